@@ -0,0 +1,166 @@
+'''Works out the fewest block element changes needed to bring a tag block in line with the objects being exported, so that saving a scene only rewrites the elements that changed.
+Pure python so that plans can be computed and checked without ManagedBlam or Blender'''
+
+import os
+from typing import Callable, Hashable
+
+def freeze(value):
+    '''Converts a value into a hashable, comparable snapshot. Sequences (including mathutils vectors) become tuples and dicts become sorted tuples of items'''
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (str, bytes)):
+        return value
+    if hasattr(value, "__iter__"):
+        return tuple(freeze(v) for v in value)
+    return value
+
+class SyncPlan:
+    '''Changes which bring a block from its previous items to the current ones:
+    - writes: (index, key) of elements whose key is unchanged but whose snapshot differs
+    - replaces: (index, key) of elements whose key is gone, reused for a new key so that the elements after them keep their indices
+    - removes: indices of elements whose key is gone and could not be reused, in descending order
+    - appends: new keys added at the end of the block
+    Indices in writes and replaces are from before any removals. order is the key of each element once the plan is applied'''
+    def __init__(self):
+        self.writes: list[tuple[int, Hashable]] = []
+        self.replaces: list[tuple[int, Hashable]] = []
+        self.removes: list[int] = []
+        self.appends: list[Hashable] = []
+        self.order: list[Hashable] = []
+
+    def __bool__(self):
+        return bool(self.writes or self.replaces or self.removes or self.appends)
+
+    def indices(self) -> dict:
+        '''Element index of each key once the plan is applied'''
+        return {key: idx for idx, key in enumerate(self.order)}
+
+def plan_sync(previous: list[tuple[Hashable, object]], current: dict[Hashable, object]) -> SyncPlan:
+    '''Diffs the (key, snapshot) of each element currently in the block against the snapshots of the items to export, keyed and ordered as they should be added.
+    A snapshot of None in previous means the element's contents are unknown, so it is always rewritten if kept'''
+    plan = SyncPlan()
+    slots = []
+    freed = []
+    kept = set()
+    for idx, (key, snapshot) in enumerate(previous):
+        if key in current and key not in kept:
+            if snapshot is None or current[key] != snapshot:
+                plan.writes.append((idx, key))
+            slots.append(key)
+            kept.add(key)
+        else:
+            freed.append(idx)
+            slots.append(None)
+
+    new_keys = [key for key in current if key not in kept]
+    # Fill the lowest freed slots first, so that any elements which do have to be removed are as near the end of the block as possible
+    for idx, key in zip(freed, new_keys):
+        plan.replaces.append((idx, key))
+        slots[idx] = key
+
+    reused = min(len(freed), len(new_keys))
+    plan.removes = freed[reused:][::-1]
+    plan.appends = new_keys[reused:]
+    plan.order = [key for key in slots if key is not None] + plan.appends
+    return plan
+
+def apply_plan(block, plan: SyncPlan, write_element: Callable, write_in_place=False):
+    '''Applies a plan to a ManagedBlam block. write_element(element, key) fills in an element. Replaced elements, and written ones unless write_in_place is set,
+    are removed and inserted again at the same index so that they start from default values'''
+    for idx, key in plan.writes:
+        if write_in_place:
+            write_element(block.Elements[idx], key)
+        else:
+            block.RemoveElement(idx)
+            write_element(block.InsertElement(idx), key)
+    for idx, key in plan.replaces:
+        block.RemoveElement(idx)
+        write_element(block.InsertElement(idx), key)
+    for idx in plan.removes:
+        block.RemoveElement(idx)
+    for key in plan.appends:
+        write_element(block.AddElement(), key)
+
+def unique_keys(keys: list[Hashable]) -> list[tuple[Hashable, int]]:
+    '''Pairs each key with the number of times it appeared before it, so that items sharing a name (such as objects from linked libraries) each keep their own element'''
+    seen = {}
+    unique = []
+    for key in keys:
+        count = seen.get(key, 0)
+        seen[key] = count + 1
+        unique.append((key, count))
+    return unique
+
+def sync_block(block, previous: list | None, snapshots: dict, write_element: Callable, existing_key: Callable = None, write_in_place=False) -> tuple[SyncPlan, bool]:
+    '''Brings a block in line with snapshots, given the (key, snapshot) of each element as last synced. If previous is None, the block is cleared unless
+    existing_key is given to read the key of each element, in which case matching elements are rewritten in place of each other. Returns the plan applied and whether the block changed'''
+    changed = False
+    if previous is None:
+        if existing_key is None:
+            if block.Elements.Count:
+                block.RemoveAllElements()
+                changed = True
+            previous = []
+        else:
+            previous = [(existing_key(element), None) for element in block.Elements]
+
+    plan = plan_sync(previous, snapshots)
+    if plan:
+        apply_plan(block, plan, write_element, write_in_place)
+        changed = True
+    return plan, changed
+
+class BlockStates:
+    '''Remembers the (key, snapshot) of each element last written to a tag block. A tag saved by anything else since (Tool, a tag editor, an undo) no longer matches
+    the modification time stamped after it was written, so its state is forgotten and the block is rebuilt in full'''
+    def __init__(self):
+        self.tags: dict[str, dict] = {}
+
+    @staticmethod
+    def _key(tag_path) -> str:
+        return os.path.normcase(os.path.abspath(tag_path))
+
+    @staticmethod
+    def _mtime(key) -> int:
+        try:
+            return os.stat(key).st_mtime_ns
+        except OSError:
+            return -1
+
+    def previous(self, tag_path, block_name: str, element_count: int) -> list | None:
+        '''Returns the state last recorded for the block, or None if it is unknown or out of date'''
+        key = self._key(tag_path)
+        state = self.tags.get(key)
+        # A state recorded since the tag was opened has no modification time yet, and is trusted until the tag is closed
+        if state is None or (state["mtime"] is not None and state["mtime"] != self._mtime(key)):
+            return
+        items = state["blocks"].get(block_name)
+        if items is None or len(items) != element_count:
+            return
+        return items
+
+    def record(self, tag_path, block_name: str, items: list[tuple[Hashable, object]]):
+        '''Records the state of a block as written. Once the tag is closed it is only trusted if the tag was stamped after saving'''
+        state = self.tags.setdefault(self._key(tag_path), {"mtime": None, "blocks": {}})
+        state["mtime"] = None
+        state["blocks"][block_name] = items
+
+    def stamp(self, tag_path):
+        '''Marks the recorded state as current. Called by Tag and TagSession once a tag is saved or closed unchanged'''
+        key = self._key(tag_path)
+        state = self.tags.get(key)
+        if state is not None:
+            state["mtime"] = self._mtime(key)
+
+    def forget(self, tag_path):
+        self.tags.pop(self._key(tag_path), None)
+
+block_states = BlockStates()
+
+def sync_tag_block(tag_path, block, block_name: str, snapshots: dict, write_element: Callable, existing_key: Callable = None, write_in_place=False) -> tuple[list, bool]:
+    '''sync_block for a block of the tag at tag_path, diffed against the state recorded when the block was last synced and recording the new state.
+    Returns the key of each element in the block and whether the block changed'''
+    previous = block_states.previous(tag_path, block_name, block.Elements.Count)
+    plan, changed = sync_block(block, previous, snapshots, write_element, existing_key, write_in_place)
+    block_states.record(tag_path, block_name, [(key, snapshots[key]) for key in plan.order])
+    return plan.order, changed
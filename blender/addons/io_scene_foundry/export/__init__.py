@@ -28,6 +28,8 @@ from ..tools.asset_types import AssetType
 
 from ..tools.camera_track_sync import export_current_action_as_camera_track
 
+from ..managed_blam.tag_session import TagSession
+
 from .process import ExportScene
 
 from ..icons import get_icon_id, get_icon_id_in_directory
@@ -358,6 +360,12 @@ class NWO_ExportScene(Operator, ExportHelper):
         col.prop(scene_nwo_export, "show_output", text="Toggle Output")
         if scene_nwo.asset_type in {'cinematic', 'model', 'animation'}:
             col.prop(scene_nwo_export, "faster_animation_export")
+        row = col.row(align=True)
+        row.prop(scene_nwo_export, "use_export_cache")
+        row.operator("nwo.clear_export_cache", text="", icon='TRASH')
+        row = col.row(align=True)
+        row.prop(scene_nwo_export, "profile_export")
+        row.operator("nwo.reset_export_profile_baseline", text="", icon='FILE_REFRESH')
         col.separator()
         col.use_property_split = False
         if not scene_nwo.is_child_asset:
@@ -550,40 +558,65 @@ def export_asset(context, sidecar_path_full, sidecar_path, asset_name, asset_pat
     if asset_type == 'camera_track_set':
         return export_current_action_as_camera_track(context,asset_path) # Return early if this is a camera track export
     export_scene = ExportScene(context, sidecar_path_full, sidecar_path, asset_type, asset_name, asset_path, corinth, export_settings, scene_settings)
+    profiler = export_scene.profiler
     try:
         if export_settings.export_mode in {'FULL', 'GRANNY'}:
             print("\n\nProcessing Scene")
             print("-----------------------------------------------------------------------\n")
-            export_scene.ready_scene()
-            export_scene.get_initial_export_objects()
-            export_scene.map_halo_properties()
-            export_scene.set_template_node_order()
-            export_scene.create_virtual_tree()
-            if export_scene.asset_type == AssetType.CINEMATIC:
-                export_scene.sample_shots()
-            else:
-                export_scene.sample_animations()
-            export_scene.report_warnings()
-            export_scene.export_files()
-            export_scene.write_sidecar()
+            # Tags read while processing (template graphs and render models, shaders for granny textures) are loaded once and shared
+            with TagSession():
+                with profiler.stage("ready_scene"):
+                    export_scene.ready_scene()
+                with profiler.stage("get_initial_export_objects"):
+                    export_scene.get_initial_export_objects()
+                with profiler.stage("map_halo_properties"):
+                    export_scene.map_halo_properties()
+                with profiler.stage("set_template_node_order"):
+                    export_scene.set_template_node_order()
+                with profiler.stage("create_virtual_tree"):
+                    export_scene.create_virtual_tree()
+                if export_scene.asset_type == AssetType.CINEMATIC:
+                    with profiler.stage("sample_shots"):
+                        export_scene.sample_shots()
+                else:
+                    with profiler.stage("sample_animations"):
+                        export_scene.sample_animations()
+                export_scene.report_warnings()
+                with profiler.stage("export_files"):
+                    export_scene.export_files()
+                with profiler.stage("write_sidecar"):
+                    export_scene.write_sidecar()
             
         if export_settings.export_mode in {'FULL', 'TAGS'}:
             if export_settings.export_mode == 'TAGS' and (export_scene.limit_perms_to_selection or export_scene.limit_bsps_to_selection):
                 # Need to figure out what perms/bsps are selected in this case
                 print("\n\nQuick Scene Process")
                 print("-----------------------------------------------------------------------\n")
-                export_scene.ready_scene()
-                export_scene.get_initial_export_objects()
-                export_scene.map_halo_properties()
+                with profiler.stage("ready_scene"):
+                    export_scene.ready_scene()
+                with profiler.stage("get_initial_export_objects"):
+                    export_scene.get_initial_export_objects()
+                with profiler.stage("map_halo_properties"):
+                    export_scene.map_halo_properties()
             
-            export_scene.preprocess_tags()
+            with profiler.stage("preprocess_tags"):
+                export_scene.preprocess_tags()
             if not (export_scene.asset_type == AssetType.CINEMATIC and (export_settings.cinematic_scope == 'CAMERA' or not export_scene.cinematic_actors)):
                 # No need to invoke tool if we're only writing cinematic frame data
                 print("\n\nWriting Tags")
                 print("-----------------------------------------------------------------------\n")
-                export_scene.invoke_tool_import()
+                with profiler.stage("invoke_tool_import"):
+                    export_scene.invoke_tool_import()
                 
-            export_scene.postprocess_tags()
-            export_scene.lightmap()
+            with profiler.stage("postprocess_tags"):
+                export_scene.postprocess_tags()
+            with profiler.stage("lightmap"):
+                export_scene.lightmap()
     finally:
-        export_scene.restore_scene()
\ No newline at end of file
+        with profiler.stage("restore_scene"):
+            export_scene.restore_scene()
+        if profiler.enabled:
+            report_path = profiler.write(Path(asset_path, "export"))
+            profiler.print_summary()
+            if report_path is not None:
+                print(f"\n--- Export profile written to {report_path}")
\ No newline at end of file
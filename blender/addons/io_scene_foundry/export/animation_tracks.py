@@ -0,0 +1,121 @@
+'''Bone animation sampling and decomposition into granny track arrays. Pure numpy, so tracks can be built and checked without Blender'''
+
+from collections import defaultdict
+import numpy as np
+
+class AnimationSampler:
+    '''Records the pose of a list of animated bones for each frame into a single (frames, bones, 4, 4) array.
+    Parent relative transforms, decomposition and the granny track buffers are then computed for all frames at once'''
+    def __init__(self, bones: list['AnimatedBone'], frame_count: int, rotation_matrix):
+        self.bones = bones
+        self.frame_count = frame_count
+        self.frames_recorded = 0
+        self.rotation_matrix = np.array(rotation_matrix, dtype=np.float64)
+        self.matrices = np.zeros((frame_count, len(bones), 4, 4), dtype=np.float64)
+
+        bone_indices = {bone.pbone: idx for idx, bone in enumerate(bones) if not bone.is_object}
+        self.parent_indices = np.array([-1 if bone.is_object or not bone.parent else bone_indices[bone.parent] for bone in bones], dtype=np.int32)
+
+        # Pose bones are grouped by armature so each armature is read with a single foreach_get per frame
+        armature_slots = defaultdict(list)
+        self.object_slots = []
+        for idx, bone in enumerate(bones):
+            if bone.is_object:
+                self.object_slots.append((idx, bone.pbone))
+            else:
+                armature_slots[bone.ob].append(idx)
+
+        self.armature_reads = []
+        for arm, slots in armature_slots.items():
+            pose_bone_indices = {pb.name: i for i, pb in enumerate(arm.pose.bones)}
+            pose_indices = np.array([pose_bone_indices[bones[idx].pbone.name] for idx in slots], dtype=np.int32)
+            buffer = np.empty(len(arm.pose.bones) * 16, dtype=np.single)
+            self.armature_reads.append((arm, buffer, pose_indices, np.array(slots, dtype=np.int32)))
+
+    def record(self):
+        '''Stores the world space matrix of every bone for the current frame'''
+        frame_matrices = self.matrices[self.frames_recorded]
+        for arm, buffer, pose_indices, slots in self.armature_reads:
+            arm.pose.bones.foreach_get("matrix", buffer)
+            # foreach_get returns matrices column major
+            pose_matrices = buffer.reshape(-1, 4, 4).transpose(0, 2, 1)[pose_indices]
+            frame_matrices[slots] = np.array(arm.matrix_world, dtype=np.float64) @ pose_matrices
+
+        for idx, ob in self.object_slots:
+            frame_matrices[idx] = ob.matrix_world
+
+        self.frames_recorded += 1
+
+    def local_matrices(self) -> np.ndarray:
+        '''Returns the sampled matrices relative to their parent bone'''
+        world = self.rotation_matrix @ self.matrices
+        local = world.copy()
+        children = np.flatnonzero(self.parent_indices >= 0)
+        if children.size:
+            local[:, children] = np.linalg.inv(world[:, self.parent_indices[children]]) @ world[:, children]
+
+        return local
+
+    def to_track_arrays(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''Returns contiguous float32 position, orientation and scale shear arrays of shape (bones, frames, 3 | 4 | 9)'''
+        num_bones = len(self.bones)
+        positions = np.zeros((num_bones, self.frame_count, 3), dtype=np.single)
+        orientations = np.zeros((num_bones, self.frame_count, 4), dtype=np.single)
+        scale_shears = np.zeros((num_bones, self.frame_count, 9), dtype=np.single)
+        if not self.frames_recorded or not num_bones:
+            return positions, orientations, scale_shears
+
+        loc, rot, sca = decompose_matrices(self.local_matrices())
+        positions[:] = loc.transpose(1, 0, 2)
+        orientations[:] = rot.transpose(1, 0, 2)
+        scale_shears[..., 0::4] = sca.transpose(1, 0, 2)
+
+        return positions, orientations, scale_shears
+
+def decompose_matrices(matrices: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Vectorised equivalent of mathutils Matrix.decompose for an array of 4x4 matrices.
+    Returns location (..., 3), quaternion as xyzw (..., 4) and scale (..., 3)'''
+    loc = matrices[..., :3, 3]
+    basis = matrices[..., :3, :3]
+    sca = np.linalg.norm(basis, axis=-2)
+    rot = basis / np.where(sca == 0, 1, sca)[..., np.newaxis, :]
+    negative = np.linalg.det(basis) < 0
+    rot[negative] *= -1
+    sca[negative] *= -1
+
+    return loc, matrices_to_quaternions(rot), sca
+
+def matrices_to_quaternions(rot: np.ndarray) -> np.ndarray:
+    '''Converts an array of normalised rotation matrices to xyzw quaternions with a non-negative w, matching mathutils'''
+    m00, m01, m02 = rot[..., 0, 0], rot[..., 0, 1], rot[..., 0, 2]
+    m10, m11, m12 = rot[..., 1, 0], rot[..., 1, 1], rot[..., 1, 2]
+    m20, m21, m22 = rot[..., 2, 0], rot[..., 2, 1], rot[..., 2, 2]
+
+    quats = np.empty(rot.shape[:-2] + (4,), dtype=rot.dtype)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # x largest
+        s = 2 * np.sqrt(np.maximum(1 + m00 - m11 - m22, 0))
+        s = np.where(m21 < m12, -s, s)
+        x_quats = np.stack((0.25 * s, (m10 + m01) / s, (m02 + m20) / s, (m21 - m12) / s), axis=-1)
+        # y largest
+        s = 2 * np.sqrt(np.maximum(1 - m00 + m11 - m22, 0))
+        s = np.where(m02 < m20, -s, s)
+        y_quats = np.stack(((m10 + m01) / s, 0.25 * s, (m21 + m12) / s, (m02 - m20) / s), axis=-1)
+        # z largest
+        s = 2 * np.sqrt(np.maximum(1 - m00 - m11 + m22, 0))
+        s = np.where(m10 < m01, -s, s)
+        z_quats = np.stack(((m02 + m20) / s, (m21 + m12) / s, 0.25 * s, (m10 - m01) / s), axis=-1)
+        # w largest
+        s = 2 * np.sqrt(np.maximum(1 + m00 + m11 + m22, 0))
+        w_quats = np.stack(((m21 - m12) / s, (m02 - m20) / s, (m10 - m01) / s, 0.25 * s), axis=-1)
+
+    use_x = (m22 < 0) & (m00 > m11)
+    use_y = (m22 < 0) & ~use_x
+    use_z = (m22 >= 0) & (m00 < -m11)
+    use_w = ~(use_x | use_y | use_z)
+    for mask, candidates in ((use_x, x_quats), (use_y, y_quats), (use_z, z_quats), (use_w, w_quats)):
+        quats[mask] = candidates[mask]
+
+    lengths = np.linalg.norm(quats, axis=-1, keepdims=True)
+    quats /= np.where(lengths == 0, 1, lengths)
+    return quats
@@ -1,13 +1,14 @@
 from collections import defaultdict
+from copy import deepcopy
 from datetime import datetime
 from getpass import getuser
 import os
 from pathlib import Path
 import bpy
 import xml.etree.cElementTree as ET
-import xml.dom.minidom
 
 from .cinematic import Actor
+from . import sidecar_xml
 
 from ..props.scene import NWO_ScenePropertiesGroup
 from ..tools.asset_types import AssetType
@@ -112,8 +113,8 @@ class Sidecar:
     def get_child_elements(self):
         for path in self.child_sidecar_paths:
             try:
-                tree = ET.parse(path)
-                root = tree.getroot()
+                # Parsed sidecars are shared between exports, so elements are only appended to the new sidecar and never changed
+                root = sidecar_xml.child_sidecars.get_root(path)
                 content_objects = [element for element in root.findall(".//ContentObject")]
                 if self.asset_type in {AssetType.MODEL, AssetType.SKY, AssetType.ANIMATION}:
                     is_animation_only = False
@@ -147,6 +148,7 @@ class Sidecar:
                         if not content_name:
                             continue
                         
+                        content = deepcopy(content)
                         for output in content.findall(".//OutputTag"):
                             output.text = str(Path(self.tag_path, content_name))
                             
@@ -160,8 +162,6 @@ class Sidecar:
                 utils.print_warning(f"--- Failed to parse {path}")
                 
     def write_verification(self):
-        m_encoding = "utf-8"
-        m_standalone = "yes"
         root = ET.Element("verification")
         
         # COMBAT CROUCH
@@ -188,26 +188,15 @@ class Sidecar:
         ET.SubElement(weapon, "action", name="airborne")
         ET.SubElement(weapon, "overlay", name="aim_still_up")
         
-        dom = xml.dom.minidom.parseString(ET.tostring(root))
-        xml_string = dom.toprettyxml(indent="  ")
-        part1, part2 = xml_string.split("?>")
-        
         verification_path = Path(self.asset_path, f"{self.asset_name}.verification.xml")
 
         try:
-            with open(verification_path, "w") as f:
-                f.write(part1 + 'encoding="{}" standalone="{}"?>\n'.format(m_encoding, m_standalone))
-                for line in part2.splitlines():
-                    if line.strip():
-                        f.write(line + "\n")
-                        
-                self.verification = utils.relative_path(verification_path)
+            sidecar_xml.write(root, verification_path)
+            self.verification = utils.relative_path(verification_path)
         except:
             utils.print_warning("Failed to write verification xml")
             
     def write_clone(self, clones: dict):
-        m_encoding = "utf-8"
-        m_standalone = "yes"
         clones_element = ET.Element("Clones")
         for perm, clone_list in clones.items():
             for clone in clone_list:
@@ -238,26 +227,15 @@ class Sidecar:
                     ET.SubElement(material_override, "Original").text=source_path_rel
                     ET.SubElement(material_override, "Override").text=destination_path_rel
 
-        dom = xml.dom.minidom.parseString(ET.tostring(clones_element))
-        xml_string = dom.toprettyxml(indent="  ")
-        part1, part2 = xml_string.split("?>")
-        
         clone_path = Path(self.asset_path, f"{self.asset_name}.clone.xml")
 
         try:
-            with open(clone_path, "w") as f:
-                f.write(part1 + 'encoding="{}" standalone="{}"?>\n'.format(m_encoding, m_standalone))
-                for line in part2.splitlines():
-                    if line.strip():
-                        f.write(line + "\n")
-                        
-                self.clone = utils.relative_path(clone_path)
+            sidecar_xml.write(clones_element, clone_path)
+            self.clone = utils.relative_path(clone_path)
         except:
             utils.print_warning("Failed to write clone xml")
         
     def build(self, actor_render_model_path=None):
-        m_encoding = "utf-8"
-        m_standalone = "yes"
         metadata = ET.Element("Metadata")
         self._write_header(metadata)
         if self.parent_sidecar is None:
@@ -306,19 +284,11 @@ class Sidecar:
                 case AssetType.CINEMATIC:
                     self._write_cinematic_contents(metadata)
 
-        dom = xml.dom.minidom.parseString(ET.tostring(metadata))
-        xml_string = dom.toprettyxml(indent="  ")
-        part1, part2 = xml_string.split("?>")
-
         if Path(self.sidecar_path_full).exists():
             if not os.access(self.sidecar_path_full, os.W_OK):
                 raise RuntimeError(f"Sidecar is read only, cannot complete export: {self.sidecar_path_full}\n")
         
-        with open(self.sidecar_path_full, "w") as f:
-            f.write(part1 + 'encoding="{}" standalone="{}"?>\n'.format(m_encoding, m_standalone))
-            for line in part2.splitlines():
-                if line.strip():
-                    f.write(line + "\n")
+        sidecar_xml.write(metadata, self.sidecar_path_full)
 
     def _write_header(self, metadata):
         header = ET.SubElement(metadata, "Header")
@@ -1,3 +1,4 @@
+from functools import cached_property
 from pathlib import Path
 import bpy
 
@@ -9,6 +10,7 @@ from ..managed_blam import Tag
 
 from .. import utils
 from ..managed_blam.camera_track import camera_correction_matrix
+from .cinematic_frames import write_frames
 
 class CinematicScene:
     def __init__(self, asset_path, scene_name, scene: bpy.types.Scene):
@@ -142,44 +144,36 @@ class ShotActor:
 class Shot: ...
     
 class Frame:
+    '''Camera state for one frame of a shot. Only the raw camera values are read while sampling. Depth of field values are derived from them on first use,
+    so they are only computed for frames which are written to the tag'''
     def __init__(self, ob: bpy.types.Object, corinth: bool):
         assert(ob.type == 'CAMERA')
         data = ob.data
         data: bpy.types.Camera
         blender_matrix = ob.matrix_world
         matrix = utils.halo_transforms_matrix(blender_matrix)
-            
+        
+        self.corinth = corinth
+        self.lens = data.lens
+        self.depth_of_field = int(data.dof.use_dof)
         if data.dof.use_dof:
             # Focal distance
             if data.dof.focus_object:
                 # Focus object exists, calculate distance from camera to object
                 focus_object = data.dof.focus_object
-                focal_distance = (ob.matrix_world.translation - focus_object.location).length
+                self.focal_depth = (ob.matrix_world.translation - focus_object.location).length
             else:
                 # Fallback to manually set focus distance
-                focal_distance = data.dof.focus_distance
-
+                self.focal_depth = data.dof.focus_distance
             # Aperture (f-stop value)
-            aperture = data.dof.aperture_fstop
-
-            # Lens focal length (in mm)
-            lens = data.lens
-
-            # Calculate the depth of field region
-            # Hyperfocal distance: the distance beyond which all objects are in acceptable focus
-            hyperfocal = (lens ** 2) / (aperture * 5)
-
-            # Near and far focal planes
-            near_focal_plane = (hyperfocal * focal_distance) / (hyperfocal + (focal_distance - lens))
-            far_focal_plane = (hyperfocal * focal_distance) / (hyperfocal - (focal_distance - lens))
-
-            # Blur amount (relative to aperture)
-            blur_amount = 1 / aperture if aperture > 0 else 0
+            self.aperture = data.dof.aperture_fstop
         else:
-            focal_distance = 0
-            near_focal_plane = 0
-            far_focal_plane = 0
-            blur_amount = 0
+            self.focal_depth = 0
+            self.aperture = 0
+            
+        self.sensor_width = data.sensor_width
+        self.clip_start = data.clip_start
+        self.clip_end = data.clip_end
             
         self.position = matrix.translation.to_tuple()
         matrix_3x3 = matrix.to_3x3() @ camera_correction_matrix.inverted()
@@ -188,28 +182,67 @@ class Frame:
         self.up = up.normalized().to_tuple()
         self.forward = forward.normalized().to_tuple()
         self.focal_length = data.lens * (0.5 if corinth else 1.3)
-        self.depth_of_field = int(data.dof.use_dof)
-
-        self.near_focal_plane_distance = utils.halo_scale(near_focal_plane) * 100
-        self.far_focal_plane_distance = utils.halo_scale(far_focal_plane) * 100
-        
-        self.focal_depth = focal_distance
-        
-        # near, far = calculate_focal_depths(focus_distance, aperture, focal_length=focal_length)
-
-        # self.near_focal_depth = near 
-        # self.far_focal_depth = far
-        
-        self.blur_amount = blur_amount
-        
-        sensor_width = data.sensor_width
         
-        # near_blur = calculate_blur_amount(focal_length, focus_distance, aperture, data.clip_start, sensor_width)
-        # far_blur = calculate_blur_amount(focal_length, focus_distance, aperture, data.clip_end, sensor_width)
-        
-        # self.near_blur_amount = near_blur
-        # self.far_blur_amount = far_blur
-
+    def signature(self) -> tuple:
+        '''Every input to the frame's tag element, for telling whether a frame changed since it was last written'''
+        return (self.position, self.forward, self.up, self.focal_length, self.depth_of_field, self.focal_depth, self.aperture, self.sensor_width, self.clip_start, self.clip_end)
+    
+    @cached_property
+    def _focal_planes(self) -> tuple[float, float]:
+        if not self.depth_of_field or self.aperture <= 0:
+            return 0, 0
+        lens = self.lens
+        focal_distance = self.focal_depth
+        # Calculate the depth of field region
+        # Hyperfocal distance: the distance beyond which all objects are in acceptable focus
+        hyperfocal = (lens ** 2) / (self.aperture * 5)
+        # Near and far focal planes
+        near_focal_plane = (hyperfocal * focal_distance) / (hyperfocal + (focal_distance - lens))
+        far_focal_plane = (hyperfocal * focal_distance) / (hyperfocal - (focal_distance - lens))
+        return utils.halo_scale(near_focal_plane) * 100, utils.halo_scale(far_focal_plane) * 100
+    
+    @property
+    def near_focal_plane_distance(self) -> float:
+        return self._focal_planes[0]
+    
+    @property
+    def far_focal_plane_distance(self) -> float:
+        return self._focal_planes[1]
+    
+    @property
+    def blur_amount(self) -> float:
+        # Blur amount (relative to aperture)
+        return 1 / self.aperture if self.depth_of_field and self.aperture > 0 else 0
+    
+    @cached_property
+    def _focal_depths(self) -> tuple[float, float]:
+        if not self.depth_of_field or self.aperture <= 0:
+            return 0, 0
+        return calculate_focal_depths(self.focal_depth, self.aperture, focal_length=self.lens)
+    
+    @property
+    def near_focal_depth(self) -> float:
+        return self._focal_depths[0]
+    
+    @property
+    def far_focal_depth(self) -> float:
+        return self._focal_depths[1]
+    
+    @cached_property
+    def _blur_amounts(self) -> tuple[float, float]:
+        if not self.depth_of_field or self.aperture <= 0 or self.focal_depth == self.lens:
+            return 0, 0
+        near_blur = calculate_blur_amount(self.lens, self.focal_depth, self.aperture, self.clip_start, self.sensor_width)
+        far_blur = calculate_blur_amount(self.lens, self.focal_depth, self.aperture, self.clip_end, self.sensor_width)
+        return near_blur, far_blur
+    
+    @property
+    def near_blur_amount(self) -> float:
+        return self._blur_amounts[0]
+    
+    @property
+    def far_blur_amount(self) -> float:
+        return self._blur_amounts[1]
     
 class Effect:
     def __init__(self):
@@ -482,6 +515,7 @@ class QUA:
                     self._write_scene_data(data, scene.tag.SelectField("Block:objects"), scene.tag.SelectField("Block:shots"), data.tag.SelectField("Block:extra camera frame data"), data.tag.SelectField("Block:objects"), data.tag.SelectField("Block:shots"))
             else:
                 self._write_scene_data(scene, scene.tag.SelectField("Block:objects"), scene.tag.SelectField("Block:shots"), scene.tag.SelectField("Block:extra camera frame data"))
+            write_frames(scene.system_path, scene.tag.SelectField("Block:shots"), self.shots, self.corinth)
             
     def _write_scene_data(self, tag, block_objects: TagFieldBlock, block_shots: TagFieldBlock, block_extra_camera: TagFieldBlock, block_data_objects: TagFieldBlock = None, block_data_shots: TagFieldBlock = None):
         # EXTRA CAMERAS TODO
@@ -574,7 +608,6 @@ class QUA:
                     c.from_element(sub_element)
                     texture_movies[c] = current_frame_index + c.frame + int(self.corinth)
                 block_texture_movies.RemoveAllElements()
-                element = block_data_shots.Elements[idx]
                 
             current_frame_index += (data_element.SelectField("frame count").Data - 1)
         
@@ -594,39 +627,6 @@ class QUA:
         for idx, shot in enumerate(self.shots):
             element = block_shots.Elements[idx]
             element.SelectField("frame count").Data = shot.frame_count
-            frame_data = element.SelectField("frame data")
-            frame_data.RemoveAllElements()
-                
-            if not shot.frames:
-                continue
-            
-            # FRAME DATA
-            if self.corinth:
-                for frame in shot.frames:
-                    felement = frame_data.AddElement()
-                    felement.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealPoint3d:camera position").Data = frame.position
-                    felement.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealVector3d:camera forward").Data = frame.forward
-                    felement.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealVector3d:camera up").Data = frame.up
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:focal length").Data = frame.focal_length
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/LongInteger:depth of field").Data = frame.depth_of_field
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near focal plane distance").Data = frame.near_focal_plane_distance
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far focal plane distance").Data = frame.far_focal_plane_distance
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near focal depth").Data = frame.near_focal_depth
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far focal depth").Data = frame.far_focal_depth
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near blur amount").Data = frame.near_blur_amount
-                    felement.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far blur amount").Data = frame.far_blur_amount
-            else:
-                for frame in shot.frames:
-                    felement = frame_data.AddElement()
-                    felement.SelectField("Struct:camera frame[0]/RealPoint3d:camera position").Data = frame.position
-                    felement.SelectField("Struct:camera frame[0]/RealVector3d:camera forward").Data = frame.forward
-                    felement.SelectField("Struct:camera frame[0]/RealVector3d:camera up").Data = frame.up
-                    felement.SelectField("Struct:camera frame[0]/Real:focal length").Data = frame.focal_length
-                    felement.SelectField("Struct:camera frame[0]/LongInteger:depth of field").Data = frame.depth_of_field
-                    felement.SelectField("Struct:camera frame[0]/Real:near focal plane distance").Data = frame.near_focal_plane_distance
-                    felement.SelectField("Struct:camera frame[0]/Real:far focal plane distance").Data = frame.far_focal_plane_distance
-                    felement.SelectField("Struct:camera frame[0]/Real:focal depth").Data = frame.focal_depth
-                    felement.SelectField("Struct:camera frame[0]/Real:blur amount").Data = frame.blur_amount
         
         # OBJECTS
         actor_elements = {actor: None for actor in self.objects}
@@ -0,0 +1,39 @@
+'''Writes the camera frames of cinematic scene shots. Works with any tag block objects shaped like ManagedBlam's, so frame syncing can be checked without it'''
+
+from ..block_sync import sync_tag_block
+
+def write_corinth_frame(element, frame):
+    element.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealPoint3d:camera position").Data = frame.position
+    element.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealVector3d:camera forward").Data = frame.forward
+    element.SelectField("Struct:camera frame[0]/Struct:dynamic data[0]/RealVector3d:camera up").Data = frame.up
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:focal length").Data = frame.focal_length
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/LongInteger:depth of field").Data = frame.depth_of_field
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near focal plane distance").Data = frame.near_focal_plane_distance
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far focal plane distance").Data = frame.far_focal_plane_distance
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near focal depth").Data = frame.near_focal_depth
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far focal depth").Data = frame.far_focal_depth
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:near blur amount").Data = frame.near_blur_amount
+    element.SelectField("Struct:camera frame[0]/Struct:constant data[0]/Real:far blur amount").Data = frame.far_blur_amount
+
+def write_reach_frame(element, frame):
+    element.SelectField("Struct:camera frame[0]/RealPoint3d:camera position").Data = frame.position
+    element.SelectField("Struct:camera frame[0]/RealVector3d:camera forward").Data = frame.forward
+    element.SelectField("Struct:camera frame[0]/RealVector3d:camera up").Data = frame.up
+    element.SelectField("Struct:camera frame[0]/Real:focal length").Data = frame.focal_length
+    element.SelectField("Struct:camera frame[0]/LongInteger:depth of field").Data = frame.depth_of_field
+    element.SelectField("Struct:camera frame[0]/Real:near focal plane distance").Data = frame.near_focal_plane_distance
+    element.SelectField("Struct:camera frame[0]/Real:far focal plane distance").Data = frame.far_focal_plane_distance
+    element.SelectField("Struct:camera frame[0]/Real:focal depth").Data = frame.focal_depth
+    element.SelectField("Struct:camera frame[0]/Real:blur amount").Data = frame.blur_amount
+
+def write_frames(tag_path, block_shots, shots: list, corinth: bool) -> bool:
+    '''Writes the camera frames of each shot to its frame data block, skipping frames which are unchanged since the last export.
+    Frame data elements are keyed by their index in the shot. Returns whether any block changed'''
+    write_frame = write_corinth_frame if corinth else write_reach_frame
+    changed = False
+    for idx, shot in enumerate(shots):
+        frames = shot.frames
+        _, shot_changed = sync_tag_block(tag_path, block_shots.Elements[idx].SelectField("frame data"), f"shot {idx} frame data", {frame_index: frame.signature() for frame_index, frame in enumerate(frames)},
+                                         lambda element, frame_index, frames=frames: write_frame(element, frames[frame_index]), write_in_place=True)
+        changed |= shot_changed
+    return changed
@@ -0,0 +1,181 @@
+'''Persistent record of the content each granny file was last written from, so unchanged files can be skipped on re-export'''
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+
+import numpy as np
+
+CACHE_VERSION = 2
+CACHE_FILENAME = "export_cache.json"
+
+def cache_path(asset_path: str | Path) -> Path:
+    return Path(asset_path, "export", CACHE_FILENAME)
+
+def invalidate(asset_path: str | Path) -> bool:
+    '''Deletes the export cache for the given asset. Returns True if a cache existed'''
+    path = cache_path(asset_path)
+    if path.exists():
+        path.unlink()
+        return True
+    return False
+
+def _update(digest, value):
+    '''Adds a value to the digest. Arrays and buffers are hashed by their raw bytes, everything else by repr'''
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value)
+        digest.update(f"{value.dtype}{value.shape}".encode())
+        digest.update(value.data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        digest.update(value)
+    elif hasattr(value, "_length_"): # ctypes array
+        digest.update(memoryview(value).cast("B"))
+    elif isinstance(value, dict):
+        digest.update(repr(sorted(value.items(), key=lambda item: str(item[0]))).encode())
+    else:
+        digest.update(repr(value).encode())
+    digest.update(b"\0")
+
+def _matrix(matrix) -> tuple:
+    return tuple(tuple(row) for row in matrix)
+
+def array_digest(*arrays) -> str:
+    '''Hashes the contents of numpy arrays, ctypes arrays or byte buffers, and the repr of any other value'''
+    digest = hashlib.blake2b(digest_size=16)
+    for array in arrays:
+        _update(digest, array)
+    return digest.hexdigest()
+
+def settings_key(*settings) -> str:
+    '''Hashes export settings which affect the content of every granny file'''
+    digest = hashlib.blake2b(digest_size=16)
+    _update(digest, CACHE_VERSION)
+    for setting in settings:
+        _update(digest, setting)
+    return digest.hexdigest()
+
+def _update_node(digest, node, valid_siblings: set):
+    _update(digest, node.name)
+    _update(digest, node.props)
+    _update(digest, _matrix(node.matrix_world))
+    _update(digest, _matrix(node.matrix_local))
+    _update(digest, list(node.bone_bindings))
+    mesh = node.mesh
+    if mesh is None:
+        _update(digest, None)
+        return
+    _update(digest, node.negative_scaling)
+    _update(digest, mesh.vertex_array)
+    _update(digest, mesh.indices)
+    _update(digest, [(mat.name, mat.shader_path, mat.shader_type, mat.texture_key, index, span) for mat, index, span in mesh.groups])
+    for name, face_set in mesh.face_properties.items():
+        _update(digest, name)
+        _update(digest, face_set.array)
+    _update(digest, [sibling for sibling in mesh.siblings if sibling != node.name and sibling in valid_siblings])
+
+def granny_file_key(scene, nodes: dict, animation=None, export_info: dict = None) -> str | None:
+    '''Hashes everything written to a granny file built from the given nodes (and animation), including the export info skeleton and any embedded textures.
+    Returns None if the file cannot be cached'''
+    if animation is not None:
+        content_key = getattr(animation, "content_key", None)
+        if content_key is None:
+            return None
+
+    digest = hashlib.blake2b(digest_size=16)
+    _update(digest, export_info)
+    valid_siblings = {node.name for node in nodes.values() if node.mesh}
+    for model in scene.models.values():
+        model_node = nodes.get(model.ob)
+        if not model_node:
+            continue
+        _update(digest, model.name)
+        _update(digest, _matrix(model.node.matrix_local))
+        for bone in model.skeleton.bones:
+            _update(digest, (bone.name, bone.parent_index, _matrix(bone.matrix_local), _matrix(bone.matrix_world)))
+            _update(digest, bone.props)
+            if bone.node and nodes.get(bone.bone) and bone.node.mesh:
+                _update_node(digest, bone.node, valid_siblings)
+
+    if animation is not None:
+        _update(digest, (animation.name, animation.frame_count, scene.time_step, animation.is_pca))
+        _update(digest, content_key)
+
+    return digest.hexdigest()
+
+class ExportCache:
+    '''Tracks the content key each granny file was last written with. A file is current if its key matches and the file on disk has not changed since it was written'''
+    def __init__(self, asset_path: str | Path, settings: str, enabled=True):
+        self.asset_path = Path(asset_path)
+        self.path = cache_path(asset_path)
+        self.settings = settings
+        self.enabled = enabled
+        self.entries: dict[str, dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self.written = 0
+        self.lock = threading.Lock()
+        if enabled:
+            self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != CACHE_VERSION or data.get("settings") != self.settings:
+            return
+        self.entries = data.get("files", {})
+
+    def _entry_name(self, filepath: Path) -> str:
+        try:
+            return Path(filepath).relative_to(self.asset_path).as_posix().lower()
+        except ValueError:
+            return Path(filepath).as_posix().lower()
+
+    def is_current(self, filepath: Path, key: str | None) -> bool:
+        '''Returns True if the file at filepath was last written with the given key and is unchanged on disk'''
+        if not self.enabled or key is None:
+            return False
+        entry = self.entries.get(self._entry_name(filepath))
+        current = False
+        if entry is not None and entry.get("key") == key:
+            try:
+                stat = os.stat(filepath)
+                current = stat.st_mtime_ns == entry.get("mtime_ns") and stat.st_size == entry.get("size")
+            except OSError:
+                pass
+        if current:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return current
+
+    def record(self, filepath: Path, key: str | None):
+        '''Stores the key for a file which has just been written. Safe to call from granny writer threads'''
+        if not self.enabled or key is None:
+            return
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return
+        with self.lock:
+            self.entries[self._entry_name(filepath)] = {"key": key, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+            self.written += 1
+
+    def save(self):
+        if not self.enabled:
+            return
+        data = {"version": CACHE_VERSION, "settings": self.settings, "files": self.entries}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as file:
+            json.dump(data, file, indent=1)
+        os.replace(temp_path, self.path)
+
+    def stats(self) -> str:
+        return f"{self.hits} unchanged granny file{'s' if self.hits != 1 else ''} skipped, {self.written} written"
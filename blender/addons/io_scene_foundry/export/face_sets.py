@@ -0,0 +1,34 @@
+'''Per face property arrays resolved from face layers and material indices. Pure numpy, so resolution can be checked without Blender'''
+
+import numpy as np
+
+def resolve_face_sets(face_properties: dict[str: object], layers: dict[str: np.ndarray], material_indices: np.ndarray, side_layers: dict[str: int], removed_materials: set[int]):
+    '''Fills the array of each FaceSet from its face props, a whole layer or material at a time. Props later in a FaceSet take precedence over earlier ones.
+    Negative int values are face sides, which combine with the first other side layer (in side_layers order) set on the same face with a different value.
+    Faces using removed_materials are skipped, with the remaining faces written to the start of the arrays'''
+    if removed_materials:
+        kept = ~np.isin(material_indices, list(removed_materials))
+        material_indices = material_indices[kept]
+        layers = {name: layer[kept] for name, layer in layers.items() if layer is not None}
+        
+    count = len(material_indices)
+    for face_set in face_properties.values():
+        array = face_set.array[:count]
+        for key, value in face_set.face_props.items():
+            if isinstance(key, int):
+                array[material_indices == key] = value
+                continue
+            mask = layers[key] != 0
+            if isinstance(value, int) and value < 0: # for handling face_sides
+                value = abs(value)
+                values = np.full(count, value, dtype=array.dtype)
+                unmerged = mask.copy()
+                for layer_name, side_value in side_layers.items():
+                    if layer_name == key or abs(side_value) == value:
+                        continue
+                    merge = unmerged & (layers[layer_name] != 0)
+                    values[merge] = value + abs(side_value)
+                    unmerged &= ~merge
+                array[mask] = values[mask]
+            else:
+                array[mask] = value
@@ -0,0 +1,132 @@
+'''Writes granny files, on the calling thread or in parallel with one granny instance per worker thread'''
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+from pathlib import Path
+from queue import Queue
+import traceback
+from typing import Callable
+
+class GrannyJob:
+    '''A single granny file to be written. Jobs sharing any of the same conflict keys are written one after another in the order they were added'''
+    def __init__(self, name: str, filepath: Path, nodes: dict, animation=None, conflict_keys=()):
+        self.name = name
+        self.filepath = filepath
+        self.nodes = nodes
+        self.animation = animation
+        self.conflict_keys = set(conflict_keys)
+        self.index = -1
+        self.error: str = None
+        self.cache_key: str = None
+        self.unchanged = False
+
+class GrannyWriter:
+    '''Queues granny files and writes them with a bounded pool of worker threads.
+    Granny releases the GIL while transforming and saving files, so independent files are written concurrently.
+    Files which share data that granny transforms in place (vertex buffers, tri topologies) are chained so they are never written at the same time'''
+    def __init__(self, granny_factory: Callable, max_workers=0, log=None):
+        '''granny_factory is called once per worker thread. log provides update_job and print_error, and defaults to utils'''
+        if log is None:
+            from .. import utils as log
+        self.log = log
+        self.granny_factory = granny_factory
+        self.max_workers = max_workers if max_workers > 0 else max((os.cpu_count() or 1) - 1, 1)
+        self.jobs: list[GrannyJob] = []
+
+    def add(self, job: GrannyJob):
+        job.index = len(self.jobs)
+        self.jobs.append(job)
+
+    def _chains(self) -> list[list[GrannyJob]]:
+        '''Groups jobs which share conflict keys. Each chain keeps the original job order'''
+        parents = list(range(len(self.jobs)))
+        def find(i):
+            while parents[i] != i:
+                parents[i] = parents[parents[i]]
+                i = parents[i]
+            return i
+
+        key_owners = {}
+        for job in self.jobs:
+            if job.unchanged: continue
+            for key in job.conflict_keys:
+                owner = key_owners.setdefault(key, job.index)
+                root_a, root_b = find(owner), find(job.index)
+                if root_a != root_b:
+                    parents[max(root_a, root_b)] = min(root_a, root_b)
+
+        chains = {}
+        for job in self.jobs:
+            if job.unchanged: continue
+            chains.setdefault(find(job.index), []).append(job)
+
+        return list(chains.values())
+
+    def _report_start(self, job: GrannyJob) -> str | None:
+        '''Prints that a job has started, returning its title. Unchanged jobs are reported as done and return None'''
+        job_title = f"--- {job.name}"
+        if job.unchanged:
+            self.log.update_job(f"{job_title} [UNCHANGED]", 1)
+            return None
+        self.log.update_job(job_title, 0)
+        return job_title
+
+    def _report_end(self, job: GrannyJob, job_title: str):
+        self.log.update_job(job_title if job.error is None else f"{job_title} [FAILED]", 1)
+
+    def run(self, write_function: Callable):
+        '''Writes all queued jobs by calling write_function(granny, job). Progress is printed in the order jobs were added and unchanged jobs are only reported.
+        Raises a RuntimeError listing every file which failed once all files have been attempted'''
+        if not self.jobs:
+            return
+
+        chains = self._chains()
+        num_workers = min(self.max_workers, len(chains))
+        grannies = Queue()
+        for _ in range(num_workers):
+            grannies.put(self.granny_factory())
+
+        def write_job(granny, job: GrannyJob):
+            try:
+                write_function(granny, job)
+            except:
+                job.error = traceback.format_exc()
+
+        def write_chain(chain: list[GrannyJob]):
+            granny = grannies.get()
+            try:
+                for job in chain:
+                    write_job(granny, job)
+            finally:
+                grannies.put(granny)
+
+        if num_workers <= 1:
+            # A single writer works on the calling thread in job order, so granny and the virtual scene are never touched from a worker thread
+            granny = grannies.get() if num_workers else None
+            for job in self.jobs:
+                job_title = self._report_start(job)
+                if job_title is None:
+                    continue
+                write_job(granny, job)
+                self._report_end(job, job_title)
+        else:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = {}
+                for chain in chains:
+                    future = executor.submit(write_chain, chain)
+                    for job in chain:
+                        futures[job.index] = future
+
+                for job in self.jobs:
+                    job_title = self._report_start(job)
+                    if job_title is None:
+                        continue
+                    futures[job.index].result()
+                    self._report_end(job, job_title)
+
+        failed = [job for job in self.jobs if job.error is not None]
+        self.jobs = []
+        if failed:
+            for job in failed:
+                self.log.print_error(f"\nFailed to write {job.filepath}\n{job.error}")
+            raise RuntimeError(f"Failed to write {len(failed)} granny file{'s' if len(failed) != 1 else ''}: {[job.name for job in failed]}")
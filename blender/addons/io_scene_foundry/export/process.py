@@ -22,7 +22,7 @@ from ..tools.light_exporter import calc_attenutation, export_lights
 
 from ..tools.scenario.zone_sets import write_zone_sets_to_scenario
 
-from ..managed_blam import Tag
+from ..managed_blam import Tag, TagSession
 from ..managed_blam.scenario import ScenarioTag
 
 from ..managed_blam.render_model import RenderModelTag
@@ -34,6 +34,10 @@ from .export_info import BoundarySurfaceType, ExportInfo, FaceDrawDistance, Face
 from ..props.mesh import NWO_MeshPropertiesGroup
 from ..props.object import NWO_ObjectPropertiesGroup
 from .virtual_geometry import AnimatedBone, VirtualAnimation, VirtualNode, VirtualScene
+from .granny_writer import GrannyJob, GrannyWriter
+from .export_cache import ExportCache, granny_file_key, settings_key
+from .profiler import ExportProfiler
+from .props_cache import PropsCache, resolve_mesh_level_props
 from ..granny import Granny
 from .. import utils
 from ..constants import VALID_MESHES, VALID_OBJECTS, WU_SCALAR
@@ -120,6 +124,16 @@ class ExportScene:
         self.models_export_dir = Path(asset_path, "export", "models")
         self.animations_export_dir = Path(asset_path, "export", "animations")
         self.cinematics_export_dir = Path(asset_path, "export", "cinematics")
+        # Profiles are only compared against a baseline exported the same way
+        self.profiler = ExportProfiler(export_settings.profile_export, {
+            "asset_type": asset_type,
+            "corinth": corinth,
+            "export_mode": export_settings.export_mode,
+            "export_animations": export_settings.export_animations,
+            "faster_animation_export": export_settings.faster_animation_export,
+            "use_export_cache": export_settings.use_export_cache,
+            "lightmap_structure": export_settings.lightmap_structure,
+        })
         
         self.regions = [i.name for i in context.scene.nwo.regions_table]
         self.regions_set = frozenset(self.regions)
@@ -131,7 +145,7 @@ class ExportScene:
         self.reg_name = 'BSP' if self.asset_type.supports_bsp else 'region'
         self.perm_name = 'layer' if self.asset_type.supports_bsp else 'permutation'
         
-        self.processed_meshes = {}
+        self.props_cache = PropsCache()
         self.processed_poop_meshes = set()
 
         self.game_version = 'corinth' if corinth else 'reach'
@@ -147,11 +161,14 @@ class ExportScene:
         self.warnings = []
         os.chdir(self.project_root)
         self.granny = Granny(Path(self.project_root, "granny2_x64.dll"), self.corinth)
+        # Files are written one at a time on this thread with the scene's own granny instance, as the granny dll is not known to be thread safe
+        self.granny_writer = GrannyWriter(lambda: self.granny, 1)
         
         self.forward = scene_settings.forward_direction
         self.from_halo_scale = 1 if scene_settings.scale == 'max' else 0.03048
         self.to_halo_scale = utils.get_export_scale(context)
         self.mirror = export_settings.granny_mirror
+        self.export_cache: ExportCache = None
         self.has_animations = False
         self.exported_animations = []
         self.setup_scenario = False
@@ -347,6 +364,7 @@ class ExportScene:
             self.export_objects = [ob for ob in self.context.view_layer.objects if ob.nwo.export_this and ob.type in VALID_OBJECTS and ob not in self.support_armatures and ob not in self.skip_obs]
         
         self.virtual_scene = VirtualScene(self.asset_type, self.depsgraph, self.corinth, self.tags_dir, self.granny, self.export_settings, self.context.scene.render.fps / self.context.scene.render.fps_base, self.scene_settings.default_animation_compression, utils.blender_halo_rotation_diff(self.forward), self.scene_settings.maintain_marker_axis, self.granny_textures, utils.get_project(self.context.scene.nwo.scene_project), self.to_halo_scale, self.unit_factor, self.atten_scalar, self.context)
+        self.virtual_scene.profiler = self.profiler
         
     def create_instance_proxies(self, ob: bpy.types.Object, ob_halo_data: dict, region: str, permutation: str):
         self.processed_poop_meshes.add(ob.data)
@@ -371,16 +389,12 @@ class ExportScene:
                 else:
                     coll_props["bungie_mesh_poop_collision_type"] = "_connected_geometry_poop_collision_type_default"
                     
-            fp_defaults, mesh_props = self.processed_meshes.get(proxy_collision.data, (None, None))
-            if mesh_props is None:
-                mesh_props = {}
-                fp_defaults = self._setup_mesh_level_props(proxy_collision, "default", mesh_props, coll_props["bungie_mesh_type"])
-                # Collision proxies must not be breakable, else tool will crash
-                if mesh_props.get("bungie_face_mode") == FaceMode.breakable.value:
-                    mesh_props["bungie_face_mode"] = FaceMode.normal.value
-                if fp_defaults.get("bungie_face_mode") == FaceMode.breakable.value:
-                    fp_defaults["bungie_face_mode"] = FaceMode.normal.value
-                self.processed_meshes[proxy_collision.data] = (fp_defaults, mesh_props)
+            fp_defaults, mesh_props = self._resolve_mesh_level_props(proxy_collision, "default", coll_props["bungie_mesh_type"])
+            # Collision proxies must not be breakable, else tool will crash
+            if mesh_props.get("bungie_face_mode") == FaceMode.breakable.value:
+                mesh_props["bungie_face_mode"] = FaceMode.normal.value
+            if fp_defaults.get("bungie_face_mode") == FaceMode.breakable.value:
+                fp_defaults["bungie_face_mode"] = FaceMode.normal.value
             
             coll_props.update(mesh_props)
             ob_halo_data[proxy_collision] = (coll_props, region, permutation, fp_defaults, tuple())
@@ -396,11 +410,7 @@ class ExportScene:
                 else:
                     phys_props["bungie_mesh_type"] = MeshType.poop_physics.value
                         
-                fp_defaults, mesh_props = self.processed_meshes.get(proxy_physics.data, (None, None))
-                if mesh_props is None:
-                    mesh_props = {}
-                    fp_defaults, self._setup_mesh_level_props(proxy_physics, "default", mesh_props, phys_props["bungie_mesh_type"])
-                    self.processed_meshes[proxy_physics.data] = (fp_defaults, mesh_props)
+                fp_defaults, mesh_props = self._resolve_mesh_level_props(proxy_physics, "default", phys_props["bungie_mesh_type"])
                 
                 phys_props.update(mesh_props)
                 ob_halo_data[proxy_physics] = (phys_props, region, permutation, fp_defaults, tuple())
@@ -410,11 +420,7 @@ class ExportScene:
             cookie_props = {}
             cookie_props["bungie_object_type"] = ObjectType.mesh.value
             cookie_props["bungie_mesh_type"] = MeshType.cookie_cutter.value
-            fp_defaults, mesh_props = self.processed_meshes.get(proxy_cookie_cutter.data, (None, None))
-            if mesh_props is None:
-                mesh_props = {}
-                fp_defaults = self._setup_mesh_level_props(proxy_cookie_cutter, "default", mesh_props, cookie_props["bungie_mesh_type"])
-                self.processed_meshes[proxy_cookie_cutter.data] = (fp_defaults, mesh_props)
+            fp_defaults, mesh_props = self._resolve_mesh_level_props(proxy_cookie_cutter, "default", cookie_props["bungie_mesh_type"])
             
             cookie_props.update(mesh_props)
             ob_halo_data[proxy_cookie_cutter] = (cookie_props, region, permutation, fp_defaults, tuple())
@@ -590,6 +596,9 @@ class ExportScene:
                     
                 utils.update_job_count(process, "", idx, num_export_objects)
             utils.update_job_count(process, "", num_export_objects, num_export_objects)
+            
+        self.profiler.count("props cache hits", self.props_cache.hits)
+        self.profiler.count("props cache misses", self.props_cache.misses)
 
         if self.current_animation:
             utils.clear_animation(self.current_animation)
@@ -805,12 +814,8 @@ class ExportScene:
         print(mesh_type)
         props["bungie_mesh_type"] = MeshType[mesh_type[30:]].value
         
-        fp_defaults, tmp_mesh_props = self.processed_meshes.get(ob.data, (None, None))
-        if tmp_mesh_props is None:
-            fp_defaults = self._setup_mesh_level_props(ob, region, mesh_props, props["bungie_mesh_type"])
-            self.processed_meshes[ob.data] = (fp_defaults, mesh_props)
-        else:
-            mesh_props.update(tmp_mesh_props)
+        fp_defaults, mesh_level_props = self._resolve_mesh_level_props(ob, region, props["bungie_mesh_type"])
+        mesh_props.update(mesh_level_props)
 
         return fp_defaults, copy
     
@@ -1055,6 +1060,10 @@ class ExportScene:
                 props["bungie_marker_light_cone_intensity"] = nwo.marker_light_cone_intensity
                 props["bungie_marker_light_cone_curve"] = nwo.marker_light_cone_curve
     
+    def _resolve_mesh_level_props(self, ob: bpy.types.Object, region: str, mesh_type_index: int) -> tuple[dict, dict]:
+        '''Returns copies of the face property defaults and mesh props of ob's mesh. These are resolved once per mesh, region and mesh type in an export'''
+        return resolve_mesh_level_props(self.props_cache, self.warnings, ob, region, mesh_type_index, self._setup_mesh_level_props)
+    
     def _setup_mesh_level_props(self, ob: bpy.types.Object, region: str, mesh_props: dict, mesh_type_index: int):
         data_nwo: NWO_MeshPropertiesGroup = ob.data.nwo
         face_props = data_nwo.face_props
@@ -1520,8 +1529,9 @@ class ExportScene:
                                     if track.object.data.animation_data:
                                         track.object.data.animation_data.action = track.action
                                 
-                        controls = self.create_event_objects(animation)
-                        self.virtual_scene.add_animation(animation, controls=controls, shape_key_objects=shape_key_objects)
+                        with self.profiler.step("animation", animation.name):
+                            controls = self.create_event_objects(animation)
+                            self.virtual_scene.add_animation(animation, controls=controls, shape_key_objects=shape_key_objects)
                         self.exported_animations.append(animation)
                         utils.update_job_count(process, "", idx, num_animations)
                     utils.update_job_count(process, "", num_animations, num_animations)
@@ -1541,7 +1551,7 @@ class ExportScene:
                                         track.object.animation_data.action = track.action
                                         
                         print("--- Sampling Active Animation ", end="")
-                        with utils.Spinner():
+                        with utils.Spinner(), self.profiler.step("animation", animation.name):
                             controls = self.create_event_objects(animation)
                             self.virtual_scene.add_animation(animation, controls=controls, shape_key_objects=shape_key_objects)
                         print(" ", end="")
@@ -1733,11 +1743,16 @@ class ExportScene:
     
     def export_files(self):
         self._create_export_groups()
+        self.export_cache = ExportCache(self.asset_path, settings_key(utils.get_version(), self.corinth, self.forward, self.from_halo_scale, self.mirror, self.granny_textures, self.scene_settings.maintain_marker_axis), self.export_settings.use_export_cache)
         self._export_models()
         if self.asset_type == AssetType.CINEMATIC:
             self._export_shots()
         else:
             self._export_animations()
+        
+        if self.export_cache.enabled:
+            self.export_cache.save()
+            print(f"\n--- Export cache: {self.export_cache.stats()}")
             
     def _export_shots(self):
         
@@ -1758,13 +1773,11 @@ class ExportScene:
                     granny_path_relative = str(Path(self.asset_path_relative, "export", "cinematics", f"{animation.name}.gr2"))
                     animation.gr2_path = granny_path_relative
                     if shot.in_scope and actor.in_scope:
-                        job = f"--- {animation.name}"
-                        utils.update_job(job, 0)
                         nodes = [self.virtual_scene.nodes.get(actor.ob)]
                         nodes_dict = {node.ob: node for node in nodes}
-                        self._export_granny_file(granny_path, nodes_dict, animation)
-                        utils.update_job(job, 1)
+                        self._queue_granny_file(animation.name, granny_path, nodes_dict, animation)
 
+            self.granny_writer.run(self._write_granny_file)
             shot_count = 1 if self.export_settings.current_shot_only else len(self.virtual_scene.shots)
             print(f'--- Built cinematic camera data for {shot_count} shot{"s" if shot_count != 1 else ""}')
                 
@@ -1787,15 +1800,13 @@ class ExportScene:
                 granny_path = self._get_export_path(animation.name, True)
                 self.sidecar.add_animation_file_data(granny_path, bpy.data.filepath, animation.name, animation.compression, animation.animation_type, animation.movement, animation.space, animation.pose_overlay, animation.is_pca)
                 if export and (not active_only or (self.current_animation is not None and animation.anim == self.current_animation)):
-                    job = f"--- {animation.name}"
-                    utils.update_job(job, 0)
                     nodes = self.animation_groups.get(animation.name, [])
                     nodes.extend(animation.nodes)
                     nodes_dict = {node.ob: node for node in nodes + [self.virtual_scene.skeleton_node]}
-                    self._export_granny_file(granny_path, nodes_dict, animation)
-                    utils.update_job(job, 1)
+                    self._queue_granny_file(animation.name, granny_path, nodes_dict, animation)
                     exported_something = True
-                
+            
+            self.granny_writer.run(self._write_granny_file)
             if export and not exported_something:
                 print("--- No animations to export")
     
@@ -1815,13 +1826,10 @@ class ExportScene:
         print("-----------------------------------------------------------------------\n")
         if self.asset_type == AssetType.CINEMATIC:
             for actor in self.cinematic_actors:
-                job = f"--- {actor.name}"
-                utils.update_job(job, 0)
                 nodes = [self.virtual_scene.nodes.get(actor.ob)]
                 nodes_dict = {node.ob: node for node in nodes}
                 granny_path = Path(self.models_export_dir, f"{actor.name}_skeleton.gr2")
-                self._export_granny_file(granny_path, nodes_dict)
-                utils.update_job(job, 1)
+                self._queue_granny_file(actor.name, granny_path, nodes_dict)
                 exported_something = True
                 self.sidecar.create_actor_sidecar(actor, bpy.data.filepath)
         else:
@@ -1834,45 +1842,69 @@ class ExportScene:
                 in_permutation_selection = self.asset_type not in {AssetType.MODEL, AssetType.SCENARIO, AssetType.SKY, AssetType.PREFAB} or not self.limit_perms_to_selection or perm in self.selected_permutations or tag_type in {'markers', 'skeleton'}
                 in_bsp_selection = self.asset_type != AssetType.SCENARIO or not self.limit_bsps_to_selection or region in self.selected_bsps
                 if in_permutation_selection and in_bsp_selection and tag_type in self.export_tag_types:
-                    job = f"--- {name}"
-                    utils.update_job(job, 0)
                     if self.virtual_scene.skeleton_node:
                         nodes_dict = {node.ob: node for node in nodes + [self.virtual_scene.skeleton_node]}
                     else:
                         nodes_dict = {node.ob: node for node in nodes}
-                    self._export_granny_file(granny_path, nodes_dict)
-                    utils.update_job(job, 1)
+                    self._queue_granny_file(name, granny_path, nodes_dict)
                     exported_something = True
         
+        self.granny_writer.run(self._write_granny_file)
         if not exported_something:
             print("--- No geometry to export")
         
-    def _export_granny_file(self, filepath: Path, virtual_objects: dict[str: VirtualNode], animation: VirtualAnimation = None):
-        self.granny.new(filepath, self.forward, self.from_halo_scale, self.mirror)
-        self.granny.from_tree(self.virtual_scene, virtual_objects)
-        
+    def _queue_granny_file(self, name: str, filepath: Path, virtual_objects: dict[str: VirtualNode], animation: VirtualAnimation = None):
+        # Granny transforms vertex data and tri topologies in place, so files sharing a mesh must not be written at the same time
+        meshes = [node.mesh for node in virtual_objects.values() if node.mesh]
+        job = GrannyJob(name, filepath, virtual_objects, animation, meshes)
+        # Skip files whose content has not changed since they were last written
+        if self.export_cache.enabled:
+            job.cache_key = granny_file_key(self.virtual_scene, virtual_objects, animation, self.export_info)
+            job.unchanged = self.export_cache.is_current(filepath, job.cache_key)
+        self.profiler.count("granny files unchanged" if job.unchanged else "granny files written")
+        self.granny_writer.add(job)
+        
+    def _write_granny_file(self, granny: Granny, job: GrannyJob):
+        with self.profiler.step("granny file", job.filepath.name):
+            self._build_granny_file(granny, job)
+        
+    def _build_granny_file(self, granny: Granny, job: GrannyJob):
+        filepath = job.filepath
+        animation = job.animation
         animation_export = animation is not None
-        
-        if not animation_export:
-            if self.granny_textures:
-                self.granny.write_textures()
-            self.granny.write_materials()
-            self.granny.write_vertex_data()
-            self.granny.write_tri_topologies()
-            self.granny.write_meshes(animation)
-        elif animation_export and animation.is_pca:
-            self.granny.write_vertex_data()
-            self.granny.write_meshes(animation)
+        writes_vertices = not animation_export or animation.is_pca
+        # Every mesh node gets its own copy of its mesh's vertices, as granny.transform changes them in place. Copies only exist for the lifetime of the file that uses them
+        baked_nodes = [node for node in job.nodes.values() if node.granny_vertex_data is not None] if writes_vertices else []
+        self.profiler.count("baked vertex bytes", sum(node.bake_vertices(granny) for node in baked_nodes))
+        try:
+            granny.new(filepath, self.forward, self.from_halo_scale, self.mirror)
+            granny.from_tree(self.virtual_scene, job.nodes)
             
-        self.granny.write_skeletons(export_info=self.export_info)
-        self.granny.write_models()
-        
-        if animation_export:
-            self.granny.write_track_groups(animation.granny_track_group)
-            self.granny.write_animations(animation.granny_animation)
+            if not animation_export:
+                if self.granny_textures:
+                    granny.write_textures()
+                granny.write_materials()
+                granny.write_vertex_data()
+                granny.write_tri_topologies()
+                granny.write_meshes(animation)
+            elif animation_export and animation.is_pca:
+                granny.write_vertex_data()
+                granny.write_meshes(animation)
+                
+            granny.write_skeletons(export_info=self.export_info)
+            granny.write_models()
             
-        self.granny.transform()
-        self.granny.save()
+            if animation_export:
+                granny.write_track_groups(animation.granny_track_group)
+                granny.write_animations(animation.granny_animation)
+                
+            granny.transform()
+            granny.save()
+        finally:
+            for node in baked_nodes:
+                node.release_vertices()
+                
+        self.export_cache.record(filepath, job.cache_key)
         
         if self.granny_open and not animation_export and filepath.exists():
             os.startfile(Path(self.project_root, "gr2_viewer.exe"), arguments=str(filepath))
@@ -1961,52 +1993,54 @@ class ExportScene:
         
     def preprocess_tags(self):
         """ManagedBlam tasks to run before tool import is called"""
-        self.node_usage_set = self.asset_type != AssetType.CINEMATIC and self.has_animations and self.any_node_usage_override()
-        # print("\n--- Foundry Tags Pre-Process\n")
-        # Skip pre processing the graph if this is a first time export and the user has specified a template animation graph
-        # This is done to ensure the templating is not skipped
-        self.defer_graph_process = not Path(self.asset_path, f"{self.asset_name}.model_animation_graph").exists() and self.scene_settings.template_model_animation_graph and Path(self.tags_dir, utils.relative_path(self.scene_settings.template_model_animation_graph)).exists()
-        if not self.defer_graph_process and (self.node_usage_set or self.scene_settings.ik_chains or self.has_animations):
-            with AnimationTag() as animation:
-                if self.scene_settings.parent_animation_graph:
-                    self.print_pre("--- Setting parent animation graph")
-                    animation.set_parent_graph(self.scene_settings.parent_animation_graph)
-                    # print("--- Set Parent Animation Graph")
-                if self.virtual_scene and self.virtual_scene.animations:
-                    self.print_pre(f"--- Validating animation compression for {len(self.exported_animations)} animations: Default Compression = {self.scene_settings.default_animation_compression}")
-                    animation.validate_compression(self.exported_animations, self.scene_settings.default_animation_compression)
-                    # print("--- Validated Animation Compression")
-                if self.node_usage_set:
-                    self.print_pre("--- Setting node usages")
-                    animation.set_node_usages(self.virtual_scene.animated_bones, True)
-                    #print("--- Updated Animation Node Usages")
-                if self.scene_settings.ik_chains:
-                    self.print_pre("--- Writing IK chains")
-                    animation.write_ik_chains(self.scene_settings.ik_chains, self.virtual_scene.animated_bones, True)
-                    # print("--- Updated Animation IK Chains")
+        # Tags opened more than once here share one handle, and are saved once before tool import reads them
+        with TagSession():
+            self.node_usage_set = self.asset_type != AssetType.CINEMATIC and self.has_animations and self.any_node_usage_override()
+            # print("\n--- Foundry Tags Pre-Process\n")
+            # Skip pre processing the graph if this is a first time export and the user has specified a template animation graph
+            # This is done to ensure the templating is not skipped
+            self.defer_graph_process = not Path(self.asset_path, f"{self.asset_name}.model_animation_graph").exists() and self.scene_settings.template_model_animation_graph and Path(self.tags_dir, utils.relative_path(self.scene_settings.template_model_animation_graph)).exists()
+            if not self.defer_graph_process and (self.node_usage_set or self.scene_settings.ik_chains or self.has_animations):
+                with AnimationTag() as animation:
+                    if self.scene_settings.parent_animation_graph:
+                        self.print_pre("--- Setting parent animation graph")
+                        animation.set_parent_graph(self.scene_settings.parent_animation_graph)
+                        # print("--- Set Parent Animation Graph")
+                    if self.virtual_scene and self.virtual_scene.animations:
+                        self.print_pre(f"--- Validating animation compression for {len(self.exported_animations)} animations: Default Compression = {self.scene_settings.default_animation_compression}")
+                        animation.validate_compression(self.exported_animations, self.scene_settings.default_animation_compression)
+                        # print("--- Validated Animation Compression")
+                    if self.node_usage_set:
+                        self.print_pre("--- Setting node usages")
+                        animation.set_node_usages(self.virtual_scene.animated_bones, True)
+                        #print("--- Updated Animation Node Usages")
+                    if self.scene_settings.ik_chains:
+                        self.print_pre("--- Writing IK chains")
+                        animation.write_ik_chains(self.scene_settings.ik_chains, self.virtual_scene.animated_bones, True)
+                        # print("--- Updated Animation IK Chains")
                     
-                if animation.tag_has_changes and (self.node_usage_set or self.scene_settings.ik_chains):
-                    # Graph should be data driven if ik chains or overlay groups in use.
-                    # Node usages are a sign the user intends to create overlays group
-                    animation.tag.SelectField("Struct:definitions[0]/ByteFlags:private flags").SetBit('uses data driven animation', True)
+                    if animation.tag_has_changes and (self.node_usage_set or self.scene_settings.ik_chains):
+                        # Graph should be data driven if ik chains or overlay groups in use.
+                        # Node usages are a sign the user intends to create overlays group
+                        animation.tag.SelectField("Struct:definitions[0]/ByteFlags:private flags").SetBit('uses data driven animation', True)
 
-        if self.asset_type == AssetType.SCENARIO:
-            scenario_path = Path(self.tags_dir, utils.relative_path(self.asset_path), f"{self.asset_name}.scenario")
-            if not scenario_path.exists():
-                self.setup_scenario = True
+            if self.asset_type == AssetType.SCENARIO:
+                scenario_path = Path(self.tags_dir, utils.relative_path(self.asset_path), f"{self.asset_name}.scenario")
+                if not scenario_path.exists():
+                    self.setup_scenario = True
                     
-        if self.setup_scenario:
-            with ScenarioTag() as scenario:
-                self.print_pre(f"--- Setting up new scenario: Creating default starting profile & setting scenario type to {self.scene_settings.scenario_type}")
-                scenario.create_default_profile()
-                if self.scene_settings.scenario_type != 'solo':
-                    scenario.tag.SelectField('type').SetValue(self.scene_settings.scenario_type)
+            if self.setup_scenario:
+                with ScenarioTag() as scenario:
+                    self.print_pre(f"--- Setting up new scenario: Creating default starting profile & setting scenario type to {self.scene_settings.scenario_type}")
+                    scenario.create_default_profile()
+                    if self.scene_settings.scenario_type != 'solo':
+                        scenario.tag.SelectField('type').SetValue(self.scene_settings.scenario_type)
                 
-        if self.asset_type == AssetType.PARTICLE_MODEL and self.scene_settings.particle_uses_custom_points:
-            self.print_pre("--- Adding particle emitter custom points")
-            emitter_path = Path(self.asset_path, self.asset_name).with_suffix(".particle_emitter_custom_points")
-            if not emitter_path.exists():
-                with Tag(path=str(emitter_path)) as _: pass
+            if self.asset_type == AssetType.PARTICLE_MODEL and self.scene_settings.particle_uses_custom_points:
+                self.print_pre("--- Adding particle emitter custom points")
+                emitter_path = Path(self.asset_path, self.asset_name).with_suffix(".particle_emitter_custom_points")
+                if not emitter_path.exists():
+                    with Tag(path=str(emitter_path)) as _: pass
 
     def any_node_usage_override(self):
         # if not self.corinth and self.asset_type == AssetType.ANIMATION and self.scene_settings.asset_animation_type == 'first_person':
@@ -2074,105 +2108,107 @@ class ExportScene:
             
     def postprocess_tags(self):
         """ManagedBlam tasks to run after tool import is called"""
-        if not self.is_child_asset:
-            self._setup_model_overrides()
-            if self.sidecar.reach_world_animations or self.sidecar.pose_overlays or self.defer_graph_process:
-                with AnimationTag() as animation:
-                    if self.sidecar.reach_world_animations:
-                        self.print_post(f"--- Setting up {len(self.sidecar.reach_world_animations)} world relative animation{'s' if len(self.sidecar.reach_world_animations) > 1 else ''}")
-                        animation.set_world_animations(self.sidecar.reach_world_animations)
-                    if self.sidecar.pose_overlays:
-                        self.print_post(f"--- Updating animation blend screens for {len(self.sidecar.pose_overlays)} pose overlay animation{'s' if len(self.sidecar.pose_overlays) > 1 else ''}")
-                        animation.setup_blend_screens(self.sidecar.pose_overlays)
+        # Tags opened more than once here (model, scenario, animation graph) share one handle and are saved once at the end
+        with TagSession():
+            if not self.is_child_asset:
+                self._setup_model_overrides()
+                if self.sidecar.reach_world_animations or self.sidecar.pose_overlays or self.defer_graph_process:
+                    with AnimationTag() as animation:
+                        if self.sidecar.reach_world_animations:
+                            self.print_post(f"--- Setting up {len(self.sidecar.reach_world_animations)} world relative animation{'s' if len(self.sidecar.reach_world_animations) > 1 else ''}")
+                            animation.set_world_animations(self.sidecar.reach_world_animations)
+                        if self.sidecar.pose_overlays:
+                            self.print_post(f"--- Updating animation blend screens for {len(self.sidecar.pose_overlays)} pose overlay animation{'s' if len(self.sidecar.pose_overlays) > 1 else ''}")
+                            animation.setup_blend_screens(self.sidecar.pose_overlays)
                         
-                    if self.defer_graph_process and (self.node_usage_set or self.scene_settings.ik_chains or self.has_animations):
-                        with AnimationTag() as animation:
-                            if self.scene_settings.parent_animation_graph:
-                                self.print_post("--- Setting parent animation graph")
-                                animation.set_parent_graph(self.scene_settings.parent_animation_graph)
-                                # print("--- Set Parent Animation Graph")
-                            if self.virtual_scene.animations:
-                                self.print_post(f"--- Validating animation compression for {len(self.exported_animations)} animations: Default Compression = {self.scene_settings.default_animation_compression}")
-                                animation.validate_compression(self.exported_animations, self.scene_settings.default_animation_compression)
-                                # print("--- Validated Animation Compression")
-                            if self.node_usage_set:
-                                self.print_post("--- Setting node usages")
-                                animation.set_node_usages(self.virtual_scene.animated_bones, True)
-                                #print("--- Updated Animation Node Usages")
-                            if self.scene_settings.ik_chains:
-                                self.print_post("--- Writing IK chains")
-                                animation.write_ik_chains(self.scene_settings.ik_chains, self.virtual_scene.animated_bones, True)
-                                # print("--- Updated Animation IK Chains")
+                        if self.defer_graph_process and (self.node_usage_set or self.scene_settings.ik_chains or self.has_animations):
+                            with AnimationTag() as animation:
+                                if self.scene_settings.parent_animation_graph:
+                                    self.print_post("--- Setting parent animation graph")
+                                    animation.set_parent_graph(self.scene_settings.parent_animation_graph)
+                                    # print("--- Set Parent Animation Graph")
+                                if self.virtual_scene.animations:
+                                    self.print_post(f"--- Validating animation compression for {len(self.exported_animations)} animations: Default Compression = {self.scene_settings.default_animation_compression}")
+                                    animation.validate_compression(self.exported_animations, self.scene_settings.default_animation_compression)
+                                    # print("--- Validated Animation Compression")
+                                if self.node_usage_set:
+                                    self.print_post("--- Setting node usages")
+                                    animation.set_node_usages(self.virtual_scene.animated_bones, True)
+                                    #print("--- Updated Animation Node Usages")
+                                if self.scene_settings.ik_chains:
+                                    self.print_post("--- Writing IK chains")
+                                    animation.write_ik_chains(self.scene_settings.ik_chains, self.virtual_scene.animated_bones, True)
+                                    # print("--- Updated Animation IK Chains")
                                 
-                            if animation.tag_has_changes and (self.node_usage_set or self.scene_settings.ik_chains):
-                                # Graph should be data driven if ik chains or overlay groups in use.
-                                # Node usages are a sign the user intends to create overlays group
-                                animation.tag.SelectField("Struct:definitions[0]/ByteFlags:private flags").SetBit('uses data driven animation', True)
+                                if animation.tag_has_changes and (self.node_usage_set or self.scene_settings.ik_chains):
+                                    # Graph should be data driven if ik chains or overlay groups in use.
+                                    # Node usages are a sign the user intends to create overlays group
+                                    animation.tag.SelectField("Struct:definitions[0]/ByteFlags:private flags").SetBit('uses data driven animation', True)
                                 
-                            # TODO check if frame event list ref set correctly after templating
+                                # TODO check if frame event list ref set correctly after templating
                                 
-                # print("--- Setup World Animations")
+                    # print("--- Setup World Animations")
           
-            if self.asset_type == AssetType.SCENARIO and self.setup_scenario:
-                lm_value = 6 if self.corinth else 3
-                with ScenarioTag() as scenario:
-                    for bsp in self.virtual_scene.structure:
-                        res = scenario.set_bsp_lightmap_res(bsp, lm_value, 0)
-                        self.print_post(f"--- Setting scenario lightmap resolution to {res}")
+                if self.asset_type == AssetType.SCENARIO and self.setup_scenario:
+                    lm_value = 6 if self.corinth else 3
+                    with ScenarioTag() as scenario:
+                        for bsp in self.virtual_scene.structure:
+                            res = scenario.set_bsp_lightmap_res(bsp, lm_value, 0)
+                            self.print_post(f"--- Setting scenario lightmap resolution to {res}")
                 
-            if self.asset_type == AssetType.SCENARIO and self.scene_settings.zone_sets:
-                self.print_post(f"--- Updating scenario zone sets: {[zs.name for zs in self.scene_settings.zone_sets]}")
-                write_zone_sets_to_scenario(self.scene_settings, self.asset_name)
+                if self.asset_type == AssetType.SCENARIO and self.scene_settings.zone_sets:
+                    self.print_post(f"--- Updating scenario zone sets: {[zs.name for zs in self.scene_settings.zone_sets]}")
+                    write_zone_sets_to_scenario(self.scene_settings, self.asset_name)
 
-        if self.export_settings.update_lighting_info:
-            light_asset = self.asset_type in {AssetType.SCENARIO, AssetType.PREFAB} or (self.corinth and self.asset_type in {AssetType.MODEL, AssetType.SKY})
-            if light_asset:
-                if self.limit_bsps_to_selection:
-                    bsps = [bsp for bsp in self.selected_bsps if bsp.lower() != "shared"]
-                else:
-                    bsps = [bsp for bsp in self.regions if bsp.lower() != "shared"]
-                if self.lights:
-                    self.print_post(f"--- Writing lighting data from {len(self.lights)} light{'s' if len(self.lights) > 1 else ''}")
-                    if self.is_child_asset:
-                        export_lights(str(self.parent_asset_path_relative), self.parent_asset_name, self.lights, bsps)
+            if self.export_settings.update_lighting_info:
+                light_asset = self.asset_type in {AssetType.SCENARIO, AssetType.PREFAB} or (self.corinth and self.asset_type in {AssetType.MODEL, AssetType.SKY})
+                if light_asset:
+                    if self.limit_bsps_to_selection:
+                        bsps = [bsp for bsp in self.selected_bsps if bsp.lower() != "shared"]
                     else:
-                        export_lights(self.asset_path_relative, self.asset_name, self.lights, bsps)
-                else:
-                    if self.is_child_asset:
-                        export_lights(str(self.parent_asset_path_relative), self.parent_asset_name, [], bsps) # this will clear the lighting info tag
+                        bsps = [bsp for bsp in self.regions if bsp.lower() != "shared"]
+                    if self.lights:
+                        self.print_post(f"--- Writing lighting data from {len(self.lights)} light{'s' if len(self.lights) > 1 else ''}")
+                        if self.is_child_asset:
+                            export_lights(str(self.parent_asset_path_relative), self.parent_asset_name, self.lights, bsps)
+                        else:
+                            export_lights(self.asset_path_relative, self.asset_name, self.lights, bsps)
                     else:
-                        export_lights(self.asset_path_relative, self.asset_name, [], bsps)
+                        if self.is_child_asset:
+                            export_lights(str(self.parent_asset_path_relative), self.parent_asset_name, [], bsps) # this will clear the lighting info tag
+                        else:
+                            export_lights(self.asset_path_relative, self.asset_name, [], bsps)
                     
-        if self.asset_type == AssetType.CINEMATIC:
-            self.print_post(f"--- Writing cinematic scene: {self.cinematic_scene.name}")
-            self._write_qua()
-            scenario_path = Path(self.tags_dir, self.scene_settings.cinematic_scenario)
-            cinematic_path = None
-            if self.is_child_asset:
-                cinematic_scenes = get_cinematic_scenes(self.sidecar.parent_sidecar)
-                cinematic_path = Path(self.parent_asset_path_relative, self.parent_asset_name)
-            else:
-                cinematic_scenes = get_cinematic_scenes(self.sidecar.sidecar_path_full)
-                cinematic_path = Path(self.asset_path, self.asset_name)
-            with CinematicTag(path=cinematic_path) as cinematic:
-                term = "Created" if cinematic.tag_is_new else "Updated"
-                self.print_post(f"--- {term} cinematic tag: {cinematic.tag_path.RelativePathWithExtension}")
+            if self.asset_type == AssetType.CINEMATIC:
+                self.print_post(f"--- Writing cinematic scene: {self.cinematic_scene.name}")
+                self._write_qua()
                 scenario_path = Path(self.tags_dir, self.scene_settings.cinematic_scenario)
-                if self.scene_settings.cinematic_scenario.strip() and scenario_path.exists() and scenario_path.is_file():
-                    if self.is_child_asset:
-                        cinematic.create(self.parent_asset_name, self.cinematic_scene, cinematic_scenes)
-                    else:
-                        cinematic.create(self.asset_name, self.cinematic_scene, cinematic_scenes, Path(self.scene_settings.cinematic_scenario), self.scene_settings.cinematic_zone_set if self.scene_settings.cinematic_zone_set.strip() else "cinematic")
-                        self.print_post(f"--- Linked cinematic to scenario: {self.scene_settings.cinematic_scenario}")
-                        if self.scene_settings.cinematic_zone_set:
-                            self.print_post(f"--- Linked to zone set: {self.scene_settings.cinematic_zone_set}")
-                            
-                    self.print_post(f"--- {term} cutscene flags for cinematic anchor")
+                cinematic_path = None
+                if self.is_child_asset:
+                    cinematic_scenes = get_cinematic_scenes(self.sidecar.parent_sidecar)
+                    cinematic_path = Path(self.parent_asset_path_relative, self.parent_asset_name)
                 else:
-                    cinematic.create(self.asset_name, self.cinematic_scene, cinematic_scenes)
-                    self.print_post(f"--- {term} cinematic tag")
-                    if self.scene_settings.cinematic_scenario.strip():
-                        utils.print_warning(f"Cinematic Scenario does not exist: {self.scene_settings.cinematic_scenario}")
+                    cinematic_scenes = get_cinematic_scenes(self.sidecar.sidecar_path_full)
+                    cinematic_path = Path(self.asset_path, self.asset_name)
+                with CinematicTag(path=cinematic_path) as cinematic:
+                    term = "Created" if cinematic.tag_is_new else "Updated"
+                    self.print_post(f"--- {term} cinematic tag: {cinematic.tag_path.RelativePathWithExtension}")
+                    scenario_path = Path(self.tags_dir, self.scene_settings.cinematic_scenario)
+                    if self.scene_settings.cinematic_scenario.strip() and scenario_path.exists() and scenario_path.is_file():
+                        if self.is_child_asset:
+                            cinematic.create(self.parent_asset_name, self.cinematic_scene, cinematic_scenes)
+                        else:
+                            cinematic.create(self.asset_name, self.cinematic_scene, cinematic_scenes, Path(self.scene_settings.cinematic_scenario), self.scene_settings.cinematic_zone_set if self.scene_settings.cinematic_zone_set.strip() else "cinematic")
+                            self.print_post(f"--- Linked cinematic to scenario: {self.scene_settings.cinematic_scenario}")
+                            if self.scene_settings.cinematic_zone_set:
+                                self.print_post(f"--- Linked to zone set: {self.scene_settings.cinematic_zone_set}")
+                            
+                        self.print_post(f"--- {term} cutscene flags for cinematic anchor")
+                    else:
+                        cinematic.create(self.asset_name, self.cinematic_scene, cinematic_scenes)
+                        self.print_post(f"--- {term} cinematic tag")
+                        if self.scene_settings.cinematic_scenario.strip():
+                            utils.print_warning(f"Cinematic Scenario does not exist: {self.scene_settings.cinematic_scenario}")
         
     def _setup_model_overrides(self):
         model_override = self.asset_type == AssetType.MODEL and any((
@@ -0,0 +1,301 @@
+'''Records where export time goes. Stages are the top level ExportScene calls and steps are the work inside them (a mesh, an animation, a granny file).
+Each records wall time, CPU time, memory, and item counts. Reports are written as JSON and as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)'''
+
+from contextlib import contextmanager, nullcontext
+import ctypes
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+BASELINE_VERSION = 2
+REPORT_FILENAME = "export_profile.json"
+TRACE_FILENAME = "export_profile.trace.json"
+BASELINE_FILENAME = "export_profile.baseline.json"
+
+def _memory_windows() -> tuple[int, int]:
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", ctypes.c_ulong),
+            ("PageFaultCount", ctypes.c_ulong),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return 0, 0
+    return counters.WorkingSetSize, counters.PeakWorkingSetSize
+
+def _memory_posix() -> tuple[int, int]:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024
+    try:
+        with open("/proc/self/statm") as file:
+            current = int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        current = peak
+    return current, peak
+
+def process_memory() -> tuple[int, int]:
+    '''Returns the current and peak memory (working set / resident size) of Blender in bytes'''
+    try:
+        return _memory_windows() if sys.platform == "win32" else _memory_posix()
+    except Exception:
+        return 0, 0
+
+class ProfileEvent:
+    __slots__ = ("name", "category", "detail", "thread", "start", "wall", "cpu", "memory", "memory_delta", "peak_memory", "counts")
+
+    def __init__(self, name: str, category: str, detail: str, thread: int, start: float):
+        self.name = name
+        self.category = category
+        self.detail = detail
+        self.thread = thread
+        self.start = start
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.memory = 0
+        self.memory_delta = 0
+        self.peak_memory = 0
+        self.counts: dict[str, int] = {}
+
+class ExportProfiler:
+    '''When disabled every call returns a shared no-op context, so instrumented code costs one attribute lookup and call per stage or step'''
+    _disabled_context = nullcontext()
+
+    def __init__(self, enabled=False, context: dict = None):
+        self.enabled = enabled
+        self.context = dict(context or {}) # export mode and settings, reports are only compared against a baseline with the same context
+        self.events: list[ProfileEvent] = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.stage_event: ProfileEvent = None
+        self.last_report: dict = None
+
+    def stage(self, name: str):
+        '''Times a top level export stage. Stage CPU time includes every thread, so covers work handed to thread pools'''
+        if not self.enabled:
+            return self._disabled_context
+        return self._record(name, "stage", "", time.process_time, True)
+
+    def step(self, category: str, name: str):
+        '''Times a unit of work within a stage, e.g. step("mesh", ob.name). Safe to call from worker threads. Step CPU time is that of the calling thread only'''
+        if not self.enabled:
+            return self._disabled_context
+        return self._record(category, "step", name, time.thread_time, False)
+
+    def count(self, key: str, amount=1):
+        '''Adds to an item count of the current stage'''
+        if not self.enabled or self.stage_event is None:
+            return
+        with self.lock:
+            self.stage_event.counts[key] = self.stage_event.counts.get(key, 0) + amount
+
+    @contextmanager
+    def _record(self, name: str, category: str, detail: str, cpu_clock, is_stage: bool):
+        start = time.perf_counter()
+        event = ProfileEvent(name, category, detail, threading.get_ident(), start - self.origin)
+        memory_start = process_memory()[0] if is_stage else 0
+        cpu_start = cpu_clock()
+        previous_stage = self.stage_event
+        if is_stage:
+            self.stage_event = event
+        try:
+            yield event
+        finally:
+            event.cpu = cpu_clock() - cpu_start
+            event.wall = time.perf_counter() - start
+            if is_stage:
+                # Memory is only sampled for stages, as the query is too slow to run per mesh
+                event.memory, event.peak_memory = process_memory()
+                event.memory_delta = event.memory - memory_start
+                self.stage_event = previous_stage
+            with self.lock:
+                self.events.append(event)
+                if not is_stage and self.stage_event is not None:
+                    counts = self.stage_event.counts
+                    counts[name] = counts.get(name, 0) + 1
+
+    def report(self) -> dict:
+        '''Totals per stage, and per step category within each stage, with the slowest steps listed'''
+        with self.lock:
+            events = sorted(self.events, key=lambda e: e.start)
+        stages = []
+        for stage in (e for e in events if e.category == "stage"):
+            end = stage.start + stage.wall
+            steps = [e for e in events if e.category == "step" and stage.start <= e.start <= end]
+            categories = {}
+            for step in steps:
+                total = categories.setdefault(step.name, {"count": 0, "wall": 0.0, "cpu": 0.0, "slowest": []})
+                total["count"] += 1
+                total["wall"] += step.wall
+                total["cpu"] += step.cpu
+                total["slowest"].append(step)
+            for total in categories.values():
+                total["slowest"] = [{"name": s.detail, "wall": round(s.wall, 4), "cpu": round(s.cpu, 4)} for s in sorted(total["slowest"], key=lambda s: s.wall, reverse=True)[:10]]
+                total["wall"] = round(total["wall"], 4)
+                total["cpu"] = round(total["cpu"], 4)
+            stages.append({
+                "name": stage.name,
+                "start": round(stage.start, 4),
+                "wall": round(stage.wall, 4),
+                "cpu": round(stage.cpu, 4),
+                "memory_mb": round(stage.memory / 1048576, 1),
+                "memory_delta_mb": round(stage.memory_delta / 1048576, 1),
+                "peak_memory_mb": round(stage.peak_memory / 1048576, 1),
+                "counts": stage.counts,
+                "steps": categories,
+            })
+        report = {"total_wall": round(sum(s["wall"] for s in stages), 4), "context": dict(self.context), "stages": stages}
+        report["context"]["cache_state"] = cache_state(report)
+        return report
+
+    def chrome_trace(self) -> dict:
+        with self.lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace_events = []
+        for event in events:
+            args = {"cpu_ms": round(event.cpu * 1000, 3)}
+            if event.category == "stage":
+                args.update(memory_mb=round(event.memory / 1048576, 1), peak_memory_mb=round(event.peak_memory / 1048576, 1), **event.counts)
+            trace_events.append({
+                "name": f"{event.name}: {event.detail}" if event.detail else event.name,
+                "cat": event.category,
+                "ph": "X",
+                "ts": round(event.start * 1e6, 1),
+                "dur": round(event.wall * 1e6, 1),
+                "pid": pid,
+                "tid": event.thread,
+                "args": args,
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write(self, directory: str | Path) -> Path | None:
+        '''Writes the JSON report and Chrome trace to directory, returning the report path. The first report written to a directory for each export context
+        (see baseline_key) becomes the baseline for that context, and later reports with the same context list the stages and steps which have got slower than it'''
+        if not self.enabled or not self.events:
+            return
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        key = baseline_key(report)
+        baselines = load_baselines(directory)
+        baseline = baselines.get(key)
+        if baseline is None:
+            baselines[key] = report
+            save_baselines(directory, baselines)
+            report = dict(report, new_baseline=True)
+        else:
+            report["regressions"] = find_regressions(report, baseline)
+        self.last_report = report
+            
+        report_path = Path(directory, REPORT_FILENAME)
+        with open(report_path, "w") as file:
+            json.dump(report, file, indent=1)
+        with open(Path(directory, TRACE_FILENAME), "w") as file:
+            json.dump(self.chrome_trace(), file)
+        return report_path
+
+    def print_summary(self):
+        if not self.enabled or not self.events:
+            return
+        self.print_report(self.last_report or self.report())
+        
+    @staticmethod
+    def print_report(report: dict):
+        print("\n\nExport Profile")
+        print("-----------------------------------------------------------------------\n")
+        for stage in report["stages"]:
+            print(f"--- {stage['name']:<28}{stage['wall']:>9.2f}s wall {stage['cpu']:>9.2f}s cpu {stage['peak_memory_mb']:>9.1f}MB peak")
+            for key, amount in stage["counts"].items():
+                if key.endswith(" bytes"):
+                    print(f"      {key:<26}{amount / 1048576:>9.1f}MB")
+            for name, total in sorted(stage["steps"].items(), key=lambda item: item[1]["wall"], reverse=True):
+                print(f"      {name:<26}{total['wall']:>9.2f}s over {total['count']} ({total['slowest'][0]['name']} slowest at {total['slowest'][0]['wall']:.2f}s)")
+
+        if report.get("new_baseline"):
+            print(f"--- Saved as the baseline for {baseline_key(report)}")
+        for regression in report.get("regressions", []):
+            print(f"--- Slower than baseline: {regression}")
+
+def cache_state(report: dict) -> str:
+    '''Whether the granny files of a report were written or skipped as unchanged, as an export which skips every file is not comparable with one which writes them all'''
+    written = sum(stage["counts"].get("granny files written", 0) for stage in report["stages"])
+    unchanged = sum(stage["counts"].get("granny files unchanged", 0) for stage in report["stages"])
+    if written and unchanged:
+        return "mixed"
+    if unchanged:
+        return "unchanged"
+    return "written" if written else "none"
+
+def baseline_key(report: dict) -> str:
+    '''The export context a report is compared under: export mode, settings and cache state'''
+    return ", ".join(f"{name}={value}" for name, value in sorted(report.get("context", {}).items()))
+
+def load_baselines(directory: str | Path) -> dict[str, dict]:
+    '''Returns the saved baseline reports keyed by baseline_key. Baselines saved before they were keyed by context are dropped'''
+    try:
+        with open(Path(directory, BASELINE_FILENAME), "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != BASELINE_VERSION:
+        return {}
+    return data.get("baselines", {})
+
+def save_baselines(directory: str | Path, baselines: dict[str, dict]):
+    path = Path(directory, BASELINE_FILENAME)
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "w") as file:
+        json.dump({"version": BASELINE_VERSION, "baselines": baselines}, file, indent=1)
+    os.replace(temp_path, path)
+
+def find_regressions(report: dict, baseline: dict, tolerance=0.25, min_seconds=0.5) -> list[str]:
+    '''Compares a report against a baseline report. Stages are compared on total wall time and steps on their mean wall time, so that exporting more or fewer
+    meshes/animations than the baseline does not read as a regression. Only slowdowns larger than both tolerance (a fraction) and min_seconds in total are reported'''
+    regressions = []
+    baseline_stages = {stage["name"]: stage for stage in baseline.get("stages", [])}
+    for stage in report["stages"]:
+        base = baseline_stages.get(stage["name"])
+        if base is None:
+            continue
+        if stage["wall"] - base["wall"] > max(base["wall"] * tolerance, min_seconds):
+            regressions.append(f"{stage['name']} took {stage['wall']:.2f}s, baseline {base['wall']:.2f}s")
+        for name, total in stage["steps"].items():
+            base_total = base["steps"].get(name)
+            if not base_total or not base_total["count"]:
+                continue
+            mean = total["wall"] / total["count"]
+            base_mean = base_total["wall"] / base_total["count"]
+            if mean - base_mean > base_mean * tolerance and (mean - base_mean) * total["count"] > min_seconds:
+                regressions.append(f"{stage['name']} {name} averaged {mean:.3f}s over {total['count']}, baseline {base_mean:.3f}s over {base_total['count']}")
+    return regressions
+
+def reset_baseline(directory: str | Path, key: str = None) -> bool:
+    '''Deletes the saved baseline for the given baseline_key, or every baseline if no key is given, so that the next profiled export becomes the new one.
+    Returns False if there was nothing to delete'''
+    baseline_path = Path(directory, BASELINE_FILENAME)
+    if not baseline_path.exists():
+        return False
+    if key is None:
+        baseline_path.unlink()
+        return True
+    baselines = load_baselines(directory)
+    if baselines.pop(key, None) is None:
+        return False
+    save_baselines(directory, baselines)
+    return True
+
+profiler_disabled = ExportProfiler(False)
@@ -0,0 +1,44 @@
+'''Memoizes Halo property resolution within an export. Results are keyed on the datablocks and settings a resolver is given, so objects sharing mesh data
+resolve it once. Keys are not snapshots of property values, as reading every property to build a key costs as much as resolving them,
+so a cache must not outlive the export it was made for. Pure python so that it can be driven with plain objects standing in for Blender data'''
+
+from typing import Callable, Hashable
+
+class PropsCache:
+    '''Results of property resolvers keyed by resolver name and key, with hit and miss counts. Cached results are shared, so callers must copy them before changing them'''
+    def __init__(self):
+        self.entries: dict[tuple[str, Hashable], object] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, resolver: str, key: Hashable, compute: Callable):
+        '''Returns the cached result of resolver for key, calling compute() to create it on a miss'''
+        entry_key = (resolver, key)
+        if entry_key in self.entries:
+            self.hits += 1
+            return self.entries[entry_key]
+        self.misses += 1
+        result = self.entries[entry_key] = compute()
+        return result
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.0f}% reused)"
+
+def resolve_mesh_level_props(cache: PropsCache, warnings: list[str], ob, region: str, mesh_type_index: int, setup: Callable) -> tuple[dict, dict]:
+    '''Returns copies of the face property defaults and mesh props of ob's mesh, resolved by setup(ob, region, mesh_props, mesh_type_index) once per mesh, region and mesh type.
+    Warnings setup appends to warnings are kept with the result and given again for every other object using the mesh, naming that object'''
+    computed = False
+    def compute():
+        nonlocal computed
+        computed = True
+        first_warning = len(warnings)
+        mesh_props = {}
+        fp_defaults = setup(ob, region, mesh_props, mesh_type_index)
+        return fp_defaults, mesh_props, ob.name, warnings[first_warning:]
+
+    fp_defaults, mesh_props, name, mesh_warnings = cache.resolve("mesh", (ob.data, region, mesh_type_index), compute)
+    if not computed:
+        warnings.extend(warning.replace(f"Object [{name}]", f"Object [{ob.name}]", 1) for warning in mesh_warnings)
+    return fp_defaults.copy(), mesh_props.copy()
@@ -0,0 +1,98 @@
+'''Parent to children index of the objects being exported. Built once from a child to parent dict so that hierarchy queries no longer scan every object'''
+
+from collections import deque
+from typing import Hashable, Iterator
+
+class SceneGraph:
+    '''Children keep the order they appear in the child to parent dict, matching the order the objects were gathered in.
+    Ancestor, descendant and subtree queries run in time linear to the size of their result'''
+    def __init__(self, parents: dict[Hashable, Hashable] = None):
+        self.parents: dict[Hashable, Hashable] = {}
+        self.children: dict[Hashable, list[Hashable]] = {}
+        if parents:
+            self.update(parents)
+
+    def update(self, parents: dict[Hashable, Hashable]):
+        for child, parent in parents.items():
+            self.add(child, parent)
+
+    def add(self, child: Hashable, parent: Hashable):
+        '''Adds or re-parents child. A parent of None makes child a root'''
+        previous = self.parents.get(child)
+        if child in self.parents:
+            if previous == parent:
+                return
+            self.children[previous].remove(child)
+        self.parents[child] = parent
+        self.children.setdefault(parent, []).append(child)
+
+    def remove(self, ob: Hashable):
+        '''Drops ob from the index. Its children become roots, keeping their order'''
+        if ob not in self.parents:
+            return
+        self.children[self.parents.pop(ob)].remove(ob)
+        for child in self.children.pop(ob, ()):
+            self.parents[child] = None
+            self.children.setdefault(None, []).append(child)
+
+    def __contains__(self, ob) -> bool:
+        return ob in self.parents
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def get_children(self, parent) -> list:
+        '''Immediate children of parent'''
+        return list(self.children.get(parent, ()))
+
+    def get_parent(self, ob):
+        return self.parents.get(ob)
+
+    def roots(self) -> list:
+        '''Objects without a parent of their own, in the order they were first seen'''
+        return [parent for parent in self.children if parent is not None and parent not in self.parents] + self.get_children(None)
+
+    def ancestors(self, ob) -> list:
+        '''Parent first, ending at the root'''
+        ancestors = []
+        visited = {ob}
+        parent = self.parents.get(ob)
+        while parent is not None and parent not in visited:
+            ancestors.append(parent)
+            visited.add(parent)
+            parent = self.parents.get(parent)
+        return ancestors
+
+    def is_ancestor(self, ancestor, ob) -> bool:
+        return ancestor in self.ancestors(ob)
+
+    def walk(self, ob=None, breadth_first=False) -> Iterator:
+        '''Yields every descendant of ob in depth first pre-order (or breadth first), children in their stored order. ob itself is not yielded.
+        Passing None walks the whole graph from its roots. Cycles are not followed'''
+        visited = {ob}
+        start = self.roots() if ob is None else self.children.get(ob, ())
+        if breadth_first:
+            queue = deque(start)
+            while queue:
+                child = queue.popleft()
+                if child in visited:
+                    continue
+                visited.add(child)
+                yield child
+                queue.extend(self.children.get(child, ()))
+        else:
+            stack = list(reversed(start))
+            while stack:
+                child = stack.pop()
+                if child in visited:
+                    continue
+                visited.add(child)
+                yield child
+                stack.extend(reversed(self.children.get(child, ())))
+
+    def descendants(self, ob, breadth_first=False) -> list:
+        return list(self.walk(ob, breadth_first))
+
+    def subtree(self, ob) -> list:
+        '''ob followed by all of its descendants in depth first order'''
+        return [ob, *self.walk(ob)]
@@ -0,0 +1,95 @@
+'''Writes sidecar XML straight from an ElementTree, and caches parsed child sidecars.
+Output matches the layout sidecars have always been written in (minidom's toprettyxml with two space indents and blank lines removed) byte for byte,
+without building a DOM or holding the whole document as one string'''
+
+import os
+from pathlib import Path
+import threading
+from typing import Iterator
+import xml.etree.cElementTree as ET
+
+XML_DECLARATION = '<?xml version="1.0" encoding="utf-8" standalone="yes"?>\n'
+INDENT = "  "
+
+def _escape(data: str) -> str:
+    '''Escapes text and attribute values the way minidom does'''
+    if "\r" in data:
+        # The XML parser the previous writer went through normalises line endings
+        data = data.replace("\r\n", "\n").replace("\r", "\n")
+    return data.replace("&", "&amp;").replace("<", "&lt;").replace('"', "&quot;").replace(">", "&gt;")
+
+def _iter_element(element: ET.Element, indent: str) -> Iterator[str]:
+    '''Yields the element as chunks which each end at a line break'''
+    tag = element.tag
+    start = indent + "<" + tag + "".join(f' {name}="{_escape(value)}"' for name, value in element.attrib.items())
+    # The text of an element and the tails of its children are text nodes between the child elements
+    nodes = [element.text] if element.text else []
+    for child in element:
+        nodes.append(child)
+        if child.tail:
+            nodes.append(child.tail)
+
+    if not nodes:
+        yield start + "/>\n"
+    elif len(nodes) == 1 and isinstance(nodes[0], str):
+        yield f"{start}>{_escape(nodes[0])}</{tag}>\n"
+    else:
+        yield start + ">\n"
+        child_indent = indent + INDENT
+        for node in nodes:
+            if isinstance(node, str):
+                yield _escape(child_indent + node + "\n")
+            else:
+                yield from _iter_element(node, child_indent)
+        yield f"{indent}</{tag}>\n"
+
+def iter_lines(root: ET.Element) -> Iterator[str]:
+    '''Yields each line of the document, declaration included. Lines which are only whitespace (such as the indentation parsed from a child sidecar) are dropped'''
+    yield XML_DECLARATION
+    for chunk in _iter_element(root, ""):
+        for line in chunk.splitlines():
+            if line.strip():
+                yield line + "\n"
+
+def to_string(root: ET.Element) -> str:
+    return "".join(iter_lines(root))
+
+def write(root: ET.Element, path: str | Path):
+    '''Streams the document to path. The file is opened the same way the sidecar always has been, so line endings follow the platform'''
+    with open(path, "w") as file:
+        file.writelines(iter_lines(root))
+
+class ChildSidecarCache:
+    '''Parsed child sidecars keyed by path, reused until the file's modification time or size changes.
+    Cached trees are shared, so callers must copy an element before changing it'''
+    def __init__(self):
+        self.trees: dict[str, tuple[int, int, ET.Element]] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_root(self, path: str | Path) -> ET.Element:
+        '''Returns the root element of the sidecar at path. Raises OSError or ET.ParseError if the file cannot be read'''
+        key = os.path.normcase(os.path.abspath(path))
+        stat = os.stat(key)
+        with self.lock:
+            cached = self.trees.get(key)
+            if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        root = ET.parse(key).getroot()
+        with self.lock:
+            self.trees[key] = (stat.st_mtime_ns, stat.st_size, root)
+        return root
+
+    def forget(self, path: str | Path):
+        with self.lock:
+            self.trees.pop(os.path.normcase(os.path.abspath(path)), None)
+
+    def clear(self):
+        with self.lock:
+            self.trees.clear()
+
+child_sidecars = ChildSidecarCache()
@@ -0,0 +1,40 @@
+'''Packed vertex buffers in the layout granny reads. Pure numpy and ctypes, so buffers can be built and checked without Blender or the granny dll'''
+
+from ctypes import Array, c_ubyte, memmove
+
+import numpy as np
+
+from .profiler import ExportProfiler, profiler_disabled
+
+def granny_vertex_buffer(data: list[np.ndarray], dtypes: list[tuple], num_vertices: int, profiler: ExportProfiler = profiler_disabled) -> Array:
+    '''Allocates a single packed vertex buffer that granny can read directly, and writes each vertex component into it through a numpy view of the buffer.
+    dtypes holds a (name, type, shape) tuple per array in data. Counts the bytes allocated and copied into the current profiler stage'''
+    dtype = np.dtype([(f"component{idx}", data_type, shape) for idx, (_, data_type, shape) in enumerate(dtypes)])
+    vertex_array = (c_ubyte * (dtype.itemsize * num_vertices))()
+    vertex_view = np.frombuffer(vertex_array, dtype=dtype)
+    copied = 0
+    for idx, array in enumerate(data):
+        component = vertex_view[f"component{idx}"]
+        component[:] = array
+        copied += component.size * component.itemsize
+
+    profiler.count("vertex buffer bytes allocated", len(vertex_array))
+    profiler.count("vertex buffer bytes copied", copied)
+    return vertex_array
+
+def weld_loops(data: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    '''Merges loops whose attributes are all identical into one vertex. data holds a (loops, n) array per attribute.
+    Returns the first loop of each vertex, to index the attribute arrays with, and the vertex each loop uses'''
+    _, vertex_loops, loop_vertices = np.unique(np.hstack(data), axis=0, return_index=True, return_inverse=True)
+    return vertex_loops, loop_vertices.ravel()
+
+def bake_vertex_buffer(vertex_array: Array, num_vertices: int, vertex_type, transform: tuple | None, backend) -> Array:
+    '''Copies a mesh's shared vertex buffer for a single node. transform is the node's (affine3, linear3x3, inverse_linear3x3) world transform, applied to the copy with
+    backend.transform_vertices, or None to copy the vertices as they are. Every node needs its own copy, since granny transforms the vertices of the file it writes in place'''
+    size = len(vertex_array)
+    baked = (c_ubyte * size)()
+    memmove(baked, vertex_array, size)
+    if transform is not None:
+        affine3, linear3x3, inverse_linear3x3 = transform
+        backend.transform_vertices(num_vertices, vertex_type, baked, affine3, linear3x3, inverse_linear3x3, True, False)
+    return baked
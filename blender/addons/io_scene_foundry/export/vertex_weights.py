@@ -0,0 +1,34 @@
+'''Skinning weights from flat vertex group data. Pure numpy, so the weighting can be checked without Blender'''
+
+import numpy as np
+
+def unpack_group_elements(elements: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''Splits flat (group, weight) pairs of every vertex group element into group index and weight arrays'''
+    pairs = elements.reshape(-1, 2)
+    return pairs[:, 0].astype(np.int32), pairs[:, 1].astype(np.single)
+
+def top_bone_weights(counts: np.ndarray, bone_indices: np.ndarray, weights: np.ndarray, max_influences=4) -> tuple[np.ndarray, np.ndarray]:
+    '''Keeps the highest weighted influences of each vertex from flat per vertex influence arrays, normalizing the kept weights so they sum to one.
+    Influences of equal weight keep their original order. Returns (num_vertices, max_influences) weight and bone index arrays, padded with zeros'''
+    num_vertices = len(counts)
+    vertex_weights = np.zeros((num_vertices, max_influences), dtype=np.single)
+    vertex_bone_indices = np.zeros((num_vertices, max_influences), dtype=np.int32)
+    if not len(weights):
+        return vertex_weights, vertex_bone_indices
+    
+    vertex_of_influence = np.repeat(np.arange(num_vertices), counts)
+    order = np.lexsort((-weights, vertex_of_influence))
+    sorted_vertices = vertex_of_influence[order]
+    starts = np.zeros(num_vertices, dtype=np.int64)
+    np.cumsum(counts[:-1], out=starts[1:])
+    rank = np.arange(len(order)) - starts[sorted_vertices]
+    keep = rank < max_influences
+    kept = order[keep]
+    rows, columns = sorted_vertices[keep], rank[keep]
+    vertex_weights[rows, columns] = weights[kept]
+    vertex_bone_indices[rows, columns] = bone_indices[kept]
+    
+    totals = vertex_weights.sum(axis=1, keepdims=True)
+    np.divide(vertex_weights, totals, out=vertex_weights, where=totals > 0)
+    vertex_bone_indices[vertex_weights == 0] = 0
+    return vertex_weights, vertex_bone_indices
@@ -2,10 +2,12 @@
 
 from collections import defaultdict
 import csv
-from ctypes import Array, Structure, c_char_p, c_float, c_int, POINTER, c_ubyte, c_void_p, cast, create_string_buffer, memmove, pointer, sizeof
+from ctypes import Array, Structure, c_char_p, c_float, c_int, POINTER, c_ubyte, c_void_p, cast, create_string_buffer, memmove, pointer, sizeof, string_at
+from itertools import chain
 import logging
 from math import degrees
 from pathlib import Path
+from types import MappingProxyType
 import bmesh
 import bpy
 from mathutils import Matrix, Vector
@@ -29,7 +31,14 @@ from .. import utils
 
 from ..tools.asset_types import AssetType
 
+from .animation_tracks import AnimationSampler
 from .cinematic import Actor, Frame
+from .export_cache import array_digest
+from .profiler import profiler_disabled
+from .scene_graph import SceneGraph
+from .face_sets import resolve_face_sets
+from .vertex_buffer import bake_vertex_buffer, granny_vertex_buffer, weld_loops
+from .vertex_weights import top_bone_weights, unpack_group_elements
 
 from ..constants import IDENTITY_MATRIX, VALID_MESHES, WU_SCALAR
 NORMAL_FIX_MATRIX = Matrix(((1, 0, 0), (0, -1, 0), (0, 0, -1)))
@@ -85,10 +94,8 @@ class VirtualShotActor:
             skeleton = model.skeleton
             if skeleton is not None:
                 self.bones = skeleton.animated_bones
-                
-        self.positions = defaultdict(list)
-        self.orientations = defaultdict(list)
-        self.scales = defaultdict(list)
+
+        self.sampler: AnimationSampler = None
 
 class VirtualShot:
     def __init__(self,  frame_start: int, frame_end: int, actors: list[Actor], camera: bpy.types.Object, index, scene: 'VirtualScene', shape_key_objects=[], in_scope=True):
@@ -107,108 +114,26 @@ class VirtualShot:
         self.in_scope = in_scope
     
     def perform(self, scene: 'VirtualScene'):
+        for shot_actor in self.shot_actors:
+            if shot_actor.in_scope:
+                shot_actor.sampler = AnimationSampler(shot_actor.bones, self.frame_count, scene.rotation_matrix)
+
         if scene.cinematic_scope != 'OBJECT' and self.in_scope:
             for frame in range(self.frame_start, self.frame_end + 1):
                 scene.context.scene.frame_set(frame)
                 # Camera Animation
                 self.frames.append(Frame(self.camera, scene.corinth))
                 # Bone Animation
-                for shot_actor in self.shot_actors: 
-                    if not shot_actor.in_scope:
-                        continue
-                    bone_inverse_matrices = {}
-                    for bone in shot_actor.bones:
-                        if bone.parent:
-                            matrix_world = scene.rotation_matrix @ bone.ob.matrix_world @ bone.pbone.matrix
-                            bone_inverse_matrices[bone.pbone] = matrix_world.inverted()
-                            matrix = bone_inverse_matrices[bone.parent] @ matrix_world
-                        else:
-                            matrix = scene.rotation_matrix @ bone.ob.matrix_world @ bone.pbone.matrix
-                            bone_inverse_matrices[bone.pbone] = matrix.inverted()
+                for shot_actor in self.shot_actors:
+                    if shot_actor.in_scope:
+                        shot_actor.sampler.record()
 
-                        loc, rot, sca = matrix.decompose()
-                        
-                        position = (c_float * 3)(loc.x, loc.y, loc.z)
-                        orientation = (c_float * 4)(rot.x, rot.y, rot.z, rot.w)
-                        scale_shear = (c_float * 9)(sca.x, 0.0, 0.0, 0.0, sca.y, 0.0, 0.0, 0.0, sca.z)
-                        shot_actor.positions[bone].extend(position)
-                        shot_actor.orientations[bone].extend(orientation)
-                        shot_actor.scales[bone].extend(scale_shear)
-                
         frame_total = self.frame_count - 1
-                
+
         for shot_actor in self.shot_actors:
             if shot_actor.in_scope:
-                tracks = []
-                for bone in shot_actor.bones:
-                    tracks.append((c_float * (self.frame_count * 3))(*shot_actor.positions[bone]))
-                    tracks.append((c_float * (self.frame_count * 4))(*shot_actor.orientations[bone]))
-                    tracks.append((c_float * (self.frame_count * 9))(*shot_actor.scales[bone]))
-                    
-                granny_tracks = []
-                for bone_idx, i in enumerate(range(0, len(tracks), 3)):
-                    granny_track = GrannyTransformTrack()
-                    granny_track.name = shot_actor.bones[bone_idx].pbone.name.encode()
-                    
-                    builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 3, self.frame_count)
-                    scene.granny.push_control_array(builder, tracks[i])
-                    position_curve = scene.granny.end_curve(builder)
-                    
-                    builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 4, self.frame_count)
-                    scene.granny.push_control_array(builder, tracks[i + 1])
-                    orientation_curve = scene.granny.end_curve(builder)
-                    
-                    builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 9, self.frame_count)
-                    scene.granny.push_control_array(builder, tracks[i + 2])
-                    scale_curve = scene.granny.end_curve(builder)
-                    
-                    granny_track.position_curve = position_curve.contents
-                    granny_track.orientation_curve = orientation_curve.contents
-                    granny_track.scale_shear_curve = scale_curve.contents
-
-                    del position_curve
-                    del orientation_curve
-                    del scale_curve
-
-                    granny_tracks.append(granny_track)
-                    
-                granny_track = GrannyTransformTrack()
-                granny_track.name = shot_actor.name_encoded
-                arm_tracks = []
-                loc, rot, sca = IDENTITY_MATRIX.decompose()
-                positions = []
-                orientations = []
-                scales = []
-                for frame in range(self.frame_count):
-                    position = (c_float * 3)(0, 0, 0)
-                    orientation = (c_float * 4)(0, 0, 0, 1)
-                    scale_shear = (c_float * 9)(1, 0.0, 0.0, 0.0, 1, 0.0, 0.0, 0.0, 1)
-                    positions.extend(position)
-                    orientations.extend(orientation)
-                    scales.extend(scale_shear)
-
-                arm_tracks.append((c_float * (self.frame_count * 3))(*positions))
-                arm_tracks.append((c_float * (self.frame_count * 4))(*orientations))
-                arm_tracks.append((c_float * (self.frame_count * 9))(*scales))
-
-                builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 3, self.frame_count)
-                scene.granny.push_control_array(builder, arm_tracks[0])
-                position_curve = scene.granny.end_curve(builder)
-                
-                builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 4, self.frame_count)
-                scene.granny.push_control_array(builder, arm_tracks[1])
-                orientation_curve = scene.granny.end_curve(builder)
-                
-                builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 9, self.frame_count)
-                scene.granny.push_control_array(builder, arm_tracks[2])
-                scale_curve = scene.granny.end_curve(builder)
-
-                granny_track.position_curve = position_curve.contents
-                granny_track.orientation_curve = orientation_curve.contents
-                granny_track.scale_shear_curve = scale_curve.contents
-
-                granny_tracks.append(granny_track)
-
+                granny_tracks = granny_sampler_tracks(scene, shot_actor.sampler)
+                granny_tracks.append(granny_identity_transform_track(scene, shot_actor.name_encoded, self.frame_count))
                 granny_tracks.sort(key=lambda track: track.name)
                 granny_transform_tracks = (GrannyTransformTrack * len(granny_tracks))(*granny_tracks)
                     
@@ -260,17 +185,14 @@ class VirtualAnimation:
         self.granny_morph_targets = {}
         
         self.nodes = []
+        self.content_key: str = None
 
         if sample:
             self.create_track_group(scene.animated_bones + animation_controls, scene, shape_key_objects)
             self.to_granny_animation(scene)
         
     def create_track_group(self, bones: list['AnimatedBone'], scene: 'VirtualScene', shape_key_objects):
-        positions = defaultdict(list)
-        orientations = defaultdict(list)
-        scales = defaultdict(list)
-        tracks = []
-        # scale_matrix = Matrix.Diagonal(scene.armature_matrix.to_scale()).to_4x4()
+        sampler = AnimationSampler(bones, self.frame_count, scene.rotation_matrix)
         morph_target_datas = defaultdict(list)
         shape_key_data = {}
         for ob in shape_key_objects:
@@ -284,104 +206,16 @@ class VirtualAnimation:
         
         for frame in range(self.frame_range[0], self.frame_range[1] + 1):
             scene.context.scene.frame_set(frame)
-            bone_inverse_matrices = {}
-            for bone in bones:
-                if bone.is_object:
-                    matrix = scene.rotation_matrix @ bone.pbone.matrix_world
-                elif bone.parent:
-                    matrix_world = scene.rotation_matrix @ bone.ob.matrix_world @ bone.pbone.matrix
-                    bone_inverse_matrices[bone.pbone] = matrix_world.inverted()
-                    matrix = bone_inverse_matrices[bone.parent] @ matrix_world
-                else:
-                    matrix = scene.rotation_matrix @ bone.ob.matrix_world @ bone.pbone.matrix
-                    bone_inverse_matrices[bone.pbone] = matrix.inverted()
-
-                loc, rot, sca = matrix.decompose()
-                
-                position = (c_float * 3)(loc.x, loc.y, loc.z)
-                orientation = (c_float * 4)(rot.x, rot.y, rot.z, rot.w)
-                scale_shear = (c_float * 9)(sca.x, 0.0, 0.0, 0.0, sca.y, 0.0, 0.0, 0.0, sca.z)
-                positions[bone].extend(position)
-                orientations[bone].extend(orientation)
-                scales[bone].extend(scale_shear)
+            sampler.record()
             
             if shape_key_data:
                 for ob, node in shape_key_data.items():
                     morph_target_datas[node].append(VirtualMorphTargetData(ob, scene, node))
 
-        for bone in bones:
-            tracks.append((c_float * (self.frame_count * 3))(*positions[bone]))
-            tracks.append((c_float * (self.frame_count * 4))(*orientations[bone]))
-            tracks.append((c_float * (self.frame_count * 9))(*scales[bone]))
-            
-        granny_tracks = []
-        for bone_idx, i in enumerate(range(0, len(tracks), 3)):
-            granny_track = GrannyTransformTrack()
-            granny_track.name = bones[bone_idx].pbone.name.encode()
-            
-            builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 3, self.frame_count)
-            scene.granny.push_control_array(builder, tracks[i])
-            position_curve = scene.granny.end_curve(builder)
-            
-            builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 4, self.frame_count)
-            scene.granny.push_control_array(builder, tracks[i + 1])
-            orientation_curve = scene.granny.end_curve(builder)
-            
-            builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 9, self.frame_count)
-            scene.granny.push_control_array(builder, tracks[i + 2])
-            scale_curve = scene.granny.end_curve(builder)
-            
-            granny_track.position_curve = position_curve.contents
-            granny_track.orientation_curve = orientation_curve.contents
-            granny_track.scale_shear_curve = scale_curve.contents
-
-            del position_curve
-            del orientation_curve
-            del scale_curve
-
-            granny_tracks.append(granny_track)
-
-
-        granny_track = GrannyTransformTrack()
-        granny_track.name = scene.skeleton_node.name.encode()
-        arm_tracks = []
-        loc, rot, sca = IDENTITY_MATRIX.decompose()
-        positions = []
-        orientations = []
-        scales = []
-        for frame in range(self.frame_count):
-            position = (c_float * 3)(0, 0, 0)
-            orientation = (c_float * 4)(0, 0, 0, 1)
-            scale_shear = (c_float * 9)(1, 0.0, 0.0, 0.0, 1, 0.0, 0.0, 0.0, 1)
-            positions.extend(position)
-            orientations.extend(orientation)
-            scales.extend(scale_shear)
-
-        arm_tracks.append((c_float * (self.frame_count * 3))(*positions))
-        arm_tracks.append((c_float * (self.frame_count * 4))(*orientations))
-        arm_tracks.append((c_float * (self.frame_count * 9))(*scales))
-
-        builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 3, self.frame_count)
-        scene.granny.push_control_array(builder, arm_tracks[0])
-        position_curve = scene.granny.end_curve(builder)
-        
-        builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 4, self.frame_count)
-        scene.granny.push_control_array(builder, arm_tracks[1])
-        orientation_curve = scene.granny.end_curve(builder)
-        
-        builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, 9, self.frame_count)
-        scene.granny.push_control_array(builder, arm_tracks[2])
-        scale_curve = scene.granny.end_curve(builder)
-
-        granny_track.position_curve = position_curve.contents
-        granny_track.orientation_curve = orientation_curve.contents
-        granny_track.scale_shear_curve = scale_curve.contents
-
-        # del position_curve
-        # del orientation_curve
-        # del scale_curve
-
-        granny_tracks.append(granny_track)
+        # Identifies the sampled content of this animation for the export cache
+        self.content_key = array_digest(sampler.matrices, *(morph.vertex_array for data in morph_target_datas.values() for morph in data))
+        granny_tracks = granny_sampler_tracks(scene, sampler)
+        granny_tracks.append(granny_identity_transform_track(scene, scene.skeleton_node.name.encode(), self.frame_count))
 
         granny_tracks.sort(key=lambda track: track.name)
         granny_transform_tracks = (GrannyTransformTrack * len(granny_tracks))(*granny_tracks)
@@ -422,6 +256,8 @@ class VirtualMaterial:
         self.shader_path = "override"
         self.shader_type = "override"
         self.granny_texture = None
+        # Identifies the embedded texture's pixels for the export cache
+        self.texture_key: str = None
         self.scene = scene
         if shader_path is not None:
             if not str(shader_path).strip() or str(shader_path) == '.':
@@ -478,6 +314,7 @@ class VirtualMaterial:
         
         # Create a granny texture builder instance
         width, height, stride, rgba = bitmap_data
+        self.texture_key = array_digest(str(full_path), width, height, string_at(rgba, stride * height))
         builder = scene.granny.begin_texture_builder(width, height)
         scene.granny.encode_image(builder, width, height, stride, 1, rgba)
         texture = scene.granny.end_texture(builder)
@@ -511,12 +348,9 @@ class VirtualMorphTargetData:
         self.granny_vertex_data.vertex_component_names = self.vertex_component_names
         self.granny_vertex_data.vertex_component_name_count = self.vertex_component_name_count
         self.granny_vertex_data.vertex_type = self.vertex_type
-        vertex_array = (c_ubyte * self.len_vertex_array)()
-        if node.matrix_world == IDENTITY_MATRIX:
-            vertex_array = self.vertex_array
-        else:
-            vertex_array = (c_ubyte * self.len_vertex_array)()
-            memmove(vertex_array, self.vertex_array, self.len_vertex_array)
+        # The vertex buffer belongs to this morph target alone so can be transformed in place
+        vertex_array = self.vertex_array
+        if node.matrix_world != IDENTITY_MATRIX:
             affine3, linear3x3, inverse_linear3x3 = calc_transforms(node.matrix_world)
             scene.granny.transform_vertices(self.num_vertices,
                                             self.granny_vertex_data.vertex_type,
@@ -631,14 +465,8 @@ class VirtualMorphTargetData:
         type_info_array = (GrannyDataTypeDefinition * (num_types + 1))(*types)
         self.vertex_type = cast(type_info_array, POINTER(GrannyDataTypeDefinition))
         
-        vertex_array = np.zeros(len(self.positions), dtype=dtypes)
-        for array, data_type in zip(data, dtypes):
-            vertex_array[data_type[0]] = array
-
-        vertex_byte_array = vertex_array.tobytes()
-
-        self.len_vertex_array = len(vertex_byte_array)
-        self.vertex_array = (c_ubyte * self.len_vertex_array).from_buffer_copy(vertex_byte_array)
+        self.vertex_array = granny_vertex_buffer(data, dtypes, len(self.positions), scene.profiler)
+        self.len_vertex_array = len(self.vertex_array)
     
     
 class VirtualMesh:
@@ -787,14 +615,8 @@ class VirtualMesh:
         type_info_array = (GrannyDataTypeDefinition * (num_types + 1))(*types)
         self.vertex_type = cast(type_info_array, POINTER(GrannyDataTypeDefinition))
         
-        vertex_array = np.zeros(len(self.positions), dtype=dtypes)
-        for array, data_type in zip(data, dtypes):
-            vertex_array[data_type[0]] = array
-
-        vertex_byte_array = vertex_array.tobytes()
-
-        self.len_vertex_array = len(vertex_byte_array)
-        self.vertex_array = (c_ubyte * self.len_vertex_array).from_buffer_copy(vertex_byte_array)
+        self.vertex_array = granny_vertex_buffer(data, dtypes, len(self.positions), scene.profiler)
+        self.len_vertex_array = len(self.vertex_array)
         
     def _setup(self, ob: bpy.types.Object, scene: 'VirtualScene', fp_defaults: dict, render_mesh: bool, props: dict, bones: list[str]):
         old_shape_key_index = 0
@@ -866,48 +688,26 @@ class VirtualMesh:
         
         self.positions = vertex_positions[loop_vertex_indices]
         
-        def remap(i):
-            return vgroup_remap.get(i, 0)
         # TODO ensure collision is not skinned
         if self.vertex_weighted:
             collision = props.get("bungie_mesh_type") == MeshType.collision.value
-            unique_bone_indices = set()
             vgroup_bone_names = {}
             for idx, vg in enumerate(ob.vertex_groups):
                 vgroup_bone_names[vg.name] = idx
-            bone_weights = np.zeros((num_loops, 4), dtype=np.single)
-            bone_indices = np.zeros((num_loops, 4), dtype=np.int32)
             vgroup_remap = {}
             for idx, bone in enumerate(bones):
                 vg_bone_index = vgroup_bone_names.get(bone)
                 if vg_bone_index is not None:
                     vgroup_remap[vg_bone_index] = idx
 
-            for idx, vertex in enumerate(mesh.vertices):
-                groups = vertex.groups
+            counts, group_indices, group_weights = read_vertex_groups(mesh)
+            # Vertex groups which are not bones are bound to the first bone
+            group_remap = np.zeros(max(len(ob.vertex_groups), group_indices.max(initial=-1) + 1), dtype=np.int32)
+            for vg_index, bone_index in vgroup_remap.items():
+                group_remap[vg_index] = bone_index
 
-                if groups:
-                    weights = np.empty(len(groups), dtype=np.single)
-                    indices = np.empty(len(groups), dtype=np.int32)
-                    groups.foreach_get("weight", weights)
-                    groups.foreach_get("group", indices)
-                        
-                    indices = np.vectorize(remap)(indices)
-
-                    top_indices = np.argsort(-weights)[:4]
-                    top_weights = weights[top_indices]
-                    top_bone_indices = indices[top_indices]
-
-                    if top_weights.sum() > 0:
-                        top_weights /= top_weights.sum()
-
-                    top_bone_indices[top_weights == 0] = 0
-                    
-                    bone_weights[idx] = np.pad((top_weights * 255), (0, 4 - len(top_weights)))
-                    bone_indices[idx] = np.pad(top_bone_indices, (0, 4 - len(top_bone_indices)))
-
-                    unique_bone_indices.update(top_bone_indices)
-                    
+            bone_weights, bone_indices = top_bone_weights(counts, group_remap[group_indices], group_weights)
+            bone_weights *= 255
                 
             if vgroup_remap:
                 self.bone_bindings = [bones[idx] for idx in vgroup_remap.values()]
@@ -974,9 +774,7 @@ class VirtualMesh:
         if self.tension is not None:
             data.append(self.tension)
 
-        loop_data = np.hstack(data)
-
-        result_data, new_indices, face_indices = np.unique(loop_data, axis=0, return_index=True, return_inverse=True)
+        new_indices, face_indices = weld_loops(data)
         
         if scene.corinth:
             # Extract the start index and number of loops for each face
@@ -997,8 +795,6 @@ class VirtualMesh:
         # self.indices = np.array(range(num_loops))
 
         self.indices = face_indices.astype(np.int32)
-        new_indices = tuple(new_indices)
-        
         self.new_indices = new_indices
 
         self.positions = self.positions[new_indices, :]
@@ -1087,6 +883,8 @@ class VirtualNode:
         self.parent: VirtualNode = None
         self.bone_bindings: list[str] = []
         self.granny_vertex_data = None
+        self.vertex_transform: tuple[Array, Array, Array] = None
+        self.baked_vertex_array: Array = None
         self.negative_scaling = False
         if not self.invalid and self.tag_type in scene.export_tag_types:
             # Skip writing mesh data for non-selected bsps/permutations
@@ -1129,7 +927,8 @@ class VirtualNode:
                     self.mesh.siblings.append(self.name)
                 else:
                     vertex_weighted = id.vertex_groups and id.parent and id.parent.type == 'ARMATURE' and id.parent_type != "BONE" and has_armature_deform_mod(id)
-                    mesh = VirtualMesh(vertex_weighted, scene, default_bone_bindings, id, fp_defaults, is_rendered(self.props), proxies if existing_linked_mesh is None else existing_linked_mesh.proxies, self.props, self.negative_scaling, bones, materials)
+                    with scene.profiler.step("mesh", id.name):
+                        mesh = VirtualMesh(vertex_weighted, scene, default_bone_bindings, id, fp_defaults, is_rendered(self.props), proxies if existing_linked_mesh is None else existing_linked_mesh.proxies, self.props, self.negative_scaling, bones, materials)
                     self.mesh = mesh
                     self.new_mesh = True
                     
@@ -1145,26 +944,30 @@ class VirtualNode:
                 self.granny_vertex_data.vertex_component_names = self.mesh.vertex_component_names
                 self.granny_vertex_data.vertex_component_name_count = self.mesh.vertex_component_name_count
                 self.granny_vertex_data.vertex_type = self.mesh.vertex_type
-                vertex_array = (c_ubyte * self.mesh.len_vertex_array)()
-                if self.matrix_world == IDENTITY_MATRIX:
-                    vertex_array = self.mesh.vertex_array
-                else:
-                    vertex_array = (c_ubyte * self.mesh.len_vertex_array)()
-                    memmove(vertex_array, self.mesh.vertex_array, self.mesh.len_vertex_array)
-                    affine3, linear3x3, inverse_linear3x3 = calc_transforms(self.matrix_world)
-                    scene.granny.transform_vertices(self.mesh.num_vertices,
-                                                    self.granny_vertex_data.vertex_type,
-                                                    vertex_array,
-                                                    affine3,
-                                                    linear3x3,
-                                                    inverse_linear3x3,
-                                                    True,
-                                                    False,
-                                                    )
+                if self.matrix_world != IDENTITY_MATRIX:
+                    self.vertex_transform = calc_transforms(self.matrix_world)
+                # Nodes share their mesh's vertex buffer. The node's own copy is only made while its granny file is written, see bake_vertices
+                scene.profiler.count("shared vertex bytes", self.mesh.len_vertex_array)
                 
-                self.granny_vertex_data.vertices = cast(vertex_array, POINTER(c_ubyte))
                 self.granny_vertex_data.vertex_count = self.mesh.num_vertices
                 self.granny_vertex_data = pointer(self.granny_vertex_data)   
+                
+    def bake_vertices(self, backend) -> int:
+        '''Points this node's granny vertex data at its own copy of its mesh's vertex buffer, transformed by the node's world matrix unless that is the identity.
+        backend is anything with Granny.transform_vertices. Returns the number of bytes allocated'''
+        if self.granny_vertex_data is None or self.baked_vertex_array is not None:
+            return 0
+        mesh = self.mesh
+        self.baked_vertex_array = bake_vertex_buffer(mesh.vertex_array, mesh.num_vertices, mesh.vertex_type, self.vertex_transform, backend)
+        self.granny_vertex_data.contents.vertices = cast(self.baked_vertex_array, POINTER(c_ubyte))
+        return mesh.len_vertex_array
+    
+    def release_vertices(self):
+        '''Frees the buffer made by bake_vertices once the granny file using it has been saved'''
+        if self.baked_vertex_array is None:
+            return
+        self.granny_vertex_data.contents.vertices = None
+        self.baked_vertex_array = None
             
     def _set_group(self, scene: 'VirtualScene', animation: str | None):
         if animation is None:
@@ -1288,6 +1091,44 @@ class AnimatedBone:
             else:
                 self.parent = parent_override
 
+def granny_sampler_tracks(scene: 'VirtualScene', sampler: AnimationSampler) -> list[GrannyTransformTrack]:
+    positions, orientations, scale_shears = sampler.to_track_arrays()
+    return [granny_transform_track(scene, bone.pbone.name.encode(), positions[idx], orientations[idx], scale_shears[idx], sampler.frame_count) for idx, bone in enumerate(sampler.bones)]
+
+def read_vertex_groups(mesh: bpy.types.Mesh) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Reads the vertex group assignments of every vertex into flat arrays. Returns the number of groups per vertex followed by the group indices and weights of all vertices in vertex order'''
+    vertex_groups = [vertex.groups for vertex in mesh.vertices]
+    counts = np.fromiter(map(len, vertex_groups), dtype=np.int32, count=len(vertex_groups))
+    # The python API has no mesh level collection of group elements to foreach_get from, so the elements are read in one flat pass instead of two foreach_get calls per vertex
+    elements = np.fromiter(chain.from_iterable((element.group, element.weight) for groups in vertex_groups for element in groups), dtype=np.float64, count=int(counts.sum()) * 2)
+    group_indices, group_weights = unpack_group_elements(elements)
+    return counts, group_indices, group_weights
+
+def granny_transform_track(scene: 'VirtualScene', name: bytes, positions: np.ndarray, orientations: np.ndarray, scale_shears: np.ndarray, frame_count: int) -> GrannyTransformTrack:
+    '''Creates a granny transform track from contiguous float32 arrays of shape (frames, 3), (frames, 4) and (frames, 9)'''
+    granny_track = GrannyTransformTrack()
+    granny_track.name = name
+    curves = []
+    for array, dimension in ((positions, 3), (orientations, 4), (scale_shears, 9)):
+        # Share the numpy memory with ctypes rather than copying element by element
+        control_array = (c_float * (frame_count * dimension)).from_buffer(array)
+        builder = scene.granny.begin_curve(scene.granny.keyframe_type, 0, dimension, frame_count)
+        scene.granny.push_control_array(builder, control_array)
+        curves.append(scene.granny.end_curve(builder))
+
+    position_curve, orientation_curve, scale_curve = curves
+    granny_track.position_curve = position_curve.contents
+    granny_track.orientation_curve = orientation_curve.contents
+    granny_track.scale_shear_curve = scale_curve.contents
+
+    return granny_track
+
+def granny_identity_transform_track(scene: 'VirtualScene', name: bytes, frame_count: int) -> GrannyTransformTrack:
+    positions = np.zeros((frame_count, 3), dtype=np.single)
+    orientations = np.tile(np.array((0, 0, 0, 1), dtype=np.single), (frame_count, 1))
+    scale_shears = np.tile(np.identity(3, dtype=np.single).ravel(), (frame_count, 1))
+    return granny_transform_track(scene, name, positions, orientations, scale_shears, frame_count)
+
 class FakeBone:
     def __init__(self, ob: bpy.types.Object, bone: bpy.types.PoseBone, parent: 'FakeBone' = None, special_bone_names=[]):
         self.name = bone.name
@@ -1577,8 +1418,9 @@ class VirtualScene:
         self.animations = []
         self.shots = []
         self.default_animation_compression = animation_compression
+        self.profiler = profiler_disabled
         
-        self.object_parent_dict: dict[bpy.types.Object: bpy.types.Object] = {}
+        self.scene_graph = SceneGraph()
         self.object_halo_data: dict[bpy.types.Object: tuple[dict, str, str, list]] = {}
         self.mesh_object_map: dict[tuple[bpy.types.Mesh, bool]: list[bpy.types.Object]] = {}
         
@@ -1662,9 +1504,17 @@ class VirtualScene:
             
         return node
             
+    @property
+    def object_parent_dict(self) -> MappingProxyType[bpy.types.Object: bpy.types.Object]:
+        '''Read only view of the child to parent index. Change the hierarchy through scene_graph or by assigning a new dict'''
+        return MappingProxyType(self.scene_graph.parents)
+    
+    @object_parent_dict.setter
+    def object_parent_dict(self, value: dict[bpy.types.Object: bpy.types.Object]):
+        self.scene_graph = SceneGraph(value)
+            
     def get_immediate_children(self, parent):
-        children = [ob for ob, ob_parent in self.object_parent_dict.items() if ob_parent == parent]
-        return children
+        return self.scene_graph.get_children(parent)
         
     def add_model(self, ob):
         model = VirtualModel(ob, self)
@@ -1825,19 +1675,35 @@ def has_armature_deform_mod(ob: bpy.types.Object):
             
     return False
 
+class FaceLayers:
+    '''Integer face attributes of a mesh, each read into a numpy array with a single foreach_get the first time it is asked for'''
+    def __init__(self, mesh: bpy.types.Mesh):
+        self.mesh = mesh
+        self.arrays: dict[str: np.ndarray | None] = {}
+        
+    def get(self, name: str) -> np.ndarray | None:
+        if name in self.arrays:
+            return self.arrays[name]
+        array = None
+        attribute = self.mesh.attributes.get(name)
+        if attribute is not None and attribute.domain == 'FACE' and attribute.data_type == 'INT':
+            array = np.empty(len(attribute.data), dtype=np.int32)
+            attribute.data.foreach_get("value", array)
+        self.arrays[name] = array
+        return array
+    
 class FaceSet:
     def __init__(self, array: np.ndarray):
-        self.face_props: dict[NWO_FaceProperties_ListItems: bmesh.types.BMLayerItem] = {}
+        self.face_props: dict[str | int: object] = {} # keyed by face layer name, or material index for material driven props
         self.array = array
         self.annotation_type = None
         self._set_tri_annotation_type()
         
-    def update(self, bm: bmesh.types.BMesh, layer_name: str, value: object):
-        layer = bm.faces.layers.int.get(layer_name)
-        if layer:
-            self.face_props[layer] = value
+    def update(self, face_layers: FaceLayers, layer_name: str, value: object):
+        if face_layers.get(layer_name) is not None:
+            self.face_props[layer_name] = value
             
-    def update_from_material(self, bm: bmesh.types.BMesh, material_indices: list[int], value: object):
+    def update_from_material(self, material_indices: list[int], value: object):
         for idx in material_indices:
             self.face_props[idx] = value
             
@@ -1864,29 +1730,27 @@ class FaceSet:
             
 
 def gather_face_props(mesh_props: NWO_MeshPropertiesGroup, mesh: bpy.types.Mesh, num_faces: int, scene: VirtualScene, sorted_order, special_mats_dict: dict, fp_defaults: dict, props: dict) -> dict:
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    
+    face_layers = FaceLayers(mesh)
     face_properties = {}
     side_layers = {}
+    removed_materials = set()
     
     for face_prop in mesh_props.face_props:
         if props.get("bungie_face_mode") is None:
             if face_prop.render_only_override:
-                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceMode.render_only.value)
+                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceMode.render_only.value)
             elif face_prop.collision_only_override:
-                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceMode.collision_only.value)
+                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceMode.collision_only.value)
             elif not scene.corinth and face_prop.sphere_collision_only_override:
-                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceMode.sphere_collision_only.value)
+                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceMode.sphere_collision_only.value)
             elif face_prop.lightmap_only_override:
-                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceMode.lightmap_only.value)
+                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceMode.lightmap_only.value)
             elif not scene.corinth and face_prop.breakable_override:
-                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceMode.breakable.value)
+                face_properties.setdefault("bungie_face_mode", FaceSet(np.full(num_faces, fp_defaults["bungie_face_mode"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceMode.breakable.value)
         
         if props.get("bungie_face_sides") is None:
             if face_prop.face_two_sided_override:
-                two_sided_layer = bm.faces.layers.int.get(face_prop.layer_name)
-                if two_sided_layer:
+                if face_layers.get(face_prop.layer_name) is not None:
                     sides_value = FaceSides.two_sided.value
                     if scene.corinth:
                         match face_prop.face_two_sided_type:
@@ -1895,81 +1759,80 @@ def gather_face_props(mesh_props: NWO_MeshPropertiesGroup, mesh: bpy.types.Mesh,
                             case "keep":
                                 sides_value = FaceSides.keep.value
                                 
-                    side_layers[two_sided_layer] = sides_value
+                    side_layers[face_prop.layer_name] = sides_value
                         
-                    face_properties.setdefault("bungie_face_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_face_sides"], dtype=np.int32))).update(bm, face_prop.layer_name, -sides_value)
+                    face_properties.setdefault("bungie_face_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_face_sides"], dtype=np.int32))).update(face_layers, face_prop.layer_name, -sides_value)
                 
             if face_prop.face_transparent_override:
-                transparent_layer = bm.faces.layers.int.get(face_prop.layer_name)
-                if transparent_layer:
-                    side_layers[transparent_layer] = 1
-                    face_properties.setdefault("bungie_face_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_face_sides"], dtype=np.int32))).update(bm, face_prop.layer_name, -FaceSides.one_sided_transparent.value)
+                if face_layers.get(face_prop.layer_name) is not None:
+                    side_layers[face_prop.layer_name] = 1
+                    face_properties.setdefault("bungie_face_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_face_sides"], dtype=np.int32))).update(face_layers, face_prop.layer_name, -FaceSides.one_sided_transparent.value)
             
         if face_prop.face_draw_distance_override and props.get("bungie_face_draw_distance") is None:
             match face_prop.face_draw_distance:
                 case '_connected_geometry_face_draw_distance_detail_mid':
-                    face_properties.setdefault("bungie_face_draw_distance", FaceSet(np.full(num_faces, fp_defaults["bungie_face_draw_distance"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceDrawDistance.detail_mid.value)
+                    face_properties.setdefault("bungie_face_draw_distance", FaceSet(np.full(num_faces, fp_defaults["bungie_face_draw_distance"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceDrawDistance.detail_mid.value)
                 case '_connected_geometry_face_draw_distance_detail_close':
-                    face_properties.setdefault("bungie_face_draw_distance", FaceSet(np.full(num_faces, fp_defaults["bungie_face_draw_distance"], dtype=np.int32))).update(bm, face_prop.layer_name, FaceDrawDistance.detail_close.value)
+                    face_properties.setdefault("bungie_face_draw_distance", FaceSet(np.full(num_faces, fp_defaults["bungie_face_draw_distance"], dtype=np.int32))).update(face_layers, face_prop.layer_name, FaceDrawDistance.detail_close.value)
 
         if face_prop.face_global_material_override and props.get("bungie_face_global_material") is None:
             gmv = scene.global_materials.get(fp_defaults["bungie_face_global_material"], 0)
             face_gmv = scene.global_materials.get(face_prop.face_global_material.strip().replace(' ', "_"))
             if face_gmv is not None:
-                face_properties.setdefault("bungie_face_global_material", FaceSet(np.full(num_faces, gmv, np.int32))).update(bm, face_prop.layer_name, face_gmv)
+                face_properties.setdefault("bungie_face_global_material", FaceSet(np.full(num_faces, gmv, np.int32))).update(face_layers, face_prop.layer_name, face_gmv)
                 
         if scene.asset_type.supports_regions and face_prop.region_name_override and props.get("bungie_face_region") is None:
             rv = scene.regions.get(fp_defaults["bungie_face_region"], 0)
             face_rv = scene.regions.get(face_prop.region_name)
             if face_rv is not None:
-                face_properties.setdefault("bungie_face_region", FaceSet(np.full(num_faces, rv, np.int32))).update(bm, face_prop.layer_name, face_rv)
+                face_properties.setdefault("bungie_face_region", FaceSet(np.full(num_faces, rv, np.int32))).update(face_layers, face_prop.layer_name, face_rv)
         
         if not scene.corinth:
             if face_prop.ladder_override and props.get("bungie_ladder") is None:
-                face_properties.setdefault("bungie_ladder", FaceSet(np.full(num_faces, fp_defaults["bungie_ladder"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+                face_properties.setdefault("bungie_ladder", FaceSet(np.full(num_faces, fp_defaults["bungie_ladder"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
             if face_prop.slip_surface_override and props.get("bungie_slip_surface") is None:
-                face_properties.setdefault("bungie_slip_surface", FaceSet(np.full(num_faces, fp_defaults["bungie_slip_surface"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+                face_properties.setdefault("bungie_slip_surface", FaceSet(np.full(num_faces, fp_defaults["bungie_slip_surface"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.decal_offset_override and props.get("bungie_decal_offset") is None:
-            face_properties.setdefault("bungie_decal_offset", FaceSet(np.full(num_faces, fp_defaults["bungie_decal_offset"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_decal_offset", FaceSet(np.full(num_faces, fp_defaults["bungie_decal_offset"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.no_shadow_override and props.get("bungie_no_shadow") is None:
-            face_properties.setdefault("bungie_no_shadow", FaceSet(np.full(num_faces, fp_defaults["bungie_no_shadow"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_no_shadow", FaceSet(np.full(num_faces, fp_defaults["bungie_no_shadow"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.no_pvs_override and props.get("bungie_invisible_to_pvs") is None:
-            face_properties.setdefault("bungie_invisible_to_pvs", FaceSet(np.full(num_faces, fp_defaults["bungie_invisible_to_pvs"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_invisible_to_pvs", FaceSet(np.full(num_faces, fp_defaults["bungie_invisible_to_pvs"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.no_lightmap_override and props.get("bungie_no_lightmap") is None:
-            face_properties.setdefault("bungie_no_lightmap", FaceSet(np.full(num_faces, fp_defaults["bungie_no_lightmap"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_no_lightmap", FaceSet(np.full(num_faces, fp_defaults["bungie_no_lightmap"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.precise_position_override and props.get("bungie_precise_position") is None:
-            face_properties.setdefault("bungie_precise_position", FaceSet(np.full(num_faces, fp_defaults["bungie_precise_position"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_precise_position", FaceSet(np.full(num_faces, fp_defaults["bungie_precise_position"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.mesh_tessellation_density_override and props.get("_connected_geometry_mesh_tessellation_density_4x") is None:
             match face_prop.mesh_tessellation_density:
                 case '_connected_geometry_mesh_tessellation_density_4x':
-                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
                 case '_connected_geometry_mesh_tessellation_density_9x':
-                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(bm, face_prop.layer_name, 2)
+                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 2)
                 case '_connected_geometry_mesh_tessellation_density_36x':
-                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(bm, face_prop.layer_name, 3)
+                    face_properties.setdefault("bungie_mesh_tessellation_density", FaceSet(np.full(num_faces, fp_defaults["bungie_mesh_tessellation_density"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 3)
             
         # Lightmap Props
         if face_prop.lightmap_ignore_default_resolution_scale_override and props.get("bungie_lightmap_ignore_default_resolution_scale") is None:
-            face_properties.setdefault("bungie_lightmap_ignore_default_resolution_scale", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_ignore_default_resolution_scale"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lightmap_ignore_default_resolution_scale", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_ignore_default_resolution_scale"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.lightmap_additive_transparency_override and props.get("bungie_lightmap_additive_transparency") is None:
-            face_properties.setdefault("bungie_lightmap_additive_transparency", FaceSet(np.full((num_faces, 3), fp_defaults["bungie_lightmap_additive_transparency"], np.single))).update(bm, face_prop.layer_name, utils.color_3p_int(face_prop.lightmap_additive_transparency))
+            face_properties.setdefault("bungie_lightmap_additive_transparency", FaceSet(np.full((num_faces, 3), fp_defaults["bungie_lightmap_additive_transparency"], np.single))).update(face_layers, face_prop.layer_name, utils.color_3p_int(face_prop.lightmap_additive_transparency))
         if face_prop.lightmap_resolution_scale_override and props.get("bungie_lightmap_additive_transparency") is None:
-            face_properties.setdefault("bungie_lightmap_resolution_scale", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_resolution_scale"], dtype=np.int32))).update(bm, face_prop.layer_name, face_prop.lightmap_resolution_scale)
+            face_properties.setdefault("bungie_lightmap_resolution_scale", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_resolution_scale"], dtype=np.int32))).update(face_layers, face_prop.layer_name, face_prop.lightmap_resolution_scale)
         if face_prop.lightmap_type_override and props.get("bungie_lightmap_type") is None:
             if face_prop.lightmap_type == '_connected_geometry_lightmap_type_per_vertex':
-                face_properties.setdefault("bungie_lightmap_type", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_type"], dtype=np.int32))).update(bm, face_prop.layer_name, LightmapType.per_vertex.value)
+                face_properties.setdefault("bungie_lightmap_type", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_type"], dtype=np.int32))).update(face_layers, face_prop.layer_name, LightmapType.per_vertex.value)
             else:
-                face_properties.setdefault("bungie_lightmap_type", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_type"], dtype=np.int32))).update(bm, face_prop.layer_name, LightmapType.per_pixel.value)
+                face_properties.setdefault("bungie_lightmap_type", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_type"], dtype=np.int32))).update(face_layers, face_prop.layer_name, LightmapType.per_pixel.value)
         if face_prop.lightmap_translucency_tint_color_override and props.get("bungie_lightmap_translucency_tint_color") is None:
-            face_properties.setdefault("bungie_lightmap_translucency_tint_color", FaceSet(np.full((num_faces, 3), fp_defaults["bungie_lightmap_translucency_tint_color"], np.single))).update(bm, face_prop.layer_name, utils.color_3p_int(face_prop.lightmap_translucency_tint_color))
+            face_properties.setdefault("bungie_lightmap_translucency_tint_color", FaceSet(np.full((num_faces, 3), fp_defaults["bungie_lightmap_translucency_tint_color"], np.single))).update(face_layers, face_prop.layer_name, utils.color_3p_int(face_prop.lightmap_translucency_tint_color))
         if face_prop.lightmap_lighting_from_both_sides_override and props.get("bungie_lightmap_lighting_from_both_sides") is None:
-            face_properties.setdefault("bungie_lightmap_lighting_from_both_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_lighting_from_both_sides"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lightmap_lighting_from_both_sides", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_lighting_from_both_sides"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.lightmap_transparency_override_override and props.get("bungie_lightmap_transparency_override") is None:
-            face_properties.setdefault("bungie_lightmap_transparency_override", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_transparency_override"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lightmap_transparency_override", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_transparency_override"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
         if face_prop.lightmap_analytical_bounce_modifier_override and props.get("bungie_lightmap_analytical_bounce_modifier") is None:
-            face_properties.setdefault("bungie_lightmap_analytical_bounce_modifier", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_analytical_bounce_modifier"], np.single))).update(bm, face_prop.layer_name, face_prop.lightmap_analytical_bounce_modifier)
+            face_properties.setdefault("bungie_lightmap_analytical_bounce_modifier", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_analytical_bounce_modifier"], np.single))).update(face_layers, face_prop.layer_name, face_prop.lightmap_analytical_bounce_modifier)
         if face_prop.lightmap_general_bounce_modifier_override and props.get("bungie_lightmap_general_bounce_modifier") is None:
-            face_properties.setdefault("bungie_lightmap_general_bounce_modifier", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_general_bounce_modifier"], np.single))).update(bm, face_prop.layer_name, face_prop.lightmap_general_bounce_modifier)
+            face_properties.setdefault("bungie_lightmap_general_bounce_modifier", FaceSet(np.full(num_faces, fp_defaults["bungie_lightmap_general_bounce_modifier"], np.single))).update(face_layers, face_prop.layer_name, face_prop.lightmap_general_bounce_modifier)
         
         # Emissives
         if face_prop.emissive_override and props.get("bungie_lighting_emissive_power") is None:
@@ -1979,57 +1842,45 @@ def gather_face_props(mesh_props: NWO_MeshPropertiesGroup, mesh: bpy.types.Mesh,
                 cutoff = face_prop.material_lighting_attenuation_cutoff
             else:
                 falloff, cutoff = calc_attenutation(face_prop.material_lighting_emissive_power * scene.unit_factor ** 2)
-            face_properties.setdefault("bungie_lighting_emissive_power", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_power"], np.single))).update(bm, face_prop.layer_name, power)
-            face_properties.setdefault("bungie_lighting_emissive_color", FaceSet(np.full((num_faces, 4), fp_defaults["bungie_lighting_emissive_color"], np.single))).update(bm, face_prop.layer_name, utils.color_4p_int(face_prop.material_lighting_emissive_color))
-            face_properties.setdefault("bungie_lighting_emissive_per_unit", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_per_unit"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
-            face_properties.setdefault("bungie_lighting_emissive_quality", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_quality"], np.single))).update(bm, face_prop.layer_name, face_prop.material_lighting_emissive_quality)
-            face_properties.setdefault("bungie_lighting_use_shader_gel", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_use_shader_gel"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
-            face_properties.setdefault("bungie_lighting_bounce_ratio", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_bounce_ratio"], np.single))).update(bm, face_prop.layer_name, face_prop.material_lighting_bounce_ratio)
-            face_properties.setdefault("bungie_lighting_attenuation_enabled", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_enabled"], dtype=np.int32))).update(bm, face_prop.layer_name, 1)
-            face_properties.setdefault("bungie_lighting_attenuation_cutoff", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_cutoff"], np.single))).update(bm, face_prop.layer_name, cutoff * scene.atten_scalar * WU_SCALAR)
-            face_properties.setdefault("bungie_lighting_attenuation_falloff", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_falloff"], np.single))).update(bm, face_prop.layer_name, falloff * scene.atten_scalar * WU_SCALAR)
-            face_properties.setdefault("bungie_lighting_emissive_focus", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_focus"], np.single))).update(bm, face_prop.layer_name, degrees(face_prop.material_lighting_emissive_focus) / 180)
+            face_properties.setdefault("bungie_lighting_emissive_power", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_power"], np.single))).update(face_layers, face_prop.layer_name, power)
+            face_properties.setdefault("bungie_lighting_emissive_color", FaceSet(np.full((num_faces, 4), fp_defaults["bungie_lighting_emissive_color"], np.single))).update(face_layers, face_prop.layer_name, utils.color_4p_int(face_prop.material_lighting_emissive_color))
+            face_properties.setdefault("bungie_lighting_emissive_per_unit", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_per_unit"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lighting_emissive_quality", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_quality"], np.single))).update(face_layers, face_prop.layer_name, face_prop.material_lighting_emissive_quality)
+            face_properties.setdefault("bungie_lighting_use_shader_gel", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_use_shader_gel"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lighting_bounce_ratio", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_bounce_ratio"], np.single))).update(face_layers, face_prop.layer_name, face_prop.material_lighting_bounce_ratio)
+            face_properties.setdefault("bungie_lighting_attenuation_enabled", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_enabled"], dtype=np.int32))).update(face_layers, face_prop.layer_name, 1)
+            face_properties.setdefault("bungie_lighting_attenuation_cutoff", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_cutoff"], np.single))).update(face_layers, face_prop.layer_name, cutoff * scene.atten_scalar * WU_SCALAR)
+            face_properties.setdefault("bungie_lighting_attenuation_falloff", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_attenuation_falloff"], np.single))).update(face_layers, face_prop.layer_name, falloff * scene.atten_scalar * WU_SCALAR)
+            face_properties.setdefault("bungie_lighting_emissive_focus", FaceSet(np.full(num_faces, fp_defaults["bungie_lighting_emissive_focus"], np.single))).update(face_layers, face_prop.layer_name, degrees(face_prop.material_lighting_emissive_focus) / 180)
 
     for material, material_indices in special_mats_dict.items():
         if material.name.lower().startswith('+seamsealer') and props.get("bungie_face_type") is None:
-            face_properties.setdefault("bungie_face_type", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(bm, material_indices, FaceType.seam_sealer.value)
+            face_properties.setdefault("bungie_face_type", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(material_indices, FaceType.seam_sealer.value)
         elif material.name.lower().startswith('+sky'):
             is_structure = props.get("bungie_mesh_type") == MeshType.default.value
             if not is_structure and not scene.corinth:
-                bmesh.ops.delete(bm, geom=[f for f in bm.faces if f.material_index in material_indices], context='FACES')
+                # These faces are dropped, the remaining faces fill the start of each array
+                removed_materials.update(material_indices)
                 continue
             
             enum_val = FaceType.sky.value if is_structure and scene.asset_type == AssetType.SCENARIO else FaceType.seam_sealer.value
             if props.get("bungie_face_type") is None:
-                face_properties.setdefault("bungie_face_type", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(bm, material_indices, enum_val)
+                face_properties.setdefault("bungie_face_type", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(material_indices, enum_val)
             
             if not scene.corinth and enum_val == FaceType.sky.value:
                 if len(material.name) > 4 and material.name[4].isdigit():
                     sky_index = int(material.name[4])
                     if sky_index > 0 and props.get("bungie_sky_permutation_index") is None:
-                        face_properties.setdefault("bungie_sky_permutation_index", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(bm, material_indices, sky_index)
+                        face_properties.setdefault("bungie_sky_permutation_index", FaceSet(np.zeros(num_faces, dtype=np.int32))).update_from_material(material_indices, sky_index)
         else:
             # Must be a material with material properties
             pass
         
-    for idx, face in enumerate(bm.faces):
-        for v in face_properties.values():
-            for key, value in v.face_props.items():
-                if isinstance(key, int):
-                    if face.material_index == key:
-                        v.array[idx] = value
-                else:
-                    if face[key]:
-                        if isinstance(value, int) and value < 0: # for handling face_sides
-                            value = abs(value)
-                            for l, va in side_layers.items():
-                                if l != key and abs(va) != value and face[l]:
-                                    value += abs(va)
-                                    break
-                                    
-                        v.array[idx] = value
-                    
-    bm.free()
+    if face_properties:
+        material_indices = np.empty(num_faces, dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        resolve_face_sets(face_properties, face_layers.arrays, material_indices, side_layers, removed_materials)
+        
     if sorted_order is not None:
         for v in face_properties.values():
             v.array = v.array[sorted_order]
@@ -2,6 +2,7 @@ from collections import defaultdict
 from ctypes import CDLL, Array, byref, c_uint32, cast, cdll, create_string_buffer, pointer, sizeof, string_at, windll
 from pathlib import Path
 import struct
+import threading
 import time
 
 import bpy
@@ -19,6 +20,10 @@ GrannyCallbackType = CFUNCTYPE(
     c_void_p
 )
 
+# Log callbacks registered per loaded granny dll handle
+_log_callbacks: dict[int, GrannyLogCallback] = {}
+_log_callback_lock = threading.Lock()
+
 class Granny:
     def __init__(self, granny_dll_path: str | Path, corinth: bool):
         self.dll = cdll.LoadLibrary(str(granny_dll_path))
@@ -32,6 +37,9 @@ class Granny:
         self.string_table = self.new_string_table()
         self._create_callback()
         self.filename = ""
+        # Read blender state up front so files can be written from worker threads
+        self.blend_filepath = bpy.data.filepath
+        self.blender_version = bpy.app.version
     
         
     def new(self, filepath: Path, forward: str, scale: float, mirror: bool):
@@ -385,15 +393,21 @@ class Granny:
         granny_model.mesh_bindings = cast(mesh_bindings, POINTER(GrannyModelMeshBinding))
         
     def _create_callback(self):
-        callback = GrannyLogCallback()
-        callback.function = GrannyCallbackType(self._new_callback_function)
-        self.set_log_callback(callback)
+        '''The log callback is process wide, so it is only registered by the first instance to load the dll. Granny instances created for worker threads
+        would otherwise each replace it. The callback is kept referenced so it is never freed while granny can call it'''
+        with _log_callback_lock:
+            if self.dll._handle in _log_callbacks:
+                return
+            callback = GrannyLogCallback()
+            callback.function = GrannyCallbackType(self._new_callback_function)
+            self.set_log_callback(callback)
+            _log_callbacks[self.dll._handle] = callback
         
     def _create_file_info(self):
         self.file_info = GrannyFileInfo()
         self.file_info.art_tool_info = pointer(self._create_art_tool_info())
         self.file_info.exporter_info = pointer(self._create_basic_exporter_tool_info())
-        self.file_info.file_name = bpy.data.filepath.encode() if bpy.data.filepath else self.filename.encode()
+        self.file_info.file_name = self.blend_filepath.encode() if self.blend_filepath else self.filename.encode()
         self.file_info.texture_count = 0
         self.file_info.textures = None
         self.file_info.material_count = 0
@@ -416,7 +430,7 @@ class Granny:
         self.file_info.extended_data.object = None
         
     def _create_art_tool_info(self) -> GrannyFileArtToolInfo:
-        blender_version = bpy.app.version
+        blender_version = self.blender_version
         tool_info = GrannyFileArtToolInfo()
         tool_info.art_tool_name = b'Blender'
         tool_info.art_tool_major_revision = blender_version[0]
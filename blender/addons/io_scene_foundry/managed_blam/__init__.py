@@ -1,5 +1,8 @@
 from pathlib import Path
 from ..managed_blam.Tags import *
+from ..managed_blam.block_index import BlockIndex, EnumIndex
+from ..block_sync import sync_tag_block
+from ..managed_blam.tag_session import TagSession, close_tag, current_session
 from ..utils import (
     any_partition,
     disable_prints,
@@ -32,6 +35,14 @@ mb_active = False
 mb_path = ""
 mb_operational = False
 
+FIELD_VALUE_GETTERS = {
+    "StringId": lambda field: field.GetStringData(),
+    "ShortInteger": lambda field: field.GetStringData(),
+    "Reference": lambda field: field.Path,
+    "WordInteger": lambda field: field.GetStringData(),
+    "Data": lambda field: field.DataAsText,
+}
+
 class Tag():
     # Stuff classes that inherit from this one may overwrite
     tag_ext = ""
@@ -66,20 +77,15 @@ class Tag():
         self.path = path
         self.tag_is_new = False
         self._find_tag()
+        self.session = current_session()
+        self.session_key = None
         try:
-            if os.path.exists(self.system_path):
-                self.tag.Load(self.tag_path)
-            elif self.tag_must_exist:
-                raise RuntimeError(f"No file exists for {self.path}, but this {self.__class__} has been told one must exist")
+            if self.session:
+                session_key = os.path.normcase(self.system_path)
+                self.tag = self.session.open(session_key, self.tag, self._load)
+                self.session_key = session_key
             else:
-                self.tag.New(self.tag_path)
-                self.tag_is_new = True
-            
-            if not self.tag_path:
-                raise RuntimeError(f"Failed to load Tag: {str(self.path)}")
-            
-            elif not self.tag_path.IsTagFileAccessible():
-                raise RuntimeError(f"TagFile not accessible: {self.tag_path.RelativePathWithExtension}")
+                self._load(self.tag)
                 
             self._read_fields()
             if self.tag_is_new:
@@ -89,10 +95,31 @@ class Tag():
             self.valid = True
             
         except:
+            if self.session_key is not None:
+                # Give back the session's reference. The session still owns the tag file and closes it
+                self.session.release(self.session_key, False)
+                self.session_key = None
+                self.tag = None
             err_message = f"Failed to Load Tag: {Path(self.path).name}"
             print_error(err_message)
             if raise_on_error:
                 raise RuntimeError(err_message)
+            
+    def _load(self, tag):
+        """Loads the tag file, or creates it if there is no file yet"""
+        if os.path.exists(self.system_path):
+            tag.Load(self.tag_path)
+        elif self.tag_must_exist:
+            raise RuntimeError(f"No file exists for {self.path}, but this {self.__class__} has been told one must exist")
+        else:
+            tag.New(self.tag_path)
+            self.tag_is_new = True
+        
+        if not self.tag_path:
+            raise RuntimeError(f"Failed to load Tag: {str(self.path)}")
+        
+        elif not self.tag_path.IsTagFileAccessible():
+            raise RuntimeError(f"TagFile not accessible: {self.tag_path.RelativePathWithExtension}")
         
     def _read_fields(self):
         """Read in some useful fields for this tag type"""
@@ -106,13 +133,7 @@ class Tag():
         return self
         
     def __exit__(self, exc_type, exc_value, traceback):
-        if self.tag:
-            if self.tag_has_changes:
-                try:
-                    self.tag.Save()
-                except:
-                    pass
-            self.tag.Dispose()
+        close_tag(self.session, self.session_key, self.tag, self.system_path, self.tag_has_changes, exc_type is not None)
         if self.hide_prints:
             enable_prints()
 
@@ -171,31 +192,41 @@ class Tag():
         block = parent.SelectField(block_name)
         return block.AddElement()
     
+    def _sync_block(self, block, block_name: str, snapshots: dict, write_element, existing_key=None, write_in_place=False) -> list:
+        """Brings a block in line with snapshots, a dict of element key to snapshot ordered as elements should be added. Only elements which changed since the block was last synced are written.
+        Blocks not synced since Blender started are rebuilt in full, unless existing_key is given to read the key of their elements. Returns the key of each element in the block"""
+        order, changed = sync_tag_block(self.system_path, block, block_name, snapshots, write_element, existing_key, write_in_place)
+        self.tag_has_changes |= changed
+        return order
+    
     def _Element_create_if_needed(self, block, field_name, value_name):
-        element = block.Elements
         element = self. _Element_from_field_value(block, field_name, value_name)
         if element:
             return element
-        return block.AddElement()
+        element = block.AddElement()
+        self._block_index(block, field_name).added(element, value_name)
+        return element
     
     def _Element_remove_if_needed(self, block, field_name, value_name):
-        element = block.Elements
         element = self. _Element_from_field_value(block, field_name, value_name)
         if element:
             block.RemoveElement(element.ElementIndex)
+            self._block_index(block, field_name).invalidate()
     
     def _Element_create_if_needed_and_confirm(self, block, field_name, value_name):
-        element = block.Elements
         element = self. _Element_from_field_value(block, field_name, value_name)
         if element:
             return element, False
-        return block.AddElement(), True
+        element = block.AddElement()
+        self._block_index(block, field_name).added(element, value_name)
+        return element, True
             
 
     
     def _Element_set_field_value(self, element, field_name: str, value):
         """Sets the value of the given field by name. Requires the tag element to be specified as the first arg. Returns the field"""
         field = element.SelectField(field_name)
+        self._update_block_indexes(element, field_name, value)
         field_type_str = str(field.FieldType)
         match field_type_str:
             case "LongEnum":
@@ -226,22 +257,8 @@ class Tag():
     def _Element_get_field_value(self, element, field_name: str, always_string=False):
         """Gets the value of the given field by name. Requires the tag element to be specified as the first arg. Returns the fvalue of the given field. If the last arg is specified as True, always returns values as strings"""
         field = element.SelectField(field_name)
-        field_type_str = str(field.FieldType)
-        value = None
-        match field_type_str:
-            case "StringId":
-                value = field.GetStringData()
-            case "ShortInteger":
-                value = field.GetStringData()
-            case "Reference":
-                value = field.Path
-            case "WordInteger":
-                value = field.GetStringData()
-            case "Data":
-                value = field.DataAsText
-            case _:
-                value = field.Value
-
+        getter = FIELD_VALUE_GETTERS.get(str(field.FieldType))
+        value = field.Value if getter is None else getter(field)
         if always_string:
             return str(value)
         return value
@@ -313,11 +330,15 @@ class Tag():
         elements = block.Elements
         if not elements.Count:
             return #print(f"{block} has no elements")
-        items = self. _EnumItems(elements[0], field_name)
-        for idx, item in enumerate(items):
-            if item == value:
-                return idx
-        return print("Value not found in items")
+        field = elements[0].SelectField(field_name)
+        if not str(field.FieldType).endswith("Enum"):
+            return print("Given field is not an Enum")
+        if not hasattr(self, "_enum_index"):
+            self._enum_index = EnumIndex()
+        idx = self._enum_index.value(field, value)
+        if idx is None:
+            return print("Value not found in items")
+        return idx
         
     def _clear_block_and_set(self, parent, block_name):
         block = parent.SelectField(block_name)
@@ -329,13 +350,26 @@ class Tag():
         block.RemoveAllElements()
     
     def _Element_from_field_value(self, block, field_name, value):
-        elements = block.Elements
-        if not elements.Count:
-            return #print(f"{block} has no elements")
-        for e in elements:
-            field_value = self._Element_get_field_value(e, field_name)
-            if field_value == value:
-                return e
+        return self._block_index(block, field_name).find(block, value)
+    
+    def _block_index(self, block, field_name) -> BlockIndex:
+        """Returns the index of the given block by the given field, creating it if needed"""
+        if not hasattr(self, "_block_indexes"):
+            self._block_indexes = {}
+        key = block.FieldPath, field_name
+        index = self._block_indexes.get(key)
+        if index is None:
+            index = self._block_indexes[key] = BlockIndex(field_name, self._Element_get_field_value)
+        return index
+    
+    def _update_block_indexes(self, element, field_name, value):
+        """Adds the new value of a field to any block index built from that field, so the index can still be trusted when a value is not found"""
+        block_indexes = getattr(self, "_block_indexes", None)
+        if not block_indexes:
+            return
+        for (_, indexed_field_name), index in block_indexes.items():
+            if indexed_field_name == field_name:
+                index.changed(element.ElementIndex, value)
             
     def _GameColor_from_RGB(self, r, g, b):
         return Halo.Game.GameColor.FromRgb(linear_to_srgb(r), linear_to_srgb(g), linear_to_srgb(b))
@@ -5,11 +5,13 @@ from math import radians
 from pathlib import Path
 import bpy
 from mathutils import Euler, Matrix, Quaternion, Vector
+import numpy as np
 
 from .Tags import TagFieldBlock, TagFieldElement
 
 from ..managed_blam.render_model import RenderModelTag
 from ..managed_blam import Tag
+from .animation_curves import PoseChannelKeys, write_fcurves
 from .. import utils
 
 tolerance = 1e-6
@@ -318,6 +320,7 @@ class AnimationTag(Tag):
                 bone_base_matrices[bone] = bone.parent.matrix.inverted() @ bone.matrix
             else:
                 bone_base_matrices[bone] = bone.matrix
+        bone_base_transforms = {bone: (matrix, *matrix.decompose()) for bone, matrix in bone_base_matrices.items()}
         if self.block_animations.Elements.Count < 1: 
             return print("No animations found in graph")
         
@@ -388,10 +391,18 @@ class AnimationTag(Tag):
                 track.action = action
                 # for node in animation_nodes:
                 #     print(node.Name)
+                node_bones = None
                 for frame in range(frame_count):
                     # result = exporter.GetRenderModelBasePose(animation_nodes, nodes_count)
                     result = exporter.GetAnimationFrame(index, frame, animation_nodes, nodes_count)
-                    self._apply_frames(animation_nodes, armature, frame + 1, action, overlay, bone_base_matrices)
+                    if node_bones is None:
+                        node_bones = self._node_bones(animation_nodes, armature)
+                        pose_indices = [armature.pose.bones.find(bone.name) for bone, _ in node_bones]
+                        keys = PoseChannelKeys([bone.name for bone, _ in node_bones], frame_count)
+                    self._apply_frame(node_bones, pose_indices, armature, frame, overlay, bone_base_transforms, keys)
+                
+                if node_bones is not None:
+                    write_fcurves(action, keys)
                 
                 actions.append(action)
                 
@@ -400,33 +411,27 @@ class AnimationTag(Tag):
         
         return actions
 
-    def _apply_frames(self, animation_nodes, armature, frame, action: bpy.types.Action, overlay: bool, bone_base_matrices: dict):
-        # for node in animation_nodes:
-        #     bone = armature.pose.bones.get(node.Name)
-        #     if bone is None:
-        #         continue
-        #     base_translation, base_rotation, base_scale = base_matrix.decompose()
-        #     if node.Translation.X == base_translation.x and node.Translation.Y == base_translation.y and node.Translation.Z == base_translation.z:
-        #         nodes_bones[bone] = node
-        nodes_bones = {bone: node for bone in armature.pose.bones for node in animation_nodes if bone.name == node.Name}
-        bone_matrices = {}
-        # print()
-        # print(action.name.upper())
-        for idx, (bone, node) in enumerate(nodes_bones.items()):
-            # default_rotation = utils.ijkw_to_wxyz(self.block_additional_node_dat.Elements[idx].SelectField("default rotation").Data)
-            # default_translation = Vector([n for n in self.block_additional_node_dat.Elements[idx].SelectField("default translation").Data])
-            # default_scale = self.block_additional_node_dat.Elements[idx].SelectField("default scale").Data
-            # print("TRANSLATION", node.Name, node.Translation.X, node.Translation.Y, node.Translation.Z)
-            # print("ROTATION", node.Rotation)
+    def _node_bones(self, animation_nodes, armature) -> list[tuple[bpy.types.PoseBone, object]]:
+        '''Pairs pose bones with the animation nodes of the same name, ordered so that parents come before their children'''
+        nodes_by_name = {node.Name: node for node in animation_nodes}
+        nodes_bones = {bone: nodes_by_name[bone.name] for bone in armature.pose.bones if bone.name in nodes_by_name}
+        bone_dict = {}
+        for bone in nodes_bones:
+            if bone.parent:
+                bone_dict[bone] = bone_dict[bone.parent] + 1
+            else:
+                bone_dict[bone] = 0
+                
+        return sorted(nodes_bones.items(), key=lambda item: bone_dict[item[0]])
+
+    def _apply_frame(self, node_bones: list, pose_indices: list[int], armature, frame: int, overlay: bool, bone_base_transforms: dict, keys: PoseChannelKeys):
+        '''Poses the armature from the current animation node transforms and stores the resulting bone channels for this frame'''
+        for bone, node in node_bones:
             translation = Vector((node.Translation.X, node.Translation.Y, node.Translation.Z)) * 100
             rotation = Quaternion((node.Rotation.W, node.Rotation.V.X, node.Rotation.V.Y, node.Rotation.V.Z))
             scale = node.Scale
-            # print(node.Name, bone.name, armature.animation_data.action.name, frame, translation, rotation)
-            # default_matrix = Matrix.LocRotScale(default_translation, default_rotation, Vector.Fill(3, default_scale))
-            base_matrix = bone_base_matrices[bone]
-            base_matrix: Matrix
+            base_matrix, base_translation, base_rotation, base_scale = bone_base_transforms[bone]
             overlay_keyed = False
-            base_translation, base_rotation, base_scale = base_matrix.decompose()
             if translation.magnitude < tolerance:
                 translation = base_translation
             else:
@@ -435,40 +440,29 @@ class AnimationTag(Tag):
                 rotation = base_rotation
             else:
                 overlay_keyed = True
-            bone: bpy.types.PoseBone
-           # print(node.Name, bone.name, armature.animation_data.action.name, frame, translation, rotation)
             if overlay:
                 if overlay_keyed:
-                    matrix = Matrix.LocRotScale(translation + base_translation, base_rotation.rotate(rotation), Vector.Fill(3, scale))
-                    # print(bone.name, node.Name, matrix.to_translation(), matrix.to_euler())
+                    matrix = Matrix.LocRotScale(translation + base_translation, base_rotation.copy().rotate(rotation), Vector.Fill(3, scale))
                 else:
                     matrix = base_matrix
             else:
                 matrix = Matrix.LocRotScale(translation, rotation, Vector.Fill(3, scale))
-            bone_matrices[bone] = matrix
-            
-        bone_dict = {}
-        list_node_bones = list(nodes_bones.keys())
-        for bone in list_node_bones:
-            if bone.parent:
-                bone_dict[bone] = bone_dict[bone.parent] + 1
-            else:
-                bone_dict[bone] = 0
                 
-        list_node_bones.sort(key=lambda x: bone_dict[x])
-            
-        for bone in list_node_bones:
-            matrix = bone_matrices[bone]
             if bone.parent:
                 bone.matrix = bone.parent.matrix @ matrix
             else:
                 bone.matrix = matrix
 
-        for bone in list_node_bones:
-            bone.keyframe_insert(data_path='location', frame=frame)
-            bone.keyframe_insert(data_path='rotation_quaternion', frame=frame)
-            bone.keyframe_insert(data_path='scale', frame=frame)
-            
+        pose_bones = armature.pose.bones
+        num_pose_bones = len(pose_bones)
+        locations = np.empty((num_pose_bones, 3), dtype=np.single)
+        rotations = np.empty((num_pose_bones, 4), dtype=np.single)
+        scales = np.empty((num_pose_bones, 3), dtype=np.single)
+        pose_bones.foreach_get("location", locations.ravel())
+        pose_bones.foreach_get("rotation_quaternion", rotations.ravel())
+        pose_bones.foreach_get("scale", scales.ravel())
+        keys.set_frame(frame, locations[pose_indices], rotations[pose_indices], scales[pose_indices])
+        
     def get_play_text(self, animation, loop: bool, game_object: str = "(player_get 0)") -> str:
         hs_func = "custom_animation_loop" if loop else "custom_animation"
         return f"{hs_func} {game_object} {self.tag_path.RelativePath} {animation.name.replace(' ', ':')} FALSE"
@@ -0,0 +1,43 @@
+"""Accumulates sampled pose bone channels and lays them out as fcurve keyframes"""
+
+import numpy as np
+
+POSE_CHANNELS = (("location", 3), ("rotation_quaternion", 4), ("scale", 3))
+POSE_CHANNEL_WIDTH = sum(size for _, size in POSE_CHANNELS)
+
+def pose_bone_data_path(bone_name: str, channel: str) -> str:
+    escaped_name = bone_name.replace("\\", "\\\\").replace('"', '\\"')
+    return f'pose.bones["{escaped_name}"].{channel}'
+
+class PoseChannelKeys:
+    '''Location, rotation and scale values of a set of pose bones for every frame of an animation'''
+    def __init__(self, bone_names: list[str], frame_count: int, first_frame: int = 1):
+        self.bone_names = bone_names
+        self.first_frame = first_frame
+        self.values = np.zeros((frame_count, len(bone_names), POSE_CHANNEL_WIDTH), dtype=np.single)
+
+    def set_frame(self, frame_index: int, locations: np.ndarray, rotations: np.ndarray, scales: np.ndarray):
+        '''Stores the channels of every bone for a frame. Takes (bones, 3), (bones, 4) and (bones, 3) arrays'''
+        frame_values = self.values[frame_index]
+        frame_values[:, 0:3] = locations
+        frame_values[:, 3:7] = rotations
+        frame_values[:, 7:10] = scales
+
+    def curves(self):
+        '''Yields (bone name, data path, array index, keyframe coordinates) for every fcurve. Keyframe coordinates are a flat array of (frame, value) pairs'''
+        frames = np.arange(self.first_frame, self.first_frame + len(self.values), dtype=np.single)
+        for bone_index, bone_name in enumerate(self.bone_names):
+            column = 0
+            for channel, size in POSE_CHANNELS:
+                data_path = pose_bone_data_path(bone_name, channel)
+                for array_index in range(size):
+                    yield bone_name, data_path, array_index, np.column_stack((frames, self.values[:, bone_index, column])).ravel()
+                    column += 1
+
+def write_fcurves(action, keys: PoseChannelKeys):
+    '''Creates an fcurve in action for every pose channel in keys and fills its keyframes in one call'''
+    for bone_name, data_path, array_index, co in keys.curves():
+        fcurve = action.fcurves.new(data_path=data_path, index=array_index, action_group=bone_name)
+        fcurve.keyframe_points.add(len(co) // 2)
+        fcurve.keyframe_points.foreach_set("co", co)
+        fcurve.update()
@@ -1,22 +1,19 @@
 
 
-from ctypes import c_void_p
-from math import sqrt
-import math
+from ctypes import c_ubyte, c_void_p
 import os
 import clr
 from pathlib import Path
 
-from mathutils import Vector
+import numpy as np
 
 from ..constants import NormalType
 from ..managed_blam import Tag
 from ..utils import print_warning
 from .. import utils
+from .bitmap_pixels import bgra_to_rgba, bgra_to_rgba_with_calculated_blue, cubemap_to_equirectangular, fix_blue_channel
 
 clr.AddReference('System.Drawing')
-from System import Array, Byte # type: ignore
-from System.Runtime.InteropServices import Marshal # type: ignore
 from System.Drawing import Rectangle, Bitmap # type: ignore
 from System.Drawing.Imaging import ImageLockMode, ImageFormat, PixelFormat # type: ignore
 
@@ -114,12 +111,6 @@ class BitmapTag(Tag):
         self.tag_has_changes = True
         
     def get_granny_data(self, fill_alpha: bool, calc_blue_channel: bool) -> object | None:
-        clr.AddReference('System.Drawing')
-        from System import Array, Byte # type: ignore
-        from System.Runtime.InteropServices import Marshal # type: ignore
-        from System.Drawing import Rectangle # type: ignore
-        from System.Drawing.Imaging import ImageLockMode, PixelFormat # type: ignore
-        from System.Runtime.InteropServices import GCHandle, GCHandleType # type: ignore
         game_bitmap = self._GameBitmap()
         bitmap = game_bitmap.GetBitmap()
         game_bitmap.Dispose()
@@ -132,146 +123,28 @@ class BitmapTag(Tag):
         width = bitmap.Width
         height = bitmap.Height
 
-        bitmap_data = bitmap.LockBits(Rectangle(0, 0, width, height), ImageLockMode.ReadWrite, bitmap.PixelFormat)
+        bitmap_data = bitmap.LockBits(Rectangle(0, 0, width, height), ImageLockMode.ReadOnly, bitmap.PixelFormat)
         stride = bitmap_data.Stride
-        total_bytes = abs(stride) * height
-        bgra_array = Array.CreateInstance(Byte, total_bytes)
-        Marshal.Copy(bitmap_data.Scan0, bgra_array, 0, total_bytes)
+        # Copy the pixels once so the array outlives the bitmap
+        pixels = locked_pixels(bitmap_data, padded=True).copy()
         bitmap.UnlockBits(bitmap_data)
+        bitmap.Dispose()
         
         if calc_blue_channel:
-            rgba_array = self.bgra_to_rgba_with_calculated_blue(total_bytes, bgra_array, gamma)
-        elif fill_alpha:
-            rgba_array = self.bgra_to_rgba_solid_alpha(total_bytes, bgra_array, gamma)
+            bgra_to_rgba_with_calculated_blue(pixels, GAMMA_FUNCTIONS.get(gamma))
         else:
-            rgba_array = self.bgra_to_rgba(total_bytes, bgra_array, gamma)
-        
-        handle = GCHandle.Alloc(rgba_array, GCHandleType.Pinned)
-        rgba_ptr = None
-        try:
-            rgba_ptr = c_void_p(handle.AddrOfPinnedObject().ToInt64())
-        finally:
-            if handle.IsAllocated:
-                handle.Free()
-        
-        bitmap.Dispose()
-        
-        if rgba_ptr is None:
-            return None
+            bgra_to_rgba(pixels, fill_alpha)
         
+        # The pointer keeps a reference to the array
+        rgba_ptr = pixels.ctypes.data_as(c_void_p)
         return width, height, stride, rgba_ptr
     
-    @staticmethod
-    def bgra_to_rgba_solid_alpha(total_bytes, bgra_array, gamma):
-        for i in range(0, total_bytes, 4):
-            bgra_array[i + 3] = 255
-            red = bgra_array[i + 2] / 255.0
-            green = bgra_array[i + 1] / 255.0
-            blue = bgra_array[i] / 255.0
-            # match gamma:
-            #     case 'linear':
-            #         red = red ** 2.0
-            #         green = green ** 2.0
-            #         blue = blue ** 2.0
-            #     case 'srgb':
-            #         red = utils.linear_to_srgb(red ** 2.0)
-            #         green = utils.linear_to_srgb(green ** 2.0)
-            #         blue = utils.linear_to_srgb(blue ** 2.0)
-                    
-            bgra_array[i] = int(red * 255)
-            bgra_array[i + 1] = int(green * 255)
-            bgra_array[i + 2] = int(blue * 255)
-            
-        return bgra_array
-    
-    @staticmethod
-    def bgra_to_rgba(total_bytes, bgra_array, gamma):
-        for i in range(0, total_bytes, 4):
-            red = bgra_array[i + 2] / 255.0
-            green = bgra_array[i + 1] / 255.0
-            blue = bgra_array[i] / 255.0
-            # match gamma:
-            #     case 'linear':
-            #         red = red ** 2.0
-            #         green = green ** 2.0
-            #         blue = blue ** 2.0
-            #     case 'srgb':
-            #         red = utils.linear_to_srgb(red ** 2.0)
-            #         green = utils.linear_to_srgb(green ** 2.0)
-            #         blue = utils.linear_to_srgb(blue ** 2.0)
-                    
-            bgra_array[i] = int(red * 255)
-            bgra_array[i + 1] = int(green * 255)
-            bgra_array[i + 2] = int(blue * 255)
-            
-        return bgra_array
-    
-    @staticmethod
-    def bgra_to_rgba_with_calculated_blue(total_bytes, bgra_array, gamma):
-        for i in range(0, total_bytes, 4):
-            red = bgra_array[i + 2] / 255.0
-            green = bgra_array[i + 1] / 255.0
-            blue = calculate_z_vector(red, green)
-            match gamma:
-                case 'linear':
-                    red = red ** 2.0
-                    green = green ** 2.0
-                    blue = blue ** 2.0
-                case 'srgb':
-                    red = utils.linear_to_srgb(red ** 2.0)
-                    green = utils.linear_to_srgb(green ** 2.0)
-                    blue = utils.linear_to_srgb(blue ** 2.0)
-                    
-            bgra_array[i] = int(red * 255)
-            bgra_array[i + 1] = int(green * 255)
-            bgra_array[i + 2] = int(blue * 255)
-            
-        return bgra_array
-    
     def _convert_cubemap(self, bitmap, suffix):
-        height = bitmap.Height
-        width = bitmap.Width
-        face_size = width // 4  # Each face is 1/4 of the total width
-        faces = {
-            "right": bitmap.Clone(Rectangle(2 * face_size, face_size, face_size, face_size), bitmap.PixelFormat),  # +X
-            "left": bitmap.Clone(Rectangle(0 * face_size, face_size, face_size, face_size), bitmap.PixelFormat),  # -X
-            "top": bitmap.Clone(Rectangle(face_size, 0, face_size, face_size), bitmap.PixelFormat),  # +Y
-            "bottom": bitmap.Clone(Rectangle(face_size, 2 * face_size, face_size, face_size), bitmap.PixelFormat),  # -Y
-            "front": bitmap.Clone(Rectangle(face_size, face_size, face_size, face_size), bitmap.PixelFormat),  # +Z
-            "back": bitmap.Clone(Rectangle(3 * face_size, face_size, face_size, face_size), bitmap.PixelFormat)  # -Z
-        }
-
-        def cubemap_to_equirectangular(x, y):
-            u = (x / float(width)) * 2 - 1
-            v = (y / float(height)) * 2 - 1
-
-            lon = u * math.pi
-            lat = v * (math.pi / 2)
-
-            X = math.cos(lat) * math.cos(lon)
-            Y = math.sin(lat)
-            Z = math.cos(lat) * math.sin(lon)
-
-            absX, absY, absZ = abs(X), abs(Y), abs(Z)
-
-            if absX >= absY and absX >= absZ:
-                face = "right" if X > 0 else "left"
-                u, v = (Z / absX + 1) / 2, (Y / absX + 1) / 2
-            elif absY >= absX and absY >= absZ:
-                face = "top" if Y > 0 else "bottom"
-                u, v = (X / absY + 1) / 2, (Z / absY + 1) / 2
-            else:
-                face = "front" if Z > 0 else "back"
-                u, v = (X / absZ + 1) / 2, (Y / absZ + 1) / 2
-
-            return face, u, v
-        
-        for y in range(height):
-            for x in range(width):
-                face, u, v = cubemap_to_equirectangular(x, y)
-                pixel_x = int(u * (faces[face].Width - 1))
-                pixel_y = int(v * (faces[face].Height - 1))
-                bitmap.SetPixel(x, y, faces[face].GetPixel(pixel_x, pixel_y))
+        bitmap_data = bitmap.LockBits(Rectangle(0, 0, bitmap.Width, bitmap.Height), ImageLockMode.ReadWrite, PixelFormat.Format32bppArgb)
+        pixels = locked_pixels(bitmap_data)
+        pixels[:] = cubemap_to_equirectangular(pixels)
+        del pixels
+        bitmap.UnlockBits(bitmap_data)
                 
         return str(Path(self.data_dir, f"{self.tag_path.RelativePath}{suffix}_equirectangular").with_suffix('.tiff'))
     
@@ -282,22 +155,7 @@ class BitmapTag(Tag):
         
         if bitmap.PixelFormat == PixelFormat.Format32bppArgb and blue_channel_fix:
             bitmap_data = bitmap.LockBits(Rectangle(0, 0, bitmap.Width, bitmap.Height), ImageLockMode.ReadWrite, bitmap.PixelFormat)
-            total_bytes = abs(bitmap_data.Stride) * bitmap_data.Height
-            rgbValues = Array.CreateInstance(Byte, total_bytes)
-            Marshal.Copy(bitmap_data.Scan0, rgbValues, 0, total_bytes)
-
-            for i in range(0, total_bytes, 4):
-                red = rgbValues[i + 2] / 255.0
-                green = rgbValues[i + 1] / 255.0
-                blue = rgbValues[i] / 255.0
-                red = red ** 2.2
-                green = green ** 2.2
-                blue = calculate_z_vector(red, green)
-                rgbValues[i + 2] = int(red * 255)
-                rgbValues[i + 1] = int(green * 255)
-                rgbValues[i] = int(blue * 255)
-
-            Marshal.Copy(rgbValues, 0, bitmap_data.Scan0, total_bytes)
+            fix_blue_channel(locked_pixels(bitmap_data), blue_fix_gamma)
             bitmap.UnlockBits(bitmap_data)
         
         tiff_path = str(Path(self.data_dir, self.tag_path.RelativePath).with_suffix('.tiff'))
@@ -409,12 +267,20 @@ class BitmapTag(Tag):
             case 'Non-Color':
                 return 1.0
             
-def lerp(p1: float, p2: float, fraction: float) -> float:
-    return (p1 * (1 - fraction)) + (p2 * fraction)
+def linear_gamma(v):
+    return v ** 2.0
+
+def srgb_gamma(v):
+    return utils.linear_to_srgb(v ** 2.0)
+
+def blue_fix_gamma(v):
+    return v ** 2.2
 
-def calculate_z_vector(r: float, g: float) -> float:
-    x = lerp(-1.0, 1.0, r)
-    y = lerp(-1.0, 1.0, g)
-    z = sqrt(max(0, 1 - x * x - y * y))
+GAMMA_FUNCTIONS = {'linear': linear_gamma, 'srgb': srgb_gamma}
 
-    return (z + 1) / 2
\ No newline at end of file
+def locked_pixels(bitmap_data, padded=False) -> np.ndarray:
+    '''Returns a (height, width, 4) numpy view of the pixels of a bitmap locked as 32 bits per pixel. If padded, each row includes any padding up to the stride'''
+    stride = abs(bitmap_data.Stride)
+    buffer = (c_ubyte * (stride * bitmap_data.Height)).from_address(bitmap_data.Scan0.ToInt64())
+    pixels = np.frombuffer(buffer, dtype=np.uint8).reshape(bitmap_data.Height, stride // 4, 4)
+    return pixels if padded else pixels[:, :bitmap_data.Width]
@@ -0,0 +1,99 @@
+"""Pixel conversions for 32 bit BGRA bitmap data, done on numpy arrays of shape (height, width, 4)"""
+
+from functools import lru_cache
+from math import sqrt
+from typing import Callable
+
+import numpy as np
+
+BLUE, GREEN, RED, ALPHA = 0, 1, 2, 3
+
+def lerp(p1: float, p2: float, fraction: float) -> float:
+    return (p1 * (1 - fraction)) + (p2 * fraction)
+
+def calculate_z_vector(r: float, g: float) -> float:
+    x = lerp(-1.0, 1.0, r)
+    y = lerp(-1.0, 1.0, g)
+    z = sqrt(max(0, 1 - x * x - y * y))
+
+    return (z + 1) / 2
+
+def calculate_z_vectors(r: np.ndarray, g: np.ndarray) -> np.ndarray:
+    '''Array version of calculate_z_vector'''
+    x = lerp(-1.0, 1.0, r)
+    y = lerp(-1.0, 1.0, g)
+    z = np.sqrt(np.maximum(0, 1 - x * x - y * y))
+
+    return (z + 1) / 2
+
+_byte_values = np.arange(256) / 255.0
+
+def _to_bytes(values: np.ndarray) -> np.ndarray:
+    return (values * 255).astype(np.uint8)
+
+@lru_cache
+def channel_table(gamma: Callable | None = None) -> np.ndarray:
+    '''Lookup table taking each byte value through the given gamma function'''
+    return _to_bytes(gamma(_byte_values) if gamma else _byte_values)
+
+@lru_cache
+def blue_table(gamma: Callable | None = None, red_green_gamma: Callable | None = None) -> np.ndarray:
+    '''(256, 256) lookup table of the normal map blue channel reconstructed from each red and green byte pair'''
+    red = _byte_values[:, np.newaxis]
+    green = _byte_values[np.newaxis, :]
+    if red_green_gamma:
+        red, green = red_green_gamma(red), red_green_gamma(green)
+    blue = calculate_z_vectors(red, green)
+    return _to_bytes(gamma(blue) if gamma else blue)
+
+def bgra_to_rgba(pixels: np.ndarray, solid_alpha=False):
+    '''Swaps the red and blue channels in place, optionally making every pixel opaque'''
+    pixels[..., [BLUE, RED]] = pixels[..., [RED, BLUE]]
+    if solid_alpha:
+        pixels[..., ALPHA] = 255
+
+def bgra_to_rgba_with_calculated_blue(pixels: np.ndarray, gamma: Callable | None = None):
+    '''Swaps the red and blue channels in place, replacing blue with the z vector calculated from red and green. Gamma is applied to all three channels'''
+    red, green = pixels[..., RED], pixels[..., GREEN]
+    blue = blue_table(gamma)[red, green]
+    table = channel_table(gamma)
+    pixels[..., BLUE] = table[red]
+    pixels[..., GREEN] = table[green]
+    pixels[..., RED] = blue
+
+def fix_blue_channel(pixels: np.ndarray, gamma: Callable):
+    '''Applies gamma to the red and green channels in place, and replaces blue with the z vector calculated from the result'''
+    red, green = pixels[..., RED].copy(), pixels[..., GREEN].copy()
+    pixels[..., BLUE] = blue_table(None, gamma)[red, green]
+    table = channel_table(gamma)
+    pixels[..., RED] = table[red]
+    pixels[..., GREEN] = table[green]
+
+def cubemap_to_equirectangular(pixels: np.ndarray) -> np.ndarray:
+    '''Remaps a horizontal cross cubemap to an equirectangular image of the same size'''
+    height, width = pixels.shape[:2]
+    face_size = width // 4
+    y, x = np.mgrid[0:height, 0:width]
+    lon = ((x / float(width)) * 2 - 1) * np.pi
+    lat = ((y / float(height)) * 2 - 1) * (np.pi / 2)
+
+    X = np.cos(lat) * np.cos(lon)
+    Y = np.sin(lat)
+    Z = np.cos(lat) * np.sin(lon)
+    absX, absY, absZ = np.abs(X), np.abs(Y), np.abs(Z)
+
+    x_major = (absX >= absY) & (absX >= absZ)
+    y_major = ~x_major & (absY >= absX) & (absY >= absZ)
+    z_major = ~(x_major | y_major)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.select([x_major, y_major], [(Z / absX + 1) / 2, (X / absY + 1) / 2], (X / absZ + 1) / 2)
+        v = np.select([x_major, y_major], [(Y / absX + 1) / 2, (Z / absY + 1) / 2], (Y / absZ + 1) / 2)
+
+    # Top left corner of each face in the cross
+    face_x = np.select([x_major & (X > 0), x_major, y_major, z_major & (Z > 0)], [2, 0, 1, 1], 3) * face_size
+    face_y = np.select([x_major, y_major & (Y > 0), y_major], [1, 0, 2], 1) * face_size
+
+    source_x = face_x + (u * (face_size - 1)).astype(np.int64)
+    source_y = face_y + (v * (face_size - 1)).astype(np.int64)
+    return pixels[source_y, source_x]
@@ -0,0 +1,98 @@
+"""Dictionary lookups of tag block elements by field value, so that resolving many elements by name does not rescan the block each time"""
+
+from typing import Callable
+
+class BlockIndex:
+    '''Maps the value of one field to the index of the first element in a block holding that value. Built with a single scan of the block, and rebuilt whenever
+    the block's element count differs from when it was built. Hits are checked against the element before they are returned, and misses are confirmed with a scan
+    of the block, so elements added, removed or renamed without the Tag helpers are still found. The index is rebuilt whenever either check finds it out of date'''
+    def __init__(self, field_name: str, get_value: Callable):
+        self.field_name = field_name
+        self.get_value = get_value
+        self.count = -1
+        self.lookup = {}
+
+    def _build(self, elements, count: int):
+        self.lookup = {}
+        for index in range(count):
+            try:
+                self.lookup.setdefault(self.get_value(elements[index], self.field_name), index)
+            except TypeError: # unhashable field value, leave it to the scan
+                pass
+        self.count = count
+
+    def _scan(self, elements, count: int, value):
+        for index in range(count):
+            element = elements[index]
+            if self.get_value(element, self.field_name) == value:
+                return element
+
+    def find(self, block, value):
+        '''Returns the first element whose field equals value, or None'''
+        elements = block.Elements
+        count = elements.Count
+        if not count:
+            return
+        try:
+            hash(value)
+        except TypeError:
+            return self._scan(elements, count, value)
+
+        if count != self.count:
+            self._build(elements, count)
+        index = self.lookup.get(value)
+        if index is not None:
+            element = elements[index]
+            if self.get_value(element, self.field_name) == value:
+                return element
+            # The block was changed without going through the helpers
+            self._build(elements, count)
+            index = self.lookup.get(value)
+            return None if index is None else elements[index]
+
+        # Values written in place without the helpers leave the element count unchanged, and blocks are keyed by field path,
+        # which can point at a different element's block once elements above it are removed. So a miss is only trusted once the block is scanned
+        element = self._scan(elements, count, value)
+        if element is not None:
+            self._build(elements, count)
+        return element
+
+    def added(self, element, value):
+        '''Records an element appended through the helpers which is about to have its field set to value'''
+        if self.count < 0:
+            return
+        self.count += 1
+        try:
+            self.lookup.setdefault(value, element.ElementIndex)
+        except TypeError:
+            pass
+
+    def changed(self, element_index: int, value):
+        '''Records a new value set on an element through the helpers. Elements from other blocks with the same field are caught when the hit is checked'''
+        if self.count < 0 or element_index >= self.count:
+            return
+        try:
+            if self.lookup.get(value, self.count) > element_index:
+                self.lookup[value] = element_index
+        except TypeError:
+            pass
+
+    def invalidate(self):
+        self.count = -1
+        self.lookup = {}
+
+class EnumIndex:
+    '''Caches the name to index mapping of enum fields. Fields are keyed by their path without element indices, as every element of a block shares the same enum definition'''
+    def __init__(self):
+        self.enums: dict[str, dict[str, int]] = {}
+
+    def value(self, field, name: str):
+        '''Returns the index of the named enum item, or None if the enum has no such item'''
+        key = field.FieldPathWithoutindices
+        items = self.enums.get(key)
+        if items is None:
+            items = {}
+            for idx, item in enumerate(field.Items):
+                items.setdefault(item.EnumName, idx)
+            self.enums[key] = items
+        return items.get(name)
@@ -0,0 +1,272 @@
+'''Tag backends and readers for bulk tag reports. This module is also loaded by tag scanner worker processes running outside of Blender, so it must only import the standard library'''
+
+from contextlib import contextmanager
+import json
+import os
+
+# BACKENDS
+#######################
+
+class ManagedBlamElement:
+    '''Read only view of a ManagedBlam tag element. Fields can be given by name or by index'''
+    def __init__(self, element):
+        self.element = element
+
+    def _field(self, field):
+        return self.element.Fields[field] if isinstance(field, int) else self.element.SelectField(field)
+
+    def index(self) -> int:
+        return self.element.ElementIndex
+
+    def string(self, field) -> str:
+        return self._field(field).GetStringData()
+
+    def value(self, field):
+        return self._field(field).Value
+
+    def enum(self, field) -> str:
+        field = self._field(field)
+        return field.Items[field.Value].EnumName
+
+    def flag(self, field, bit: str) -> bool:
+        return self._field(field).TestBit(bit)
+
+class ManagedBlamTag:
+    def __init__(self, tag, relative_path: str):
+        self.tag = tag
+        self.relative_path = relative_path
+
+    def elements(self, block_path: str) -> list[ManagedBlamElement]:
+        return [ManagedBlamElement(element) for element in self.tag.SelectField(block_path).Elements]
+
+class ManagedBlamBackend:
+    '''Opens tags with ManagedBlam. Pass start=False if ManagedBlam has already been started in this process'''
+    def __init__(self, project_path: str, corinth: bool, start=True):
+        import clr # type: ignore
+        clr.AddReference(os.path.join(project_path, "bin", "managedblam"))
+        if corinth:
+            import Corinth as Halo # type: ignore
+        else:
+            import Bungie as Halo # type: ignore
+        if start:
+            callback = Halo.ManagedBlamCrashCallback(lambda info: None)
+            startup_parameters = Halo.ManagedBlamStartupParameters()
+            startup_parameters.InitializationLevel = Halo.InitializationType.TagsOnly
+            Halo.ManagedBlamSystem().Start(project_path, callback, startup_parameters)
+        self.Tags = Halo.Tags
+        self.tags_dir = os.path.join(project_path, "tags")
+
+    @contextmanager
+    def open(self, path: str):
+        relative_path = os.path.relpath(path, self.tags_dir)
+        tag_path = self.Tags.TagPath.FromPathAndExtension(relative_path.rpartition(".")[0], relative_path.rpartition(".")[2])
+        tag = self.Tags.TagFile()
+        tag.Load(tag_path)
+        try:
+            yield ManagedBlamTag(tag, relative_path.rpartition(".")[0])
+        finally:
+            tag.Dispose()
+
+class SyntheticElement:
+    '''Element of a synthetic tag. Fields are stored as a dict of field name to value, with a list under "fields" for access by index.
+    Enums are stored as their item name and flags as a list of the bits which are set'''
+    def __init__(self, data: dict, index: int):
+        self.data = data
+        self.element_index = index
+
+    def _field(self, field):
+        return self.data["fields"][field] if isinstance(field, int) else self.data[field]
+
+    def index(self) -> int:
+        return self.element_index
+
+    def string(self, field) -> str:
+        return str(self._field(field))
+
+    def value(self, field):
+        return self._field(field)
+
+    def enum(self, field) -> str:
+        return self._field(field)
+
+    def flag(self, field, bit: str) -> bool:
+        return bit in self._field(field)
+
+class SyntheticTag:
+    def __init__(self, data: dict, relative_path: str):
+        self.data = data
+        self.relative_path = relative_path
+
+    def elements(self, block_path: str) -> list[SyntheticElement]:
+        return [SyntheticElement(element, idx) for idx, element in enumerate(self.data.get(block_path, []))]
+
+class SyntheticBackend:
+    '''Reads synthetic tag files: JSON documents mapping block paths to lists of elements. Used to run and benchmark readers without ManagedBlam'''
+    def __init__(self, tags_dir: str):
+        self.tags_dir = tags_dir
+
+    @contextmanager
+    def open(self, path: str):
+        with open(path, "r") as file:
+            data = json.load(file)
+        yield SyntheticTag(data, os.path.splitext(os.path.relpath(path, self.tags_dir))[0])
+
+BACKENDS = {
+    "managedblam": ManagedBlamBackend,
+    "synthetic": SyntheticBackend,
+}
+
+# READERS
+#######################
+
+class TagReader:
+    '''Reads one tag into a partial result which can be sent between processes as JSON, and merges partial results into a report.
+    read runs in the worker processes, while new_report, merge and finish run in Blender'''
+    extensions: tuple[str] = ()
+    folder = ""
+
+    def read(self, tag) -> dict:
+        raise NotImplementedError
+
+    def new_report(self) -> dict:
+        return {}
+
+    def merge(self, report: dict, partial: dict):
+        pass
+
+    def finish(self, report: dict, tag_count: int):
+        pass
+
+def _print_unique(title: str, names):
+    ordered = sorted(names)
+    print(f'Found {len(ordered)} unique {title}:')
+    for name in ordered:
+        print(f'--- {name}')
+    return ordered
+
+class StateNamesReader(TagReader):
+    '''Animation graph state names (objects folder only)'''
+    extensions = ('.model_animation_graph',)
+    folder = "objects"
+
+    def read(self, tag):
+        return {"lines": [tag.relative_path, '-'*50], "names": [element.string('label') for element in tag.elements("Struct:content[0]/Block:modes")]}
+
+    def new_report(self):
+        return {"names": set()}
+
+    def merge(self, report, partial):
+        report["names"].update(partial["names"])
+
+    def finish(self, report, tag_count):
+        print(f'Found {tag_count} animation graphs')
+        return _print_unique("state names", report["names"])
+
+class SeatNamesReader(TagReader):
+    '''Vehicle and biped seat names (objects folder only)'''
+    extensions = ('.vehicle', '.biped')
+    folder = "objects"
+
+    def read(self, tag):
+        return {"lines": [tag.relative_path, '-'*50], "names": [element.string('label') for element in tag.elements('Struct:unit[0]/Block:seats')]}
+
+    def new_report(self):
+        return {"names": set()}
+
+    def merge(self, report, partial):
+        report["names"].update(partial["names"])
+
+    def finish(self, report, tag_count):
+        print(f'Found {tag_count} vehicle/biped tags')
+        return _print_unique("seat names", report["names"])
+
+class BlendScreensReader(TagReader):
+    '''Animation graph blend screen sources and animations (objects folder only)'''
+    extensions = ('.model_animation_graph',)
+    folder = "objects"
+
+    def read(self, tag):
+        lines = [tag.relative_path, '-'*50]
+        partial = {"yaw": [], "pitch": [], "weight": [], "animations": []}
+        functions = tag.elements('Struct:definitions[0]/Block:functions')
+        animations = tag.elements("Struct:definitions[0]/Block:animations")
+        for element in tag.elements('Struct:definitions[0]/Block:NEW blend screens'):
+            lines.append('====' + element.string(0) + '====')
+            lines.append(f"--- active only when weapon down: {element.flag(1, 'active only when weapon down')}")
+            lines.append(f"--- attempt piece-wise blending: {element.flag(1, 'attempt piece-wise blending')}")
+            lines.append(f"--- allow parent adjustment: {element.flag(1, 'allow parent adjustment')}")
+            lines.append(f"--- weight: {element.string(2)}")
+            lines.append(f"--- interpolation rate: {element.string(3)}")
+            for key, source in (("yaw", 'yaw source'), ("pitch", 'pitch source'), ("weight", 'weight source')):
+                source_name = element.enum(source)
+                partial[key].append(source_name)
+                lines.append(f"--- {source}: {source_name}")
+            for source in ('yaw', 'pitch', 'weight'):
+                lines.append(f"--- {source} source object function: {element.string(f'{source} source object function')}")
+            weight_function_index = element.value('weight function')
+            if weight_function_index > -1:
+                lines.append(f"--- weight function: {functions[weight_function_index].string(0)}")
+            animation_index = element.value('Struct:animation[0]/ShortBlockIndex:animation')
+            if animation_index > -1:
+                animation_name = animations[animation_index].string(0)
+                partial["animations"].append(animation_name.rpartition(':')[2] or animation_name)
+                lines.append(f"--- animation: {animation_name}")
+
+        partial["lines"] = lines
+        return partial
+
+    def new_report(self):
+        return {"yaw": set(), "pitch": set(), "weight": set(), "animations": set()}
+
+    def merge(self, report, partial):
+        for key, names in report.items():
+            names.update(partial[key])
+
+    def finish(self, report, tag_count):
+        _print_unique("yaw sources", report["yaw"])
+        print('\n')
+        _print_unique("pitch sources", report["pitch"])
+        print('\n')
+        _print_unique("weight sources", report["weight"])
+        print('\n')
+        _print_unique("animation state names", report["animations"])
+
+class LightmapResReader(TagReader):
+    '''Structure bsp elements with a non default lightmap resolution'''
+    extensions = ('.scenario_structure_bsp',)
+
+    def __init__(self, block_path: str, field_name: str, default: float, ignore_below_zero=False):
+        self.block_path = block_path
+        self.field_name = field_name
+        self.default = default
+        self.ignore_below_zero = ignore_below_zero
+
+    def read(self, tag):
+        overrides = []
+        for element in tag.elements(self.block_path):
+            lm_res = float(element.string(self.field_name))
+            if lm_res != self.default and not (self.ignore_below_zero and lm_res <= 0):
+                overrides.append([tag.relative_path, element.index(), int(lm_res) if self.ignore_below_zero else lm_res])
+        return {"overrides": overrides}
+
+    def new_report(self):
+        return {"overrides": []}
+
+    def merge(self, report, partial):
+        report["overrides"].extend(partial["overrides"])
+
+    def finish(self, report, tag_count):
+        overrides = sorted(report["overrides"])
+        print(f'Found {len(overrides)} set lightmap {"res overrides" if self.ignore_below_zero else "resses"}:')
+        print('\n')
+        for items in overrides:
+            print(items[2], items[1], items[0])
+        return overrides
+
+READERS = {
+    "state_names": lambda: StateNamesReader(),
+    "seat_names": lambda: SeatNamesReader(),
+    "blend_screens": lambda: BlendScreensReader(),
+    "prefab_lightmap_res": lambda: LightmapResReader("Block:external references", "override lightmap resolution scale", 3, True),
+    "instance_lightmap_res": lambda: LightmapResReader("instanced geometry instances", "lightmap resolution scale", 1),
+}
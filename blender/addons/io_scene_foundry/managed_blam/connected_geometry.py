@@ -6,7 +6,6 @@ from math import radians, sqrt
 import math
 from pathlib import Path
 from statistics import mean
-from typing import Iterable
 import bmesh
 import bpy
 from mathutils import Matrix, Quaternion, Vector
@@ -21,6 +20,8 @@ from .shader import ShaderTag
 from ..tools import materials as special_materials
 
 from .. import utils
+from .index_buffer import triangle_list_faces, triangle_strip_faces
+from .vertex_buffers import decompress_texcoords, net_array_to_numpy, normalize_vectors, vertex_group_weights
 from .Tags import TagFieldBlock, TagFieldBlockElement, TagPath
 
 class BSPSeam:
@@ -393,16 +394,6 @@ class EnvironmentObject:
     scale: float
     variant: str
 
-class Face:
-    index: int
-    indices: list[int]
-    subpart: 'MeshPart'
-    
-    def __init__(self,indices: list[int], subpart: 'MeshSubpart', index: int):
-        self.indices = indices
-        self.subpart = subpart
-        self.index = index
-
 class Node:
     index: int
     name: str
@@ -1374,58 +1365,33 @@ class IndexLayoutType(Enum):
     
 class IndexBuffer:
     index_buffer_type: IndexLayoutType
-    indices: list[int]
+    indices: np.ndarray
 
-    def __init__(self, index_buffer_type: int, indices: list[int]):
+    def __init__(self, index_buffer_type: int, indices: np.ndarray):
         self.index_layout = IndexLayoutType(index_buffer_type)
         self.indices = indices
 
-    def get_faces(self, mesh: 'Mesh') -> list[Face]:
-        idx = 0
-        faces = []
+    def get_faces(self, mesh: 'Mesh') -> tuple[np.ndarray, np.ndarray]:
+        '''Returns an (N, 3) array of faces and the index of the subpart each face belongs to (-1 if the mesh has no subparts)'''
         if mesh.subparts:
-            for subpart in mesh.subparts:
-                start = subpart.index_start
-                count = subpart.index_count
-                list_indices = list(self._get_indices(start, count))
-                indices = (list_indices[n:n+3] for n in range(0, len(list_indices), 3))
-                for i in indices:
-                    faces.append(Face(indices=i, subpart=subpart, index=idx))
-                    idx += 1
+            subpart_faces = [self._get_faces(subpart.index_start, subpart.index_count) for subpart in mesh.subparts]
+            faces = np.concatenate(subpart_faces)
+            face_subparts = np.repeat(np.arange(len(subpart_faces)), [len(f) for f in subpart_faces])
         else:
-            start = 0
-            count = len(self.indices)
-            list_indices = list(self._get_indices(start, count))
-            indices = (list_indices[n:n+3] for n in range(0, len(list_indices), 3))
-            for i in indices:
-                faces.append(Face(indices=i, subpart=None, index=idx))
-                idx += 1
+            faces = self._get_faces(0, len(self.indices))
+            face_subparts = np.full(len(faces), -1)
                 
-        return faces
+        return faces, face_subparts
     
-    def _get_indices(self, start: int, count: int):
+    def _get_faces(self, start: int, count: int) -> np.ndarray:
         end = len(self.indices) if count < 0 else start + count
-        subset = (self.indices[i] for i in range(start, end))
+        subset = self.indices[start:end]
         if self.index_layout == IndexLayoutType.TRIANGLE_LIST:
-            return subset
+            return triangle_list_faces(subset)
         elif self.index_layout == IndexLayoutType.TRIANGLE_STRIP:
-            return self._unpack(subset)
+            return triangle_strip_faces(subset)
         else:
-            raise (f"Unsupported Index Layout Type {self.index_layout}")
-
-    def _unpack(self, indices: list[int]) -> list[int]:
-        i0, i1, i2 = 0, 0, 0
-        for pos, idx in enumerate(indices):
-            tri = []
-            i0, i1, i2 = i1, i2, idx
-            if pos < 2 or i0 == i1 or i0 == i2 or i1 == i2: continue
-            yield i0
-            if pos % 2 == 0:
-                yield i1
-                yield i2
-            else:
-                yield i2
-                yield i1
+            raise RuntimeError(f"Unsupported Index Layout Type {self.index_layout}")
                 
 class Tessellation(Enum):
     _connected_geometry_mesh_tessellation_density_none = 0
@@ -1494,7 +1460,8 @@ class MeshSubpart:
         self.part_index = element.SelectField("part index").Value
         self.part = next(p for p in parts if p.index == self.part_index)
         
-    def create(self, ob: bpy.types.Object, tris: Face, face_transparent: bool, face_draw_distance: bool, face_tesselation: bool, face_no_shadow: bool, face_lightmap_only: bool, water_surface_parts: list[MeshPart]):
+    def create(self, ob: bpy.types.Object, indices: np.ndarray, face_transparent: bool, face_draw_distance: bool, face_tesselation: bool, face_no_shadow: bool, face_lightmap_only: bool, water_surface_parts: list[MeshPart]):
+        '''Assigns this subpart's material and face properties to the faces at the given indices'''
         mesh = ob.data
         blend_material = self.part.material.blender_material
 
@@ -1502,10 +1469,10 @@ class MeshSubpart:
             mesh.materials.append(blend_material)
         blend_material_index = ob.material_slots.find(blend_material.name)
 
-        indices = {t.index for t in tris if t.subpart == self}
-
-        for i in indices:
-            mesh.polygons[i].material_index = blend_material_index
+        material_indices = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("material_index", material_indices)
+        material_indices[indices] = blend_material_index
+        mesh.polygons.foreach_set("material_index", material_indices)
 
         if not (face_transparent or face_draw_distance or face_tesselation or face_no_shadow or face_lightmap_only or water_surface_parts):
             return
@@ -1552,7 +1519,7 @@ class MeshSubpart:
                 layer_map["water_surface"] = existing_layer
 
         bm.faces.ensure_lookup_table()
-        for i in indices:
+        for i in indices.tolist():
             for layer in layer_map.values():
                 bm.faces[i][layer] = 1
 
@@ -1570,12 +1537,13 @@ class Mesh:
     index_buffer_type: int
     bounds: CompressionBounds
     ob: bpy.types.Object
-    tris: Iterable[Face]
-    raw_positions: list
-    raw_texcoords : list
-    raw_normals: list
-    raw_node_indices: list
-    raw_node_weights: list
+    tris: np.ndarray
+    tri_subparts: np.ndarray
+    raw_positions: np.ndarray
+    raw_texcoords: np.ndarray
+    raw_normals: np.ndarray
+    raw_node_indices: np.ndarray
+    raw_node_weights: np.ndarray
     node_map: list[int]
     face_transparent: bool
     face_tesselation: bool
@@ -1617,15 +1585,6 @@ class Mesh:
             map_element = block_node_map.Elements[self.index]
             self.node_map = [e.Fields[0].Data for e in map_element.Fields[0].Elements]
             
-    def _true_uvs(self, texcoords):
-        return [self._interp_uv(tc) for tc in texcoords]
-    
-    def _interp_uv(self, texcoord):
-        u = np.interp(texcoord[0], (0, 1), (self.bounds.u0, self.bounds.u1))
-        v = np.interp(texcoord[1], (0, 1), (self.bounds.v0, self.bounds.v1))
-        
-        return Vector((u, 1-v)) # 1-v to correct UV for Blender
-    
     def create(self, render_model, temp_meshes: TagFieldBlock, nodes=[], parent: bpy.types.Object | None = None, instances: list['InstancePlacement'] = [], name="blam", is_io=False):
         if not self.valid:
             return []
@@ -1636,20 +1595,22 @@ class Mesh:
         if raw_indices.Elements.Count == 0:
             raw_indices = temp_mesh.SelectField("raw indices32")
 
-        self.raw_positions = list(render_model.GetPositionsFromMesh(temp_meshes, self.index))
-        self.raw_texcoords = list(render_model.GetTexCoordsFromMesh(temp_meshes, self.index))
-        self.raw_normals = list(render_model.GetNormalsFromMesh(temp_meshes, self.index))
-        self.raw_lightmap_texcoords = [e.Fields[5].Data for e in raw_vertices.Elements]
-        self.raw_vertex_colors = [e.Fields[8].Data for e in raw_vertices.Elements]
-        self.raw_texcoords1 = [e.Fields[9].Data for e in raw_vertices.Elements] if utils.is_corinth() else []
+        # Convert the .NET vertex buffers to numpy arrays once, one row per vertex
+        self.raw_positions = net_array_to_numpy(render_model.GetPositionsFromMesh(temp_meshes, self.index), np.single, 3)
+        self.raw_texcoords = net_array_to_numpy(render_model.GetTexCoordsFromMesh(temp_meshes, self.index), np.double, 2)
+        self.raw_normals = net_array_to_numpy(render_model.GetNormalsFromMesh(temp_meshes, self.index), np.single, 3)
+        self.raw_lightmap_texcoords = np.array([tuple(e.Fields[5].Data) for e in raw_vertices.Elements], dtype=np.single).reshape(-1, 2)
+        self.raw_vertex_colors = np.array([tuple(e.Fields[8].Data) for e in raw_vertices.Elements], dtype=np.single).reshape(-1, 3)
+        self.raw_texcoords1 = np.array([tuple(e.Fields[9].Data) for e in raw_vertices.Elements], dtype=np.single).reshape(-1, 2) if utils.is_corinth() else None
 
         if not instances and self.rigid_node_index == -1:
-            self.raw_node_indices = list(render_model.GetNodeIndiciesFromMesh(temp_meshes, self.index))
-            self.raw_node_weights = list(render_model.GetNodeWeightsFromMesh(temp_meshes, self.index))
+            self.raw_node_indices = net_array_to_numpy(render_model.GetNodeIndiciesFromMesh(temp_meshes, self.index), np.int32, 4)
+            self.raw_node_weights = net_array_to_numpy(render_model.GetNodeWeightsFromMesh(temp_meshes, self.index), np.single, 4)
 
-        indices = [utils.unsigned_int16(element.Fields[0].Data) for element in raw_indices.Elements]
+        indices = np.array([element.Fields[0].Data for element in raw_indices.Elements], dtype=np.int32)
+        indices[indices < 0] += 65536 # unsigned int16
         buffer = IndexBuffer(self.index_buffer_type, indices)
-        self.tris = buffer.get_faces(self)
+        self.tris, self.tri_subparts = buffer.get_faces(self)
 
         objects = []
 
@@ -1670,60 +1631,57 @@ class Mesh:
     def _create_mesh(self, name, parent, nodes, subpart: MeshSubpart | None, parent_bone=None, local_matrix=None, is_io=False):
         matrix = local_matrix or (parent.matrix_world if parent else Matrix.Identity(4))
 
-        indices = [t.indices for t in self.tris if not subpart or t.subpart == subpart]
+        tris = self.tris[self.tri_subparts == self.subparts.index(subpart)] if subpart else self.tris.copy()
 
-        vertex_indices = sorted({idx for tri in indices for idx in tri})
-        idx_start, idx_end = vertex_indices[0], vertex_indices[-1]
+        idx_start, idx_end = int(tris.min()), int(tris.max())
+        vertex_range = slice(idx_start, idx_end + 1)
+        tris -= idx_start
+        loop_vertex_indices = tris.ravel()
 
         mesh = bpy.data.meshes.new(name)
         ob = bpy.data.objects.new(name, mesh)
 
-        positions = [self.raw_positions[i:i+3] for i in range(idx_start * 3, (idx_end + 1) * 3, 3)]
-        texcoords = [self.raw_texcoords[i:i+2] for i in range(idx_start * 2, (idx_end + 1) * 2, 2)]
-        normals = [self.raw_normals[i:i+3] for i in range(idx_start * 3, (idx_end + 1) * 3, 3)]
-        lighting_texcoords = [[float(v) for v in self.raw_lightmap_texcoords[n]] for n in range(idx_start, idx_end+1)]
-        vertex_colors = [[float(v) for v in self.raw_vertex_colors[n]] for n in range(idx_start, idx_end+1)]
-        texcoords1 = [[float(v) for v in self.raw_texcoords1[n]] for n in range(idx_start, idx_end+1)] if self.raw_texcoords1 else []
-
-        if idx_start > 0:
-            indices = [[i - idx_start for i in tri] for tri in indices]
-
-        mesh.from_pydata(positions, [], indices)
+        positions = self.raw_positions[vertex_range]
+        texcoords = self.raw_texcoords[vertex_range]
+        normals = self.raw_normals[vertex_range]
+        lighting_texcoords = self.raw_lightmap_texcoords[vertex_range]
+        vertex_colors = self.raw_vertex_colors[vertex_range]
+        texcoords1 = self.raw_texcoords1[vertex_range] if self.raw_texcoords1 is not None else None
+
+        mesh.vertices.add(len(positions))
+        mesh.vertices.foreach_set("co", positions.ravel())
+        mesh.loops.add(len(loop_vertex_indices))
+        mesh.loops.foreach_set("vertex_index", loop_vertex_indices)
+        mesh.polygons.add(len(tris))
+        mesh.polygons.foreach_set("loop_start", np.arange(0, len(loop_vertex_indices), 3, dtype=np.int32))
+        mesh.update(calc_edges=True)
 
         transform_matrix = self.bounds.co_matrix if self.bounds else Matrix.Scale(100, 4)
         mesh.transform(transform_matrix)
 
         print(f"--- {name}")
 
-        has_vertex_colors = any(any(v) for v in vertex_colors)
-        has_lighting_texcoords = any(any(v) for v in lighting_texcoords)
-        has_texcoords1 = bool(texcoords1) and any(any(v) for v in texcoords1)
+        has_vertex_colors = vertex_colors.any()
+        has_lighting_texcoords = lighting_texcoords.any()
+        has_texcoords1 = texcoords1 is not None and texcoords1.any()
 
-        uvs = self._true_uvs(texcoords) if self.bounds else [Vector((u, 1-v)) for (u, v) in texcoords]
+        uvs = decompress_texcoords(texcoords, (self.bounds.u0, self.bounds.u1), (self.bounds.v0, self.bounds.v1)) if self.bounds else decompress_texcoords(texcoords)
         uv_layer = mesh.uv_layers.new(name="UVMap0", do_init=False)
         lighting_uv_layer = mesh.uv_layers.new(name="lighting", do_init=False) if has_lighting_texcoords else None
         uvs1_layer = mesh.uv_layers.new(name="UVMap1", do_init=False) if has_texcoords1 else None
 
         if uv_layer:
-            for face in mesh.polygons:
-                for vert_idx, loop_idx in zip(face.vertices, face.loop_indices):
-                    uv_layer.data[loop_idx].uv = uvs[vert_idx]
-                    if uvs1_layer:
-                        uvs1_layer.data[loop_idx].uv = texcoords1[vert_idx]
-                    if lighting_uv_layer:
-                        lighting_uv_layer.data[loop_idx].uv = lighting_texcoords[vert_idx]
+            uv_layer.data.foreach_set("uv", uvs[loop_vertex_indices].ravel())
+            if uvs1_layer:
+                uvs1_layer.data.foreach_set("uv", texcoords1[loop_vertex_indices].ravel())
+            if lighting_uv_layer:
+                lighting_uv_layer.data.foreach_set("uv", lighting_texcoords[loop_vertex_indices].ravel())
 
-        normalised_normals = [Vector(n).normalized() for n in normals]
-        mesh.normals_split_custom_set_from_vertices(normalised_normals)
+        mesh.normals_split_custom_set_from_vertices(normalize_vectors(normals))
 
         if has_vertex_colors:
-            bm = bmesh.new()
-            bm.from_mesh(mesh)
-            layer = bm.verts.layers.float_color.new("Color")
-            for idx, v in enumerate(bm.verts):
-                v[layer] = vertex_colors[idx] + [1.0]
-            bm.to_mesh(mesh)
-            bm.free()
+            layer = mesh.color_attributes.new("Color", 'FLOAT_COLOR', 'POINT')
+            layer.data.foreach_set("color", np.hstack((vertex_colors, np.ones((len(vertex_colors), 1), dtype=np.single))).ravel())
 
         if parent:
             ob.parent = parent
@@ -1733,16 +1691,12 @@ class Mesh:
                     ob.parent_bone = parent_bone or nodes[self.rigid_node_index].name
                     ob.matrix_world = matrix
                 else:
-                    node_indices = [self.raw_node_indices[i:i+4] for i in range(idx_start * 4, (idx_end + 1) * 4, 4)]
-                    node_weights = [self.raw_node_weights[i:i+4] for i in range(idx_start * 4, (idx_end + 1) * 4, 4)]
                     vgroups = ob.vertex_groups
-                    for idx, (ni, nw) in enumerate(zip(node_indices, node_weights)):
-                        for i, w in zip(ni, nw):
-                            if 0 <= i <= 254 and w > 0:
-                                if self.node_map:
-                                    i = self.node_map[i]
-                                group = vgroups.get(nodes[i].name) or vgroups.new(name=nodes[i].name)
-                                group.add([idx], w, 'REPLACE')
+                    for node_index, weighted_vertices in vertex_group_weights(self.raw_node_indices[vertex_range], self.raw_node_weights[vertex_range], self.node_map):
+                        name = nodes[node_index].name
+                        group = vgroups.get(name) or vgroups.new(name=name)
+                        for weight, vertex_indices in weighted_vertices:
+                            group.add(vertex_indices, weight, 'REPLACE')
                     ob.modifiers.new(name="Armature", type="ARMATURE").object = parent
 
         if not self.does_not_need_parts:
@@ -1762,8 +1716,8 @@ class Mesh:
             if subpart:
                 mesh.materials.append(subpart.part.material.blender_material)
             else:
-                for subpart in self.subparts:
-                    subpart.create(ob, self.tris, self.face_transparent, self.face_draw_distance, self.face_tesselation, self.face_no_shadow, self.face_lightmap_only, water_surface_parts)
+                for idx, subpart in enumerate(self.subparts):
+                    subpart.create(ob, np.flatnonzero(self.tri_subparts == idx), self.face_transparent, self.face_draw_distance, self.face_tesselation, self.face_no_shadow, self.face_lightmap_only, water_surface_parts)
 
 
         self._set_two_sided(mesh, is_io)
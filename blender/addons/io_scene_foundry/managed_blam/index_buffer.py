@@ -0,0 +1,31 @@
+"""Decodes render geometry index buffers into triangle arrays"""
+
+import numpy as np
+
+def triangle_list_faces(indices: np.ndarray) -> np.ndarray:
+    '''Returns an (N, 3) array of faces from a triangle list. A trailing partial triangle is dropped'''
+    indices = np.asarray(indices)
+    return indices[:len(indices) - len(indices) % 3].reshape(-1, 3)
+
+def triangle_strip_faces(indices: np.ndarray, restart_index: int = None) -> np.ndarray:
+    '''Returns an (N, 3) array of faces from a triangle strip.
+    Every other triangle has its winding flipped, based on its position in the strip. Degenerate triangles are removed but still count towards this parity.
+    If a restart index is given, the strip is split where it appears and each section starts with even parity'''
+    indices = np.asarray(indices)
+    if len(indices) < 3:
+        return np.empty((0, 3), dtype=indices.dtype)
+
+    positions = np.arange(len(indices))
+    if restart_index is not None:
+        restarts = indices == restart_index
+        section_starts = np.maximum.accumulate(np.where(restarts, positions + 1, 0))
+        positions = positions - section_starts
+
+    first, second, third = indices[:-2], indices[1:-1], indices[2:]
+    keep = (first != second) & (first != third) & (second != third)
+    if restart_index is not None:
+        keep &= ~(restarts[:-2] | restarts[1:-1] | restarts[2:])
+
+    odd = positions[2:] % 2 == 1
+    faces = np.column_stack((first, np.where(odd, third, second), np.where(odd, second, third)))
+    return faces[keep]
@@ -8,6 +8,7 @@ from ..tools.property_apply import apply_props_material
 from .connected_geometry import BSPCollisionMaterial, BSPSeam, Cluster, CompressionBounds, Instance, InstanceDefinition, Material, Mesh, Portal, StructureCollision
 from ..utils import jstr
 from ..managed_blam import Tag
+from ..block_sync import unique_keys
 from .. import utils
 
 class ScenarioStructureBspTag(Tag):
@@ -21,112 +22,116 @@ class ScenarioStructureBspTag(Tag):
         self.block_instance_definitions = self.tag.SelectField("Struct:resource interface[0]/Block:raw_resources[0]/Struct:raw_items[0]/Block:instanced geometries definitions")
     
     def write_prefabs(self, prefabs):
+        """Syncs the prefabs block with the given prefabs, only writing the elements of prefabs which changed since the last sync"""
         if not self.corinth or (not prefabs and self.block_prefabs.Elements.Count == 0): return
-        self.block_prefabs.RemoveAllElements()
-        for prefab in prefabs:
-            element = self.block_prefabs.AddElement()
-            element.SelectField("prefab reference").Path = self._TagPath_from_string(prefab.reference)
-            element.SelectField("name").SetStringData(prefab.name)
-            element.SelectField("scale").SetStringData(prefab.scale)
-            element.SelectField("forward").SetStringData(prefab.forward)
-            element.SelectField("left").SetStringData(prefab.left)
-            element.SelectField("up").SetStringData(prefab.up)
-            element.SelectField("position").SetStringData(prefab.position)
-            
-            override_flags = element.SelectField("override flags")
-            flags_mask = element.SelectField("instance flags Mask")
-            policy_mask = element.SelectField("instance policy mask")
-            
-            nwo = prefab.props
-            
-            if nwo.prefab_lighting != "no_override":
-                policy_mask.SetBit("override lightmapping policy", True)
-                lighting = element.SelectField("override lightmapping policy")
-                match nwo.prefab_lighting:
-                    case "per_pixel":
-                        lighting.Value = 0
-                    case "per_vertex":
-                        lighting.Value = 1
-                    case "single_probe":
-                        lighting.Value = 2
-                    case "per_vertex_ao":
-                        lighting.Value = 5
-                        
-            if nwo.prefab_lightmap_res > 0:
-                policy_mask.SetBit("override lightmap resolution policy", True)
-                element.SelectField("override lightmap resolution scale").SetStringData(str(nwo.prefab_lightmap_res))
+        # Prefabs can share a name (objects from linked libraries), so each is keyed by its name and how many prefabs of that name came before it
+        prefabs = dict(zip(unique_keys([prefab.name for prefab in prefabs]), prefabs))
+        existing_keys = unique_keys([element.SelectField("name").GetStringData() for element in self.block_prefabs.Elements])
+        self._sync_block(self.block_prefabs, "prefabs", {key: prefab.snapshot() for key, prefab in prefabs.items()},
+                         lambda element, key: self._write_prefab(prefabs[key], element),
+                         lambda element: existing_keys[element.ElementIndex])
+        
+    def _write_prefab(self, prefab, element):
+        element.SelectField("prefab reference").Path = self._TagPath_from_string(prefab.reference)
+        element.SelectField("name").SetStringData(prefab.name)
+        element.SelectField("scale").SetStringData(prefab.scale)
+        element.SelectField("forward").SetStringData(prefab.forward)
+        element.SelectField("left").SetStringData(prefab.left)
+        element.SelectField("up").SetStringData(prefab.up)
+        element.SelectField("position").SetStringData(prefab.position)
+        
+        override_flags = element.SelectField("override flags")
+        flags_mask = element.SelectField("instance flags Mask")
+        policy_mask = element.SelectField("instance policy mask")
+        
+        nwo = prefab.props
+        
+        if nwo.prefab_lighting != "no_override":
+            policy_mask.SetBit("override lightmapping policy", True)
+            lighting = element.SelectField("override lightmapping policy")
+            match nwo.prefab_lighting:
+                case "per_pixel":
+                    lighting.Value = 0
+                case "per_vertex":
+                    lighting.Value = 1
+                case "single_probe":
+                    lighting.Value = 2
+                case "per_vertex_ao":
+                    lighting.Value = 5
                     
-            if nwo.prefab_pathfinding != "no_override":
-                policy_mask.SetBit("override pathfinding policy", True)
-                pathfinding = element.SelectField("override pathfinding policy")
-                match nwo.prefab_lighting:
-                    case "cutout":
-                        pathfinding.Value = 0
-                    case "static":
-                        pathfinding.Value = 1
-                    case "none":
-                        pathfinding.Value = 2
-                        
-            if nwo.prefab_imposter_policy != "no_override":
-                policy_mask.SetBit("override lmposter policy", True)
-                imposter = element.SelectField("override imposter policy")
-                match nwo.prefab_imposter_policy:
-                    case "polygon_default":
-                        imposter.Value = 0
-                    case "polygon_high":
-                        imposter.Value = 1
-                    case "card_default":
-                        imposter.Value = 2
-                    case "card_high":
-                        imposter.Value = 3
-                    case "never":
-                        imposter.Value = 4
-                if nwo.prefab_imposter_policy != "never":
-                    if nwo.prefab_imposter_brightness > 0:
-                        policy_mask.SetBit("override imposter brightness", True)
-                        element.SelectField("override imposter brightness").SetStringData(jstr(nwo.prefab_imposter_brightness))
-                        
-                    if not nwo.prefab_imposter_transition_distance_auto:
-                        policy_mask.SetBit("override imposter transition distance policy", True)
-                        element.SelectField("override imposter transition distance").SetStringData(jstr(nwo.prefab_imposter_transition_distance))
-                        
-            if nwo.prefab_streaming_priority != "no_override":
-                streaming = element.SelectField("override streaming priority")
-                match nwo.prefab_streaming_priority:
-                    case "_connected_geometry_poop_streamingpriority_default":
-                        streaming.Value = 0
-                    case "_connected_geometry_poop_streamingpriority_higher":
-                        streaming.Value = 1
-                    case "_connected_geometry_poop_streamingpriority_highest":
-                        streaming.Value = 2
-            
-            if nwo.prefab_cinematic_properties == '_connected_geometry_poop_cinema_only':
-                override_flags.SetBit("cinema only", True)
-                flags_mask.SetBit("cinema only", True)
-            elif nwo.prefab_cinematic_properties == '_connected_geometry_poop_cinema_exclude':
-                override_flags.SetBit("exclude from cinema", True)
-                flags_mask.SetBit("exclude from cinema", True)
+        if nwo.prefab_lightmap_res > 0:
+            policy_mask.SetBit("override lightmap resolution policy", True)
+            element.SelectField("override lightmap resolution scale").SetStringData(str(nwo.prefab_lightmap_res))
                 
-            if nwo.prefab_render_only:
-                override_flags.SetBit("render only", True)
-                flags_mask.SetBit("render only", True)
-            if nwo.prefab_does_not_block_aoe:
-                override_flags.SetBit("does not block aoe damage", True)
-                flags_mask.SetBit("does not block aoe damage", True)
-            if nwo.prefab_excluded_from_lightprobe:
-                override_flags.SetBit("not in lightprobes", True)
-                flags_mask.SetBit("not in lightprobes", True)
-            if nwo.prefab_decal_spacing:
-                override_flags.SetBit("decal spacing", True)
-                flags_mask.SetBit("decal spacing", True)
-            if nwo.prefab_remove_from_shadow_geometry:
-                override_flags.SetBit("remove from shadow geometry", True)
-                flags_mask.SetBit("remove from shadow geometry", True)
-            if nwo.prefab_disallow_lighting_samples:
-                override_flags.SetBit("disallow object lighting samples", True)
-                flags_mask.SetBit("disallow object lighting samples", True)
+        if nwo.prefab_pathfinding != "no_override":
+            policy_mask.SetBit("override pathfinding policy", True)
+            pathfinding = element.SelectField("override pathfinding policy")
+            match nwo.prefab_lighting:
+                case "cutout":
+                    pathfinding.Value = 0
+                case "static":
+                    pathfinding.Value = 1
+                case "none":
+                    pathfinding.Value = 2
+                    
+        if nwo.prefab_imposter_policy != "no_override":
+            policy_mask.SetBit("override lmposter policy", True)
+            imposter = element.SelectField("override imposter policy")
+            match nwo.prefab_imposter_policy:
+                case "polygon_default":
+                    imposter.Value = 0
+                case "polygon_high":
+                    imposter.Value = 1
+                case "card_default":
+                    imposter.Value = 2
+                case "card_high":
+                    imposter.Value = 3
+                case "never":
+                    imposter.Value = 4
+            if nwo.prefab_imposter_policy != "never":
+                if nwo.prefab_imposter_brightness > 0:
+                    policy_mask.SetBit("override imposter brightness", True)
+                    element.SelectField("override imposter brightness").SetStringData(jstr(nwo.prefab_imposter_brightness))
+                    
+                if not nwo.prefab_imposter_transition_distance_auto:
+                    policy_mask.SetBit("override imposter transition distance policy", True)
+                    element.SelectField("override imposter transition distance").SetStringData(jstr(nwo.prefab_imposter_transition_distance))
+                    
+        if nwo.prefab_streaming_priority != "no_override":
+            streaming = element.SelectField("override streaming priority")
+            match nwo.prefab_streaming_priority:
+                case "_connected_geometry_poop_streamingpriority_default":
+                    streaming.Value = 0
+                case "_connected_geometry_poop_streamingpriority_higher":
+                    streaming.Value = 1
+                case "_connected_geometry_poop_streamingpriority_highest":
+                    streaming.Value = 2
+        
+        if nwo.prefab_cinematic_properties == '_connected_geometry_poop_cinema_only':
+            override_flags.SetBit("cinema only", True)
+            flags_mask.SetBit("cinema only", True)
+        elif nwo.prefab_cinematic_properties == '_connected_geometry_poop_cinema_exclude':
+            override_flags.SetBit("exclude from cinema", True)
+            flags_mask.SetBit("exclude from cinema", True)
             
-        self.tag_has_changes = True
+        if nwo.prefab_render_only:
+            override_flags.SetBit("render only", True)
+            flags_mask.SetBit("render only", True)
+        if nwo.prefab_does_not_block_aoe:
+            override_flags.SetBit("does not block aoe damage", True)
+            flags_mask.SetBit("does not block aoe damage", True)
+        if nwo.prefab_excluded_from_lightprobe:
+            override_flags.SetBit("not in lightprobes", True)
+            flags_mask.SetBit("not in lightprobes", True)
+        if nwo.prefab_decal_spacing:
+            override_flags.SetBit("decal spacing", True)
+            flags_mask.SetBit("decal spacing", True)
+        if nwo.prefab_remove_from_shadow_geometry:
+            override_flags.SetBit("remove from shadow geometry", True)
+            flags_mask.SetBit("remove from shadow geometry", True)
+        if nwo.prefab_disallow_lighting_samples:
+            override_flags.SetBit("disallow object lighting samples", True)
+            flags_mask.SetBit("disallow object lighting samples", True)
         
     def to_blend_objects(self, collection: bpy.types.Collection, for_scenario: bool, for_cinematic: bool):
         objects = []
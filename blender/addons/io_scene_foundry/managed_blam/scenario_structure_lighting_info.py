@@ -2,6 +2,7 @@
 
 from ..managed_blam.Tags import TagFieldBlockElement
 from ..managed_blam import Tag
+from ..block_sync import freeze, unique_keys
 from .. import utils
 
 class ScenarioStructureLightingInfoTag(Tag):
@@ -11,55 +12,31 @@ class ScenarioStructureLightingInfoTag(Tag):
         self.block_generic_light_definitions = self.tag.SelectField("Block:generic light definitions")
         self.block_generic_light_instances = self.tag.SelectField("Block:generic light instances")
         
-    def _definition_index_from_id(self, id) -> int:
-        for element in self.block_generic_light_definitions.Elements:
-            if id == element.Fields[0].Data:
-                return element.ElementIndex
-            
-        return 0
-    
-    def _definition_index_from_data_name(self, name, light_definitions) -> int:
-        for definition in light_definitions:
-            if name == definition.data_name:
-                return definition.index
-            
-        return 0
-    
     def clear_lights(self):
-        self.block_generic_light_definitions.RemoveAllElements()
-        self.block_generic_light_instances.RemoveAllElements()
-        self.tag_has_changes = True
+        self.build_tag([], [])
         
     def build_tag(self, light_instances, light_definitions):
+        """Syncs the light blocks with the given lights, only writing the elements of lights which changed since the last sync"""
+        definitions = {light.data_name: light for light in light_definitions}
+        definition_snapshots = {name: freeze(vars(light)) for name, light in definitions.items()}
         if self.corinth:
-            self._write_corinth_light_definitions(light_definitions)
-            self._write_corinth_light_instances(light_instances, light_definitions)
+            # Corinth definitions are updated in place and matched by their Definition Identifier on the first sync, so that fields Foundry does not write are kept
+            names_by_id = {str(light.id): name for name, light in definitions.items()}
+            definition_order = self._sync_block(self.block_generic_light_definitions, "definitions", definition_snapshots,
+                                                lambda element, name: self._update_corinth_light_definitions(definitions[name], element),
+                                                lambda element: names_by_id.get(element.SelectField("Definition Identifier").GetStringData()), write_in_place=True)
         else:
-            self._write_reach_light_definitions(light_definitions)
-            self._write_reach_light_instances(light_instances, light_definitions)
+            definition_order = self._sync_block(self.block_generic_light_definitions, "definitions", definition_snapshots,
+                                                lambda element, name: self._write_reach_light_definition(definitions[name], element))
             
-        self.tag_has_changes = True
+        definition_indices = {name: idx for idx, name in enumerate(definition_order)}
+        instances = dict(zip(unique_keys([light.name for light in light_instances]), light_instances))
+        # Instances also change when their definition moves to another index
+        instance_snapshots = {name: (definition_indices.get(light.data_name, 0), freeze(vars(light))) for name, light in instances.items()}
+        write_instance = self._write_corinth_light_instance if self.corinth else self._write_reach_light_instance
+        self._sync_block(self.block_generic_light_instances, "instances", instance_snapshots,
+                         lambda element, name: write_instance(instances[name], element, definition_indices.get(instances[name].data_name, 0)))
             
-    def _write_corinth_light_definitions(self, light_definitions):
-        remaining_light_indices = list(range(len(light_definitions)))
-        remove_indices = []
-        
-        for element in self.block_generic_light_definitions.Elements:
-            element_id = element.SelectField("Definition Identifier").GetStringData()
-            found_light = next((light for light in light_definitions if light.id == element_id), None)
-            if found_light is None:
-                remove_indices.append(element.ElementIndex)
-            else:
-                remaining_light_indices.remove(light_definitions.index(found_light))
-                self._update_corinth_light_definitions(found_light, element)
-                
-        if remove_indices:
-            for i in reversed(remove_indices):
-                self.block_generic_light_definitions.RemoveElement(i)
-                
-        for i in remaining_light_indices:
-            self._update_corinth_light_definitions(light_definitions[i], self.block_generic_light_definitions.AddElement())
-                
     def _update_corinth_light_definitions(self, light, element: TagFieldBlockElement):
         element.SelectField("Definition Identifier").Data = light.id 
         parameters_struct  = element.SelectField("Midnight_Light_Parameters")
@@ -113,78 +90,67 @@ class ScenarioStructureLightingInfoTag(Tag):
         element.SelectField("static analytic").Value = light.static_analytic
         
         
-    def _write_corinth_light_instances(self, light_instances, light_definitions):
-        self.block_generic_light_instances.RemoveAllElements()
-        for light in light_instances:
-            element = self.block_generic_light_instances.AddElement()
-            id = utils.id_from_string(light.data_name)
-            element.SelectField("Light Definition ID").Data = id
-            element.SelectField("Light Definition Index").Data = self._definition_index_from_id(id)
-            element.SelectField("light mode").Value = light.light_mode
-            element.SelectField("origin").Data = light.origin
-            element.SelectField("forward").Data = light.forward
-            element.SelectField("up").Data = light.up
-            
-    def _write_reach_light_definitions(self, light_definitions):
-        self.block_generic_light_definitions.RemoveAllElements()
-        for light in light_definitions:
-            element = self.block_generic_light_definitions.AddElement()
-            light.index = element.ElementIndex
-            element.SelectField("type").Value = light.type
-            element.SelectField("shape").Value = light.shape
-            element.SelectField("color").Data = light.color
-            intensity_divisor = 1
-            # Reach seems to fudge our intensity numbers based on whether the light is a point or spot light, fight back!
-            match light.type:
-                case 0:
-                    intensity_divisor = 0.37735857955
-                case 1:
-                    intensity_divisor = 3.14465382959
-                case 2:
-                    intensity_divisor = 0.6289308
-                    
-            element.SelectField("intensity").Data = light.intensity / intensity_divisor
+    def _write_corinth_light_instance(self, light, element: TagFieldBlockElement, definition_index: int):
+        element.SelectField("Light Definition ID").Data = utils.id_from_string(light.data_name)
+        element.SelectField("Light Definition Index").Data = definition_index
+        element.SelectField("light mode").Value = light.light_mode
+        element.SelectField("origin").Data = light.origin
+        element.SelectField("forward").Data = light.forward
+        element.SelectField("up").Data = light.up
             
-            if light.type == 1:
-                element.SelectField("hotspot size").Data = light.hotspot_size
-                element.SelectField("hotspot cutoff size").Data = light.hotspot_cutoff
-                element.SelectField("hotspot falloff speed").Data = light.hotspot_falloff
+    def _write_reach_light_definition(self, light, element: TagFieldBlockElement):
+        element.SelectField("type").Value = light.type
+        element.SelectField("shape").Value = light.shape
+        element.SelectField("color").Data = light.color
+        intensity_divisor = 1
+        # Reach seems to fudge our intensity numbers based on whether the light is a point or spot light, fight back!
+        match light.type:
+            case 0:
+                intensity_divisor = 0.37735857955
+            case 1:
+                intensity_divisor = 3.14465382959
+            case 2:
+                intensity_divisor = 0.6289308
+                
+        element.SelectField("intensity").Data = light.intensity / intensity_divisor
+        
+        if light.type == 1:
+            element.SelectField("hotspot size").Data = light.hotspot_size
+            element.SelectField("hotspot cutoff size").Data = light.hotspot_cutoff
+            element.SelectField("hotspot falloff speed").Data = light.hotspot_falloff
     
-            element.SelectField("near attenuation bounds").Data = [light.near_attenuation_start, light.near_attenuation_end]
-            
-            flags = element.SelectField("flags")
-            flags.SetBit("use far attenuation", True)
-            if light.far_attenuation_end > 0:
-                flags.SetBit("invere squared falloff", False)
-                element.SelectField("far attenuation bounds").Data = [light.far_attenuation_start, light.far_attenuation_end]
-            else:
-                flags.SetBit("invere squared falloff", True)
-                element.SelectField("far attenuation bounds").Data = [900, 4000]
+        element.SelectField("near attenuation bounds").Data = [light.near_attenuation_start, light.near_attenuation_end]
+        
+        flags = element.SelectField("flags")
+        flags.SetBit("use far attenuation", True)
+        if light.far_attenuation_end > 0:
+            flags.SetBit("invere squared falloff", False)
+            element.SelectField("far attenuation bounds").Data = [light.far_attenuation_start, light.far_attenuation_end]
+        else:
+            flags.SetBit("invere squared falloff", True)
+            element.SelectField("far attenuation bounds").Data = [900, 4000]
 
-            element.SelectField("aspect").Data = light.aspect
-            
-    def _write_reach_light_instances(self, light_instances, light_definitions):
-        self.block_generic_light_instances.RemoveAllElements()
-        for light in light_instances:
-            element = self.block_generic_light_instances.AddElement()
-            element.SelectField("definition index").Data = self._definition_index_from_data_name(light.data_name, light_definitions)
-            element.SelectField("origin").Data = light.origin
-            element.SelectField("forward").Data = light.forward
-            element.SelectField("up").Data = light.up
-            element.SelectField("bungie light type").Value = light.game_type
-            
-            flags = element.SelectField("screen space specular")
-            flags.SetBit("screen space light has specular", light.screen_space_specular)
-            
-            element.SelectField("bounce light control").Data = light.bounce_ratio
-            element.SelectField("light volume distance").Data = light.volume_distance
-            element.SelectField("light volume intensity scalar").Data = light.volume_intensity
-            
-            if light.light_tag:
-                element.SelectField("user control").Path = self._TagPath_from_string(light.light_tag)
-            if light.shader:
-                element.SelectField("shader reference").Path = self._TagPath_from_string(light.shader)
-            if light.gel:
-                element.SelectField("gel reference").Path = self._TagPath_from_string(light.gel)
-            if light.lens_flare:
-                element.SelectField("lens flare reference").Path = self._TagPath_from_string(light.lens_flare)
\ No newline at end of file
+        element.SelectField("aspect").Data = light.aspect
+        
+    def _write_reach_light_instance(self, light, element: TagFieldBlockElement, definition_index: int):
+        element.SelectField("definition index").Data = definition_index
+        element.SelectField("origin").Data = light.origin
+        element.SelectField("forward").Data = light.forward
+        element.SelectField("up").Data = light.up
+        element.SelectField("bungie light type").Value = light.game_type
+        
+        flags = element.SelectField("screen space specular")
+        flags.SetBit("screen space light has specular", light.screen_space_specular)
+        
+        element.SelectField("bounce light control").Data = light.bounce_ratio
+        element.SelectField("light volume distance").Data = light.volume_distance
+        element.SelectField("light volume intensity scalar").Data = light.volume_intensity
+        
+        if light.light_tag:
+            element.SelectField("user control").Path = self._TagPath_from_string(light.light_tag)
+        if light.shader:
+            element.SelectField("shader reference").Path = self._TagPath_from_string(light.shader)
+        if light.gel:
+            element.SelectField("gel reference").Path = self._TagPath_from_string(light.gel)
+        if light.lens_flare:
+            element.SelectField("lens flare reference").Path = self._TagPath_from_string(light.lens_flare)
\ No newline at end of file
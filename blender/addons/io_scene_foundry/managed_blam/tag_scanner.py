@@ -0,0 +1,161 @@
+'''Reads many tags in parallel. ManagedBlam can only be started once per process, so tags are sharded across worker processes which each start their own instance'''
+
+import itertools
+import json
+import os
+from pathlib import Path
+from queue import Empty, Queue
+import subprocess
+import sys
+import threading
+
+from .bulk_readers import BACKENDS, READERS
+
+WORKER_SCRIPT = Path(__file__).with_name("tag_scanner_worker.py")
+
+class TagScanner:
+    '''Runs a named reader from bulk_readers over a list of tag paths and merges the partial results into one report as they arrive.
+    With workers set to 0, tags are read in this process using the backend given (ManagedBlam must already be running if using that backend)'''
+    def __init__(self, reader_name: str, backend_name: str, backend_args: dict, workers: int = -1, log=None):
+        if log is None:
+            from .. import utils as log
+        self.log = log
+        self.reader_name = reader_name
+        self.reader = READERS[reader_name]()
+        self.backend_name = backend_name
+        self.backend_args = backend_args
+        self.workers = workers if workers >= 0 else max((os.cpu_count() or 2) // 2, 1)
+        self.cancelled = False
+        self.errors: dict[str, str] = {}
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _in_process(self, paths: list[str]):
+        backend = BACKENDS[self.backend_name](**self.backend_args)
+        for path in paths:
+            if self.cancelled:
+                return
+            try:
+                with backend.open(path) as tag:
+                    yield {"path": path, "result": self.reader.read(tag)}
+            except Exception as e:
+                yield {"path": path, "error": str(e)}
+
+    def _in_workers(self, paths: list[str]):
+        shards = [paths[i::self.workers] for i in range(min(self.workers, len(paths)))]
+        messages = Queue()
+        processes = []
+        failures = {}
+        # Workers run outside of Blender, so they are given Blender's module paths to find pythonnet and anything else installed with the addon's wheels
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+
+        def read_output(shard_index, process):
+            try:
+                for line in process.stdout:
+                    message = parse_worker_line(line)
+                    if message is not None:
+                        messages.put((shard_index, message))
+            except (OSError, ValueError):
+                pass
+            finally:
+                messages.put((shard_index, None))
+
+        for shard_index, shard in enumerate(shards):
+            process = subprocess.Popen(
+                [sys.executable, str(WORKER_SCRIPT), self.backend_name, json.dumps(self.backend_args), self.reader_name],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+            processes.append(process)
+            threading.Thread(target=read_output, args=(shard_index, process), daemon=True).start()
+            try:
+                process.stdin.write("".join(f"{path}\n" for path in shard))
+                process.stdin.close()
+            except (BrokenPipeError, OSError) as e:
+                failures[shard_index] = f"Failed to send tags to worker process: {e}"
+
+        try:
+            received = [set() for _ in shards]
+            running = len(processes)
+            while running:
+                if self.cancelled:
+                    return
+                try:
+                    shard_index, message = messages.get(timeout=0.1)
+                except Empty:
+                    continue
+                if message is not None:
+                    received[shard_index].add(message["path"])
+                    yield message
+                    continue
+                # The worker has closed its output, so every tag in its shard without a result failed with it. Its own traceback is on the console
+                running -= 1
+                process = processes[shard_index]
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                unread = [path for path in shards[shard_index] if path not in received[shard_index]]
+                if unread:
+                    error = failures.get(shard_index, f"Worker process exited with code {process.returncode}")
+                    for path in unread:
+                        yield {"path": path, "error": error}
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+
+    def run(self, paths: list[str], print_tags=True):
+        '''Reads every tag and returns the merged report. Tags which fail to read are listed in errors. A KeyboardInterrupt cancels the scan, returning the report so far'''
+        report = self.reader.new_report()
+        total = len(paths)
+        if not total:
+            return report
+        spinner = itertools.cycle(["|", "/", "—", "\\"])
+        messages = self._in_process(paths) if self.workers == 0 else self._in_workers(paths)
+        done = 0
+        try:
+            for message in messages:
+                done += 1
+                if "error" in message:
+                    self.errors[message["path"]] = message["error"]
+                else:
+                    partial = message["result"]
+                    if print_tags and partial.get("lines"):
+                        print("\n" + "\n".join(partial["lines"]))
+                    self.reader.merge(report, partial)
+                self.log.update_job_count("Scanning tags", next(spinner), done, total)
+        except KeyboardInterrupt:
+            self.cancel()
+            messages.close()
+            self.log.print_warning(f"\nTag scan cancelled after {done} of {total} tags")
+
+        for path, error in self.errors.items():
+            self.log.print_warning(f"Failed to read {path}\n{error}")
+        return report
+
+def parse_worker_line(line: str) -> dict | None:
+    '''Returns the message written on a line of worker output, or None for anything else the worker printed (such as ManagedBlam's own output)'''
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return
+    if isinstance(message, dict) and "path" in message and ("result" in message or "error" in message):
+        return message
+
+def scan_tags(reader_name: str, paths: list[str] = None, workers: int = -1):
+    '''Runs a bulk reader over the project's tags with ManagedBlam, printing and returning its report'''
+    from .. import utils
+    reader = READERS[reader_name]()
+    if paths is None:
+        directory = Path(utils.get_tags_path(), reader.folder) if reader.folder else Path(utils.get_tags_path())
+        paths = utils.paths_in_dir(str(directory), reader.extensions)
+    backend_args = {"project_path": utils.get_project_path(), "corinth": utils.is_corinth()}
+    if workers == 0:
+        from . import mb_active, mb_init
+        if not mb_active:
+            mb_init()
+        backend_args["start"] = False
+    scanner = TagScanner(reader_name, "managedblam", backend_args, workers)
+    report = scanner.run(paths)
+    print('\n\n\n')
+    return scanner.reader.finish(report, len(paths))
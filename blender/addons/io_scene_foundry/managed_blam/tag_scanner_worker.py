@@ -0,0 +1,29 @@
+'''Entry point for tag scanner worker processes. Started with the backend name, backend arguments as JSON, and reader name.
+Reads tag paths from stdin, one per line, and writes a JSON line for each tag read'''
+
+import json
+import os
+import sys
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import bulk_readers # type: ignore
+
+def main():
+    backend_name, backend_args, reader_name = sys.argv[1:4]
+    backend = bulk_readers.BACKENDS[backend_name](**json.loads(backend_args))
+    reader = bulk_readers.READERS[reader_name]()
+    for line in sys.stdin:
+        path = line.rstrip("\n")
+        if not path:
+            continue
+        try:
+            with backend.open(path) as tag:
+                message = {"path": path, "result": reader.read(tag)}
+        except Exception:
+            message = {"path": path, "error": traceback.format_exc()}
+        sys.stdout.write(json.dumps(message) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
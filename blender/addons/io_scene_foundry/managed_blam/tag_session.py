@@ -0,0 +1,134 @@
+'''Sharing of open tag files between the Tags opened during an operation. Works with any tag file object with Save() and Dispose() methods,
+so sessions can be checked without ManagedBlam'''
+
+from typing import Callable
+
+from ..block_sync import block_states
+
+active_session = None
+
+class _SessionHandle:
+    '''A tag file held open by a TagSession'''
+    def __init__(self, path: str, tag):
+        self.path = path
+        self.tag = tag
+        self.references = 0
+        self.dirty = False
+        self.failed = False
+
+class TagSession():
+    '''Keeps tags open for the length of an operation. While a session is active, every Tag opened with the same path shares one tag file, so a tag is only loaded once.
+    Tags with changes are saved once when the session commits rather than each time a Tag closes. Exiting the session commits it, unless an exception was raised, in which case it is rolled back.
+    Sessions opened while another is active join the outer session'''
+    def __init__(self, log=None):
+        if log is None:
+            from .. import utils as log
+        self.log = log
+        self.handles: dict[str, _SessionHandle] = {}
+        self.joined = False
+        self.loads = 0
+        self.saves = 0
+
+    def __enter__(self):
+        global active_session
+        if active_session is not None:
+            self.joined = True
+            return active_session
+        active_session = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global active_session
+        if self.joined:
+            return
+        active_session = None
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def open(self, key: str, tag, load: Callable):
+        '''Returns the session's tag file for key, disposing the unused tag passed in. If the session does not have the tag yet, load(tag) is called to load
+        or create it and it is handed to the session. Either way the caller holds a reference until it calls release. If load raises, no reference is held'''
+        handle = self.handles.get(key)
+        if handle is not None:
+            handle.references += 1
+            tag.Dispose()
+            return handle.tag
+        load(tag)
+        handle = self.handles[key] = _SessionHandle(key, tag)
+        handle.references = 1
+        self.loads += 1
+        return tag
+
+    def release(self, key: str, has_changes: bool, failed=False):
+        '''Gives back a reference taken by open. If failed, the tag may be part way through a change, so it is never saved. Once no longer in use it is closed,
+        to be loaded again from disk if opened later'''
+        handle = self.handles[key]
+        handle.references -= 1
+        handle.dirty |= has_changes
+        handle.failed |= failed
+        if handle.failed and handle.references <= 0:
+            del self.handles[key]
+            if handle.dirty:
+                self.log.print_warning(f"Discarded unsaved changes to tag {handle.path} after an error")
+            block_states.forget(handle.path)
+            handle.tag.Dispose()
+
+    def flush(self):
+        '''Saves every tag with changes, keeping them open. Tags which failed are left unsaved'''
+        for handle in self.handles.values():
+            if handle.failed:
+                continue
+            if handle.dirty:
+                try:
+                    handle.tag.Save()
+                    self.saves += 1
+                    block_states.stamp(handle.path)
+                except:
+                    self.log.print_warning(f"Failed to save tag {handle.path}")
+                    block_states.forget(handle.path)
+                handle.dirty = False
+            else:
+                block_states.stamp(handle.path)
+
+    def commit(self):
+        '''Saves every tag with changes, then closes all tags'''
+        self.flush()
+        self._dispose()
+
+    def rollback(self):
+        '''Closes all tags without saving. Changes already written by flush are kept'''
+        for handle in self.handles.values():
+            if handle.dirty or handle.failed:
+                block_states.forget(handle.path)
+        self._dispose()
+
+    def _dispose(self):
+        for handle in self.handles.values():
+            handle.tag.Dispose()
+        self.handles.clear()
+
+def current_session() -> TagSession | None:
+    return active_session
+
+def close_tag(session: TagSession | None, key: str | None, tag, path: str, has_changes: bool, failed: bool):
+    '''Closes the tag file of a Tag. If the Tag was opened through a session (key is not None) its reference is given back and the session saves the tag when it commits.
+    Otherwise the tag is saved now if it has changes and did not fail, then disposed'''
+    if key is not None:
+        session.release(key, has_changes, failed)
+        return
+    if tag is None:
+        return
+    if failed:
+        # A block sync may have stopped part way, so neither the tag nor its recorded block state can be trusted
+        block_states.forget(path)
+    elif has_changes:
+        try:
+            tag.Save()
+            block_states.stamp(path)
+        except:
+            block_states.forget(path)
+    else:
+        block_states.stamp(path)
+    tag.Dispose()
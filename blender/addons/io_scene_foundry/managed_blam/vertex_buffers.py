@@ -0,0 +1,51 @@
+"""Decodes render geometry vertex buffers into arrays ready for Blender meshes"""
+
+import numpy as np
+
+def net_array_to_numpy(net_array, dtype, width: int) -> np.ndarray:
+    '''Converts a flat .NET array into a numpy array with width columns'''
+    return np.fromiter(net_array, dtype=dtype).reshape(-1, width)
+
+def decompress_texcoords(texcoords: np.ndarray, u_bounds=(0, 1), v_bounds=(0, 1)) -> np.ndarray:
+    '''Maps compressed texcoords into the given bounds and flips v to correct UVs for Blender'''
+    uvs = np.empty(texcoords.shape, dtype=np.single)
+    uvs[:, 0] = np.interp(texcoords[:, 0], (0, 1), u_bounds)
+    uvs[:, 1] = 1 - np.interp(texcoords[:, 1], (0, 1), v_bounds)
+    return uvs
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    '''Normalizes each row. Zero length rows are left as zero'''
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors), where=lengths > 0)
+
+def vertex_group_weights(node_indices: np.ndarray, node_weights: np.ndarray, node_map: list[int]) -> list[tuple[int, list[tuple[float, list[int]]]]]:
+    '''Groups per vertex node influences by node and weight, so each vertex group can be filled with one call per distinct weight.
+    Returns (node index, [(weight, vertex indices)]) in order of each node's first influence.
+    Influences outside the valid node range or without weight are skipped, and where a vertex references a node more than once the last influence wins'''
+    vertices = np.repeat(np.arange(len(node_indices)), node_indices.shape[1])
+    indices = node_indices.ravel()
+    weights = node_weights.ravel()
+    valid = (indices >= 0) & (indices <= 254) & (weights > 0)
+    vertices, indices, weights = vertices[valid], indices[valid], weights[valid]
+    if node_map:
+        indices = np.asarray(node_map, dtype=np.int32)[indices]
+    if not len(indices):
+        return []
+
+    # Keep the last influence for each vertex/node pair
+    pairs = vertices.astype(np.int64) * (int(indices.max()) + 1) + indices
+    _, last = np.unique(pairs[::-1], return_index=True)
+    last = np.sort(len(pairs) - 1 - last)
+    
+    _, first_influence = np.unique(indices, return_index=True)
+    node_order = indices[np.sort(first_influence)]
+    vertices, indices, weights = vertices[last], indices[last], weights[last]
+    
+    groups = []
+    for node_index in node_order.tolist():
+        node_mask = indices == node_index
+        node_vertices, node_weights = vertices[node_mask], weights[node_mask]
+        unique_weights, weight_groups = np.unique(node_weights, return_inverse=True)
+        groups.append((node_index, [(float(weight), node_vertices[weight_groups == idx].tolist()) for idx, weight in enumerate(unique_weights)]))
+
+    return groups
@@ -0,0 +1,134 @@
+'''Classifies lines of Tool output as errors, warnings, info, or noise while Tool is still running'''
+
+from collections import deque
+import os
+import re
+import threading
+import time
+from typing import Callable, IO
+
+ERROR = "error"
+WARNING = "warning"
+INFO = "info"
+NOISE = "noise"
+
+CATEGORIES = (ERROR, WARNING, INFO, NOISE)
+
+PREFIX = "prefix" # the line starts with the text
+CONTAINS = "contains" # the text is anywhere in the line
+PATTERN = "pattern" # (prefix, regular expression): the line starts with the prefix and the expression matches from the start of the line
+
+# Checked in order, the first matching rule decides the category
+IMPORT_RULES = (
+    (ERROR, PREFIX, "IMPORT FAILED"),
+    # this really shouldn't be a warning, so don't print/write it
+    (NOISE, CONTAINS, "(skipping tangent-space calculations)"),
+    (NOISE, CONTAINS, "if it is a decorator"),
+    # Pointless error and just ends up being spam
+    (NOISE, CONTAINS, "but has flags that only make sense on render geometry"),
+    # This is just incorrect and outputs when a mesh is a valid type for uncompressed
+    # Export logic prevents uncompressed from being applied to invalid types
+    (NOISE, CONTAINS, "Uncompressed vertices are not supported for meshes with type"),
+    # Annonying and outputs on things like collision geometry when it does not matter
+    (NOISE, CONTAINS, "which only makes sense on two-sided (or one sided transparent) geometry"),
+    # No but don't whine about shaders on imported geometry
+    (NOISE, CONTAINS, "Do you really want this?"),
+    # Skip because we often want the idle to not have animation e.g. for vehicles
+    (NOISE, CONTAINS, "Failed to find any animated nodes"),
+    # Skip since the animation import codec is fine
+    (NOISE, CONTAINS, "graph was imported with old codec which is no longer supported!"),
+    # Always outputs on new animation graph creation
+    (NOISE, CONTAINS, "animation graph update failed!"),
+    (NOISE, CONTAINS, "Mesh marked to include per-vertex alpha has entirely opaque values!"),
+    # Invalid error for cinematic sidecars
+    (NOISE, CONTAINS, "sidecar does not specify a model path"),
+    # Bungie what you doing
+    (NOISE, CONTAINS, "unrecognized output tag type cinematic_scene for object cinematic_scene"),
+    # Most animation output is written to stderr
+    # The message is whatever follows the last "animation:import: "
+    (WARNING, PATTERN, ("animation:import:", r".*animation:import: Failed to extract(?!.*animation:import: )")),
+    (ERROR, PATTERN, ("animation:import:", r".*animation:import: Failed(?!.*animation:import: )")),
+    (INFO, PREFIX, "animation:import:"),
+)
+
+def compile_rules(rules=IMPORT_RULES, default=WARNING) -> Callable[[str], str]:
+    '''Returns a function giving the category of the first rule a line matches, or default if none do.
+    Runs of prefix or contains rules with the same category are merged into one test, and runs of patterns into one regular expression whose alternatives keep the rule order.
+    The tests are written out as a single chain of if statements, as looping over the rules costs more than the string tests themselves.
+    Patterns are only run on lines which start with the prefix they share'''
+    groups = []
+    for category, kind, text in rules:
+        if kind not in (PREFIX, CONTAINS, PATTERN):
+            raise ValueError(f"Unknown tool output rule kind: {kind}")
+        if groups and groups[-1][1] == kind and (kind == PATTERN or groups[-1][0] == category):
+            groups[-1][2].append((category, text))
+        else:
+            groups.append((category, kind, [(category, text)]))
+
+    namespace = {}
+    lines = ["def classify(line):"]
+    for idx, (category, kind, texts) in enumerate(groups):
+        if kind == PREFIX:
+            prefixes = tuple(text for _, text in texts)
+            lines.append(f"    if line.startswith({prefixes[0] if len(prefixes) == 1 else prefixes!r}):")
+            lines.append(f"        return {category!r}")
+        elif kind == CONTAINS:
+            lines.append(f"    if {' or '.join(f'{text!r} in line' for _, text in texts)}:")
+            lines.append(f"        return {category!r}")
+        else:
+            prefix = os.path.commonprefix([prefix for _, (prefix, _) in texts])
+            namespace[f"match_{idx}"] = re.compile("|".join(f"(?P<rule_{n}>{pattern})" for n, (_, (_, pattern)) in enumerate(texts))).match
+            namespace[f"categories_{idx}"] = {f"rule_{n}": rule_category for n, (rule_category, _) in enumerate(texts)}
+            lines.append(f"    if line.startswith({prefix!r}):")
+            lines.append(f"        match = match_{idx}(line)")
+            lines.append(f"        if match is not None:")
+            lines.append(f"            return categories_{idx}[match.lastgroup]")
+    lines.append(f"    return {default!r}")
+    exec("\n".join(lines), namespace)
+    return namespace["classify"]
+
+class ToolOutputClassifier:
+    '''Sorts lines into categories using the rules. Keeps a count of each category and the most recent lines of each in bounded buffers'''
+    def __init__(self, rules=IMPORT_RULES, default=WARNING, buffer_size=200):
+        self.classify = compile_rules(rules, default)
+        self.counts = dict.fromkeys(CATEGORIES, 0)
+        self.recent = {category: deque(maxlen=buffer_size) for category in CATEGORIES}
+        self.lines = 0
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def add(self, line: str) -> str:
+        '''Classifies a line and records it'''
+        category = self.classify(line)
+        with self.lock:
+            self.lines += 1
+            self.counts[category] += 1
+            self.recent[category].append(line)
+        return category
+
+    def finish(self):
+        self.end_time = time.perf_counter()
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "lines": self.lines,
+                "seconds": round((self.end_time or time.perf_counter()) - self.start_time, 3),
+                "counts": dict(self.counts),
+                "recent": {category: list(lines) for category, lines in self.recent.items() if category != NOISE},
+            }
+
+def read_tool_output(stream: IO[bytes], classifier: ToolOutputClassifier, on_line: Callable[[str, str], None] = None) -> threading.Thread:
+    '''Starts a background thread which reads lines from stream until it closes, classifying each and passing it with its category to on_line'''
+    def reader():
+        for raw_line in stream:
+            line = raw_line.decode(errors="replace").rstrip("\r\n")
+            category = classifier.add(line)
+            if on_line is not None:
+                on_line(line, category)
+        classifier.finish()
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    return thread
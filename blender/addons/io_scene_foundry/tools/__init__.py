@@ -29,6 +29,8 @@ from .scene_scaler import NWO_ScaleScene
 from .append_foundry_materials import NWO_AppendFoundryMaterials
 from .auto_seam import NWO_AutoSeam
 from .clear_duplicate_materials import NWO_ClearShaderPaths, NWO_StompMaterials
+from .clear_export_cache import NWO_OT_ClearExportCache
+from .reset_export_profile_baseline import NWO_OT_ResetExportProfileBaseline
 from .export_bitmaps import NWO_ExportBitmapsSingle
 from .importer import NWO_FH_Import, NWO_FH_ImportBitmapAsImage, NWO_FH_ImportBitmapAsNode, NWO_FH_ImportShaderAsMaterial, NWO_Import, NWO_OT_ConvertScene, NWO_OT_ImportBitmap, NWO_OT_ImportFromDrop, NWO_OT_ImportShader
 from .mesh_to_marker import NWO_MeshToMarker
@@ -142,6 +144,8 @@ classes = (
     NWO_ShaderToNodes,
     NWO_AppendFoundryMaterials,
     NWO_ClearShaderPaths,
+    NWO_OT_ClearExportCache,
+    NWO_OT_ResetExportProfileBaseline,
     NWO_UpdateSets,
     NWO_ScaleScene,
     NWO_OT_ConvertToHaloRig,
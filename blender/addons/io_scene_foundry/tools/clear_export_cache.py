@@ -0,0 +1,23 @@
+from pathlib import Path
+import bpy
+
+from .. import utils
+from ..export.export_cache import invalidate
+
+class NWO_OT_ClearExportCache(bpy.types.Operator):
+    bl_idname = "nwo.clear_export_cache"
+    bl_label = "Clear Export Cache"
+    bl_description = "Forgets which granny files were unchanged at the last export, so that every granny file is written on the next export"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.nwo.sidecar_path
+
+    def execute(self, context):
+        asset_path = utils.get_asset_path_full()
+        if asset_path and invalidate(Path(asset_path)):
+            self.report({'INFO'}, "Cleared export cache")
+        else:
+            self.report({'INFO'}, "No export cache to clear")
+        return {"FINISHED"}
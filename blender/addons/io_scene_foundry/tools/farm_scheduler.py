@@ -0,0 +1,140 @@
+'''Runs farm work on a bounded pool of worker threads, starting main thread work as soon as the worker tasks it depends on have finished'''
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import itertools
+import os
+from subprocess import CalledProcessError
+import traceback
+from typing import Callable
+
+class FarmTask:
+    '''A single unit of farm work. Worker tasks run on the pool, main thread tasks run on the thread which calls FarmScheduler.run'''
+    def __init__(self, name: str, function: Callable, args=(), on_main_thread=False):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.on_main_thread = on_main_thread
+        self.waiting_on: set[str] = set()
+        self.dependents: list[FarmTask] = []
+        self.attempts = 0
+        self.error: str = None
+        self.cancelled = False
+        self.finished = False
+
+class FarmScheduler:
+    '''Schedules farm tasks by their dependencies. Worker tasks are submitted as soon as they are added (or as soon as their dependencies finish), so they can
+    start running while later tasks are still being queued. Tasks which fail with one of the retry_on exceptions are attempted again up to the given number of retries.
+    A task still runs if one of its dependencies failed, matching the farm's behaviour of building shaders even if a bitmap failed to import'''
+    def __init__(self, max_workers=0, retries=1, retry_on=(CalledProcessError,), log=None):
+        '''log provides update_job_count, and defaults to utils'''
+        if log is None:
+            from .. import utils as log
+        self.log = log
+        self.max_workers = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+        self.retries = retries
+        self.retry_on = retry_on
+        self.tasks: dict[str, FarmTask] = {}
+        self.main_queue: deque[FarmTask] = deque()
+        self.running: dict[Future, FarmTask] = {}
+        self.executor: ThreadPoolExecutor = None
+        self.cancelled = False
+
+    def add(self, name: str, function: Callable, *args, depends_on=(), on_main_thread=False) -> FarmTask:
+        '''Queues function(*args) to run once every named task in depends_on has finished. Names of tasks which have not been added are ignored'''
+        if name in self.tasks:
+            raise ValueError(f"Farm task {name} has already been added")
+        task = FarmTask(name, function, args, on_main_thread)
+        for dependency_name in depends_on:
+            dependency = self.tasks.get(dependency_name)
+            if dependency is not None and not dependency.finished and dependency_name not in task.waiting_on:
+                task.waiting_on.add(dependency_name)
+                dependency.dependents.append(task)
+
+        self.tasks[name] = task
+        if not task.waiting_on:
+            self._ready(task)
+
+        return task
+
+    def cancel(self):
+        '''Stops any task which has not started yet from running. Tasks already running are left to finish'''
+        self.cancelled = True
+        for future in self.running:
+            future.cancel()
+
+    def _ready(self, task: FarmTask):
+        if task.on_main_thread:
+            self.main_queue.append(task)
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.running[self.executor.submit(self._attempt, task)] = task
+
+    def _attempt(self, task: FarmTask):
+        while not self.cancelled:
+            task.attempts += 1
+            try:
+                task.function(*task.args)
+                task.error = None
+                return
+            except self.retry_on:
+                task.error = traceback.format_exc()
+                if task.attempts > self.retries:
+                    return
+            except Exception:
+                task.error = traceback.format_exc()
+                return
+
+        task.cancelled = True
+
+    def _finish(self, task: FarmTask):
+        task.finished = True
+        for dependent in task.dependents:
+            dependent.waiting_on.discard(task.name)
+            if not dependent.waiting_on:
+                self._ready(dependent)
+
+    def _collect(self, futures):
+        for future in futures:
+            task = self.running.pop(future)
+            if future.cancelled():
+                task.cancelled = True
+            self._finish(task)
+
+    def run(self, job_title: str) -> list[FarmTask]:
+        '''Runs every queued task, reporting progress under the given job title. Main thread tasks run in the order they become ready.
+        Returns the tasks which failed. A KeyboardInterrupt cancels all tasks which have not started'''
+        total = len(self.tasks)
+        if not total:
+            return []
+
+        spinner = itertools.cycle(["|", "/", "—", "\\"])
+        def completed():
+            return sum(task.finished for task in self.tasks.values())
+
+        try:
+            while self.main_queue or self.running:
+                if self.main_queue:
+                    task = self.main_queue.popleft()
+                    if self.cancelled:
+                        task.cancelled = True
+                    else:
+                        self._attempt(task)
+                    self._finish(task)
+                    self._collect([future for future in self.running if future.done()])
+                else:
+                    done, _ = wait(self.running, timeout=0.1, return_when=FIRST_COMPLETED)
+                    self._collect(done)
+
+                self.log.update_job_count(job_title, next(spinner), completed(), total)
+        except KeyboardInterrupt:
+            self.cancel()
+            raise
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                self.executor = None
+
+        self.log.update_job_count(job_title, "", completed(), total)
+        return [task for task in self.tasks.values() if task.error is not None]
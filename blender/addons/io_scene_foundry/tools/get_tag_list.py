@@ -3,7 +3,8 @@
 from pathlib import Path
 import bpy
 import os
-from ..utils import get_project_path, get_tags_path, is_corinth, os_sep_partition
+from ..utils import get_project_path, get_tags_path, is_corinth
+from .tag_index import get_tag_index, normalise_extensions
 
 global_items = {}
 scene_props = ('template_render_model', 'template_collision_model', 'template_physics_model', 'template_model_animation_graph', 'parent_animation_graph', 'render_model_path', 
@@ -53,6 +54,9 @@ class NWO_GetTagsList(bpy.types.Operator):
         return {'FINISHED'}
     
     def invoke(self, context, event):
+        # Rebuild the list each time it is opened so that new and deleted tags are picked up
+        global_items.pop(self.list_type, None)
+        get_tag_index(get_tags_path()).refresh()
         wm = context.window_manager
         wm.invoke_search_popup(self)
         return {"FINISHED"}
@@ -134,8 +138,9 @@ def extensions_from_type(list_type):
             return (".scenario")
         
 def walk_tags_dir(tags_dir, ext_list):
-    tags_set = set()
-    fav_tags = set()
+    """Returns the relative paths of tags with the given extensions. Favorite tags come first, followed by all other tags sorted by file name"""
+    extensions = tuple(normalise_extensions(ext_list))
+    fav_tags = {}
     # Display the favorite tags first, so grab these
     if is_corinth():
         fav_tags_file = os.path.join(get_project_path(), "FavoriteTags.txt")
@@ -143,19 +148,11 @@ def walk_tags_dir(tags_dir, ext_list):
             with open(fav_tags_file, "r") as file:
                 for line in file:
                     l = line.strip("\n ")
-                    if l and not l.startswith(";") and l.endswith(ext_list):
-                        fav_tags.add(l)
+                    if l and not l.startswith(";") and l.lower().endswith(extensions):
+                        fav_tags[l] = None
 
-    for root, dirs, files in os.walk(tags_dir):
-        for file in files:
-            if file.endswith(ext_list):
-                relative_path = str(Path(root, file).relative_to(tags_dir))
-                if relative_path not in fav_tags:
-                    tags_set.add(relative_path)
-
-    tags_sorted = sorted(tags_set, key=lambda x: os_sep_partition(x, True))
-    tags = [t for t in fav_tags]
-    tags.extend(tags_sorted)
+    tags = list(fav_tags)
+    tags.extend(t for t in get_tag_index(tags_dir).query(extensions) if t not in fav_tags)
     return tags
 
 class NWO_TagExplore(bpy.types.Operator):
@@ -6,6 +6,7 @@ from pathlib import Path
 import bpy
 from ..managed_blam.model import ModelTag
 from ..managed_blam.scenario_structure_lighting_info import ScenarioStructureLightingInfoTag
+from ..managed_blam.tag_session import TagSession
 from ..constants import WU_SCALAR
 from .. import utils
 
@@ -20,6 +21,7 @@ class BlamLightInstance:
         # self.data = ob.data
         data = ob.data
         nwo = data.nwo
+        self.name = ob.name
         self.data_name = ob.data.name
         self.bsp = bsp
         matrix = utils.halo_transforms(ob, scale, rotation)
@@ -199,39 +201,48 @@ class NWO_OT_ExportLights(bpy.types.Operator):
 def gather_lights(context):
     return [ob for ob in context.scene.objects if ob.type == 'LIGHT' and ob.data.type != 'AREA' and not ob.nwo.ignore_for_export]
 
-def export_lights(asset_path, asset_name, light_objects = None, bsps = None):
+def sync_lighting_info(info_path, light_instances, light_definitions):
+    """Writes only the lights which changed since the lighting info tag was last synced"""
+    with ScenarioStructureLightingInfoTag(path=info_path) as tag:
+        tag.build_tag(light_instances, light_definitions)
+
+def export_lights(asset_path=None, asset_name=None, light_objects = None, bsps = None):
+    if asset_path is None:
+        asset_path, asset_name = utils.get_asset_info()
     tags_dir = utils.get_tags_path()
     context = bpy.context
     asset_type = context.scene.nwo.asset_type
     if light_objects is None:
         light_objects = gather_lights(context)
     lights = [BlamLightInstance(ob, utils.true_region(ob.nwo)) for ob in light_objects]
-    if asset_type == 'scenario':
-        if bsps is None:
-            bsps = [r.name for r in context.scene.nwo.regions_table if r.name.lower() != 'shared']
-        lighting_info_paths = [str(Path(asset_path, f'{b}.scenario_structure_lighting_info')) for b in bsps]
-        for idx, info_path in enumerate(lighting_info_paths):
-            b = bsps[idx]
-            lights_list = [light for light in lights if light.bsp == b]
-            if not lights_list:
+    # Joins the export's tag session when lights are written during post processing
+    with TagSession():
+        if asset_type == 'scenario':
+            if bsps is None:
+                bsps = [r.name for r in context.scene.nwo.regions_table if r.name.lower() != 'shared']
+            lighting_info_paths = [str(Path(asset_path, f'{b}.scenario_structure_lighting_info')) for b in bsps]
+            for idx, info_path in enumerate(lighting_info_paths):
+                b = bsps[idx]
+                lights_list = [light for light in lights if light.bsp == b]
+                if not lights_list:
+                    if Path(tags_dir, utils.relative_path(info_path)).exists():
+                        sync_lighting_info(info_path, [], [])
+                else:
+                    light_instances = [light for light in lights_list]
+                    light_data = {bpy.data.lights.get(light.data_name) for light in lights_list}
+                    light_definitions = [BlamLightDefinition(data) for data in light_data]
+                    print(info_path)
+                    sync_lighting_info(info_path, light_instances, light_definitions)
+    
+        elif utils.is_corinth(context) and asset_type in ('model', 'sky', 'prefab'):
+            info_path = str(Path(asset_path, f'{asset_name}.scenario_structure_lighting_info'))
+            if not lights:
                 if Path(tags_dir, utils.relative_path(info_path)).exists():
-                    with ScenarioStructureLightingInfoTag(path=info_path) as tag: tag.clear_lights()
+                    sync_lighting_info(info_path, [], [])
             else:
-                light_instances = [light for light in lights_list]
-                light_data = {bpy.data.lights.get(light.data_name) for light in lights_list}
+                light_instances = [light for light in lights]
+                light_data = {bpy.data.lights.get(light.data_name) for light in lights}
                 light_definitions = [BlamLightDefinition(data) for data in light_data]
-                print(info_path)
-                with ScenarioStructureLightingInfoTag(path=info_path) as tag: tag.build_tag(light_instances, light_definitions)
-    
-    elif utils.is_corinth(context) and asset_type in ('model', 'sky', 'prefab'):
-        info_path = str(Path(asset_path, f'{asset_name}.scenario_structure_lighting_info'))
-        if not lights:
-            if Path(tags_dir, utils.relative_path(info_path)).exists():
-                with ScenarioStructureLightingInfoTag(path=info_path) as tag: tag.clear_lights()
-        else:
-            light_instances = [light for light in lights]
-            light_data = {bpy.data.lights.get(light.data_name) for light in lights}
-            light_definitions = [BlamLightDefinition(data) for data in light_data]
-            with ScenarioStructureLightingInfoTag(path=info_path) as tag: tag.build_tag(light_instances, light_definitions)
-            if asset_type in ('model', 'sky'):
-                with ModelTag(path=str(Path(asset_path, f'{asset_name}.model'))) as tag: tag.assign_lighting_info_tag(info_path)
\ No newline at end of file
+                sync_lighting_info(info_path, light_instances, light_definitions)
+                if asset_type in ('model', 'sky'):
+                    with ModelTag(path=str(Path(asset_path, f'{asset_name}.model'))) as tag: tag.assign_lighting_info_tag(info_path)
\ No newline at end of file
@@ -3,8 +3,28 @@
 from pathlib import Path
 import bpy
 from ..managed_blam.scenario_structure_bsp import ScenarioStructureBspTag
+from ..managed_blam.tag_session import TagSession
 from .. import utils
 
+# Object properties written to prefab elements
+PREFAB_PROPS = (
+    "prefab_lighting",
+    "prefab_lightmap_res",
+    "prefab_pathfinding",
+    "prefab_imposter_policy",
+    "prefab_imposter_brightness",
+    "prefab_imposter_transition_distance_auto",
+    "prefab_imposter_transition_distance",
+    "prefab_streaming_priority",
+    "prefab_cinematic_properties",
+    "prefab_render_only",
+    "prefab_does_not_block_aoe",
+    "prefab_excluded_from_lightprobe",
+    "prefab_decal_spacing",
+    "prefab_remove_from_shadow_geometry",
+    "prefab_disallow_lighting_samples",
+)
+
 class BlamPrefab:
     def __init__(self, ob, bsp=None, scale=None, rotation=None):
         nwo = ob.nwo
@@ -29,6 +49,10 @@ class BlamPrefab:
         self.up = [str(n) for n in up_matrix]
         self.position = [str(n) for n in matrix.translation]
         self.props = nwo
+        
+    def snapshot(self) -> tuple:
+        """Everything written to the prefab's tag element, for telling whether it changed since the last export"""
+        return (self.reference, self.scale, tuple(self.forward), tuple(self.left), tuple(self.up), tuple(self.position), tuple(getattr(self.props, prop) for prop in PREFAB_PROPS))
     
 class NWO_OT_ExportPrefabs(bpy.types.Operator):
     bl_idname = "nwo.export_prefabs"
@@ -52,7 +76,9 @@ def export_prefabs():
     prefabs = [BlamPrefab(ob, utils.true_region(ob.nwo)) for ob in gather_prefabs(bpy.context)]
     bsps = [r.name for r in bpy.context.scene.nwo.regions_table if r.name.lower() != 'shared']
     structure_bsp_paths = [str(Path(asset_path, f'{b}.scenario_structure_bsp')) for b in bsps]
-    for idx, bsp_path in enumerate(structure_bsp_paths):
-        b = bsps[idx]
-        prefabs_list = [prefab for prefab in prefabs if prefab.bsp == b]
-        with ScenarioStructureBspTag(path=bsp_path) as bsp: bsp.write_prefabs(prefabs_list)
\ No newline at end of file
+    # Joins any tag session already open, so the bsps are saved together with the rest of its tags
+    with TagSession():
+        for idx, bsp_path in enumerate(structure_bsp_paths):
+            b = bsps[idx]
+            prefabs_list = [prefab for prefab in prefabs if prefab.bsp == b]
+            with ScenarioStructureBspTag(path=bsp_path) as bsp: bsp.write_prefabs(prefabs_list)
\ No newline at end of file
@@ -0,0 +1,23 @@
+from pathlib import Path
+import bpy
+
+from .. import utils
+from ..export.profiler import reset_baseline
+
+class NWO_OT_ResetExportProfileBaseline(bpy.types.Operator):
+    bl_idname = "nwo.reset_export_profile_baseline"
+    bl_label = "Reset Export Profile Baseline"
+    bl_description = "Forgets the export profiles that later profiled exports are compared against (one per export mode, settings and cache state), so that the next profiled export of each becomes the new baseline"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.nwo.sidecar_path
+
+    def execute(self, context):
+        asset_path = utils.get_asset_path_full()
+        if asset_path and reset_baseline(Path(asset_path, "export")):
+            self.report({'INFO'}, "Reset export profile baselines")
+        else:
+            self.report({'INFO'}, "No export profile baselines to reset")
+        return {"FINISHED"}
@@ -4,6 +4,7 @@ import bpy
 
 from ...managed_blam.scenario import ScenarioTag
 from ... import utils
+from .lightmap_farm import CHECKPOINT_FILENAME, LightmapCheckpoint, LightmapFarm, ToolExecutor, checkpoint_key
 import os
 
 def scenario_exists() -> bool:
@@ -84,6 +85,7 @@ def run_lightmapper(
     model_lightmap=False,
     cpu_threads=1,
     structure_bsps=[],
+    executor=None,
 ):
     lightmap = LightMapper(
         not_bungie_game,
@@ -97,6 +99,7 @@ def run_lightmapper(
         model_lightmap,
         cpu_threads,
         structure_bsps,
+        executor,
     )
     if not_bungie_game:
         lightmap_results = lightmap.lightmap_h4()
@@ -120,6 +123,7 @@ class LightMapper:
         model_lightmap,
         cpu_threads,
         structure_bsps,
+        executor=None,
     ):
         self.lightmap_message = "Lightmap Successful"
         self.lightmap_failed = False
@@ -130,6 +134,7 @@ class LightMapper:
         self.light_group = self.get_light_group(lightmap_region, misc_halo_objects, not_bungie_game)
         self.thread_count = cpu_threads
         self.bsps = structure_bsps
+        self.executor = executor or ToolExecutor()
 
     # HELPERS --------------------------
     def get_light_group(self, lightmap_region, misc_halo_objects, not_bungie_game):
@@ -157,45 +162,17 @@ class LightMapper:
     def print_exec_time(self):
         print(datetime.datetime.now() - self.start_time)
 
-    def threads(self, stage, thread_index):
-        log_filename = os.path.join(self.blob_dir, "logs", stage, f"{thread_index}.txt")
-        log_dir = os.path.dirname(log_filename)
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-        with open(log_filename, "w") as log:
-            return (
-                utils.run_tool(
-                    [
-                        "faux_farm_" + stage,
-                        self.blob_dir,
-                        str(thread_index),
-                        str(self.thread_count),
-                    ],
-                    True,
-                    log,
-                ),
-                log_filename,
-            )
+    def checkpoint(self, directory, *settings):
+        '''Returns the checkpoint for this lightmap. It is only resumed from if the scenario, bsps and settings are unchanged'''
+        key = checkpoint_key(self.scenario, self.bsp, tuple(self.bsps), self.quality, *settings)
+        return LightmapCheckpoint(Path(utils.get_project_path(), directory, CHECKPOINT_FILENAME), key)
 
     def farm(self, stage):
         # self.print_exec_time()
-        processes = [
-            self.threads(stage, thread_index)
-            for thread_index in range(self.thread_count)
-        ]
-        for p, log_filename in processes:
-            if p.wait() != 0:
-                self.lightmap_message = f"Lightmapper failed during {stage}. See error log for details: {log_filename}\nIf nothing is written to the above log, it may be that you have minimal space remaining on your disk drive"
-                self.lightmap_failed = True
-                return False
-
-        utils.run_tool(
-            [
-                "faux_farm_" + stage + "_merge",
-                self.blob_dir,
-                str(self.thread_count),
-            ]
-        )
+        if not self.farm_runner.stage(stage):
+            self.lightmap_message = f"Lightmapper failed during {stage}. See error log for details: {self.farm_runner.failed_log}\nIf nothing is written to the above log, it may be that you have minimal space remaining on your disk drive"
+            self.lightmap_failed = True
+            return False
 
         return True
 
@@ -204,20 +181,23 @@ class LightMapper:
         self.analytical_light = "true"
         self.blob_dir = os.path.join("faux", self.blob_dir_name)
         self.start_time = datetime.datetime.now()
+        checkpoint = self.checkpoint(self.blob_dir, self.light_group, self.analytical_light, self.thread_count)
+        self.farm_runner = LightmapFarm(self.executor, checkpoint, self.blob_dir, self.thread_count)
 
         print("\n\nFaux Data Sync")
         print(
             "-------------------------------------------------------------------------\n"
         )
         # self.print_exec_time()
-        utils.run_tool(["faux_data_sync", self.scenario, self.bsp])
+        self.farm_runner.step("data_sync", ["faux_data_sync", self.scenario, self.bsp])
 
         print("\nFaux Farm")
         print(
             "-------------------------------------------------------------------------\n"
         )
         # self.print_exec_time()
-        utils.run_tool(
+        self.farm_runner.step(
+            "begin",
             [
                 "faux_farm_begin",
                 self.scenario,
@@ -258,16 +238,17 @@ class LightMapper:
         print(
             "-------------------------------------------------------------------------\n"
         )
-        utils.run_tool(["faux_farm_finish", self.blob_dir])
+        self.farm_runner.step("finish", ["faux_farm_finish", self.blob_dir])
 
-        utils.run_tool(
+        self.farm_runner.step(
+            "reorganize_mesh",
             [
                 "faux-reorganize-mesh-for-analytical-lights",
                 self.scenario,
                 self.bsp,
             ]
         )
-        utils.run_tool(
+        self.executor.run(
             [
                 "faux-build-vmf-textures-from-quadratic",
                 self.scenario,
@@ -276,6 +257,7 @@ class LightMapper:
                 "true",
             ]
         )
+        checkpoint.clear()
         self.lightmap_message = f"{utils.formalise_string(self.quality)} Quality lightmap complete"
         return self
 
@@ -290,63 +272,24 @@ class LightMapper:
         print(
             "-------------------------------------------------------------------------\n"
         )
-        try:
-            if self.model_lightmap:
-                utils.run_tool(
-                    [
-                        "faux_lightmap_model",
-                        self.scenario,
-                        self.suppress_dialog,
-                        self.force_reatlas,
-                    ]
-                )
-            else:
-                if self.bsp == "all":
-                    for bsp in self.bsps:
-                        if using_asset_settings:
-                            utils.run_tool(
-                                [
-                                    "faux_lightmap",
-                                    self.scenario,
-                                    bsp,
-                                    self.suppress_dialog,
-                                    self.force_reatlas,
-                                ]
-                            )
-                        else:
-                            utils.run_tool(
-                                [
-                                    "faux_lightmap_with_settings",
-                                    self.scenario,
-                                    bsp,
-                                    self.suppress_dialog,
-                                    self.force_reatlas,
-                                    self.settings,
-                                ]
-                            )
-                        # self.suppress_dialog = "true"
+        if self.model_lightmap:
+            steps = [("model", ["faux_lightmap_model", self.scenario, self.suppress_dialog, self.force_reatlas])]
+        else:
+            steps = []
+            for bsp in (self.bsps if self.bsp == "all" else [self.bsp]):
+                if using_asset_settings:
+                    steps.append((bsp, ["faux_lightmap", self.scenario, bsp, self.suppress_dialog, self.force_reatlas]))
                 else:
-                    if using_asset_settings:
-                        utils.run_tool(
-                            [
-                                "faux_lightmap",
-                                self.scenario,
-                                self.bsp,
-                                self.suppress_dialog,
-                                self.force_reatlas,
-                            ]
-                        )
-                    else:
-                        utils.run_tool(
-                            [
-                                "faux_lightmap_with_settings",
-                                self.scenario,
-                                self.bsp,
-                                self.suppress_dialog,
-                                self.force_reatlas,
-                                self.settings,
-                            ]
-                        )
+                    steps.append((bsp, ["faux_lightmap_with_settings", self.scenario, bsp, self.suppress_dialog, self.force_reatlas, self.settings]))
+                # self.suppress_dialog = "true"
+
+        # Each bsp is recorded once lightmapped, so a failure part way through only relights the remaining bsps next time
+        checkpoint = self.checkpoint("faux", self.model_lightmap, self.suppress_dialog, self.force_reatlas)
+        farm_runner = LightmapFarm(self.executor, checkpoint, "faux", self.thread_count)
+        try:
+            for name, args in steps:
+                farm_runner.step(name, args)
+            checkpoint.clear()
         except:
             utils.print_error("Failed to run lightmapper")
 
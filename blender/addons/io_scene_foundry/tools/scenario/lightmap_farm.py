@@ -0,0 +1,181 @@
+'''Checkpointed lightmap farm. Each finished step and farm client is recorded on disk so a failed or interrupted lightmap resumes where it stopped'''
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+
+CHECKPOINT_VERSION = 1
+CHECKPOINT_FILENAME = "foundry_lightmap_checkpoint.json"
+
+class LightmapCheckpoint:
+    '''Records the names of finished lightmap steps. Steps recorded under a different key (lightmap settings or bsps changed since) are discarded'''
+    def __init__(self, path: str | Path, key: str):
+        self.path = Path(path)
+        self.key = key
+        self.steps: set[str] = set()
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CHECKPOINT_VERSION and data.get("key") == self.key:
+            self.steps = set(data.get("steps", []))
+
+    def done(self, step: str) -> bool:
+        return step in self.steps
+
+    def complete(self, step: str):
+        '''Records a finished step and writes the checkpoint to disk immediately'''
+        self.steps.add(step)
+        data = {"version": CHECKPOINT_VERSION, "key": self.key, "steps": sorted(self.steps)}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as file:
+            json.dump(data, file, indent=1)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        self.steps.clear()
+        if self.path.exists():
+            self.path.unlink()
+
+def checkpoint_key(*settings) -> str:
+    '''Hashes the lightmap inputs. The scenario and structure bsp tags are deliberately left out, since the farm itself rewrites them as it runs'''
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr((CHECKPOINT_VERSION, settings)).encode())
+    return digest.hexdigest()
+
+class ToolExecutor:
+    '''Runs Tool commands for the lightmap farm'''
+    def run(self, args: list[str]):
+        '''Runs a command to completion, raising an exception if it fails'''
+        from ... import utils
+        utils.run_tool(args)
+
+    def start(self, args: list[str], log_filename: str):
+        '''Starts a command in the background and returns an object with a wait() method which returns the exit code'''
+        from ... import utils
+        with open(log_filename, "w") as log:
+            return utils.run_tool(args, True, log)
+
+class SimulatedToolExecutor(ToolExecutor):
+    '''Stand-in for Tool which writes a placeholder output for each command after the time given in timings (by command name).
+    Commands listed in failures fail that many times before succeeding. Files in rewrites are touched by every command, as Tool rewrites the scenario and bsp tags.
+    Useful for exercising the farm without a Halo editing kit'''
+    class _Process:
+        def __init__(self, function):
+            self.returncode = None
+            def target():
+                self.returncode = function()
+            self.thread = threading.Thread(target=target)
+            self.thread.start()
+
+        def wait(self):
+            self.thread.join()
+            return self.returncode
+
+    def __init__(self, output_dir: str | Path, timings: dict[str, float] = None, failures: dict[str, int] = None, rewrites=()):
+        self.output_dir = Path(output_dir)
+        self.rewrites = [Path(path) for path in rewrites]
+        self.timings = timings or {}
+        self.failures = dict(failures or {})
+        self.commands: list[list[str]] = []
+        self.lock = threading.Lock()
+
+    def _simulate(self, args: list[str]) -> int:
+        name = " ".join(args)
+        with self.lock:
+            self.commands.append(args)
+            remaining_failures = self.failures.get(name, 0)
+            if remaining_failures:
+                self.failures[name] = remaining_failures - 1
+        time.sleep(self.timings.get(args[0], 0))
+        if remaining_failures:
+            return 1
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        Path(self.output_dir, "_".join(Path(arg).name for arg in args) + ".out").write_text(name)
+        with self.lock:
+            for path in self.rewrites:
+                with open(path, "a") as file:
+                    file.write(name + "\n")
+        return 0
+
+    def run(self, args: list[str]):
+        if self._simulate(args) != 0:
+            raise RuntimeError(f"Simulated failure: {' '.join(args)}")
+
+    def start(self, args: list[str], log_filename: str):
+        return self._Process(lambda: self._simulate(args))
+
+class LightmapFarm:
+    '''Runs lightmap steps and farm stages through an executor, skipping anything the checkpoint records as finished.
+    Failed farm clients are rescheduled on their own, up to max_attempts times, before the stage is given up on'''
+    def __init__(self, executor: ToolExecutor, checkpoint: LightmapCheckpoint, blob_dir: str, client_count: int, max_attempts=2, log=None):
+        if log is None:
+            from ... import utils as log
+        self.log = log
+        self.executor = executor
+        self.checkpoint = checkpoint
+        self.blob_dir = blob_dir
+        self.client_count = client_count
+        self.max_attempts = max_attempts
+        self.failed_log: str = None
+
+    def step(self, name: str, args: list[str]) -> bool:
+        '''Runs a single command once. Returns False if it was skipped because a previous run finished it'''
+        if self.checkpoint.done(name):
+            print(f"--- {name} already complete, skipping")
+            return False
+        self.executor.run(args)
+        self.checkpoint.complete(name)
+        return True
+
+    def log_filename(self, stage: str, client: int) -> str:
+        log_filename = os.path.join(self.blob_dir, "logs", stage, f"{client}.txt")
+        os.makedirs(os.path.dirname(log_filename), exist_ok=True)
+        return log_filename
+
+    def stage(self, stage: str) -> bool:
+        '''Runs every unfinished client of a farm stage then merges their results. Returns False if a client still failed after its last attempt'''
+        merge_step = f"{stage}:merge"
+        if self.checkpoint.done(merge_step):
+            print(f"--- {stage} already complete, skipping")
+            return True
+
+        pending = [client for client in range(self.client_count) if not self.checkpoint.done(f"{stage}:{client}")]
+        if len(pending) < self.client_count:
+            print(f"--- Resuming {stage} with {len(pending)} of {self.client_count} clients remaining")
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not pending:
+                break
+            if attempt > 1:
+                self.log.print_warning(f"Rescheduling {len(pending)} failed {stage} client{'s' if len(pending) != 1 else ''} (attempt {attempt} of {self.max_attempts})")
+            processes = []
+            for client in pending:
+                log_filename = self.log_filename(stage, client)
+                process = self.executor.start(["faux_farm_" + stage, self.blob_dir, str(client), str(self.client_count)], log_filename)
+                processes.append((client, process, log_filename))
+
+            pending = []
+            for client, process, log_filename in processes:
+                if process.wait() == 0:
+                    self.checkpoint.complete(f"{stage}:{client}")
+                else:
+                    pending.append(client)
+                    self.failed_log = log_filename
+
+        if pending:
+            return False
+
+        self.executor.run(["faux_farm_" + stage + "_merge", self.blob_dir, str(self.client_count)])
+        self.checkpoint.complete(merge_step)
+        return True
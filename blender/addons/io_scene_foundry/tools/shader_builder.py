@@ -4,7 +4,9 @@ import bpy
 import os
 from ..managed_blam.shader import ShaderTag
 from ..managed_blam.material import MaterialTag
+from ..managed_blam.tag_session import TagSession
 from .. import utils
+from .tag_index import get_tag_index
 
 global_material_shaders = []
 material_shader_path = ""
@@ -34,14 +36,16 @@ def build_shader(material, corinth, folder="", report=None):
         shader_name = utils.get_shader_name(material)
         shader_path = os.path.join(shader_dir, shader_name)
         
-    if corinth:
-        with MaterialTag(path=shader_path) as tag:
-            nwo.shader_path = tag.write_tag(material, nwo.uses_blender_nodes, material_shader=nwo.material_shader)
-    else:
-        with ShaderTag(path=shader_path) as tag:
-            nwo.shader_path = tag.write_tag(material, nwo.uses_blender_nodes)
-        if report is not None:
-            report({'INFO'}, f"Created Shader Tag for {material.name}")
+    # The material shader and bitmaps read while writing the tag are loaded once each
+    with TagSession():
+        if corinth:
+            with MaterialTag(path=shader_path) as tag:
+                nwo.shader_path = tag.write_tag(material, nwo.uses_blender_nodes, material_shader=nwo.material_shader)
+        else:
+            with ShaderTag(path=shader_path) as tag:
+                nwo.shader_path = tag.write_tag(material, nwo.uses_blender_nodes)
+    if not corinth and report is not None:
+        report({'INFO'}, f"Created Shader Tag for {material.name}")
 
     return {"FINISHED"}
 
@@ -64,13 +68,9 @@ class NWO_ListMaterialShaders(bpy.types.Operator):
             return global_material_shaders
         items = []
         tags_dir = utils.get_tags_path()
-        shaders_dir = str(Path(tags_dir, "shaders", "material_shaders"))
-        material_shaders = []
-        # walk shaders dir and collect
-        for root, _, files in os.walk(shaders_dir):
-            for file in files:
-                if file.endswith(".material_shader"):
-                    material_shaders.append(os.path.join(root, file).replace(tags_dir + os.sep, ""))
+        tag_index = get_tag_index(tags_dir)
+        tag_index.refresh()
+        material_shaders = tag_index.query(".material_shader", under=str(Path("shaders", "material_shaders")))
         
         # Order so we get shaders in the materials folder first
         ordered_shaders = sorted(material_shaders, key=lambda s: (0, s) if s.startswith(r"shaders\material_shaders\materials") else (1, s))
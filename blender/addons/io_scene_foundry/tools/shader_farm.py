@@ -1,8 +1,5 @@
-import itertools
-import multiprocessing
 import os
 from pathlib import Path
-import threading
 import time
 import bpy
 
@@ -10,6 +7,7 @@ from .. import utils
 
 from ..icons import get_icon_id
 from ..managed_blam.bitmap import BitmapTag
+from ..tools.farm_scheduler import FarmScheduler
 from ..tools.export_bitmaps import save_image_as
 from ..tools.shader_builder import build_shader
 
@@ -105,10 +103,9 @@ class NWO_FarmShaders(bpy.types.Operator):
     def execute(self, context):
         with utils.ExportManager():
             self.corinth = utils.is_corinth(context)
-            self.thread_max = multiprocessing.cpu_count()
-            self.running_check = 0
-            self.bitmap_processes = 0
-            self.exported_bitmaps = []
+            self.scheduler = FarmScheduler()
+            self.exported_bitmaps = {}
+            self.image_tasks = {}
             shaders = {}
             shaders['new'] = []
             shaders['update'] = []
@@ -198,21 +195,9 @@ class NWO_FarmShaders(bpy.types.Operator):
                 for idx, bitmap in enumerate(valid_bitmaps):
                     tiff_path = self.export_tiff_if_needed(bitmap)
                     if tiff_path:
-                        self.thread_bitmap_export(bitmap)
+                        self.queue_bitmap_export(bitmap)
                 self.report({'INFO'}, f"Exported {bitmap_count} Bitmaps")
 
-                # Wait for Bitmap export to finish
-                print("")
-                job = "Reimporting Source Tiffs"
-                spinner = itertools.cycle(["|", "/", "—", "\\"])
-                total_p = self.bitmap_processes
-                while self.running_check:
-                    utils.update_job_count(
-                        job, next(spinner), total_p - self.running_check, total_p
-                    )
-                    time.sleep(0.1)
-                utils.update_job_count(job, "", total_p, total_p)
-
             if self.farm_type == "both" or self.farm_type == "shaders":
                 print(f"\nStarting {tag_type}s Export")
                 print(
@@ -227,14 +212,23 @@ class NWO_FarmShaders(bpy.types.Operator):
                 shader_count = len(valid_shaders)
                 print(f"{shader_count} {tag_type}s in Scope")
                 print(f"{tag_type}s Directory = {shaders_dir}\n")
+                for shader in valid_shaders:
+                    self.scheduler.add(f"shader:{shader.name}", self.export_shader, shader, shaders_dir, depends_on=self.shader_bitmap_tasks(shader), on_main_thread=True)
+
+            # Shaders are built as soon as the bitmaps they use have been reimported
+            print("")
+            if self.farm_type == "bitmaps":
+                job = "Reimporting Source Tiffs"
+            elif self.farm_type == "shaders":
                 job = f"Exporting {tag_type}s"
-                for idx, shader in enumerate(valid_shaders):
-                    utils.update_progress(job, idx / shader_count)
-                    shader.nwo.uses_blender_nodes = self.link_shaders
-                    if self.default_material_shader and Path(self.tags_dir, self.default_material_shader).exists():
-                        shader.nwo.material_shader = self.default_material_shader
-                    build_shader(shader, self.corinth, shaders_dir)
-                utils.update_progress(job, 1)
+            else:
+                job = f"Reimporting Source Tiffs & Exporting {tag_type}s"
+            failed = self.scheduler.run(job)
+            for task in failed:
+                utils.print_warning(f"\nFailed {task.name} after {task.attempts} attempt{'s' if task.attempts != 1 else ''}\n{task.error}")
+            if failed:
+                self.report({'WARNING'}, f"{len(failed)} farm job{'s' if len(failed) != 1 else ''} failed, see console for details")
+            if self.farm_type == "both" or self.farm_type == "shaders":
                 self.report({'INFO'}, f"Exported {shader_count} {tag_type}s")
 
             end = time.perf_counter()
@@ -282,7 +276,7 @@ class NWO_FarmShaders(bpy.types.Operator):
                 
         return image.nwo.filepath
     
-    def thread_bitmap_export(self, image):
+    def queue_bitmap_export(self, image):
         user_path = image.filepath_from_user()
         if user_path and Path(user_path).is_relative_to(Path(self.data_dir)):
             bitmap_path = str(Path(user_path).relative_to(Path(self.data_dir)).with_suffix('.bitmap'))
@@ -298,30 +292,40 @@ class NWO_FarmShaders(bpy.types.Operator):
         else:
             job = f"-- Created Tag:"
 
-        if not bitmap_path or bitmap_path not in self.exported_bitmaps:
-            path_no_ext = str(Path(image.nwo.filepath).with_suffix(""))
-            bitmap_path = path_no_ext + '.bitmap'
-            with BitmapTag(path=bitmap_path) as bitmap:
-                bitmap.new_bitmap(utils.dot_partition(image.nwo.source_name), image.nwo.bitmap_type, image.colorspace_settings.name)
-                
-            self.exported_bitmaps.append(bitmap_path)
-            print(f"{job} {bitmap_path}")
-            while self.running_check > self.thread_max * 2:
-                time.sleep(0.1)
+        if bitmap_path and bitmap_path in self.exported_bitmaps:
+            self.image_tasks[image.name] = self.exported_bitmaps[bitmap_path]
+            return
 
-            thread = threading.Thread(target=self.export_bitmap, args=(path_no_ext,))
-            thread.start()
-            self.first_bitmap = False
+        path_no_ext = str(Path(image.nwo.filepath).with_suffix(""))
+        bitmap_path = path_no_ext + '.bitmap'
+        with BitmapTag(path=bitmap_path) as bitmap:
+            bitmap.new_bitmap(utils.dot_partition(image.nwo.source_name), image.nwo.bitmap_type, image.colorspace_settings.name)
+            
+        task_name = f"bitmap:{bitmap_path}"
+        self.exported_bitmaps[bitmap_path] = task_name
+        self.image_tasks[image.name] = task_name
+        print(f"{job} {bitmap_path}")
+        if task_name not in self.scheduler.tasks:
+            self.scheduler.add(task_name, self.export_bitmap, path_no_ext)
 
     def export_bitmap(self, bitmap_path):
-        self.running_check += 1
-        self.bitmap_processes += 1
-        time.sleep(self.running_check / 10)
         if self.corinth:
             utils.run_tool(["reimport-bitmaps-single", bitmap_path, "default"], False, True)
         else:
             utils.run_tool(["reimport-bitmaps-single", bitmap_path], False, True)
-        self.running_check -= 1
+
+    def shader_bitmap_tasks(self, shader):
+        '''Returns the names of the bitmap reimport tasks for images used by this shader's nodes'''
+        if not shader.node_tree:
+            return []
+        images = {n.image.name for n in shader.node_tree.nodes if getattr(n, "image", None)}
+        return [self.image_tasks[name] for name in images if name in self.image_tasks]
+
+    def export_shader(self, shader, shaders_dir):
+        shader.nwo.uses_blender_nodes = self.link_shaders
+        if self.default_material_shader and Path(self.tags_dir, self.default_material_shader).exists():
+            shader.nwo.material_shader = self.default_material_shader
+        build_shader(shader, self.corinth, shaders_dir)
         
     def draw(self, context):
         layout = self.layout
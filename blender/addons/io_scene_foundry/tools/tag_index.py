@@ -0,0 +1,140 @@
+'''Persistent SQLite index of the files in a tags directory. Refreshing only lists directories whose modified time has changed since they were last indexed'''
+
+from collections import defaultdict
+import hashlib
+import os
+from pathlib import Path
+import sqlite3
+import tempfile
+import time
+
+INDEX_VERSION = 2
+# Directories modified this recently may change again within the same timestamp tick (FAT rounds to two seconds), so they are listed again on the next refresh
+RACY_WINDOW_NS = 2_000_000_000
+
+_indexes: dict[str, "TagIndex"] = {}
+
+def index_path(tags_dir: str) -> Path:
+    '''Returns the location of the index database for a tags directory. Each tags directory gets its own database in the Foundry app data folder'''
+    name = hashlib.blake2b(os.path.normcase(os.path.abspath(tags_dir)).encode(), digest_size=8).hexdigest()
+    return Path(os.getenv('APPDATA') or tempfile.gettempdir(), "Foundry", "tag_index", f"{name}.sqlite")
+
+def get_tag_index(tags_dir: str) -> "TagIndex":
+    '''Returns the shared index for a tags directory, opening it if needed'''
+    key = os.path.normcase(os.path.abspath(tags_dir))
+    index = _indexes.get(key)
+    if index is None:
+        index = _indexes[key] = TagIndex(tags_dir)
+    return index
+
+def normalise_extensions(extensions) -> list[str]:
+    '''Accepts a single extension or an iterable of them, with or without the leading dot'''
+    if not extensions:
+        return []
+    if isinstance(extensions, str):
+        extensions = (extensions,)
+    return sorted({ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions})
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+class TagIndex:
+    '''Stores the relative path, name, and extension of every file in a tags directory, along with the modified time of each directory.
+    Adding, removing, or renaming a file changes the modified time of its directory, so refresh only lists directories which differ from the index.
+    Editing a file does not change its directory, and the index holds nothing which would go stale when it does'''
+    def __init__(self, tags_dir: str, db_path: str | Path = None):
+        self.tags_dir = str(tags_dir)
+        self.db_path = Path(db_path) if db_path else index_path(tags_dir)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.db_path))
+        self._create_tables()
+
+    def _create_tables(self):
+        with self.connection:
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != INDEX_VERSION:
+                self.connection.execute("DROP TABLE IF EXISTS dirs")
+                self.connection.execute("DROP TABLE IF EXISTS tags")
+                self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS tags (path TEXT PRIMARY KEY, dir TEXT, name TEXT, extension TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS tags_extension ON tags (extension)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS tags_dir ON tags (dir)")
+
+    def close(self):
+        self.connection.close()
+
+    def refresh(self) -> int:
+        '''Brings the index up to date with the tags directory. Returns the number of directories which were listed'''
+        known = {}
+        children = defaultdict(list)
+        for path, parent, mtime_ns in self.connection.execute("SELECT path, parent, mtime_ns FROM dirs"):
+            known[path] = mtime_ns
+            if parent is not None:
+                children[parent].append(path)
+
+        visited = set()
+        listed = 0
+        racy_after = time.time_ns() - RACY_WINDOW_NS
+        stack = [""]
+        with self.connection:
+            while stack:
+                relative_dir = stack.pop()
+                full_dir = os.path.join(self.tags_dir, relative_dir)
+                try:
+                    mtime_ns = os.stat(full_dir).st_mtime_ns
+                except OSError:
+                    continue
+                visited.add(relative_dir)
+                if known.get(relative_dir) == mtime_ns:
+                    stack.extend(children[relative_dir])
+                    continue
+
+                subdirs = []
+                files = []
+                try:
+                    with os.scandir(full_dir) as entries:
+                        for entry in entries:
+                            relative_path = os.path.join(relative_dir, entry.name)
+                            if entry.is_dir():
+                                subdirs.append(relative_path)
+                            elif entry.is_file():
+                                files.append((relative_path, relative_dir, entry.name, os.path.splitext(entry.name)[1].lower()))
+                except OSError:
+                    continue
+
+                listed += 1
+                self.connection.execute("DELETE FROM tags WHERE dir = ?", (relative_dir,))
+                self.connection.executemany("INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?)", files)
+                # A recently modified directory is stored without its modified time, so a change in the same tick as this listing is not missed
+                self.connection.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (relative_dir, os.path.dirname(relative_dir) if relative_dir else None, mtime_ns if mtime_ns < racy_after else None))
+                stack.extend(subdirs)
+
+            removed = [(path,) for path in known if path not in visited]
+            self.connection.executemany("DELETE FROM dirs WHERE path = ?", removed)
+            self.connection.executemany("DELETE FROM tags WHERE dir = ?", removed)
+
+        return listed
+
+    def query(self, extensions=(), contains="", under="") -> list[str]:
+        '''Returns the relative paths of indexed tags, sorted by file name.
+        Filters by extension, by a case insensitive substring of the file name, and by a directory relative to the tags directory'''
+        clauses = []
+        parameters = []
+        extensions = normalise_extensions(extensions)
+        if extensions:
+            clauses.append(f"extension IN ({', '.join('?' * len(extensions))})")
+            parameters.extend(extensions)
+        if contains:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            parameters.append(f"%{_like_escape(contains)}%")
+        if under:
+            under = os.path.normpath(under).strip(os.sep)
+            clauses.append("(dir = ? OR dir LIKE ? ESCAPE '\\')")
+            parameters.extend((under, f"{_like_escape(under + os.sep)}%"))
+
+        sql = "SELECT path FROM tags"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY name, path"
+        return [row[0] for row in self.connection.execute(sql, parameters)]
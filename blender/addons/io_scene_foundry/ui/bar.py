@@ -470,6 +470,12 @@ class NWO_HaloExportSettings(bpy.types.Panel):
         col.prop(scene_nwo_export, "show_output", text="Toggle Output")
         if asset_type in {'cinematic', 'model', 'animation'}:
             col.prop(scene_nwo_export, "faster_animation_export")
+        row = col.row(align=True)
+        row.prop(scene_nwo_export, "use_export_cache")
+        row.operator("nwo.clear_export_cache", text="", icon='TRASH')
+        row = col.row(align=True)
+        row.prop(scene_nwo_export, "profile_export")
+        row.operator("nwo.reset_export_profile_baseline", text="", icon='FILE_REFRESH')
         col.separator()
         col = flow.column()
         col.use_property_split = False
@@ -1000,6 +1006,20 @@ class NWO_HaloExportPropertiesGroup(bpy.types.PropertyGroup):
     def set_lightmap_threads(self, value):
         self['lightmap_threads'] = value
     
+    use_export_cache: bpy.props.BoolProperty(
+        name="Skip Unchanged GR2 Files",
+        description="Skips writing granny files whose geometry, properties, materials, textures, and animation have not changed since the last export. Scene data is still gathered and the sidecar is still rebuilt on every export, only the writing of unchanged granny files is skipped. The cache is stored in the asset's export folder",
+        default=False,
+        options=set(),
+    )
+    
+    profile_export: bpy.props.BoolProperty(
+        name="Profile Export",
+        description="Records the time, CPU time, and memory spent on each export stage and on each mesh, animation, and granny file. Writes export_profile.json and a Chrome trace (export_profile.trace.json) to the asset's export folder, and reports stages which have got slower than the first profiled export",
+        default=False,
+        options=set(),
+    )
+    
     lightmap_threads: bpy.props.IntProperty(
         name="Thread Count",
         description="The number of CPU threads to use when lightmapping",
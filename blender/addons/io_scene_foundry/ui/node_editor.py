@@ -4,6 +4,7 @@ import os
 from pathlib import Path
 import bpy
 from .. import utils
+from ..tools.tag_index import get_tag_index
 
 all_material_shaders = []
 
@@ -62,12 +63,9 @@ class NWO_OT_HaloMaterialNodes(bpy.types.Operator):
                 else:
                     global all_material_shaders
                     if not all_material_shaders:
-                        tags_dir = utils.get_tags_path()
-                        material_shaders_dir = Path(tags_dir, 'shaders')
-                        for root, _, files in os.walk(material_shaders_dir):
-                            for file in files:
-                                if file.endswith(".material_shader"):
-                                    all_material_shaders.append(utils.dot_partition(file))
+                        tag_index = get_tag_index(utils.get_tags_path())
+                        tag_index.refresh()
+                        all_material_shaders.extend(utils.dot_partition(os.path.basename(path)) for path in tag_index.query(".material_shader", under='shaders'))
                     if n_group in all_material_shaders:
                         items.append((n_group, n_group, ''))
         return items    
@@ -21,7 +21,7 @@ import bpy
 import platform
 from mathutils import Euler, Matrix, Vector, Quaternion
 import os
-from subprocess import Popen, check_call
+from subprocess import CalledProcessError, Popen, check_call
 import random
 import xml.etree.ElementTree as ET
 import numpy as np
@@ -509,9 +509,28 @@ def run_tool(tool_args: list, in_background=False, null_output=False, event_leve
                 os.startfile(tmp_log)
             return result
         else:
-            return check_call(command)  # ,stderr=PIPE)
-
-
+            return check_call_classified(command)
+
+def print_tool_line(line: str, category: str):
+    """Prints a line of Tool output in the style of its tool_output category. Noise is not printed"""
+    from . import tool_output
+    if category == tool_output.ERROR:
+        print_error(line)
+    elif category == tool_output.WARNING:
+        print_warning(line)
+    elif category == tool_output.INFO:
+        print(line)
+
+def check_call_classified(command):
+    """check_call with Tool's stderr read on a background thread and printed by category"""
+    from . import tool_output
+    p = Popen(command, stderr=subprocess.PIPE)
+    reader = tool_output.read_tool_output(p.stderr, tool_output.ToolOutputClassifier(), print_tool_line)
+    p.wait()
+    reader.join()
+    if p.returncode:
+        raise CalledProcessError(p.returncode, command)
+    return p.returncode
 
 def run_tool_sidecar(tool_args: list, asset_path, event_level='WARNING'):
     """Runs Tool using the specified function and arguments. Do not include 'tool' in the args passed"""
@@ -535,62 +554,22 @@ def run_tool_sidecar(tool_args: list, asset_path, event_level='WARNING'):
     if not (cull_warnings or log_warnings):
         set_tool_event_level(event_level)
             
-    # Read and print stderr contents while writing to the file
+    # Read and print stderr contents on a background thread, classifying each line with the compiled rules in tool_output
     if cull_warnings:
-        for line in p.stderr:
-            line = line.decode().rstrip("\n")
-            if is_error_line(line):
-                print_error(line)
+        from . import tool_output
+        
+        def print_line(line, category):
+            nonlocal failed
+            if category == tool_output.ERROR and is_error_line(line):
                 failed = True
-            elif cull_warnings:
-                if "(skipping tangent-space calculations)" in line or "if it is a decorator" in line:
-                    # this really shouldn't be a warning, so don't print/write it
-                    continue
-                elif "but has flags that only make sense on render geometry" in line:
-                    # Pointless error and just ends up being spam
-                    continue
-                elif "Uncompressed vertices are not supported for meshes with type" in line:
-                    # This is just incorrect and outputs when a mesh is a valid type for uncompressed
-                    # Export logic prevents uncompressed from being applied to invalid types
-                    continue
-                elif "which only makes sense on two-sided (or one sided transparent) geometry" in line:
-                    # Annonying and outputs on things like collision geometry when it does not matter
-                    continue
-                elif "Do you really want this?" in line:
-                    # No but don't whine about shaders on imported geometry
-                    continue
-                elif "Failed to find any animated nodes" in line: # 07/01/2025 removed and "idle" from this
-                    # Skip because we often want the idle to not have animation e.g. for vehicles
-                    continue
-                elif "graph was imported with old codec which is no longer supported!" in line:
-                    # Skip since the animation import codec is fine
-                    continue
-                elif "animation graph update failed!" in line:
-                    # Always outputs on new animation graph creation
-                    continue
-                elif "Mesh marked to include per-vertex alpha has entirely opaque values!" in line:
-                    # Always outputs on new animation graph creation
-                    continue
-                elif "sidecar does not specify a model path" in line:
-                    # Invalid error for cinematic sidecars
-                    continue
-                elif "unrecognized output tag type cinematic_scene for object cinematic_scene" in line:
-                    # Bungie what you doing
-                    continue
-                else:
-                    # need to handle animation stuff. Most animation output is written to stderr...
-                    if line.startswith("animation:import:"):
-                        warning_line = line.rpartition("animation:import: ")[2]
-                        if warning_line.startswith("Failed to extract"):
-                            print_warning(line)
-                        elif warning_line.startswith("Failed"):
-                            print_error(line)
-                        else:
-                            print(line)
-                    else:
-                        print_warning(line)
+            print_tool_line(line, category)
+                
+        reader = tool_output.read_tool_output(p.stderr, tool_output.ToolOutputClassifier(), print_line)
 
     p.wait()
+    if cull_warnings:
+        # The reader finishes once Tool exits and closes its end of the pipe
+        reader.join()
     
     if tmp_log is not None and tmp_log.exists() and os.path.getsize(tmp_log) > 0:
         os.startfile(tmp_log)
@@ -0,0 +1,26 @@
+'''Makes the addon's pure python modules importable outside Blender.
+The addon and its packages run Blender registration (and load bpy and ManagedBlam) in their __init__ files, so the packages are created here as empty modules
+pointing at their real folders. Modules are then imported as normal, and any which need bpy or ManagedBlam still fail to import'''
+
+import sys
+import types
+from pathlib import Path
+
+ADDON_NAME = "io_scene_foundry"
+ADDON_DIR = Path(__file__).resolve().parents[1] / "blender" / "addons" / ADDON_NAME
+PACKAGES = ("export", "granny", "managed_blam", "tools", "tools.scenario")
+
+def _add_package(name: str, path: Path):
+    if name in sys.modules:
+        return
+    package = types.ModuleType(name)
+    package.__path__ = [str(path)]
+    package.__package__ = name
+    sys.modules[name] = package
+
+def install():
+    _add_package(ADDON_NAME, ADDON_DIR)
+    for package in PACKAGES:
+        _add_package(f"{ADDON_NAME}.{package}", ADDON_DIR.joinpath(*package.split(".")))
+
+install()
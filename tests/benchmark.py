@@ -0,0 +1,270 @@
+'''Headless benchmark of the export pipeline's pure python parts on a synthetic asset, using the fake Granny and tag backends.
+Each run is recorded with the export profiler, so the first run of each configuration is saved as its baseline and later runs list what got slower.
+
+    python tests/benchmark.py [--scale 1.0] [--threads 1] [--output DIR] [--reset-baseline]
+
+Runs twice, once writing every granny file and once with every file unchanged in the export cache, as those are profiled against separate baselines.
+Exits with status 1 if any stage or step regressed'''
+
+import argparse
+import io
+from pathlib import Path
+import random
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import addon # noqa: F401, E402
+from fakes import FakeBlock, FakeGranny, FakeTagBackend, RecordingLog, write_fake_granny_file # noqa: E402
+import reference # noqa: E402
+import synthetic # noqa: E402
+
+from io_scene_foundry import tool_output # noqa: E402
+from io_scene_foundry.block_sync import block_states # noqa: E402
+from io_scene_foundry.export.animation_tracks import AnimationSampler # noqa: E402
+from io_scene_foundry.export import sidecar_xml # noqa: E402
+from io_scene_foundry.export.export_cache import ExportCache, granny_file_key, settings_key # noqa: E402
+from io_scene_foundry.export.granny_writer import GrannyJob, GrannyWriter # noqa: E402
+from io_scene_foundry.export.profiler import ExportProfiler, reset_baseline # noqa: E402
+from io_scene_foundry.export.scene_graph import SceneGraph # noqa: E402
+from io_scene_foundry.export.vertex_buffer import granny_vertex_buffer, weld_loops # noqa: E402
+from io_scene_foundry.export.vertex_weights import top_bone_weights # noqa: E402
+from io_scene_foundry.managed_blam.index_buffer import triangle_strip_faces # noqa: E402
+from io_scene_foundry.managed_blam.tag_session import TagSession # noqa: E402
+from io_scene_foundry.managed_blam.vertex_buffers import decompress_texcoords, net_array_to_numpy, normalize_vectors, vertex_group_weights # noqa: E402
+from io_scene_foundry.tools.tag_index import TagIndex # noqa: E402
+
+DEFAULT_OUTPUT = Path(tempfile.gettempdir(), "foundry_benchmark")
+
+def write_granny_files(profiler: ExportProfiler, asset: synthetic.SyntheticAsset, directory: Path, threads: int):
+    '''Keys, checks and writes every granny file the way ExportScene.export_files does'''
+    cache = ExportCache(directory, settings_key("synthetic", asset.size.vertices))
+    writer = GrannyWriter(lambda: FakeGranny(), threads, RecordingLog())
+    with profiler.stage("export_cache_keys"):
+        for name, nodes in asset.files.items():
+            with profiler.step("granny key", name):
+                job = GrannyJob(name, Path(directory, "export", "models", name), nodes, conflict_keys=asset.conflict_keys[name])
+                job.cache_key = granny_file_key(asset.scene, nodes)
+                job.unchanged = cache.is_current(job.filepath, job.cache_key)
+                profiler.count("granny files unchanged" if job.unchanged else "granny files written")
+                writer.add(job)
+
+    def write(granny, job):
+        with profiler.step("granny file", job.name):
+            job.filepath.parent.mkdir(parents=True, exist_ok=True)
+            write_fake_granny_file(granny, job)
+        cache.record(job.filepath, job.cache_key)
+
+    with profiler.stage("write_granny_files"):
+        writer.run(write)
+    cache.save()
+
+def sync_lights(profiler: ExportProfiler, size: synthetic.AssetSize, directory: Path):
+    '''Syncs a lighting info tag's light block twice through a tag session: the first export, then one with a tenth of the lights moved'''
+    from io_scene_foundry.block_sync import sync_block
+    backend = FakeTagBackend()
+    path = str(Path(directory, "synthetic.scenario_structure_lighting_info"))
+    block = FakeBlock()
+    with profiler.stage("sync_tag_blocks"):
+        for export, changed in enumerate((0.0, 0.1)):
+            lights = synthetic.make_lights(size, changed=changed)
+            with profiler.step("light sync", f"export {export}"), TagSession(RecordingLog()) as session:
+                tag = backend.TagFile()
+                tag = session.open(path, tag, lambda tag: tag.New(path))
+                previous = block_states.previous(path, "instances", block.Elements.Count)
+                plan, changed_block = sync_block(block, previous, lights, lambda element, key: element.fields.update(name=key, snapshot=lights[key]))
+                block_states.record(path, "instances", [(key, lights[key]) for key in plan.order])
+                session.release(path, changed_block)
+                profiler.count("light elements written", len(plan.writes) + len(plan.replaces) + len(plan.appends))
+
+def write_sidecar(profiler: ExportProfiler, size: synthetic.AssetSize, directory: Path):
+    '''Streams a generated sidecar to disk, against pretty printing it through minidom as sidecars were written before'''
+    root = synthetic.make_sidecar(size)
+    with profiler.stage("write_sidecar"):
+        with profiler.step("sidecar", "bulk"):
+            sidecar_xml.write(root, Path(directory, "synthetic.sidecar.xml"))
+        with profiler.step("sidecar", "minidom reference"):
+            reference.write_sidecar(root, Path(directory, "synthetic_reference.sidecar.xml"))
+        profiler.count("sidecar bytes", Path(directory, "synthetic.sidecar.xml").stat().st_size)
+
+def query_scene_graph(profiler: ExportProfiler, size: synthetic.AssetSize, queries=2000, seed=0):
+    '''Builds the parent index of a random hierarchy and looks up the children of random objects, against scanning the child to parent dict for each lookup'''
+    parents = synthetic.make_hierarchy(size, seed)
+    rng = random.Random(seed)
+    sample = [rng.randrange(len(parents)) for _ in range(queries)]
+    with profiler.stage("scene_graph"):
+        with profiler.step("index", "build"):
+            graph = SceneGraph(parents)
+        with profiler.step("children", "bulk"):
+            for parent in sample:
+                graph.get_children(parent)
+        with profiler.step("children", "dict scan reference"):
+            for parent in sample:
+                reference.immediate_children(parents, parent)
+        with profiler.step("index", "walk"):
+            profiler.count("nodes walked", sum(1 for _ in graph.walk()))
+
+def build_virtual_meshes(profiler: ExportProfiler, size: synthetic.AssetSize):
+    '''Welds each mesh's loops into vertices and packs them into a granny vertex buffer as VirtualMesh does, against the structured array copy buffers were built with before'''
+    meshes = [synthetic.make_mesh_loops(size.vertices, seed) for seed in range(size.meshes_per_file)]
+    with profiler.stage("build_virtual_meshes"):
+        welded = []
+        with profiler.step("meshes", "weld loops"):
+            for loops in meshes:
+                vertex_loops, _ = weld_loops(loops)
+                welded.append([array[vertex_loops] for array in loops])
+        with profiler.step("vertex buffers", "bulk"):
+            for data in welded:
+                granny_vertex_buffer(data, synthetic.MESH_LOOP_DTYPES, len(data[0]), profiler)
+        with profiler.step("vertex buffers", "structured copy reference"):
+            for data in welded:
+                reference.vertex_buffer(data, synthetic.MESH_LOOP_DTYPES)
+        profiler.count("mesh loops", sum(len(loops[0]) for loops in meshes))
+
+def build_animation_tracks(profiler: ExportProfiler, size: synthetic.AssetSize):
+    '''Samples a rig for every frame and builds its track arrays with AnimationSampler, and again with the per frame, per bone path it replaced'''
+    bones, armature, poses = synthetic.make_rig(size)
+    rotation_matrix = synthetic.IDENTITY
+    with profiler.stage("animation_tracks"):
+        with profiler.step("tracks", "sampler"):
+            sampler = AnimationSampler(bones, size.frames, rotation_matrix)
+            for frame in range(size.frames):
+                for pbone, matrix in zip(armature.pose.bones, poses[frame]):
+                    pbone.matrix = matrix
+                sampler.record()
+            sampler.to_track_arrays()
+        with profiler.step("tracks", "per frame reference"):
+            reference.sample_tracks(sampler.matrices, sampler.parent_indices.tolist(), np.array(rotation_matrix))
+        profiler.count("bone frames", size.frames * size.bones)
+
+def decode_render_geometry(profiler: ExportProfiler, size: synthetic.AssetSize):
+    '''Decodes an imported render model mesh's vertex buffers with the bulk helpers, and again with the per vertex code they replaced'''
+    buffers = synthetic.make_render_vertices(size)
+    with profiler.stage("decode_render_geometry"):
+        with profiler.step("vertex buffers", "bulk"):
+            decompress_texcoords(net_array_to_numpy(buffers["texcoords"], np.double, 2), (-1, 1), (0, 2))
+            normalize_vectors(net_array_to_numpy(buffers["normals"], np.single, 3))
+            node_indices = net_array_to_numpy(buffers["node_indices"], np.int32, 4)
+            vertex_group_weights(node_indices, net_array_to_numpy(buffers["node_weights"], np.single, 4), [])
+        with profiler.step("vertex buffers", "per vertex reference"):
+            texcoords = [buffers["texcoords"][i:i+2] for i in range(0, len(buffers["texcoords"]), 2)]
+            reference.true_uvs(texcoords, (-1, 1), (0, 2))
+            reference.normalized([buffers["normals"][i:i+3] for i in range(0, len(buffers["normals"]), 3)])
+            reference.vertex_group_adds([buffers["node_indices"][i:i+4] for i in range(0, len(buffers["node_indices"]), 4)],
+                                        [buffers["node_weights"][i:i+4] for i in range(0, len(buffers["node_weights"]), 4)], [])
+        profiler.count("vertices", len(node_indices))
+
+def decode_index_buffers(profiler: ExportProfiler, size: synthetic.AssetSize):
+    '''Unpacks a triangle strip per imported mesh with triangle_strip_faces, and again with the per index loop it replaced'''
+    strips = [synthetic.make_strip(size.vertices * 3, size.vertices, seed, 0xFFFF) for seed in range(size.meshes_per_file)]
+    with profiler.stage("decode_index_buffers"):
+        with profiler.step("triangle strips", "bulk"):
+            for strip in strips:
+                triangle_strip_faces(strip, 0xFFFF)
+        with profiler.step("triangle strips", "per index reference"):
+            for strip in strips:
+                reference.strip_faces(strip.tolist(), 0xFFFF)
+        profiler.count("strip indices", sum(len(strip) for strip in strips))
+
+def refresh_tag_index(profiler: ExportProfiler, size: synthetic.AssetSize, directory: Path):
+    '''Indexes a generated tags tree, then refreshes it unchanged and with one folder changed, against the full walk tag lists made before the index'''
+    tags_dir = Path(directory, "tags")
+    if tags_dir.exists():
+        shutil.rmtree(tags_dir)
+    paths = synthetic.make_tag_tree(tags_dir, size)
+    db_path = Path(directory, "tag_index.sqlite")
+    db_path.unlink(missing_ok=True)
+    index = TagIndex(tags_dir, db_path)
+    with profiler.stage("refresh_tag_index"):
+        with profiler.step("tag index", "first refresh"):
+            profiler.count("tag folders listed", index.refresh())
+        with profiler.step("tag index", "unchanged refresh"):
+            profiler.count("tag folders listed", index.refresh())
+        Path(tags_dir, paths[-1]).unlink()
+        with profiler.step("tag index", "one folder changed"):
+            profiler.count("tag folders listed", index.refresh())
+        with profiler.step("tag list", "query"):
+            index.query(synthetic.TAG_EXTENSIONS[0])
+        with profiler.step("tag list", "full walk reference"):
+            reference.walk_tags_dir(str(tags_dir), synthetic.TAG_EXTENSIONS[:1])
+        profiler.count("tags", len(paths))
+    index.close()
+
+def classify_tool_output(profiler: ExportProfiler, size: synthetic.AssetSize):
+    '''Classifies generated Tool import output with the compiled rules, against the substring chain they replaced, then reads it through the reader thread'''
+    lines = synthetic.make_tool_lines(size.tool_lines)
+    classifier = tool_output.ToolOutputClassifier()
+    with profiler.stage("classify_tool_output"):
+        with profiler.step("tool lines", "compiled rules"):
+            for line in lines:
+                classifier.classify(line)
+        with profiler.step("tool lines", "substring chain reference"):
+            for line in lines:
+                reference.classify_tool_line(line)
+        with profiler.step("tool lines", "reader thread"):
+            stream = io.BytesIO("".join(line + "\r\n" for line in lines).encode())
+            tool_output.read_tool_output(stream, classifier).join()
+        profiler.count("tool lines", classifier.lines)
+
+def run_suite(profiler: ExportProfiler, asset: synthetic.SyntheticAsset, directory: Path, threads: int):
+    size = asset.size
+    write_granny_files(profiler, asset, directory, threads)
+
+    with profiler.stage("vertex_weights"):
+        for file_index in range(size.files):
+            with profiler.step("skin", f"file {file_index}"):
+                top_bone_weights(*synthetic.make_skin(size, file_index))
+
+    query_scene_graph(profiler, size)
+
+    write_sidecar(profiler, size, directory)
+
+    sync_lights(profiler, size, directory)
+    build_virtual_meshes(profiler, size)
+    build_animation_tracks(profiler, size)
+    decode_render_geometry(profiler, size)
+    decode_index_buffers(profiler, size)
+    refresh_tag_index(profiler, size, directory)
+
+    classify_tool_output(profiler, size)
+
+def run(scale=1.0, threads=1, output: Path = DEFAULT_OUTPUT, reset=False, quiet=False) -> list[dict]:
+    '''Runs the suite with the export cache cold then warm, writing a profile of each to output. Returns the two reports'''
+    output = Path(output)
+    asset_dir = Path(output, "asset")
+    report_dir = Path(output, "profile")
+    if reset:
+        reset_baseline(report_dir)
+    cache_path = Path(asset_dir, "export", "export_cache.json")
+    if cache_path.exists():
+        cache_path.unlink()
+
+    size = synthetic.AssetSize().scaled(scale)
+    asset = synthetic.make_asset(size)
+    reports = []
+    for _ in range(2):
+        profiler = ExportProfiler(True, {"suite": "synthetic", "scale": scale, "granny_write_threads": threads})
+        block_states.tags.clear()
+        run_suite(profiler, asset, asset_dir, threads)
+        profiler.write(report_dir)
+        if not quiet:
+            profiler.print_summary()
+        reports.append(profiler.last_report)
+    return reports
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplies every count of the synthetic asset")
+    parser.add_argument("--threads", type=int, default=1, help="Granny writer threads")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="Folder for the synthetic asset, profiles and baselines")
+    parser.add_argument("--reset-baseline", action="store_true", help="Forget the saved baselines, making this run the new baseline")
+    args = parser.parse_args()
+    reports = run(args.scale, args.threads, args.output, args.reset_baseline)
+    return 1 if any(report.get("regressions") for report in reports) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+'''Recording stand-ins for the Windows only backends (the granny dll, ManagedBlam and the Halo tools), used by the tests and benchmarks'''
+
+from pathlib import Path
+from subprocess import CalledProcessError
+import threading
+import time
+
+import numpy as np
+
+class RecordingLog:
+    '''Stands in for the utils progress and error printing functions'''
+    def __init__(self):
+        self.jobs: list[tuple[str, float]] = []
+        self.errors: list[str] = []
+        self.warnings: list[str] = []
+
+    def update_job(self, title: str, progress: float):
+        self.jobs.append((title, progress))
+
+    def update_job_count(self, message: str, spinner: str, completed: int, total: int):
+        self.jobs.append((message, completed / total))
+
+    def print_error(self, message: str):
+        self.errors.append(message)
+
+    def print_warning(self, message: str):
+        self.warnings.append(message)
+
+class FakeToolRunner:
+    '''Stands in for utils.run_tool. Records the order tool calls start and finish and the most calls running at once.
+    delay is the seconds each call takes and failures maps a call's first argument to the number of times it exits with an error before succeeding'''
+    def __init__(self, delay=0.0, failures: dict[str, int] = None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.lock = threading.Lock()
+        self.started: list[str] = []
+        self.finished: list[str] = []
+        self.threads: dict[str, int] = {}
+        self.active = 0
+        self.most_active = 0
+
+    def __call__(self, args: list[str], *_):
+        name = args[0]
+        with self.lock:
+            self.started.append(name)
+            self.threads[name] = threading.get_ident()
+            self.active += 1
+            self.most_active = max(self.most_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self.lock:
+                if self.failures.get(name, 0) > 0:
+                    self.failures[name] -= 1
+                    raise CalledProcessError(1, args)
+        finally:
+            with self.lock:
+                self.active -= 1
+                self.finished.append(name)
+
+class FakeGranny:
+    '''Stands in for granny.Granny. Each save writes a small file and records which instance wrote it and the meshes in use at the time, and each from_tree records the thread reading the scene.
+    delays maps file names to seconds to sleep while saving and failures is a set of file names which raise when saved'''
+    lock = threading.Lock()
+
+    def __init__(self, delays: dict[str, float] = None, failures=(), active_keys: set = None):
+        self.delays = delays or {}
+        self.failures = set(failures)
+        self.filename = ""
+        self.saved: list[str] = []
+        self.transformed: list[str] = []
+        self.overlaps: list[str] = []
+        # Shared between instances, so concurrent use of the same mesh can be detected
+        self.active_keys = active_keys if active_keys is not None else set()
+        self.nodes = {}
+        self.tree_threads: list[int] = []
+
+    def new(self, filepath: Path, *args):
+        self.filename = str(filepath)
+
+    def from_tree(self, scene, nodes: dict):
+        self.nodes = nodes
+        self.tree_threads.append(threading.get_ident())
+
+    def transform_vertices(self, vertex_count, layout, vertices, affine_3, linear_3x3, inverse_linear_3x3, renormalise, treat_as_deltas):
+        '''Offsets the positions at the start of each vertex by affine_3, in place as granny does'''
+        self.transformed.append(self.filename)
+        np.frombuffer(vertices, dtype=np.single).reshape(vertex_count, -1)[:, :3] += np.asarray(affine_3, dtype=np.single)
+
+    def transform(self):
+        '''Doubles every vertex of the nodes being written, in place as granny's unit conversion does'''
+        for node in self.nodes.values():
+            vertices = getattr(node, "baked_vertex_array", None)
+            if vertices is not None:
+                np.frombuffer(vertices, dtype=np.single)[:] *= 2
+
+    def save(self, keys=()):
+        with self.lock:
+            busy = self.active_keys.intersection(keys)
+            if busy:
+                self.overlaps.append(self.filename)
+            self.active_keys.update(keys)
+        try:
+            time.sleep(self.delays.get(Path(self.filename).name, 0))
+            if Path(self.filename).name in self.failures:
+                raise OSError(f"Granny failed to write {self.filename}")
+            Path(self.filename).write_bytes(b"gr2\0" + self.filename.encode())
+            self.saved.append(self.filename)
+        finally:
+            with self.lock:
+                self.active_keys.difference_update(keys)
+
+def write_fake_granny_file(granny: FakeGranny, job):
+    '''Does what ExportScene._write_granny_file does with a real granny instance'''
+    granny.new(job.filepath)
+    granny.from_tree(None, job.nodes)
+    granny.transform()
+    granny.save(job.conflict_keys)
+
+class FakeTagFile:
+    '''Stands in for a ManagedBlam TagFile, reporting loads, saves and disposals to its backend'''
+    def __init__(self, backend: "FakeTagBackend"):
+        self.backend = backend
+        self.path = None
+        self.fields: dict = {}
+        self.disposed = False
+
+    def Load(self, path):
+        if path not in self.backend.files:
+            raise OSError(f"No tag at {path}")
+        if path in self.backend.load_failures:
+            raise RuntimeError(f"Failed to load {path}")
+        self.path = path
+        self.fields = dict(self.backend.files[path])
+        self.backend.loads.append(path)
+
+    def New(self, path):
+        self.path = path
+        self.backend.news.append(path)
+
+    def Save(self):
+        assert not self.disposed, "Saved a disposed tag"
+        if self.path in self.backend.save_failures:
+            raise RuntimeError(f"Failed to save {self.path}")
+        self.backend.files[self.path] = dict(self.fields)
+        self.backend.saves.append(self.path)
+
+    def Dispose(self):
+        assert not self.disposed, "Disposed a tag twice"
+        self.disposed = True
+        self.backend.disposes += 1
+
+class FakeTagBackend:
+    '''Tag files on a pretend disk, as dicts of field values. Counts every load, save and tag file created and disposed'''
+    def __init__(self, files: dict = None, load_failures=(), save_failures=()):
+        self.files: dict[str, dict] = {path: dict(fields) for path, fields in (files or {}).items()}
+        self.load_failures = set(load_failures)
+        self.save_failures = set(save_failures)
+        self.loads: list[str] = []
+        self.news: list[str] = []
+        self.saves: list[str] = []
+        self.created = 0
+        self.disposes = 0
+
+    def TagFile(self) -> FakeTagFile:
+        self.created += 1
+        return FakeTagFile(self)
+
+    def open_files(self) -> int:
+        return self.created - self.disposes
+
+class FakeField:
+    '''A field selected from a FakeElement. Setting Data stores the value in the element and counts the write on its block'''
+    def __init__(self, element: "FakeElement", path: str):
+        self.element = element
+        self.path = path
+
+    @property
+    def Data(self):
+        return self.element.fields.get(self.path)
+
+    @Data.setter
+    def Data(self, value):
+        self.element.fields[self.path] = value
+        self.element.block.field_writes += 1
+
+class FakeElement:
+    '''Stands in for a ManagedBlam TagElement, with field values in a dict and a FakeBlock for each of its block's sub-blocks'''
+    def __init__(self, block: "FakeBlock", fields: dict = None):
+        self.block = block
+        self.fields = dict(fields or {})
+        self.blocks = {name: FakeBlock() for name in block.sub_blocks}
+
+    @property
+    def ElementIndex(self) -> int:
+        return self.block.items.index(self)
+
+    def SelectField(self, path: str):
+        block = self.blocks.get(path)
+        return block if block is not None else FakeField(self, path)
+
+class FakeElements:
+    def __init__(self, block: "FakeBlock"):
+        self.block = block
+
+    @property
+    def Count(self) -> int:
+        return len(self.block.items)
+
+    def __getitem__(self, index: int) -> FakeElement:
+        return self.block.items[index]
+
+    def __iter__(self):
+        return iter(list(self.block.items))
+
+class FakeBlock:
+    '''Stands in for a ManagedBlam TagFieldBlock. Each element gets an empty FakeBlock for every name in sub_blocks.
+    reads counts field reads made through get_value, so tests can tell a lookup from a scan, and field_writes counts fields set through SelectField'''
+    def __init__(self, rows: list[dict] = (), sub_blocks=()):
+        self.sub_blocks = tuple(sub_blocks)
+        self.items: list[FakeElement] = [FakeElement(self, row) for row in rows]
+        self.Elements = FakeElements(self)
+        self.reads = 0
+        self.field_writes = 0
+
+    def get_value(self, element: FakeElement, field_name: str):
+        self.reads += 1
+        return element.fields.get(field_name)
+
+    def AddElement(self) -> FakeElement:
+        element = FakeElement(self)
+        self.items.append(element)
+        return element
+
+    def InsertElement(self, index: int) -> FakeElement:
+        element = FakeElement(self)
+        self.items.insert(index, element)
+        return element
+
+    def RemoveElement(self, index: int):
+        del self.items[index]
+
+    def RemoveAllElements(self):
+        self.items.clear()
+
+    def values(self, field_name: str) -> list:
+        return [element.fields.get(field_name) for element in self.items]
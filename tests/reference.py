@@ -0,0 +1,270 @@
+'''Per element versions of code the export now does in bulk, kept as the oracles the tests compare against and the baselines the benchmark times'''
+
+from ctypes import c_ubyte
+import math
+import os
+from pathlib import Path
+import xml.dom.minidom
+import xml.etree.cElementTree as ET
+
+import numpy as np
+
+def decompose_matrix(matrix) -> tuple[tuple, tuple, tuple]:
+    '''mathutils Matrix.decompose for one 4x4 matrix, following mat4_to_loc_rot_size and mat3_normalized_to_quat in Blender's math library.
+    Returns location, quaternion as xyzw and scale'''
+    matrix = np.asarray(matrix, dtype=np.float64)
+    # Blender's matrices are indexed [column][row]
+    mat = matrix[:3, :3].T.copy()
+    size = [float(np.sqrt(mat[col] @ mat[col])) for col in range(3)]
+    for col in range(3):
+        if size[col]:
+            mat[col] /= size[col]
+    if np.linalg.det(mat) < 0:
+        mat = -mat
+        size = [-value for value in size]
+
+    if mat[2][2] < 0:
+        if mat[0][0] > mat[1][1]:
+            s = 2 * np.sqrt(max(1 + mat[0][0] - mat[1][1] - mat[2][2], 0))
+            if mat[1][2] < mat[2][1]:
+                s = -s
+            w, x, y, z = (mat[1][2] - mat[2][1]) / s, 0.25 * s, (mat[0][1] + mat[1][0]) / s, (mat[2][0] + mat[0][2]) / s
+        else:
+            s = 2 * np.sqrt(max(1 - mat[0][0] + mat[1][1] - mat[2][2], 0))
+            if mat[2][0] < mat[0][2]:
+                s = -s
+            w, x, y, z = (mat[2][0] - mat[0][2]) / s, (mat[0][1] + mat[1][0]) / s, 0.25 * s, (mat[1][2] + mat[2][1]) / s
+    else:
+        if mat[0][0] < -mat[1][1]:
+            s = 2 * np.sqrt(max(1 - mat[0][0] - mat[1][1] + mat[2][2], 0))
+            if mat[0][1] < mat[1][0]:
+                s = -s
+            w, x, y, z = (mat[0][1] - mat[1][0]) / s, (mat[2][0] + mat[0][2]) / s, (mat[1][2] + mat[2][1]) / s, 0.25 * s
+        else:
+            s = 2 * np.sqrt(1 + mat[0][0] + mat[1][1] + mat[2][2])
+            w, x, y, z = 0.25 * s, (mat[1][2] - mat[2][1]) / s, (mat[2][0] - mat[0][2]) / s, (mat[0][1] - mat[1][0]) / s
+
+    length = np.sqrt(w * w + x * x + y * y + z * z)
+    return tuple(matrix[:3, 3]), (x / length, y / length, z / length, w / length), tuple(size)
+
+def sample_tracks(matrices: np.ndarray, parent_indices: list[int], rotation_matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''The per frame, per bone track building AnimationSampler replaced: each bone's matrix is made relative to its parent's inverted world matrix,
+    decomposed and appended to flat float lists. matrices is (frames, bones, 4, 4) world space. Returns (bones, frames, 3 | 4 | 9) float32 arrays'''
+    num_frames, num_bones = matrices.shape[:2]
+    positions = [[] for _ in range(num_bones)]
+    orientations = [[] for _ in range(num_bones)]
+    scales = [[] for _ in range(num_bones)]
+    for frame in range(num_frames):
+        inverse_matrices = {}
+        for bone in range(num_bones):
+            matrix_world = rotation_matrix @ matrices[frame, bone]
+            inverse_matrices[bone] = np.linalg.inv(matrix_world)
+            parent = parent_indices[bone]
+            matrix = matrix_world if parent < 0 else inverse_matrices[parent] @ matrix_world
+            loc, rot, sca = decompose_matrix(matrix)
+            positions[bone].extend(loc)
+            orientations[bone].extend(rot)
+            scales[bone].extend((sca[0], 0.0, 0.0, 0.0, sca[1], 0.0, 0.0, 0.0, sca[2]))
+
+    def to_array(values, dimension):
+        return np.array(values, dtype=np.single).reshape(num_bones, num_frames, dimension)
+
+    return to_array(positions, 3), to_array(orientations, 4), to_array(scales, 9)
+
+def vertex_buffer(data: list[np.ndarray], dtypes: list[tuple]):
+    '''The structured array copy granny vertex buffers were built with before granny_vertex_buffer: fill a zeroed record array,
+    copy it to bytes, then copy the bytes into a ctypes array'''
+    vertex_array = np.zeros(len(data[0]), dtype=dtypes)
+    for array, data_type in zip(data, dtypes):
+        vertex_array[data_type[0]] = array
+    vertex_byte_array = vertex_array.tobytes()
+    return (c_ubyte * len(vertex_byte_array)).from_buffer_copy(vertex_byte_array)
+
+def true_uvs(texcoords, u_bounds=(0, 1), v_bounds=(0, 1)) -> list[tuple[float, float]]:
+    '''Mesh._true_uvs from before decompress_texcoords: one np.interp per coordinate of each vertex, with v flipped for Blender'''
+    return [(np.interp(u, (0, 1), u_bounds), 1 - np.interp(v, (0, 1), v_bounds)) for u, v in texcoords]
+
+def normalized(vectors) -> list[tuple[float, float, float]]:
+    '''mathutils Vector.normalized for each vector, which leaves zero length vectors as zero'''
+    results = []
+    for vector in vectors:
+        length = np.sqrt(sum(float(value) * float(value) for value in vector))
+        results.append(tuple(float(value) / length for value in vector) if length else (0.0, 0.0, 0.0))
+    return results
+
+def vertex_group_adds(node_indices, node_weights, node_map: list[int]) -> dict[int, dict[int, float]]:
+    '''The per vertex, per influence vertex_group.add(..., 'REPLACE') calls Mesh._create_mesh made before vertex_group_weights.
+    Returns the resulting groups as node index to vertex to weight, in the order the groups were created'''
+    groups = {}
+    for vertex, (indices, weights) in enumerate(zip(node_indices, node_weights)):
+        for index, weight in zip(indices, weights):
+            if 0 <= index <= 254 and weight > 0:
+                if node_map:
+                    index = node_map[index]
+                groups.setdefault(int(index), {})[vertex] = float(weight)
+    return groups
+
+def unpack_strip(indices):
+    '''IndexBuffer._unpack from before triangle_strip_faces, yielding the flat indices of each non degenerate triangle of a strip'''
+    i0, i1, i2 = 0, 0, 0
+    for pos, idx in enumerate(indices):
+        i0, i1, i2 = i1, i2, idx
+        if pos < 2 or i0 == i1 or i0 == i2 or i1 == i2: continue
+        yield i0
+        if pos % 2 == 0:
+            yield i1
+            yield i2
+        else:
+            yield i2
+            yield i1
+
+def strip_faces(indices, restart_index=None) -> list[list[int]]:
+    '''unpack_strip grouped into faces. With a restart index, each section between restarts is unpacked as its own strip'''
+    sections = [[]]
+    for idx in indices:
+        if restart_index is not None and idx == restart_index:
+            sections.append([])
+        else:
+            sections[-1].append(idx)
+    faces = []
+    for section in sections:
+        flat = list(unpack_strip(section))
+        faces.extend(flat[n:n+3] for n in range(0, len(flat), 3))
+    return faces
+
+def insert_pose_keys(action, frame: int, bone_name: str, location, rotation, scale):
+    '''The three PoseBone.keyframe_insert calls AnimationTag._apply_frames made for each bone on each frame, which key every
+    component of a channel into its fcurve, creating the fcurve in the bone's group the first time'''
+    escaped_name = bone_name.replace("\\", "\\\\").replace('"', '\\"')
+    for channel, values in (("location", location), ("rotation_quaternion", rotation), ("scale", scale)):
+        data_path = f'pose.bones["{escaped_name}"].{channel}'
+        for index, value in enumerate(values):
+            fcurve = action.fcurves.find(data_path, index=index)
+            if fcurve is None:
+                fcurve = action.fcurves.new(data_path=data_path, index=index, action_group=bone_name)
+            fcurve.keyframe_points.insert(frame, value)
+
+def calculate_z_vector(r: float, g: float) -> float:
+    x = (-1.0 * (1 - r)) + (1.0 * r)
+    y = (-1.0 * (1 - g)) + (1.0 * g)
+    z = np.sqrt(max(0, 1 - x * x - y * y))
+    return (z + 1) / 2
+
+def _gamma(value: float, gamma: str | None) -> float:
+    match gamma:
+        case 'linear':
+            return value ** 2.0
+        case 'srgb':
+            return (value ** 2.0) ** (1 / 2.2)
+    return value
+
+def bgra_to_rgba(pixels: np.ndarray, solid_alpha=False, calculate_blue=False, gamma: str = None) -> np.ndarray:
+    '''BitmapTag.bgra_to_rgba, bgra_to_rgba_solid_alpha and bgra_to_rgba_with_calculated_blue from before bitmap_pixels, looping over the flat bytes.
+    Gamma ('linear' or 'srgb') only applied when calculating blue'''
+    bgra_array = pixels.ravel().tolist()
+    for i in range(0, len(bgra_array), 4):
+        if solid_alpha:
+            bgra_array[i + 3] = 255
+        red = bgra_array[i + 2] / 255.0
+        green = bgra_array[i + 1] / 255.0
+        blue = bgra_array[i] / 255.0
+        if calculate_blue:
+            blue = calculate_z_vector(red, green)
+            red, green, blue = _gamma(red, gamma), _gamma(green, gamma), _gamma(blue, gamma)
+        bgra_array[i] = int(red * 255)
+        bgra_array[i + 1] = int(green * 255)
+        bgra_array[i + 2] = int(blue * 255)
+    return np.array(bgra_array, dtype=np.uint8).reshape(pixels.shape)
+
+def fix_blue_channel(pixels: np.ndarray) -> np.ndarray:
+    '''The normal map blue channel fix in BitmapTag from before bitmap_pixels: 2.2 gamma on red and green, then blue calculated from the result'''
+    rgb_values = pixels.ravel().tolist()
+    for i in range(0, len(rgb_values), 4):
+        red = (rgb_values[i + 2] / 255.0) ** 2.2
+        green = (rgb_values[i + 1] / 255.0) ** 2.2
+        blue = calculate_z_vector(red, green)
+        rgb_values[i + 2] = int(red * 255)
+        rgb_values[i + 1] = int(green * 255)
+        rgb_values[i] = int(blue * 255)
+    return np.array(rgb_values, dtype=np.uint8).reshape(pixels.shape)
+
+def cubemap_to_equirectangular(pixels: np.ndarray) -> np.ndarray:
+    '''BitmapTag's per pixel cubemap remap from before bitmap_pixels, reading each pixel from a copy of its horizontal cross face'''
+    height, width = pixels.shape[:2]
+    face_size = width // 4
+    corners = {"right": (2, 1), "left": (0, 1), "top": (1, 0), "bottom": (1, 2), "front": (1, 1), "back": (3, 1)}
+    faces = {face: pixels[y * face_size:(y + 1) * face_size, x * face_size:(x + 1) * face_size].copy() for face, (x, y) in corners.items()}
+    result = pixels.copy()
+    for y in range(height):
+        for x in range(width):
+            lon = ((x / float(width)) * 2 - 1) * math.pi
+            lat = ((y / float(height)) * 2 - 1) * (math.pi / 2)
+            X = math.cos(lat) * math.cos(lon)
+            Y = math.sin(lat)
+            Z = math.cos(lat) * math.sin(lon)
+            absX, absY, absZ = abs(X), abs(Y), abs(Z)
+            if absX >= absY and absX >= absZ:
+                face = "right" if X > 0 else "left"
+                u, v = (Z / absX + 1) / 2, (Y / absX + 1) / 2
+            elif absY >= absX and absY >= absZ:
+                face = "top" if Y > 0 else "bottom"
+                u, v = (X / absY + 1) / 2, (Z / absY + 1) / 2
+            else:
+                face = "front" if Z > 0 else "back"
+                u, v = (X / absZ + 1) / 2, (Y / absZ + 1) / 2
+            result[y, x] = faces[face][int(v * (face_size - 1)), int(u * (face_size - 1))]
+    return result
+
+def immediate_children(parents: dict, parent) -> list:
+    '''The previous VirtualScene.get_immediate_children: a scan of the whole child to parent dict for every query'''
+    return [ob for ob, ob_parent in parents.items() if ob_parent == parent]
+
+def write_sidecar(root: ET.Element, path: str | Path):
+    '''How sidecars were written before sidecar_xml: the tree is serialised, parsed into a minidom document and pretty printed as one string, then written without its blank lines'''
+    xml_string = xml.dom.minidom.parseString(ET.tostring(root)).toprettyxml(indent="  ")
+    part1, part2 = xml_string.split("?>")
+    with open(path, "w") as f:
+        f.write(part1 + 'encoding="{}" standalone="{}"?>\n'.format("utf-8", "yes"))
+        for line in part2.splitlines():
+            if line.strip():
+                f.write(line + "\n")
+
+def walk_tags_dir(tags_dir: str, extensions: tuple[str]) -> list[str]:
+    '''The tag list from before TagIndex: a full os.walk of the tags directory on every call, returning the relative paths of matching files'''
+    tags = set()
+    for root, dirs, files in os.walk(tags_dir):
+        for file in files:
+            if file.endswith(extensions):
+                tags.add(str(Path(root, file).relative_to(tags_dir)))
+    return sorted(tags, key=lambda path: (os.path.basename(path), path))
+
+TOOL_NOISE = (
+    "(skipping tangent-space calculations)",
+    "if it is a decorator",
+    "but has flags that only make sense on render geometry",
+    "Uncompressed vertices are not supported for meshes with type",
+    "which only makes sense on two-sided (or one sided transparent) geometry",
+    "Do you really want this?",
+    "Failed to find any animated nodes",
+    "graph was imported with old codec which is no longer supported!",
+    "animation graph update failed!",
+    "Mesh marked to include per-vertex alpha has entirely opaque values!",
+    "sidecar does not specify a model path",
+    "unrecognized output tag type cinematic_scene for object cinematic_scene",
+)
+
+def classify_tool_line(line: str) -> str:
+    '''The chain of substring checks run_tool_sidecar used before tool_output's compiled rules'''
+    if line.startswith("IMPORT FAILED"):
+        return "error"
+    for text in TOOL_NOISE:
+        if text in line:
+            return "noise"
+    if line.startswith("animation:import:"):
+        warning_line = line.rpartition("animation:import: ")[2]
+        if warning_line.startswith("Failed to extract"):
+            return "warning"
+        elif warning_line.startswith("Failed"):
+            return "error"
+        return "info"
+    return "warning"
@@ -0,0 +1,274 @@
+'''Generated stand-ins for the data an export works on, sized by a few counts so the same asset can be made small for tests or large for benchmarks.
+Shapes match what the export modules read (VirtualScene models, skeletons and nodes, sidecar trees, light lists), not the full Blender data'''
+
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import random
+from types import SimpleNamespace
+import xml.etree.cElementTree as ET
+
+import numpy as np
+
+from reference import TOOL_NOISE
+
+IDENTITY = ((1.0, 0.0, 0.0, 0.0), (0.0, 1.0, 0.0, 0.0), (0.0, 0.0, 1.0, 0.0), (0.0, 0.0, 0.0, 1.0))
+
+class BlenderObject:
+    '''Stands in for a bpy object, which export dicts key on by identity'''
+    def __init__(self, name: str):
+        self.name = name
+
+class PoseBones(list):
+    '''Stands in for an armature's pose bone collection, whose foreach_get returns each bone matrix column major'''
+    def foreach_get(self, attribute: str, buffer: np.ndarray):
+        buffer[:] = np.array([getattr(bone, attribute) for bone in self]).transpose(0, 2, 1).ravel()
+
+@dataclass
+class AssetSize:
+    '''files: granny files (permutations) written. meshes_per_file: mesh nodes in each file. vertices: vertices per mesh.
+    shared_meshes: fraction of mesh nodes which instance a mesh from another file, so their files must not be written at the same time'''
+    files: int = 8
+    meshes_per_file: int = 20
+    vertices: int = 2000
+    shared_meshes: float = 0.2
+    bones: int = 40
+    frames: int = 60
+    lights: int = 200
+    hierarchy: int = 20000
+    sidecar_contents: int = 2000
+    tool_lines: int = 50000
+    tags: int = 20000
+
+    def scaled(self, scale: float) -> "AssetSize":
+        return AssetSize(**{name: value if isinstance(value, float) else max(int(value * scale), 1) for name, value in vars(self).items()})
+
+@dataclass
+class SyntheticAsset:
+    scene: SimpleNamespace
+    files: dict[str, dict] = field(default_factory=dict) # granny file name to the nodes written to it
+    conflict_keys: dict[str, set] = field(default_factory=dict) # granny file name to the meshes it shares
+    size: AssetSize = None
+
+def make_mesh(rng: np.random.Generator, vertices: int) -> SimpleNamespace:
+    triangles = max(vertices // 2, 1)
+    return SimpleNamespace(
+        vertex_array=rng.random((vertices, 8), dtype=np.float32),
+        indices=rng.integers(0, vertices, (triangles, 3), dtype=np.int32),
+        groups=[(SimpleNamespace(name="wall", shader_path=r"shaders\wall", shader_type="shader", texture_key=None), 0, triangles)],
+        face_properties={"face_mode": SimpleNamespace(array=np.zeros(triangles, dtype=np.int32))},
+        siblings=[],
+    )
+
+def make_asset(size: AssetSize, seed=0) -> SyntheticAsset:
+    '''A model with one skeleton bone per mesh node, split into granny files. Instanced nodes reference the same mesh object as the node they copy'''
+    rng = np.random.default_rng(seed)
+    picker = random.Random(seed)
+    model_ob = BlenderObject("model")
+    model_node = SimpleNamespace(name="model", mesh=None, matrix_local=IDENTITY)
+    bones = []
+    asset = SyntheticAsset(SimpleNamespace(models={}, time_step=1 / 30), size=size)
+    meshes = []
+    for file_index in range(size.files):
+        file_name = f"model_render_perm_{file_index}.gr2"
+        nodes = {model_ob: model_node}
+        keys = asset.conflict_keys[file_name] = set()
+        for mesh_index in range(size.meshes_per_file):
+            if meshes and picker.random() < size.shared_meshes:
+                owner, mesh = picker.choice(meshes)
+                keys.add(id(mesh))
+                asset.conflict_keys[owner].add(id(mesh))
+            else:
+                mesh = make_mesh(rng, size.vertices)
+                meshes.append((file_name, mesh))
+            bone_ob = BlenderObject(f"perm_{file_index}_mesh_{mesh_index}")
+            node = SimpleNamespace(name=bone_ob.name, props={"bungie_object_type": "_connected_geometry_object_type_mesh", "bungie_permutation_name": f"perm_{file_index}"},
+                                   matrix_world=IDENTITY, matrix_local=IDENTITY, bone_bindings=[bone_ob.name], mesh=mesh, negative_scaling=False)
+            bones.append(SimpleNamespace(name=bone_ob.name, parent_index=0, matrix_local=IDENTITY, matrix_world=IDENTITY, props={}, node=node, bone=bone_ob))
+            nodes[bone_ob] = node
+        asset.files[file_name] = nodes
+
+    asset.scene.models["model"] = SimpleNamespace(name="model", ob=model_ob, node=model_node, skeleton=SimpleNamespace(bones=bones))
+    return asset
+
+def make_hierarchy(size: AssetSize, seed=0) -> dict[int, int | None]:
+    '''Child to parent dict of a random tree, as VirtualScene gathers it'''
+    rng = random.Random(seed)
+    parents = {0: None}
+    for node in range(1, size.hierarchy):
+        parents[node] = rng.randrange(node)
+    return parents
+
+CHILD_SIDECAR = '''<ContentObject Name="" Type="render_model">
+    <ContentNetwork Name="child &amp; &lt;alt&gt;" Type="">
+      <InputFile>objects\\synthetic\\child.blend</InputFile>
+      <IntermediateFile>objects\\synthetic\\export\\models\\child.gr2</IntermediateFile>
+    </ContentNetwork>
+    <OutputTagCollection/>
+  </ContentObject>'''
+
+def make_sidecar(size: AssetSize) -> ET.Element:
+    '''A model sidecar with one animation content network per animation, and the kinds of content written by build_sidecar: a header, empty elements,
+    values which need escaping and a ContentObject merged from a child sidecar which keeps the whitespace it was parsed with'''
+    metadata = ET.Element("Metadata")
+    header = ET.SubElement(metadata, "Header")
+    ET.SubElement(header, "MainRev").text = "0"
+    ET.SubElement(header, "PointRelease").text = "0"
+    ET.SubElement(header, "Description").text = "Forged in Foundry"
+    ET.SubElement(header, "Created").text = "2024-01-01 00:00:00"
+    ET.SubElement(header, "By").text = "synthetic"
+    ET.SubElement(header, "SourceFile").text = r"objects\synthetic\synthetic.blend"
+    asset = ET.SubElement(metadata, "Asset", Name="synthetic", Type="model")
+    ET.SubElement(asset, "OutputTagCollection")
+    contents = ET.SubElement(metadata, "Contents")
+    content = ET.SubElement(contents, "Content", Name="synthetic", Type="model")
+    content_object = ET.SubElement(content, "ContentObject", Name="", Type="model_animation_graph")
+    for idx in range(size.sidecar_contents):
+        network = ET.SubElement(content_object, "ContentNetwork", Name=f"combat pistol idle_{idx}", Type="Base", Compression="Default", ModelAnimationMovementData="None")
+        ET.SubElement(network, "InputFile").text = r"objects\synthetic\synthetic.blend"
+        ET.SubElement(network, "IntermediateFile").text = rf"objects\synthetic\export\animations\idle_{idx} & <alt>.gr2"
+    output = ET.SubElement(content_object, "OutputTagCollection")
+    ET.SubElement(output, "OutputTag", Type="model_animation_graph").text = r"objects\synthetic\synthetic"
+    content.append(ET.fromstring(CHILD_SIDECAR))
+    return metadata
+
+def make_skin(size: AssetSize, seed=0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Flat vertex group assignments for every vertex of one file, as read_vertex_groups returns them'''
+    rng = np.random.default_rng(seed)
+    vertices = size.meshes_per_file * size.vertices
+    counts = rng.integers(0, 7, vertices).astype(np.int32)
+    total = int(counts.sum())
+    return counts, rng.integers(0, size.bones, total).astype(np.int32), rng.random(total, dtype=np.float32)
+
+def make_lights(size: AssetSize, seed=0, changed=0.0) -> dict[str, tuple]:
+    '''Light name to the snapshot written to its tag element. changed is the fraction of lights given a different snapshot, as if moved since the last export'''
+    rng = random.Random(seed)
+    lights = {}
+    for idx in range(size.lights):
+        position = (idx * 1.5, idx % 7, 3.0)
+        if rng.random() < changed:
+            position = (position[0] + 1, position[1], position[2])
+        lights[f"light_{idx}"] = (f"light_definition_{idx % 10}", position, (1.0, 0.9, 0.8), 10.0)
+    return lights
+
+MESH_LOOP_DTYPES = [('Position', np.single, (3,)), ('Normal', np.single, (3,)), ('TextureCoordinates0', np.single, (3,)), ('DiffuseColor0', np.single, (3,))]
+
+def make_mesh_loops(num_vertices: int, seed=0) -> list[np.ndarray]:
+    '''Per loop position, normal, uv and colour arrays of a triangulated mesh, laid out as MESH_LOOP_DTYPES, as VirtualMesh reads them from Blender.
+    Each vertex is used by about three loops. Loops on hard edges and uv seams differ from the other loops of their vertex, so welding keeps them apart'''
+    rng = np.random.default_rng(seed)
+    num_loops = num_vertices * 3
+    loop_vertices = rng.integers(0, num_vertices, num_loops)
+    positions = rng.normal(size=(num_vertices, 3)).astype(np.single)[loop_vertices]
+    normals = rng.normal(size=(num_vertices, 3)).astype(np.single)[loop_vertices]
+    hard_edges = rng.random(num_loops) < 0.1
+    normals[hard_edges] = rng.normal(size=(int(hard_edges.sum()), 3))
+    uvs = np.zeros((num_loops, 3), dtype=np.single)
+    uvs[:, :2] = rng.random((num_vertices, 2))[loop_vertices]
+    seams = rng.random(num_loops) < 0.05
+    uvs[seams, :2] = rng.random((int(seams.sum()), 2))
+    colors = np.ones((num_loops, 3), dtype=np.single)
+    return [positions, normals, uvs, colors]
+
+def make_tool_lines(count: int, seed=0) -> list[str]:
+    '''Lines resembling a Tool import log, mostly noise as in a real import'''
+    rng = random.Random(seed)
+    templates = [f"### WARNING: object 'mesh_{{}}' {text}" for text in TOOL_NOISE]
+    templates += [
+        "### WARNING: material 'wall_{}' has no shader",
+        "animation:import: Failed to extract node {} from the graph",
+        "animation:import: Failed to import animation idle_{}",
+        "animation:import: Imported animation idle_{}",
+        "IMPORT FAILED on sidecar {}",
+    ]
+    weights = [20] * len(TOOL_NOISE) + [10, 2, 1, 20, 1]
+    return [template.format(idx) for idx, template in enumerate(rng.choices(templates, weights, k=count))]
+
+TAG_EXTENSIONS = (".bitmap", ".material", ".render_model", ".model", ".scenario_structure_bsp", ".model_animation_graph")
+
+def age_tree(root: Path, seconds=3600):
+    '''Moves the modified time of every directory under root (and root itself) into the past, as an untouched tags tree would be'''
+    mtime_ns = (int(os.stat(root).st_mtime) - seconds) * 1_000_000_000
+    for directory, _, _ in os.walk(root):
+        os.utime(directory, ns=(mtime_ns, mtime_ns))
+
+def make_tag_tree(root: Path, size: AssetSize, seed=0) -> list[str]:
+    '''A tags directory of size.tags empty tag files, spread over nested object folders with around 25 files each. Returns the relative file paths'''
+    rng = random.Random(seed)
+    directories = [Path()]
+    paths = []
+    for idx in range(size.tags):
+        if idx % 25 == 0:
+            directories.append(Path(rng.choice(directories), f"folder_{len(directories)}"))
+            Path(root, directories[-1]).mkdir(parents=True, exist_ok=True)
+        path = Path(rng.choice(directories[-4:]), f"tag_{idx}{rng.choice(TAG_EXTENSIONS)}")
+        Path(root, path).touch()
+        paths.append(str(path))
+    age_tree(root)
+    return paths
+
+def random_rotations(rng: np.random.Generator, count: int) -> np.ndarray:
+    '''Uniformly random (count, 3, 3) rotation matrices'''
+    quats = rng.normal(size=(4, count))
+    x, y, z, w = quats / np.linalg.norm(quats, axis=0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis=-1),
+        np.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis=-1),
+        np.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+def make_transforms(rng: np.random.Generator, shape: tuple) -> np.ndarray:
+    '''Random 4x4 transforms of the given leading shape, with non uniform scale that is negative on a fifth of the axes'''
+    count = int(np.prod(shape))
+    scale = rng.uniform(0.5, 2, (count, 3)) * np.where(rng.random((count, 3)) < 0.2, -1, 1)
+    matrices = np.tile(np.identity(4), (count, 1, 1))
+    matrices[:, :3, :3] = random_rotations(rng, count) * scale[:, np.newaxis, :]
+    matrices[:, :3, 3] = rng.uniform(-10, 10, (count, 3))
+    return matrices.reshape(*shape, 4, 4)
+
+def make_rig(size: AssetSize, seed=0) -> tuple[list[SimpleNamespace], BlenderObject, np.ndarray]:
+    '''An armature of size.bones bones, each parented to an earlier bone, with its animated bones as AnimationSampler takes them
+    and the armature space pose matrices of every bone for size.frames frames'''
+    rng = np.random.default_rng(seed)
+    armature = BlenderObject("armature")
+    armature.matrix_world = make_transforms(rng, ())
+    armature.pose = SimpleNamespace(bones=PoseBones(BlenderObject(f"bone_{idx}") for idx in range(size.bones)))
+    pose_bones = armature.pose.bones
+    bones = [SimpleNamespace(pbone=pbone, ob=armature, parent=pose_bones[int(rng.integers(idx))] if idx else None, is_object=False) for idx, pbone in enumerate(pose_bones)]
+    return bones, armature, make_transforms(rng, (size.frames, size.bones)).astype(np.single)
+
+def make_influences(num_vertices: int, num_nodes: int, seed=0) -> tuple[np.ndarray, np.ndarray]:
+    '''Four node indices and weights per vertex as render geometry stores them. Includes unused (255) and out of range slots, zero weights,
+    weights repeated across vertices and vertices which reference the same node twice'''
+    rng = np.random.default_rng(seed)
+    node_indices = rng.integers(0, num_nodes, (num_vertices, 4)).astype(np.int32)
+    node_indices[rng.random((num_vertices, 4)) < 0.1] = 255
+    node_indices[rng.random((num_vertices, 4)) < 0.02] = -1
+    node_indices[::9, 1] = node_indices[::9, 0]
+    node_weights = np.round(rng.random((num_vertices, 4)), 2).astype(np.single)
+    node_weights[rng.random((num_vertices, 4)) < 0.1] = 0
+    return node_indices, node_weights
+
+def make_render_vertices(size: AssetSize, seed=0) -> dict[str, list]:
+    '''Flat vertex buffers of one render model mesh, as the ManagedBlam render model reader returns them'''
+    rng = np.random.default_rng(seed)
+    vertices = size.meshes_per_file * size.vertices
+    node_indices, node_weights = make_influences(vertices, size.bones, seed)
+    return {
+        "positions": rng.normal(size=vertices * 3).astype(np.single).tolist(),
+        "texcoords": rng.random(vertices * 2).tolist(),
+        "normals": rng.normal(size=vertices * 3).astype(np.single).tolist(),
+        "node_indices": node_indices.ravel().tolist(),
+        "node_weights": node_weights.ravel().tolist(),
+    }
+
+def make_strip(length: int, num_vertices: int, seed=0, restart_index: int = None) -> np.ndarray:
+    '''A uint16 triangle strip index buffer. Repeated indices stitch sections together with degenerate triangles, as strippers emit them,
+    and restart_index is placed between sections if given'''
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, num_vertices, length).astype(np.uint16)
+    stitches = rng.random(length) < 0.1
+    indices[1:][stitches[1:]] = indices[:-1][stitches[1:]]
+    if restart_index is not None:
+        indices[rng.random(length) < 0.03] = restart_index
+    return indices
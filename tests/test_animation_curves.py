@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+import reference
+from io_scene_foundry.managed_blam.animation_curves import PoseChannelKeys, pose_bone_data_path, write_fcurves
+
+class KeyframePoints:
+    def __init__(self):
+        self.co = np.empty(0, dtype=np.single)
+
+    def insert(self, frame, value):
+        self.co = np.append(self.co, np.array((frame, value), dtype=np.single))
+
+    def add(self, count: int):
+        self.co = np.append(self.co, np.zeros(count * 2, dtype=np.single))
+
+    def foreach_set(self, attribute: str, values):
+        assert attribute == "co" and len(values) == len(self.co)
+        self.co[:] = values
+
+class FCurve:
+    def __init__(self, data_path: str, index: int, action_group: str):
+        self.data_path = data_path
+        self.array_index = index
+        self.group = action_group
+        self.keyframe_points = KeyframePoints()
+
+    def update(self):
+        pass
+
+class FCurves(list):
+    def find(self, data_path: str, index=0):
+        return next((fcurve for fcurve in self if fcurve.data_path == data_path and fcurve.array_index == index), None)
+
+    def new(self, data_path: str, index=0, action_group=""):
+        assert self.find(data_path, index) is None, "Blender raises when an fcurve already exists"
+        fcurve = FCurve(data_path, index, action_group)
+        self.append(fcurve)
+        return fcurve
+
+class Action:
+    '''Stands in for a bpy Action, recording its fcurves in creation order'''
+    def __init__(self):
+        self.fcurves = FCurves()
+
+    def layout(self) -> list[tuple]:
+        return [(fcurve.data_path, fcurve.array_index, fcurve.group, fcurve.keyframe_points.co.tolist()) for fcurve in self.fcurves]
+
+def random_channels(rng: np.random.Generator, num_frames: int, num_bones: int):
+    locations = rng.normal(size=(num_frames, num_bones, 3)).astype(np.single)
+    rotations = rng.normal(size=(num_frames, num_bones, 4)).astype(np.single)
+    rotations /= np.linalg.norm(rotations, axis=-1, keepdims=True)
+    scales = rng.uniform(0.5, 2, (num_frames, num_bones, 3)).astype(np.single)
+    return locations, rotations, scales
+
+BONE_NAMES = ["pedestal", "pelvis", "spine", 'r_"hand"', "l\\hand", "head"]
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bulk_fcurves_match_per_key_insertion(seed):
+    rng = np.random.default_rng(seed)
+    num_frames = 25
+    locations, rotations, scales = random_channels(rng, num_frames, len(BONE_NAMES))
+    keys = PoseChannelKeys(BONE_NAMES, num_frames)
+    expected = Action()
+    for frame in range(num_frames):
+        keys.set_frame(frame, locations[frame], rotations[frame], scales[frame])
+        for bone_index, bone_name in enumerate(BONE_NAMES):
+            reference.insert_pose_keys(expected, frame + 1, bone_name, locations[frame, bone_index], rotations[frame, bone_index], scales[frame, bone_index])
+
+    action = Action()
+    write_fcurves(action, keys)
+    assert len(action.fcurves) == len(BONE_NAMES) * 10
+    assert action.layout() == expected.layout()
+
+def test_frames_start_at_first_frame():
+    keys = PoseChannelKeys(["bone"], 3, first_frame=10)
+    for frame in range(3):
+        keys.set_frame(frame, np.full((1, 3), frame), np.array([[1, 0, 0, 0]]), np.ones((1, 3)))
+    curves = {(data_path, index): co for _, data_path, index, co in keys.curves()}
+    np.testing.assert_array_equal(curves[('pose.bones["bone"].location', 0)], [10, 0, 11, 1, 12, 2])
+    np.testing.assert_array_equal(curves[('pose.bones["bone"].rotation_quaternion', 0)], [10, 1, 11, 1, 12, 1])
+
+def test_unset_frames_are_zero():
+    keys = PoseChannelKeys(["bone"], 2)
+    keys.set_frame(1, np.ones((1, 3)), np.ones((1, 4)), np.ones((1, 3)))
+    assert keys.values[0].sum() == 0 and keys.values[1].sum() == 10
+
+def test_data_paths_escape_bone_names():
+    assert pose_bone_data_path('a "b" \\c', "scale") == 'pose.bones["a \\"b\\" \\\\c"].scale'
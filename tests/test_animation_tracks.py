@@ -0,0 +1,100 @@
+import math
+
+import numpy as np
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.export.animation_tracks import AnimationSampler, decompose_matrices
+
+def axis_rotation(axis, angle: float) -> np.ndarray:
+    x, y, z = np.asarray(axis, dtype=np.float64) / np.linalg.norm(axis)
+    c, s = math.cos(angle), math.sin(angle)
+    t = 1 - c
+    return np.array(((t * x * x + c, t * x * y - s * z, t * x * z + s * y),
+                     (t * x * y + s * z, t * y * y + c, t * y * z - s * x),
+                     (t * x * z - s * y, t * y * z + s * x, t * z * z + c)))
+
+def assert_matches_reference(matrices: np.ndarray):
+    loc, rot, sca = decompose_matrices(matrices)
+    for idx, matrix in enumerate(matrices):
+        expected_loc, expected_rot, expected_sca = reference.decompose_matrix(matrix)
+        np.testing.assert_allclose(loc[idx], expected_loc, atol=1e-12)
+        np.testing.assert_allclose(sca[idx], expected_sca, atol=1e-12)
+        np.testing.assert_allclose(rot[idx], expected_rot, atol=1e-9)
+
+def quaternion_matrices(quats: np.ndarray) -> np.ndarray:
+    x, y, z, w = np.moveaxis(quats, -1, 0)
+    return np.stack((
+        np.stack((1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)), axis=-1),
+        np.stack((2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)), axis=-1),
+        np.stack((2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)), axis=-1),
+    ), axis=-2)
+
+@pytest.mark.parametrize("seed", range(3))
+def test_decomposition_matches_reference(seed):
+    matrices = synthetic.make_transforms(np.random.default_rng(seed), (500,))
+    assert_matches_reference(matrices)
+
+    # Recomposing gives back the original matrix
+    loc, rot, sca = decompose_matrices(matrices)
+    np.testing.assert_allclose(quaternion_matrices(rot) * sca[:, np.newaxis, :], matrices[:, :3, :3], atol=1e-9)
+    np.testing.assert_allclose(loc, matrices[:, :3, 3])
+    assert np.all(rot[:, 3] >= 0)
+
+@pytest.mark.parametrize("scale", [(1, 1, 1), (-1, 1, 1), (1, -2, 1), (-1, -1, -1), (2, 0.5, -3)])
+def test_negative_scale_matches_reference(scale):
+    rng = np.random.default_rng(0)
+    matrices = np.tile(np.identity(4), (50, 1, 1))
+    matrices[:, :3, :3] = synthetic.random_rotations(rng, 50) * np.array(scale, dtype=np.float64)
+    assert_matches_reference(matrices)
+    # An odd number of negative axes is decomposed as a negative uniform flip, as mathutils does
+    _, _, sca = decompose_matrices(matrices)
+    assert np.all(np.sign(sca) == (-1 if np.prod(scale) < 0 else 1))
+
+@pytest.mark.parametrize("angle", [math.pi, math.pi - 1e-7, math.pi - 1e-3, math.pi + 1e-7])
+def test_near_half_turn_rotations_match_reference(angle):
+    axes = [(1, 0, 0), (0, 1, 0), (0, 0, 1), (1, 1, 0), (1, -1, 1), (-0.2, 0.1, 1), (1, 1e-8, 0)]
+    matrices = np.tile(np.identity(4), (len(axes), 1, 1))
+    matrices[:, :3, :3] = [axis_rotation(axis, angle) for axis in axes]
+    assert_matches_reference(matrices)
+    _, rot, _ = decompose_matrices(matrices)
+    np.testing.assert_allclose(quaternion_matrices(rot), matrices[:, :3, :3], atol=1e-9)
+
+def test_zero_scale_does_not_produce_nans():
+    matrices = np.tile(np.identity(4), (2, 1, 1))
+    matrices[0, :3, :3] = 0
+    loc, rot, sca = decompose_matrices(matrices)
+    assert np.all(np.isfinite(rot)) and np.all(np.isfinite(sca))
+
+def test_sampler_matches_per_frame_tracks():
+    size = synthetic.AssetSize(bones=12, frames=8)
+    bones, armature, poses = synthetic.make_rig(size, seed=3)
+    # An object animated on its own, not parented to any bone
+    prop = synthetic.BlenderObject("prop")
+    bones.append(synthetic.SimpleNamespace(pbone=prop, ob=prop, parent=None, is_object=True))
+    prop_matrices = synthetic.make_transforms(np.random.default_rng(4), (size.frames,))
+    rotation_matrix = synthetic.make_transforms(np.random.default_rng(5), ())
+
+    sampler = AnimationSampler(bones, size.frames, rotation_matrix)
+    for frame in range(size.frames):
+        for pbone, matrix in zip(armature.pose.bones, poses[frame]):
+            pbone.matrix = matrix
+        prop.matrix_world = prop_matrices[frame]
+        sampler.record()
+
+    world = np.concatenate((armature.matrix_world @ poses.astype(np.float64), prop_matrices[:, np.newaxis]), axis=1)
+    np.testing.assert_allclose(sampler.matrices, world)
+
+    parent_indices = [-1] + [armature.pose.bones.index(bone.parent) for bone in bones[1:-1]] + [-1]
+    assert sampler.parent_indices.tolist() == parent_indices
+    expected = reference.sample_tracks(world, parent_indices, rotation_matrix)
+    for array, expected_array in zip(sampler.to_track_arrays(), expected):
+        assert array.dtype == np.single and array.flags.c_contiguous
+        np.testing.assert_allclose(array, expected_array, atol=2e-4)
+
+def test_sampler_without_recorded_frames_returns_empty_tracks():
+    bones, _, _ = synthetic.make_rig(synthetic.AssetSize(bones=3, frames=4))
+    positions, orientations, scale_shears = AnimationSampler(bones, 4, np.identity(4)).to_track_arrays()
+    assert positions.shape == (3, 4, 3) and orientations.shape == (3, 4, 4) and scale_shears.shape == (3, 4, 9)
+    assert not positions.any() and not orientations.any()
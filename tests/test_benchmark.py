@@ -0,0 +1,16 @@
+import benchmark
+
+def test_benchmark_saves_a_baseline_per_cache_state_then_compares(tmp_path):
+    cold, warm = benchmark.run(0.05, 2, tmp_path, quiet=True)
+    assert cold["new_baseline"] and warm["new_baseline"]
+    assert cold["context"]["cache_state"] == "written"
+    assert warm["context"]["cache_state"] == "unchanged"
+
+    cold, warm = benchmark.run(0.05, 2, tmp_path, quiet=True)
+    assert "new_baseline" not in cold and "new_baseline" not in warm
+    assert isinstance(cold["regressions"], list) and isinstance(warm["regressions"], list)
+
+def test_reset_baseline_starts_over(tmp_path):
+    benchmark.run(0.05, 1, tmp_path, quiet=True)
+    cold, _ = benchmark.run(0.05, 1, tmp_path, reset=True, quiet=True)
+    assert cold["new_baseline"]
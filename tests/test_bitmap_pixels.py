@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import reference
+from io_scene_foundry.managed_blam.bitmap_pixels import bgra_to_rgba, bgra_to_rgba_with_calculated_blue, cubemap_to_equirectangular, fix_blue_channel
+
+# The gamma functions bitmap.GAMMA_FUNCTIONS maps each name to, and the normal map fix gamma
+GAMMAS = {None: None, 'linear': lambda v: v ** 2.0, 'srgb': lambda v: (v ** 2.0) ** (1 / 2.2)}
+
+def random_pixels(height: int, width: int, seed=0) -> np.ndarray:
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 4)).astype(np.uint8)
+    # Byte values from 0 up appear in every channel
+    count = min(height * width, 256)
+    pixels.reshape(-1, 4)[:count] = np.arange(count)[:, np.newaxis]
+    return pixels
+
+SIZES = [(16, 16), (17, 15), (32, 9)]
+
+@pytest.mark.parametrize("size", SIZES, ids=str)
+@pytest.mark.parametrize("solid_alpha", [False, True])
+def test_bgra_to_rgba_matches_per_pixel_loop(size, solid_alpha):
+    pixels = random_pixels(*size)
+    expected = reference.bgra_to_rgba(pixels, solid_alpha)
+    bgra_to_rgba(pixels, solid_alpha)
+    np.testing.assert_array_equal(pixels, expected)
+
+@pytest.mark.parametrize("size", SIZES, ids=str)
+@pytest.mark.parametrize("gamma", GAMMAS, ids=str)
+def test_calculated_blue_matches_per_pixel_loop(size, gamma):
+    pixels = random_pixels(*size, seed=1)
+    expected = reference.bgra_to_rgba(pixels, calculate_blue=True, gamma=gamma)
+    bgra_to_rgba_with_calculated_blue(pixels, GAMMAS[gamma])
+    np.testing.assert_array_equal(pixels, expected)
+
+@pytest.mark.parametrize("size", SIZES, ids=str)
+def test_blue_channel_fix_matches_per_pixel_loop(size):
+    pixels = random_pixels(*size, seed=2)
+    expected = reference.fix_blue_channel(pixels)
+    fix_blue_channel(pixels, lambda v: v ** 2.2)
+    np.testing.assert_array_equal(pixels, expected)
+
+@pytest.mark.parametrize("face_size", [1, 4, 9])
+def test_cubemap_remap_matches_per_pixel_loop(face_size):
+    pixels = random_pixels(face_size * 3, face_size * 4, seed=3)
+    np.testing.assert_array_equal(cubemap_to_equirectangular(pixels), reference.cubemap_to_equirectangular(pixels))
+
+def test_padded_rows_are_converted_in_place():
+    # get_granny_data converts the whole locked buffer including row padding, through a view
+    buffer = random_pixels(8, 12, seed=4)
+    expected = reference.bgra_to_rgba(buffer, True)
+    bgra_to_rgba(buffer[:, :10], True)
+    np.testing.assert_array_equal(buffer[:, :10], expected[:, :10])
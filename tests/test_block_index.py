@@ -0,0 +1,74 @@
+from fakes import FakeBlock
+from io_scene_foundry.managed_blam.block_index import BlockIndex
+
+def make_block(count=100) -> tuple[FakeBlock, BlockIndex]:
+    block = FakeBlock([{"name": f"region_{idx}"} for idx in range(count)])
+    return block, BlockIndex("name", block.get_value)
+
+def test_repeat_lookups_do_not_rescan():
+    block, index = make_block()
+    assert index.find(block, "region_50").ElementIndex == 50
+    reads = block.reads
+    for idx in range(100):
+        assert index.find(block, f"region_{idx}").ElementIndex == idx
+    # One read per lookup, to check the hit
+    assert block.reads - reads == 100
+
+def test_returns_the_first_matching_element():
+    block = FakeBlock([{"name": "a"}, {"name": "b"}, {"name": "a"}])
+    assert BlockIndex("name", block.get_value).find(block, "a").ElementIndex == 0
+
+def test_missing_value_and_empty_block():
+    block, index = make_block()
+    assert index.find(block, "missing") is None
+    assert index.find(FakeBlock(), "region_0") is None
+
+def test_value_written_in_place_without_the_helpers_is_found():
+    block, index = make_block()
+    index.find(block, "region_0")
+    block.items[70].fields["name"] = "renamed"
+    # Same element count, so only the scan on a miss can find it
+    assert index.find(block, "renamed") is block.items[70]
+    reads = block.reads
+    assert index.find(block, "renamed") is block.items[70]
+    assert block.reads - reads == 1
+
+def test_renamed_hit_is_not_returned():
+    block, index = make_block()
+    index.find(block, "region_0")
+    block.items[5].fields["name"] = "renamed"
+    assert index.find(block, "region_5") is None
+    assert index.find(block, "region_6") is block.items[6]
+
+def test_elements_added_and_removed_outside_the_helpers():
+    block, index = make_block(10)
+    index.find(block, "region_0")
+    block.RemoveElement(3)
+    assert index.find(block, "region_9").ElementIndex == 8
+    block.AddElement().fields["name"] = "new"
+    assert index.find(block, "new").ElementIndex == 9
+
+def test_block_swapped_under_the_same_field_path():
+    block, index = make_block(10)
+    index.find(block, "region_0")
+    other = FakeBlock([{"name": f"other_{idx}"} for idx in range(10)])
+    other.get_value = block.get_value
+    assert index.find(other, "other_4") is other.items[4]
+    assert index.find(other, "region_4") is None
+
+def test_helpers_keep_the_index_current():
+    block, index = make_block(10)
+    index.find(block, "region_0")
+    element = block.AddElement()
+    index.added(element, "added")
+    element.fields["name"] = "added"
+    index.changed(2, "changed")
+    block.items[2].fields["name"] = "changed"
+    reads = block.reads
+    assert index.find(block, "added") is element
+    assert index.find(block, "changed") is block.items[2]
+    assert block.reads - reads == 2
+
+def test_unhashable_values_are_scanned():
+    block = FakeBlock([{"name": [1, 2]}, {"name": [3]}])
+    assert BlockIndex("name", block.get_value).find(block, [3]) is block.items[1]
@@ -0,0 +1,126 @@
+import os
+import random
+
+import pytest
+
+from fakes import FakeBlock
+from io_scene_foundry.block_sync import BlockStates, SyncPlan, freeze, plan_sync, sync_block, unique_keys
+
+def write_element(element, key, snapshots, log):
+    element.fields.update(key=key, snapshot=snapshots[key])
+    log.append(key)
+
+def synced(block: FakeBlock, previous, snapshots, existing_key=None, write_in_place=False) -> tuple[SyncPlan, list]:
+    written = []
+    plan, _ = sync_block(block, previous, snapshots, lambda element, key: write_element(element, key, snapshots, written), existing_key, write_in_place)
+    assert block.values("key") == plan.order
+    assert [snapshots[key] for key in plan.order] == block.values("snapshot")
+    return plan, written
+
+def state(block: FakeBlock) -> list:
+    return list(zip(block.values("key"), block.values("snapshot")))
+
+@pytest.fixture
+def block() -> FakeBlock:
+    block = FakeBlock()
+    synced(block, None, {"a": 1, "b": 2, "c": 3, "d": 4})
+    return block
+
+def test_unchanged_writes_nothing(block):
+    plan, written = synced(block, state(block), {"a": 1, "b": 2, "c": 3, "d": 4})
+    assert not plan and not written
+
+def test_edit_rewrites_only_the_changed_element(block):
+    plan, written = synced(block, state(block), {"a": 1, "b": 20, "c": 3, "d": 4})
+    assert plan.writes == [(1, "b")] and written == ["b"]
+    assert not (plan.replaces or plan.removes or plan.appends)
+
+def test_add_appends(block):
+    plan, written = synced(block, state(block), {"a": 1, "b": 2, "c": 3, "d": 4, "e": 5})
+    assert plan.appends == ["e"] and written == ["e"]
+
+def test_remove_keeps_the_indices_of_elements_before_it(block):
+    plan, written = synced(block, state(block), {"a": 1, "b": 2, "d": 4})
+    assert plan.removes == [2] and not written
+    assert plan.indices() == {"a": 0, "b": 1, "d": 2}
+
+def test_add_reuses_a_removed_slot(block):
+    plan, written = synced(block, state(block), {"a": 1, "c": 3, "d": 4, "e": 5})
+    assert plan.replaces == [(1, "e")] and not plan.removes and written == ["e"]
+    assert plan.order == ["a", "e", "c", "d"]
+
+def test_reorder_keeps_elements_where_they_are(block):
+    plan, written = synced(block, state(block), {"d": 4, "c": 3, "b": 2, "a": 1})
+    assert not plan and not written
+    assert plan.order == ["a", "b", "c", "d"]
+
+def test_write_in_place_keeps_the_element(block):
+    element = block.items[2]
+    element.fields["unwritten"] = True
+    synced(block, state(block), {"a": 1, "b": 2, "c": 30, "d": 4}, write_in_place=True)
+    assert block.items[2] is element and element.fields["snapshot"] == 30
+
+def test_first_sync_without_existing_keys_rebuilds(block):
+    plan, written = synced(block, None, {"b": 2, "a": 1})
+    assert written == ["b", "a"]
+
+def test_first_sync_matches_existing_elements():
+    '''As Corinth light definitions are matched by their Definition Identifier, with unknown elements reused or removed'''
+    block = FakeBlock([{"id": "111", "extra": "kept"}, {"id": "999"}, {"id": "222"}])
+    names_by_id = {"111": "light_a", "222": "light_b"}
+    plan, written = synced(block, None, {"light_a": 1, "light_b": 2}, lambda element: names_by_id.get(element.fields["id"]), write_in_place=True)
+    assert plan.writes == [(0, "light_a"), (2, "light_b")]
+    assert plan.removes == [1]
+    assert block.items[0].fields["extra"] == "kept"
+
+def test_unique_keys_keep_duplicate_names_apart():
+    keys = unique_keys(["crate", "barrel", "crate", "crate"])
+    assert keys == [("crate", 0), ("barrel", 0), ("crate", 1), ("crate", 2)]
+    block = FakeBlock()
+    plan, _ = synced(block, None, dict(zip(keys, [1, 2, 3, 4])))
+    assert len(block.items) == 4
+    # Removing the second crate shifts the third into its key, so only that one is rewritten and the last element removed
+    keys = unique_keys(["crate", "barrel", "crate"])
+    plan, written = synced(block, state(block), dict(zip(keys, [1, 2, 4])))
+    assert written == [("crate", 1)] and plan.removes == [3]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_sequences_of_changes(seed):
+    rng = random.Random(seed)
+    block = FakeBlock()
+    previous = None
+    current = {}
+    for _ in range(30):
+        keys = list(current)
+        for key in rng.sample(keys, rng.randint(0, len(keys) // 2)):
+            del current[key]
+        for key in rng.sample(list(current), rng.randint(0, len(current))):
+            if rng.random() < 0.3:
+                current[key] += 1
+        for _ in range(rng.randint(0, 5)):
+            current[f"item_{rng.randrange(1000)}"] = 0
+        items = list(current.items())
+        rng.shuffle(items)
+        current = dict(items)
+        plan, written = synced(block, previous, current)
+        assert len(written) == len(set(written))
+        previous = state(block)
+
+def test_block_states_follow_the_tag_file(tmp_path):
+    path = tmp_path / "test.scenario_structure_lighting_info"
+    path.write_text("saved")
+    states = BlockStates()
+    states.record(path, "definitions", [("a", 1)])
+    # Trusted while the tag is still open, so later blocks of the same tag sync against it
+    states.record(path, "instances", [("b", 2)])
+    assert states.previous(path, "definitions", 1) == [("a", 1)]
+    states.stamp(path)
+    assert states.previous(path, "instances", 1) == [("b", 2)]
+    assert states.previous(path, "definitions", 1) == [("a", 1)]
+    assert states.previous(path, "definitions", 2) is None
+    path.write_text("saved by something else")
+    os.utime(path, ns=(0, 0))
+    assert states.previous(path, "definitions", 1) is None
+
+def test_freeze():
+    assert freeze({"b": [1, 2], "a": "x"}) == (("a", "x"), ("b", (1, 2)))
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import pytest
+
+from fakes import FakeBlock
+from io_scene_foundry.block_sync import block_states
+from io_scene_foundry.export.cinematic_frames import write_frames
+
+REACH_FIELDS = 9
+CORINTH_FIELDS = 11
+
+class StubFrame:
+    '''The values of export.cinematic.Frame which are written to a frame data element'''
+    def __init__(self, position):
+        self.position = position
+        self.forward = (1.0, 0.0, 0.0)
+        self.up = (0.0, 0.0, 1.0)
+        self.focal_length = 65.0
+        self.depth_of_field = 0
+        self.focal_depth = self.blur_amount = 0.0
+        self.near_focal_plane_distance = self.far_focal_plane_distance = 0.0
+        self.near_focal_depth = self.far_focal_depth = 0.0
+        self.near_blur_amount = self.far_blur_amount = 0.0
+
+    def signature(self) -> tuple:
+        return (self.position, self.forward, self.up, self.focal_length, self.depth_of_field, self.focal_depth)
+
+def make_shots(*frame_counts):
+    return [SimpleNamespace(frames=[StubFrame((float(shot), float(frame), 0.0)) for frame in range(count)]) for shot, count in enumerate(frame_counts)]
+
+def positions(block_shots, shot):
+    return block_shots.Elements[shot].SelectField("frame data").values("Struct:camera frame[0]/RealPoint3d:camera position")
+
+@pytest.fixture
+def tag_path(tmp_path):
+    path = str(tmp_path / "scene.cinematic_scene")
+    yield path
+    block_states.forget(path)
+
+def export(tag_path, block_shots, shots, corinth=False):
+    '''Writes frames then stamps the synced state, as closing the Tag after a successful save does'''
+    for shot in range(block_shots.Elements.Count):
+        block_shots.Elements[shot].SelectField("frame data").field_writes = 0
+    changed = write_frames(tag_path, block_shots, shots, corinth)
+    block_states.stamp(tag_path)
+    return changed
+
+def frame_writes(block_shots, shot) -> int:
+    return block_shots.Elements[shot].SelectField("frame data").field_writes
+
+def test_first_export_writes_every_frame(tag_path):
+    block_shots = FakeBlock([{}, {}], sub_blocks=("frame data",))
+    shots = make_shots(3, 2)
+    assert export(tag_path, block_shots, shots)
+    assert positions(block_shots, 0) == [frame.position for frame in shots[0].frames]
+    assert positions(block_shots, 1) == [frame.position for frame in shots[1].frames]
+    assert frame_writes(block_shots, 0) == 3 * REACH_FIELDS
+
+def test_unchanged_frames_are_not_rewritten(tag_path):
+    block_shots = FakeBlock([{}, {}], sub_blocks=("frame data",))
+    export(tag_path, block_shots, make_shots(3, 2))
+    assert not export(tag_path, block_shots, make_shots(3, 2))
+    assert frame_writes(block_shots, 0) == frame_writes(block_shots, 1) == 0
+
+def test_only_the_changed_frame_is_written_in_place(tag_path):
+    block_shots = FakeBlock([{}, {}], sub_blocks=("frame data",))
+    export(tag_path, block_shots, make_shots(4, 2), corinth=True)
+    frame_data = block_shots.Elements[0].SelectField("frame data")
+    elements = list(frame_data.Elements)
+
+    shots = make_shots(4, 2)
+    shots[0].frames[2].position = (9.0, 9.0, 9.0)
+    assert export(tag_path, block_shots, shots, corinth=True)
+    assert frame_writes(block_shots, 0) == CORINTH_FIELDS and frame_writes(block_shots, 1) == 0
+    # Written in place, the elements themselves are kept
+    assert list(frame_data.Elements) == elements
+    assert positions(block_shots, 0)[2] is None
+    assert frame_data.values("Struct:camera frame[0]/Struct:dynamic data[0]/RealPoint3d:camera position")[2] == (9.0, 9.0, 9.0)
+
+def test_shots_which_grow_or_shrink_only_touch_their_ends(tag_path):
+    block_shots = FakeBlock([{}, {}], sub_blocks=("frame data",))
+    export(tag_path, block_shots, make_shots(4, 2))
+    shots = make_shots(2, 5)
+    assert export(tag_path, block_shots, shots)
+    assert positions(block_shots, 0) == [frame.position for frame in shots[0].frames]
+    assert positions(block_shots, 1) == [frame.position for frame in shots[1].frames]
+    assert frame_writes(block_shots, 0) == 0
+    assert frame_writes(block_shots, 1) == 3 * REACH_FIELDS
+
+def test_frames_edited_outside_the_export_are_rebuilt(tag_path):
+    block_shots = FakeBlock([{}], sub_blocks=("frame data",))
+    export(tag_path, block_shots, make_shots(3))
+    # A frame deleted in a tag editor leaves the block out of step with the recorded state
+    block_shots.Elements[0].SelectField("frame data").RemoveElement(0)
+    export(tag_path, block_shots, make_shots(3))
+    assert frame_writes(block_shots, 0) == 3 * REACH_FIELDS
+    assert positions(block_shots, 0) == [frame.position for frame in make_shots(3)[0].frames]
+
+def test_a_failed_sync_is_not_trusted_next_export(tag_path):
+    block_shots = FakeBlock([{}], sub_blocks=("frame data",))
+    export(tag_path, block_shots, make_shots(4))
+    shots = make_shots(4)
+    for frame in shots[0].frames:
+        frame.position = (5.0, 5.0, 5.0)
+    del shots[0].frames[2].forward
+    with pytest.raises(AttributeError):
+        write_frames(tag_path, block_shots, shots, False)
+    # What Tag.__exit__ does when an exception leaves it
+    block_states.forget(tag_path)
+
+    assert export(tag_path, block_shots, make_shots(4))
+    assert frame_writes(block_shots, 0) == 4 * REACH_FIELDS
+    assert positions(block_shots, 0) == [frame.position for frame in make_shots(4)[0].frames]
@@ -0,0 +1,119 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from io_scene_foundry.export.export_cache import ExportCache, granny_file_key, settings_key
+
+IDENTITY = ((1, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1))
+
+def make_mesh(seed=0):
+    rng = np.random.default_rng(seed)
+    return SimpleNamespace(
+        vertex_array=rng.random((24, 8), dtype=np.float32),
+        indices=rng.integers(0, 24, (12, 3), dtype=np.int32),
+        groups=[(SimpleNamespace(name="wall", shader_path=r"shaders\wall", shader_type="shader", texture_key=None), 0, 12)],
+        face_properties={"face_mode": SimpleNamespace(array=np.zeros(12, dtype=np.int32))},
+        siblings=["mesh_0", "mesh_1"],
+    )
+
+def make_scene():
+    '''A model with a skeleton of two bones, each bound to a mesh node'''
+    model_ob = object()
+    bones = []
+    nodes = {model_ob: SimpleNamespace(name="model", mesh=None)}
+    for idx in range(2):
+        bone_ob = object()
+        node = SimpleNamespace(name=f"mesh_{idx}", props={"bungie_object_type": "_connected_geometry_object_type_mesh"}, matrix_world=IDENTITY, matrix_local=IDENTITY,
+                               bone_bindings=[f"bone_{idx}"], mesh=make_mesh(idx), negative_scaling=False)
+        bones.append(SimpleNamespace(name=f"bone_{idx}", parent_index=idx - 1, matrix_local=IDENTITY, matrix_world=IDENTITY, props={}, node=node, bone=bone_ob))
+        nodes[bone_ob] = node
+    model = SimpleNamespace(name="model", ob=model_ob, node=SimpleNamespace(matrix_local=IDENTITY), skeleton=SimpleNamespace(bones=bones))
+    return SimpleNamespace(models={"model": model}, time_step=1 / 30), nodes
+
+def mesh_of(scene, idx=0):
+    return scene.models["model"].skeleton.bones[idx].node.mesh
+
+EDITS = {
+    "vertex moved": lambda scene: mesh_of(scene).vertex_array.__setitem__((3, 0), 5.0),
+    "triangles changed": lambda scene: mesh_of(scene).indices.__setitem__((0, 0), 7),
+    "material changed": lambda scene: setattr(mesh_of(scene).groups[0][0], "shader_path", r"shaders\floor"),
+    "face property changed": lambda scene: mesh_of(scene).face_properties["face_mode"].array.__setitem__(2, 1),
+    "face property added": lambda scene: mesh_of(scene).face_properties.__setitem__("ladder", SimpleNamespace(array=np.ones(12, dtype=np.int32))),
+    "node props changed": lambda scene: scene.models["model"].skeleton.bones[1].node.props.__setitem__("bungie_mesh_type", "poop"),
+    "node moved": lambda scene: setattr(scene.models["model"].skeleton.bones[0].node, "matrix_world", ((2, 0, 0, 0), (0, 1, 0, 0), (0, 0, 1, 0), (0, 0, 0, 1))),
+    "bone renamed": lambda scene: setattr(scene.models["model"].skeleton.bones[1], "name", "bone_renamed"),
+    "texture changed": lambda scene: setattr(mesh_of(scene).groups[0][0], "texture_key", "new pixels"),
+    "mesh mirrored": lambda scene: setattr(scene.models["model"].skeleton.bones[0].node, "negative_scaling", True),
+}
+
+def test_same_content_gives_the_same_key():
+    assert granny_file_key(*make_scene()) == granny_file_key(*make_scene())
+
+@pytest.mark.parametrize("edit", EDITS.values(), ids=EDITS.keys())
+def test_every_kind_of_change_gives_a_new_key(edit):
+    scene, nodes = make_scene()
+    key = granny_file_key(scene, nodes)
+    edit(scene)
+    assert granny_file_key(scene, nodes) != key
+
+def test_export_info_is_part_of_the_key():
+    scene, nodes = make_scene()
+    info = {"connected_geometry_region_table_enum_names": b"#('default')"}
+    key = granny_file_key(scene, nodes, export_info=info)
+    assert key == granny_file_key(scene, nodes, export_info=dict(info))
+    assert key != granny_file_key(scene, nodes)
+    assert key != granny_file_key(scene, nodes, export_info={"connected_geometry_region_table_enum_names": b"#('default', 'hull')"})
+
+def test_animation_keys():
+    scene, nodes = make_scene()
+    animation = SimpleNamespace(name="idle", frame_count=30, is_pca=False, content_key="a")
+    key = granny_file_key(scene, nodes, animation)
+    animation.content_key = "b"
+    assert granny_file_key(scene, nodes, animation) != key
+    animation.content_key = None
+    assert granny_file_key(scene, nodes, animation) is None
+
+def write_and_record(tmp_path: Path, settings="settings", enabled=True):
+    scene, nodes = make_scene()
+    key = granny_file_key(scene, nodes)
+    filepath = Path(tmp_path, "export", "models", "model_render.gr2")
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    filepath.write_bytes(b"gr2")
+    cache = ExportCache(tmp_path, settings, enabled)
+    cache.record(filepath, key)
+    cache.save()
+    return filepath, key
+
+def test_cache_hit_across_exports(tmp_path):
+    filepath, key = write_and_record(tmp_path)
+    cache = ExportCache(tmp_path, "settings")
+    assert cache.is_current(filepath, key)
+    assert (cache.hits, cache.misses) == (1, 0)
+
+def test_miss_after_content_change(tmp_path):
+    filepath, _ = write_and_record(tmp_path)
+    scene, nodes = make_scene()
+    EDITS["vertex moved"](scene)
+    assert not ExportCache(tmp_path, "settings").is_current(filepath, granny_file_key(scene, nodes))
+
+def test_miss_after_settings_change(tmp_path):
+    filepath, key = write_and_record(tmp_path, settings_key("1.0", False, "y-"))
+    assert ExportCache(tmp_path, settings_key("1.0", False, "y-")).is_current(filepath, key)
+    assert not ExportCache(tmp_path, settings_key("1.0", False, "x")).is_current(filepath, key)
+
+def test_miss_after_file_changed_on_disk(tmp_path):
+    filepath, key = write_and_record(tmp_path)
+    filepath.write_bytes(b"edited outside of blender")
+    assert not ExportCache(tmp_path, "settings").is_current(filepath, key)
+
+def test_miss_after_file_deleted(tmp_path):
+    filepath, key = write_and_record(tmp_path)
+    filepath.unlink()
+    assert not ExportCache(tmp_path, "settings").is_current(filepath, key)
+
+def test_disabled_cache_never_hits_or_saves(tmp_path):
+    filepath, key = write_and_record(tmp_path, enabled=False)
+    assert not Path(tmp_path, "export", "export_cache.json").exists()
+    assert not ExportCache(tmp_path, "settings", enabled=False).is_current(filepath, key)
@@ -0,0 +1,89 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from io_scene_foundry.export.face_sets import resolve_face_sets
+
+def legacy_resolve(face_properties, layers, material_indices, side_layers, removed_materials):
+    '''The per face loop gather_face_props ran over a bmesh before resolve_face_sets, with faces using removed_materials deleted first'''
+    faces = [idx for idx, material_index in enumerate(material_indices) if material_index not in removed_materials]
+    for idx, face in enumerate(faces):
+        for v in face_properties.values():
+            for key, value in v.face_props.items():
+                if isinstance(key, int):
+                    if material_indices[face] == key:
+                        v.array[idx] = value
+                else:
+                    if layers[key][face]:
+                        if isinstance(value, int) and value < 0: # for handling face_sides
+                            value = abs(value)
+                            for l, va in side_layers.items():
+                                if l != key and abs(va) != value and layers[l][face]:
+                                    value += abs(va)
+                                    break
+
+                        v.array[idx] = value
+
+def random_setup(rng: random.Random):
+    '''Face layers, materials and face sets as gather_face_props builds them, with the kinds of face prop it adds'''
+    num_faces = rng.randint(0, 60)
+    num_materials = rng.randint(1, 4)
+    material_indices = np.array([rng.randrange(num_materials) for _ in range(num_faces)], dtype=np.int32)
+    layer_names = [f"face_layer_{idx}" for idx in range(rng.randint(1, 6))]
+    layers = {name: np.array([rng.choice((0, 0, 1, 2)) for _ in range(num_faces)], dtype=np.int32) for name in layer_names}
+
+    def face_sets():
+        sets = {}
+        side_layers = {}
+        sides = sets["bungie_face_sides"] = SimpleNamespace(array=np.zeros(num_faces, dtype=np.int32), face_props={})
+        for name in rng.sample(layer_names, rng.randint(0, len(layer_names))):
+            # Two sided (2, mirror 4 or keep 6) or transparent (1)
+            side_value = rng.choice((1, 2, 4, 6))
+            side_layers[name] = side_value
+            sides.face_props[name] = -(1 if side_value == 1 else side_value)
+        mode = sets["bungie_face_mode"] = SimpleNamespace(array=np.full(num_faces, 0, dtype=np.int32), face_props={})
+        for name in rng.sample(layer_names, rng.randint(0, len(layer_names))):
+            mode.face_props[name] = rng.randint(1, 5)
+        color = sets["bungie_lightmap_translucency_tint_color"] = SimpleNamespace(array=np.ones((num_faces, 3), dtype=np.single), face_props={})
+        for name in rng.sample(layer_names, rng.randint(0, len(layer_names))):
+            color.face_props[name] = (rng.random(), rng.random(), rng.random())
+        power = sets["bungie_lighting_emissive_power"] = SimpleNamespace(array=np.zeros(num_faces, dtype=np.single), face_props={})
+        for name in rng.sample(layer_names, rng.randint(0, len(layer_names))):
+            power.face_props[name] = rng.random() * 100
+        face_type = sets["bungie_face_type"] = SimpleNamespace(array=np.zeros(num_faces, dtype=np.int32), face_props={})
+        for material_index in rng.sample(range(num_materials), rng.randint(0, num_materials)):
+            face_type.face_props[material_index] = rng.randint(1, 2)
+        return sets, side_layers
+
+    removed_materials = set(rng.sample(range(num_materials), rng.randint(0, 1)))
+    return face_sets, layers, material_indices, removed_materials
+
+def test_resolve_face_sets_matches_the_per_face_loop():
+    rng = random.Random(0)
+    for _ in range(500):
+        face_sets, layers, material_indices, removed_materials = random_setup(rng)
+        state = rng.getstate()
+        expected, side_layers = face_sets()
+        rng.setstate(state)
+        resolved, _ = face_sets()
+
+        legacy_resolve(expected, layers, material_indices, side_layers, removed_materials)
+        resolve_face_sets(resolved, dict(layers), material_indices, side_layers, removed_materials)
+        for name, face_set in expected.items():
+            np.testing.assert_array_equal(resolved[name].array, face_set.array, err_msg=name)
+
+def test_face_sides_merge_with_the_first_other_side_layer():
+    layers = {"two_sided": np.array([1, 1, 0, 1]), "transparent": np.array([0, 1, 1, 1]), "mirror": np.array([0, 0, 0, 1])}
+    side_layers = {"transparent": 1, "mirror": 4, "two_sided": 2}
+    sides = SimpleNamespace(array=np.zeros(4, dtype=np.int32), face_props={"two_sided": -2, "transparent": -1})
+    resolve_face_sets({"bungie_face_sides": sides}, layers, np.zeros(4, dtype=np.int32), side_layers, set())
+    # The transparent layer comes later so overrides two sided where both are set, merging with the two sided layer: 1 + 2
+    assert sides.array.tolist() == [2, 3, 1, 5]
+
+def test_faces_of_removed_materials_are_dropped():
+    face_set = SimpleNamespace(array=np.full(5, -1, dtype=np.int32), face_props={"ladder": 7, 1: 3})
+    layers = {"ladder": np.array([1, 0, 1, 1, 0])}
+    resolve_face_sets({"bungie_ladder": face_set}, layers, np.array([0, 2, 2, 1, 0], dtype=np.int32), {}, {2})
+    # Faces 1 and 2 use the removed material, faces 0, 3 and 4 fill the start of the array
+    assert face_set.array.tolist() == [7, 3, -1, -1, -1]
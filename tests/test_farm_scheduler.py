@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from fakes import FakeToolRunner, RecordingLog
+from io_scene_foundry.tools.farm_scheduler import FarmScheduler
+
+def add_shader_farm(scheduler: FarmScheduler, tool: FakeToolRunner, shaders: dict[str, list[str]]):
+    '''Queues bitmap reimports on the workers and shader builds on the main thread, each shader waiting on its bitmaps, as ShaderFarm does'''
+    for bitmaps in shaders.values():
+        for bitmap in bitmaps:
+            if f"bitmap:{bitmap}" not in scheduler.tasks:
+                scheduler.add(f"bitmap:{bitmap}", tool, [bitmap])
+    for shader, bitmaps in shaders.items():
+        scheduler.add(f"shader:{shader}", tool, [shader], depends_on=[f"bitmap:{bitmap}" for bitmap in bitmaps], on_main_thread=True)
+
+def test_main_thread_tasks_wait_for_their_dependencies():
+    tool = FakeToolRunner(delay=0.01)
+    scheduler = FarmScheduler(4, log=RecordingLog())
+    shaders = {"wall": ["wall_diff", "wall_norm"], "floor": ["floor_diff"], "trim": ["wall_diff", "trim_diff"], "glass": []}
+    add_shader_farm(scheduler, tool, shaders)
+    assert scheduler.run("farm") == []
+
+    for shader, bitmaps in shaders.items():
+        assert tool.threads[shader] == threading.get_ident()
+        start = tool.started.index(shader)
+        assert all(tool.finished.index(bitmap) < start for bitmap in bitmaps)
+    assert all(tool.threads[bitmap] != threading.get_ident() for bitmap in ("wall_diff", "wall_norm", "floor_diff", "trim_diff"))
+    assert sorted(tool.finished) == sorted(["wall_diff", "wall_norm", "floor_diff", "trim_diff", *shaders])
+
+def test_dependencies_on_finished_or_unknown_tasks_are_ignored():
+    tool = FakeToolRunner()
+    scheduler = FarmScheduler(2, log=RecordingLog())
+    scheduler.add("a", tool, ["a"], on_main_thread=True)
+    task = scheduler.add("b", tool, ["b"], depends_on=["a", "missing"], on_main_thread=True)
+    assert task.waiting_on == {"a"}
+    scheduler.run("farm")
+    assert tool.finished == ["a", "b"]
+    with pytest.raises(ValueError):
+        scheduler.add("a", tool, ["a"])
+
+@pytest.mark.parametrize("max_workers", [1, 3])
+def test_worker_count_is_bounded(max_workers):
+    tool = FakeToolRunner(delay=0.02)
+    scheduler = FarmScheduler(max_workers, log=RecordingLog())
+    for idx in range(12):
+        scheduler.add(f"bitmap_{idx}", tool, [f"bitmap_{idx}"])
+    scheduler.run("farm")
+    assert len(tool.finished) == 12
+    assert tool.most_active == max_workers
+
+def test_failures_are_retried_then_reported_and_dependents_still_run():
+    tool = FakeToolRunner(failures={"flaky": 1, "broken": 5})
+    log = RecordingLog()
+    scheduler = FarmScheduler(2, retries=1, log=log)
+    add_shader_farm(scheduler, tool, {"wall": ["flaky", "broken"]})
+    def crash(*_):
+        raise RuntimeError("not a tool error")
+    scheduler.add("crash", crash)
+
+    failed = scheduler.run("farm")
+    assert {task.name: task.attempts for task in failed} == {"bitmap:broken": 2, "crash": 1}
+    assert "CalledProcessError" in scheduler.tasks["bitmap:broken"].error and "RuntimeError" in scheduler.tasks["crash"].error
+    assert scheduler.tasks["bitmap:flaky"].error is None and scheduler.tasks["bitmap:flaky"].attempts == 2
+    # Shaders are built even if one of their bitmaps failed to import
+    assert "wall" in tool.finished
+    assert log.jobs[-1] == ("farm", 1)
+
+def test_interrupt_cancels_tasks_which_have_not_started():
+    tool = FakeToolRunner(delay=0.05)
+    scheduler = FarmScheduler(1, log=RecordingLog())
+    def interrupt(*_):
+        raise KeyboardInterrupt
+    scheduler.add("first", tool, ["first"])
+    scheduler.add("interrupt", interrupt, on_main_thread=True)
+    for idx in range(5):
+        scheduler.add(f"later_{idx}", tool, [f"later_{idx}"])
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.run("farm")
+    assert len(tool.started) < 6
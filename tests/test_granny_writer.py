@@ -0,0 +1,98 @@
+from pathlib import Path
+import threading
+
+import pytest
+
+from fakes import FakeGranny, RecordingLog, write_fake_granny_file
+from io_scene_foundry.export.granny_writer import GrannyJob, GrannyWriter
+
+def make_writer(max_workers, **granny_kwargs):
+    instances = []
+    active_keys = set()
+    def factory():
+        granny = FakeGranny(active_keys=active_keys, **granny_kwargs)
+        instances.append(granny)
+        return granny
+    log = RecordingLog()
+    return GrannyWriter(factory, max_workers, log), instances, log
+
+def add_jobs(writer: GrannyWriter, directory: Path, names: list[str], conflict_keys: dict = {}):
+    jobs = []
+    for name in names:
+        job = GrannyJob(name, Path(directory, f"{name}.gr2"), {}, conflict_keys=conflict_keys.get(name, ()))
+        writer.add(job)
+        jobs.append(job)
+    return jobs
+
+def test_writes_every_file_and_reports_in_queue_order(tmp_path):
+    names = [f"file_{i}" for i in range(8)]
+    # Later files finish first, so reporting has to wait on completion order
+    writer, instances, log = make_writer(4, delays={f"{name}.gr2": 0.01 * (8 - i) for i, name in enumerate(names)})
+    add_jobs(writer, tmp_path, names)
+    writer.run(write_fake_granny_file)
+
+    assert all(Path(tmp_path, f"{name}.gr2").exists() for name in names)
+    assert [title for title, progress in log.jobs if progress == 1] == [f"--- {name}" for name in names]
+    assert not log.errors
+    assert writer.jobs == []
+
+def test_worker_count_is_bounded(tmp_path):
+    writer, instances, _ = make_writer(2)
+    add_jobs(writer, tmp_path, [f"file_{i}" for i in range(10)])
+    writer.run(write_fake_granny_file)
+    assert len(instances) == 2
+    assert sum(len(granny.saved) for granny in instances) == 10
+
+def test_jobs_sharing_a_mesh_are_written_in_order_and_never_together(tmp_path):
+    names = ["a", "b", "c", "d", "e"]
+    keys = {"a": {"mesh_1"}, "b": {"mesh_2"}, "c": {"mesh_1", "mesh_3"}, "d": {"mesh_3"}, "e": {"mesh_4"}}
+    writer, instances, _ = make_writer(4, delays={f"{name}.gr2": 0.02 for name in names})
+    jobs = add_jobs(writer, tmp_path, names, keys)
+    chains = writer._chains()
+    assert [[job.name for job in chain] for chain in chains] == [["a", "c", "d"], ["b"], ["e"]]
+
+    writer.run(write_fake_granny_file)
+    assert not any(granny.overlaps for granny in instances)
+    chain_granny = next(granny for granny in instances if str(jobs[0].filepath) in granny.saved)
+    assert [Path(path).stem for path in chain_granny.saved if Path(path).stem in {"a", "c", "d"}] == ["a", "c", "d"]
+
+def test_unchanged_jobs_are_reported_but_not_written(tmp_path):
+    writer, instances, log = make_writer(2)
+    jobs = add_jobs(writer, tmp_path, ["kept", "skipped"])
+    jobs[1].unchanged = True
+    writer.run(write_fake_granny_file)
+    assert Path(tmp_path, "kept.gr2").exists()
+    assert not Path(tmp_path, "skipped.gr2").exists()
+    assert ("--- skipped [UNCHANGED]", 1) in log.jobs
+
+def test_failures_are_reported_per_file_after_every_file_is_attempted(tmp_path):
+    names = ["a", "b", "c", "d"]
+    writer, _, log = make_writer(2, failures={"b.gr2", "d.gr2"})
+    add_jobs(writer, tmp_path, names, {"a": {"mesh"}, "b": {"mesh"}, "c": {"mesh"}})
+    with pytest.raises(RuntimeError) as error:
+        writer.run(write_fake_granny_file)
+
+    assert "['b', 'd']" in str(error.value)
+    assert Path(tmp_path, "a.gr2").exists() and Path(tmp_path, "c.gr2").exists()
+    assert ("--- b [FAILED]", 1) in log.jobs and ("--- d [FAILED]", 1) in log.jobs
+    assert len(log.errors) == 2 and "OSError" in log.errors[0]
+
+def test_single_worker_writes_on_the_calling_thread(tmp_path):
+    writer, instances, log = make_writer(1, failures={"file_2.gr2"})
+    jobs = add_jobs(writer, tmp_path, [f"file_{i}" for i in range(5)], {"file_1": {"mesh"}, "file_3": {"mesh"}})
+    jobs[4].unchanged = True
+    with pytest.raises(RuntimeError):
+        writer.run(write_fake_granny_file)
+
+    assert len(instances) == 1
+    assert instances[0].tree_threads == [threading.get_ident()] * 4
+    assert [Path(path).stem for path in instances[0].saved] == ["file_0", "file_1", "file_3"]
+    # Each file is reported started then finished before the next begins
+    assert log.jobs == [("--- file_0", 0), ("--- file_0", 1), ("--- file_1", 0), ("--- file_1", 1), ("--- file_2", 0), ("--- file_2 [FAILED]", 1),
+                        ("--- file_3", 0), ("--- file_3", 1), ("--- file_4 [UNCHANGED]", 1)]
+
+def test_only_unchanged_jobs_create_no_granny(tmp_path):
+    writer, instances, log = make_writer(1)
+    add_jobs(writer, tmp_path, ["a"])[0].unchanged = True
+    writer.run(write_fake_granny_file)
+    assert not instances and log.jobs == [("--- a [UNCHANGED]", 1)]
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.managed_blam.index_buffer import triangle_list_faces, triangle_strip_faces
+
+RESTART = 0xFFFF
+
+def assert_strip_matches_reference(indices, restart_index=None):
+    faces = triangle_strip_faces(indices, restart_index)
+    expected = reference.strip_faces(indices.tolist(), restart_index)
+    assert faces.shape == (len(expected), 3)
+    assert faces.tolist() == expected
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_strips_match_the_old_unpack_loop(seed):
+    # Few vertices so that degenerate triangles are common
+    indices = synthetic.make_strip(2000, 12, seed)
+    assert_strip_matches_reference(indices)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_strips_with_restarts_unpack_each_section_as_a_new_strip(seed):
+    indices = synthetic.make_strip(2000, 500, seed, RESTART)
+    assert (indices == RESTART).any()
+    assert_strip_matches_reference(indices, RESTART)
+
+@pytest.mark.parametrize("strip", [
+    [], [1], [1, 2], [1, 2, 3], [1, 1, 1, 1], [1, 2, 2, 3, 4], [0, 1, 2, 3, 3, 4, 4, 5, 6, 7],
+    [RESTART, 1, 2, 3], [1, 2, 3, RESTART], [1, 2, RESTART, 3, 4, 5, 6], [RESTART, RESTART, 1, 2, 3, 4],
+], ids=str)
+def test_edge_case_strips(strip):
+    assert_strip_matches_reference(np.array(strip, dtype=np.uint16), RESTART)
+
+def test_winding_alternates_with_position_in_the_strip():
+    assert triangle_strip_faces(np.array([0, 1, 2, 3, 4])).tolist() == [[0, 1, 2], [1, 3, 2], [2, 3, 4]]
+    # Degenerate triangles are dropped but still count towards the parity of the triangles after them
+    assert triangle_strip_faces(np.array([0, 1, 2, 2, 3, 4])).tolist() == [[0, 1, 2], [2, 4, 3]]
+
+def test_restart_index_is_only_used_when_given():
+    indices = np.array([0, 1, 2, RESTART, 3], dtype=np.uint16)
+    assert len(triangle_strip_faces(indices)) == 3
+    assert triangle_strip_faces(indices, RESTART).tolist() == [[0, 1, 2]]
+
+def test_triangle_list_matches_chunking_and_drops_a_partial_triangle():
+    indices = np.random.default_rng(0).integers(0, 100, 301).astype(np.uint16)
+    faces = triangle_list_faces(indices)
+    assert faces.tolist() == [indices[n:n+3].tolist() for n in range(0, 300, 3)]
+    assert faces.dtype == np.uint16
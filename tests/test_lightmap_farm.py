@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from fakes import RecordingLog
+from io_scene_foundry.tools.scenario.lightmap_farm import CHECKPOINT_FILENAME, LightmapCheckpoint, LightmapFarm, SimulatedToolExecutor, checkpoint_key
+
+STAGES = ("dillum", "pcast", "radest_extillum", "fgather")
+
+def run_reach_lightmap(tmp_path: Path, executor: SimulatedToolExecutor, key: str, client_count=4) -> tuple[LightmapFarm, bool]:
+    '''Runs the same sequence of steps and stages as LightMapper.lightmap_reach'''
+    blob_dir = str(Path(tmp_path, "faux", "111"))
+    checkpoint = LightmapCheckpoint(Path(blob_dir, CHECKPOINT_FILENAME), key)
+    farm = LightmapFarm(executor, checkpoint, blob_dir, client_count, log=RecordingLog())
+    farm.step("data_sync", ["faux_data_sync", "levels\\test\\test", "all"])
+    farm.step("begin", ["faux_farm_begin", "levels\\test\\test", "all", "all", "direct_only", "111", "true"])
+    for stage in STAGES:
+        if not farm.stage(stage):
+            return farm, False
+    farm.step("finish", ["faux_farm_finish", blob_dir])
+    checkpoint.clear()
+    return farm, True
+
+def make_tags(tmp_path: Path) -> list[Path]:
+    tags = [Path(tmp_path, "test.scenario"), Path(tmp_path, "test_bsp.scenario_structure_bsp")]
+    for tag in tags:
+        tag.write_text("tag")
+    return tags
+
+def test_key_ignores_tags_the_farm_rewrites(tmp_path):
+    key = checkpoint_key("levels\\test\\test", "all", ("test_bsp",), "direct_only")
+    executor = SimulatedToolExecutor(tmp_path, rewrites=make_tags(tmp_path))
+    executor.run(["faux_data_sync"])
+    assert checkpoint_key("levels\\test\\test", "all", ("test_bsp",), "direct_only") == key
+    assert checkpoint_key("levels\\test\\test", "all", ("test_bsp",), "high") != key
+    assert checkpoint_key("levels\\test\\test", "all", ("test_bsp", "other_bsp"), "direct_only") != key
+
+def test_failed_client_is_rescheduled_on_its_own(tmp_path):
+    blob_dir = str(Path(tmp_path, "faux", "111"))
+    executor = SimulatedToolExecutor(tmp_path, failures={f"faux_farm_dillum {blob_dir} 2 4": 1})
+    farm, success = run_reach_lightmap(tmp_path, executor, "key")
+    assert success
+    dillum_clients = [command[2] for command in executor.commands if command[0] == "faux_farm_dillum"]
+    assert sorted(dillum_clients) == ["0", "1", "2", "2", "3"]
+    assert len(farm.log.warnings) == 1
+    assert not Path(blob_dir, CHECKPOINT_FILENAME).exists()
+
+def test_resumes_after_failure_although_the_farm_rewrote_the_tags(tmp_path):
+    blob_dir = str(Path(tmp_path, "faux", "111"))
+    tags = make_tags(tmp_path)
+    key = checkpoint_key("levels\\test\\test", "all", ("test_bsp",), "direct_only")
+    # Client 1 of pcast fails on every attempt, so the first run stops there
+    executor = SimulatedToolExecutor(tmp_path, failures={f"faux_farm_pcast {blob_dir} 1 4": 2}, rewrites=tags)
+    farm, success = run_reach_lightmap(tmp_path, executor, key)
+    assert not success and farm.failed_log.endswith(str(Path("pcast", "1.txt")))
+    assert Path(blob_dir, CHECKPOINT_FILENAME).exists()
+
+    resumed = SimulatedToolExecutor(tmp_path, rewrites=tags)
+    farm, success = run_reach_lightmap(tmp_path, resumed, checkpoint_key("levels\\test\\test", "all", ("test_bsp",), "direct_only"))
+    assert success
+    # Only the failed client and everything after it run again
+    assert [command[0] for command in resumed.commands][:2] == ["faux_farm_pcast", "faux_farm_pcast_merge"]
+    assert [command[2] for command in resumed.commands if command[0] == "faux_farm_pcast"] == ["1"]
+    assert "faux_farm_dillum" not in {command[0] for command in resumed.commands}
+
+def test_changed_settings_start_again(tmp_path):
+    blob_dir = str(Path(tmp_path, "faux", "111"))
+    executor = SimulatedToolExecutor(tmp_path, failures={f"faux_farm_fgather {blob_dir} 0 4": 2})
+    run_reach_lightmap(tmp_path, executor, "direct_only")
+    restarted = SimulatedToolExecutor(tmp_path)
+    _, success = run_reach_lightmap(tmp_path, restarted, "high")
+    assert success
+    assert restarted.commands[0][0] == "faux_data_sync"
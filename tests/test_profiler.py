@@ -0,0 +1,58 @@
+import json
+
+from io_scene_foundry.export.profiler import BASELINE_FILENAME, ExportProfiler, baseline_key, cache_state, find_regressions, load_baselines, reset_baseline
+
+def profile(directory, context, written=0, unchanged=0):
+    profiler = ExportProfiler(True, context)
+    with profiler.stage("write_granny_files"):
+        with profiler.step("granny file", "model.gr2"):
+            pass
+        profiler.count("granny files written", written)
+        profiler.count("granny files unchanged", unchanged)
+    profiler.write(directory)
+    return profiler.last_report
+
+def make_report(stage_wall, step_wall=0.0, steps=1):
+    return {"stages": [{"name": "export", "wall": stage_wall, "counts": {}, "steps": {"mesh": {"count": steps, "wall": step_wall}}}]}
+
+def test_cache_state():
+    assert cache_state({"stages": [{"counts": {"granny files written": 2}}]}) == "written"
+    assert cache_state({"stages": [{"counts": {"granny files unchanged": 2}}]}) == "unchanged"
+    assert cache_state({"stages": [{"counts": {"granny files written": 1, "granny files unchanged": 1}}]}) == "mixed"
+    assert cache_state({"stages": [{"counts": {}}]}) == "none"
+
+def test_baselines_are_kept_per_context_and_cache_state(tmp_path):
+    context = {"asset_type": "model", "export_mode": "full"}
+    assert profile(tmp_path, context, written=3)["new_baseline"]
+    assert profile(tmp_path, context, unchanged=3)["new_baseline"]
+    assert profile(tmp_path, dict(context, export_mode="granny"), written=3)["new_baseline"]
+
+    report = profile(tmp_path, context, written=3)
+    assert "new_baseline" not in report and report["regressions"] == []
+    assert len(load_baselines(tmp_path)) == 3
+    assert baseline_key(report) == "asset_type=model, cache_state=written, export_mode=full"
+
+def test_old_unkeyed_baseline_is_ignored(tmp_path):
+    (tmp_path / BASELINE_FILENAME).write_text(json.dumps(make_report(1.0)))
+    assert load_baselines(tmp_path) == {}
+    assert profile(tmp_path, {"export_mode": "full"}, written=1)["new_baseline"]
+
+def test_find_regressions():
+    baseline = make_report(10.0, 4.0, 4)
+    assert find_regressions(make_report(10.4, 4.0, 4), baseline) == []
+    assert len(find_regressions(make_report(20.0, 4.0, 4), baseline)) == 1
+    # Twice the steps at the same mean time is not a regression of the steps
+    assert find_regressions(make_report(10.0, 8.0, 8), baseline) == []
+    assert len(find_regressions(make_report(10.0, 8.0, 4), baseline)) == 1
+    # Too small to matter however large the fraction
+    assert find_regressions(make_report(0.2, 0.2, 4), make_report(0.05, 0.05, 4)) == []
+
+def test_reset_baseline(tmp_path):
+    assert not reset_baseline(tmp_path)
+    written = profile(tmp_path, {"export_mode": "full"}, written=1)
+    profile(tmp_path, {"export_mode": "full"}, unchanged=1)
+    assert reset_baseline(tmp_path, baseline_key(written))
+    assert not reset_baseline(tmp_path, baseline_key(written))
+    assert list(load_baselines(tmp_path)) == ["cache_state=unchanged, export_mode=full"]
+    assert reset_baseline(tmp_path)
+    assert load_baselines(tmp_path) == {}
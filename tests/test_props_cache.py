@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+from io_scene_foundry.export.props_cache import PropsCache, resolve_mesh_level_props
+
+class Export:
+    '''Stands in for ExportScene, with a _setup_mesh_level_props reading plain objects in place of meshes and their nwo settings'''
+    def __init__(self, regions=("default",)):
+        self.props_cache = PropsCache()
+        self.warnings = []
+        self.regions_set = set(regions)
+        self.setups = []
+
+    def _setup_mesh_level_props(self, ob, region: str, mesh_props: dict, mesh_type_index: int) -> dict:
+        self.setups.append((ob.name, region, mesh_type_index))
+        nwo = ob.data.nwo
+        fp_defaults = {"bungie_face_type": 0}
+        mesh_props["bungie_face_region"] = region
+        if nwo.ladder:
+            mesh_props["bungie_ladder"] = 1
+        for idx, face_region in enumerate(nwo.face_regions):
+            if face_region not in self.regions_set:
+                self.warnings.append(f"Object [{ob.name}] has region [{face_region}] on face property index {idx} which is not present in the regions table")
+        return fp_defaults
+
+    def resolve(self, ob, region="default", mesh_type_index=0) -> tuple[dict, dict]:
+        '''What ExportScene._resolve_mesh_level_props does'''
+        return resolve_mesh_level_props(self.props_cache, self.warnings, ob, region, mesh_type_index, self._setup_mesh_level_props)
+
+class Mesh:
+    '''Hashed by identity, like a Blender ID'''
+    def __init__(self, ladder=False, face_regions=()):
+        self.nwo = SimpleNamespace(ladder=ladder, face_regions=list(face_regions))
+
+def make_ob(name: str, mesh: Mesh):
+    return SimpleNamespace(name=name, data=mesh)
+
+def test_objects_sharing_a_mesh_resolve_it_once():
+    mesh = Mesh(ladder=True)
+    export = Export()
+    results = [export.resolve(make_ob(f"ob_{idx}", mesh)) for idx in range(3)]
+    assert export.setups == [("ob_0", "default", 0)]
+    assert (export.props_cache.hits, export.props_cache.misses) == (2, 1)
+    assert results[0] == results[2] == ({"bungie_face_type": 0}, {"bungie_face_region": "default", "bungie_ladder": 1})
+
+def test_mesh_region_and_mesh_type_are_the_key():
+    mesh, other = Mesh(), Mesh(ladder=True)
+    export = Export()
+    assert export.resolve(make_ob("a", mesh))[1] == {"bungie_face_region": "default"}
+    assert export.resolve(make_ob("b", mesh), "upper")[1] == {"bungie_face_region": "upper"}
+    export.resolve(make_ob("c", mesh), "default", 3)
+    assert export.resolve(make_ob("d", other))[1] == {"bungie_face_region": "default", "bungie_ladder": 1}
+    assert export.setups == [("a", "default", 0), ("b", "upper", 0), ("c", "default", 3), ("d", "default", 0)]
+    assert export.props_cache.hits == 0
+    export.resolve(make_ob("e", mesh), "upper")
+    assert export.props_cache.hits == 1
+
+def test_results_are_copies():
+    export = Export()
+    ob = make_ob("a", Mesh())
+    fp_defaults, mesh_props = export.resolve(ob)
+    fp_defaults["bungie_face_type"] = 1
+    mesh_props["bungie_ladder"] = 1
+    assert export.resolve(ob) == ({"bungie_face_type": 0}, {"bungie_face_region": "default"})
+
+def test_warnings_are_replayed_for_every_object_using_the_mesh():
+    mesh = Mesh(face_regions=("default", "missing", "gone"))
+    export = Export()
+    for name in ("first", "second"):
+        export.resolve(make_ob(name, mesh))
+    export.resolve(make_ob("clean", Mesh()))
+    assert len(export.setups) == 2
+    assert export.warnings == [
+        "Object [first] has region [missing] on face property index 1 which is not present in the regions table",
+        "Object [first] has region [gone] on face property index 2 which is not present in the regions table",
+        "Object [second] has region [missing] on face property index 1 which is not present in the regions table",
+        "Object [second] has region [gone] on face property index 2 which is not present in the regions table",
+    ]
+
+def test_warnings_of_other_meshes_are_not_replayed():
+    export = Export()
+    export.warnings.append("Object [earlier] is not a mesh")
+    mesh = Mesh()
+    export.resolve(make_ob("a", mesh))
+    export.resolve(make_ob("b", mesh))
+    assert export.warnings == ["Object [earlier] is not a mesh"]
+
+def test_a_new_export_starts_with_an_empty_cache():
+    mesh = Mesh()
+    first, second = Export(), Export()
+    first.resolve(make_ob("a", mesh))
+    mesh.nwo.ladder = True
+    assert second.resolve(make_ob("a", mesh))[1] == {"bungie_face_region": "default", "bungie_ladder": 1}
+    assert second.props_cache.summary() == "0 hits, 1 misses (0% reused)"
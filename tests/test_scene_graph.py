@@ -0,0 +1,89 @@
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.export.scene_graph import SceneGraph
+
+def make_graph() -> SceneGraph:
+    #   a       f
+    #  / \
+    # b   c
+    #    / \
+    #   d   e
+    return SceneGraph({"a": None, "b": "a", "c": "a", "d": "c", "e": "c", "f": None})
+
+def test_children_keep_the_order_they_were_gathered_in():
+    graph = make_graph()
+    assert graph.get_children("a") == ["b", "c"]
+    assert graph.get_children("c") == ["d", "e"]
+    assert graph.get_children("b") == []
+    assert graph.get_children("missing") == []
+    assert graph.roots() == ["a", "f"]
+    assert len(graph) == 6 and "d" in graph and "missing" not in graph
+
+def test_children_match_a_scan_of_the_parent_dict():
+    parents = synthetic.make_hierarchy(synthetic.AssetSize(hierarchy=500), seed=3)
+    graph = SceneGraph(parents)
+    for parent in [None, *parents]:
+        assert graph.get_children(parent) == reference.immediate_children(parents, parent)
+
+def test_get_children_returns_a_copy():
+    graph = make_graph()
+    graph.get_children("a").append("x")
+    assert graph.get_children("a") == ["b", "c"]
+
+def test_ancestors_walk_and_subtree():
+    graph = make_graph()
+    assert graph.ancestors("d") == ["c", "a"]
+    assert graph.ancestors("a") == []
+    assert graph.is_ancestor("a", "e") and not graph.is_ancestor("b", "e")
+    assert graph.descendants("a") == ["b", "c", "d", "e"]
+    assert graph.descendants("a", breadth_first=True) == ["b", "c", "d", "e"]
+    assert graph.subtree("c") == ["c", "d", "e"]
+    assert list(graph.walk()) == ["a", "b", "c", "d", "e", "f"]
+
+def test_objects_parented_to_ungathered_objects_hang_off_a_root():
+    graph = SceneGraph({"child": "armature"})
+    assert graph.roots() == ["armature"]
+    assert graph.subtree("armature") == ["armature", "child"]
+
+def test_reparenting_moves_the_child_and_its_subtree():
+    graph = make_graph()
+    graph.add("c", "f")
+    assert graph.get_parent("c") == "f"
+    assert graph.get_children("a") == ["b"]
+    assert graph.get_children("f") == ["c"]
+    assert graph.ancestors("e") == ["c", "f"]
+    assert graph.subtree("f") == ["f", "c", "d", "e"]
+    # Re-adding with the same parent keeps the child's place
+    graph.add("b", "a")
+    graph.add("g", "a")
+    assert graph.get_children("a") == ["b", "g"]
+
+def test_reparenting_to_none_makes_a_root():
+    graph = make_graph()
+    graph.add("d", None)
+    assert graph.roots() == ["a", "f", "d"]
+    assert graph.get_children("c") == ["e"]
+
+def test_removal_makes_children_roots():
+    graph = make_graph()
+    graph.remove("c")
+    assert "c" not in graph
+    assert graph.get_children("a") == ["b"]
+    assert graph.get_parent("d") is None and graph.get_parent("e") is None
+    assert graph.roots() == ["a", "f", "d", "e"]
+    assert list(graph.walk()) == ["a", "b", "f", "d", "e"]
+
+@pytest.mark.parametrize("ob", ["b", "f", "missing"])
+def test_removing_a_leaf_root_or_unknown_object(ob):
+    graph = make_graph()
+    graph.remove(ob)
+    assert ob not in graph
+    assert len(graph) == 6 - (ob != "missing")
+    assert ob not in graph.walk()
+
+def test_cycles_are_not_followed():
+    graph = SceneGraph({"a": "b", "b": "a"})
+    assert graph.ancestors("a") == ["b"]
+    assert graph.descendants("a") == ["b"]
@@ -0,0 +1,59 @@
+import os
+import xml.etree.cElementTree as ET
+
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.export import sidecar_xml
+
+@pytest.mark.parametrize("contents", [0, 1, 50])
+def test_streamed_sidecar_matches_the_minidom_writer_byte_for_byte(tmp_path, contents):
+    root = synthetic.make_sidecar(synthetic.AssetSize(sidecar_contents=contents))
+    sidecar_xml.write(root, tmp_path / "streamed.sidecar.xml")
+    reference.write_sidecar(root, tmp_path / "minidom.sidecar.xml")
+    assert (tmp_path / "streamed.sidecar.xml").read_bytes() == (tmp_path / "minidom.sidecar.xml").read_bytes()
+
+@pytest.mark.parametrize("element", [
+    ET.Element("Empty"),
+    ET.fromstring('<A Name="quote &quot; and &amp;"><B>text &lt; &gt;</B>tail<C/></A>'),
+    ET.fromstring("<A>leading<B>one</B>  <B>two</B></A>"),
+    ET.fromstring("<A>line\r\nbreak\rhere</A>"),
+])
+def test_edge_cases_match_the_minidom_writer(tmp_path, element):
+    sidecar_xml.write(element, tmp_path / "streamed.xml")
+    reference.write_sidecar(element, tmp_path / "minidom.xml")
+    assert (tmp_path / "streamed.xml").read_bytes() == (tmp_path / "minidom.xml").read_bytes()
+
+def test_two_runs_write_identical_bytes(tmp_path):
+    size = synthetic.AssetSize(sidecar_contents=20)
+    sidecar_xml.write(synthetic.make_sidecar(size), tmp_path / "first.sidecar.xml")
+    sidecar_xml.write(synthetic.make_sidecar(size), tmp_path / "second.sidecar.xml")
+    assert (tmp_path / "first.sidecar.xml").read_bytes() == (tmp_path / "second.sidecar.xml").read_bytes()
+
+def test_to_string_is_the_written_document(tmp_path):
+    root = synthetic.make_sidecar(synthetic.AssetSize(sidecar_contents=3))
+    sidecar_xml.write(root, tmp_path / "streamed.sidecar.xml")
+    with open(tmp_path / "streamed.sidecar.xml") as file:
+        assert file.read() == sidecar_xml.to_string(root)
+    assert sidecar_xml.to_string(root).startswith(sidecar_xml.XML_DECLARATION + "<Metadata>\n  <Header>\n")
+
+def test_child_sidecars_are_parsed_again_only_when_changed(tmp_path):
+    path = tmp_path / "child.sidecar.xml"
+    path.write_text(synthetic.CHILD_SIDECAR)
+    cache = sidecar_xml.ChildSidecarCache()
+    first = cache.get_root(path)
+    assert cache.get_root(path) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+    path.write_text(synthetic.CHILD_SIDECAR.replace("child.blend", "changed.blend"))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    changed = cache.get_root(path)
+    assert changed is not first and changed.find("ContentNetwork/InputFile").text.endswith("changed.blend")
+    cache.forget(path)
+    assert cache.get_root(path) is not changed
+    assert cache.misses == 3
+
+def test_missing_child_sidecars_raise(tmp_path):
+    with pytest.raises(OSError):
+        sidecar_xml.ChildSidecarCache().get_root(tmp_path / "missing.sidecar.xml")
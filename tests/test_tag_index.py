@@ -0,0 +1,142 @@
+import os
+from pathlib import Path
+import shutil
+import sqlite3
+
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.tools.tag_index import TagIndex
+
+@pytest.fixture
+def tags_dir(tmp_path) -> Path:
+    tags = Path(tmp_path, "tags")
+    for path in (r"objects\crate\crate.model", r"objects\crate\crate.render_model", r"objects\crate\bitmaps\crate_diff.bitmap",
+                 r"shaders\material_shaders\wall.material_shader", r"shaders\wall.material", r"levels\test\test.scenario"):
+        path = Path(tags, *path.split("\\"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    synthetic.age_tree(tags)
+    return tags
+
+@pytest.fixture
+def index(tags_dir, tmp_path):
+    index = TagIndex(tags_dir, Path(tmp_path, "index.sqlite"))
+    index.refresh()
+    yield index
+    index.close()
+
+def indexed(index: TagIndex) -> list[str]:
+    return sorted(index.query())
+
+def walked(tags_dir: Path) -> list[str]:
+    return sorted(reference.walk_tags_dir(str(tags_dir), ("",)))
+
+def set_mtime(path: Path, mtime_ns: int):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_first_refresh_indexes_every_file(tags_dir, tmp_path):
+    index = TagIndex(tags_dir, Path(tmp_path, "index.sqlite"))
+    assert index.refresh() == 8
+    assert indexed(index) == walked(tags_dir)
+    assert index.refresh() == 0
+    index.close()
+
+def test_file_added(index, tags_dir):
+    Path(tags_dir, "objects", "crate", "crate.physics_model").touch()
+    assert index.refresh() == 1
+    assert indexed(index) == walked(tags_dir)
+    assert os.path.join("objects", "crate", "crate.physics_model") in index.query(".physics_model")
+
+def test_file_removed(index, tags_dir):
+    Path(tags_dir, "objects", "crate", "bitmaps", "crate_diff.bitmap").unlink()
+    assert index.refresh() == 1
+    assert index.query("bitmap") == []
+    assert indexed(index) == walked(tags_dir)
+
+def test_file_renamed(index, tags_dir):
+    Path(tags_dir, "shaders", "wall.material").rename(Path(tags_dir, "shaders", "floor.material"))
+    assert index.refresh() == 1
+    assert index.query(".material") == [os.path.join("shaders", "floor.material")]
+
+def test_file_modified_needs_no_listing(index, tags_dir):
+    before = indexed(index)
+    path = Path(tags_dir, "objects", "crate", "crate.model")
+    path.write_bytes(b"edited")
+    set_mtime(path, os.stat(path).st_mtime_ns + 10_000_000_000)
+    assert index.refresh() == 0
+    assert indexed(index) == before
+
+def test_directory_mtime_change_relists_only_that_directory(index, tags_dir):
+    before = indexed(index)
+    crate = Path(tags_dir, "objects", "crate")
+    set_mtime(crate, os.stat(crate).st_mtime_ns - 1_000_000_000)
+    assert index.refresh() == 1
+    assert indexed(index) == before
+    assert index.refresh() == 0
+
+def test_change_within_the_same_timestamp_tick_is_found(index, tags_dir):
+    crate = Path(tags_dir, "objects", "crate")
+    Path(crate, "crate.collision_model").touch()
+    tick = os.stat(crate).st_mtime_ns
+    assert index.refresh() == 1
+    # A second file added before the directory's timestamp moves on, as on a file system with coarse timestamps
+    Path(crate, "crate.physics_model").touch()
+    set_mtime(crate, tick)
+    assert index.refresh() == 1
+    assert indexed(index) == walked(tags_dir)
+
+def test_directories_added_and_removed(index, tags_dir):
+    shutil.rmtree(Path(tags_dir, "objects", "crate"))
+    new_dir = Path(tags_dir, "objects", "barrel", "bitmaps")
+    new_dir.mkdir(parents=True)
+    Path(new_dir, "barrel_diff.bitmap").touch()
+    index.refresh()
+    assert indexed(index) == walked(tags_dir)
+    assert index.query(under="objects") == [os.path.join("objects", "barrel", "bitmaps", "barrel_diff.bitmap")]
+    assert {row[0] for row in index.connection.execute("SELECT path FROM dirs")} == {"", "objects", "shaders", os.path.join("shaders", "material_shaders"),
+        "levels", os.path.join("levels", "test"), os.path.join("objects", "barrel"), os.path.join("objects", "barrel", "bitmaps")}
+
+def test_index_persists_between_sessions(index, tags_dir, tmp_path):
+    index.close()
+    reopened = TagIndex(tags_dir, Path(tmp_path, "index.sqlite"))
+    assert reopened.refresh() == 0
+    assert indexed(reopened) == walked(tags_dir)
+    reopened.close()
+
+def test_index_of_an_older_version_is_rebuilt(tags_dir, tmp_path):
+    db_path = Path(tmp_path, "old.sqlite")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("CREATE TABLE dirs (path TEXT PRIMARY KEY, parent TEXT, mtime_ns INTEGER)")
+        connection.execute("CREATE TABLE tags (path TEXT PRIMARY KEY, dir TEXT, name TEXT, extension TEXT, mtime_ns INTEGER)")
+    connection.close()
+    index = TagIndex(tags_dir, db_path)
+    assert index.refresh() == 8
+    assert indexed(index) == walked(tags_dir)
+    index.close()
+
+def test_query_filters(index):
+    assert index.query((".model", "render_model")) == [os.path.join("objects", "crate", "crate.model"), os.path.join("objects", "crate", "crate.render_model")]
+    assert index.query(contains="WALL") == [os.path.join("shaders", "wall.material"), os.path.join("shaders", "material_shaders", "wall.material_shader")]
+    assert index.query(".material", under="shaders") == [os.path.join("shaders", "wall.material")]
+    assert index.query(under=os.path.join("shaders", "material_shaders")) == [os.path.join("shaders", "material_shaders", "wall.material_shader")]
+    # Wildcards in the search text are matched literally
+    assert index.query(contains="e_d") == [os.path.join("objects", "crate", "bitmaps", "crate_diff.bitmap")]
+    assert index.query(contains="%") == []
+
+def test_large_tree_matches_a_full_walk(tmp_path):
+    size = synthetic.AssetSize(tags=3000)
+    tags_dir = Path(tmp_path, "tags")
+    paths = synthetic.make_tag_tree(tags_dir, size)
+    index = TagIndex(tags_dir, Path(tmp_path, "index.sqlite"))
+    index.refresh()
+    assert index.query() == reference.walk_tags_dir(str(tags_dir), ("",))
+    for extensions in (synthetic.TAG_EXTENSIONS[:2], (".model",)):
+        assert index.query(extensions) == reference.walk_tags_dir(str(tags_dir), extensions)
+    assert len(index.query()) == len(paths)
+
+    Path(tags_dir, paths[-1]).unlink()
+    assert index.refresh() == 1
+    assert index.query() == reference.walk_tags_dir(str(tags_dir), ("",))
+    index.close()
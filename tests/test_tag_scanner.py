@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from fakes import RecordingLog
+from io_scene_foundry.managed_blam.tag_scanner import TagScanner, parse_worker_line
+
+def make_graphs(tags_dir: Path, count: int) -> list[str]:
+    paths = []
+    for idx in range(count):
+        path = Path(tags_dir, "objects", f"graph_{idx}.model_animation_graph")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"Struct:content[0]/Block:modes": [{"label": f"mode_{idx % 7}"}, {"label": "combat"}]}))
+        paths.append(str(path))
+    return paths
+
+@pytest.mark.parametrize("workers", [0, 3])
+def test_workers_match_in_process(tmp_path, workers):
+    paths = make_graphs(tmp_path, 20)
+    scanner = TagScanner("state_names", "synthetic", {"tags_dir": str(tmp_path)}, workers, RecordingLog())
+    report = scanner.run(paths, print_tags=False)
+    assert report["names"] == {f"mode_{idx}" for idx in range(7)} | {"combat"}
+    assert not scanner.errors
+
+def test_unreadable_tags_are_reported(tmp_path):
+    paths = make_graphs(tmp_path, 4)
+    Path(paths[1]).write_text("not json")
+    log = RecordingLog()
+    scanner = TagScanner("state_names", "synthetic", {"tags_dir": str(tmp_path)}, 2, log)
+    scanner.run(paths, print_tags=False)
+    assert list(scanner.errors) == [paths[1]]
+    assert len(log.warnings) == 1
+
+def test_every_tag_of_a_failed_worker_is_reported(tmp_path):
+    paths = make_graphs(tmp_path, 6)
+    # The backend cannot be created, so each worker exits before reading a tag
+    scanner = TagScanner("state_names", "synthetic", {"tags_directory": str(tmp_path)}, 2, RecordingLog())
+    scanner.run(paths, print_tags=False)
+    assert sorted(scanner.errors) == sorted(paths)
+    assert all("Worker process" in error or "Failed to send" in error for error in scanner.errors.values())
+
+def test_only_result_lines_are_messages():
+    assert parse_worker_line('{"path": "a", "result": {}}\n') == {"path": "a", "result": {}}
+    assert parse_worker_line('{"path": "a", "error": "x"}') == {"path": "a", "error": "x"}
+    assert parse_worker_line("ManagedBlam started\n") is None
+    assert parse_worker_line("[1, 2]") is None
+    assert parse_worker_line('{"status": "ok"}') is None
@@ -0,0 +1,206 @@
+import pytest
+
+from fakes import FakeTagBackend, RecordingLog
+from io_scene_foundry.block_sync import block_states
+from io_scene_foundry.managed_blam.tag_session import TagSession, close_tag, current_session
+
+class SessionTag:
+    '''Opens a tag the way managed_blam.Tag does, through the active session if there is one, and closes it with Tag's close_tag'''
+    def __init__(self, backend: FakeTagBackend, path: str, fail_reading=False):
+        self.session = current_session()
+        self.path = path
+        self.key = None
+        self.tag_has_changes = False
+        tag = backend.TagFile()
+        def load(tag):
+            if path in backend.files:
+                tag.Load(path)
+            else:
+                tag.New(path)
+                self.tag_has_changes = True
+        try:
+            if self.session:
+                self.tag = self.session.open(path, tag, load)
+                self.key = path
+            else:
+                self.tag = tag
+                load(tag)
+            if fail_reading:
+                raise ValueError("Failed to read fields")
+        except:
+            if self.key is not None:
+                self.session.release(self.key, False)
+                self.key = None
+            self.tag = None
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        close_tag(self.session, self.key, self.tag, self.path, self.tag_has_changes, exc_type is not None)
+
+    def set(self, field, value):
+        self.tag.fields[field] = value
+        self.tag_has_changes = True
+
+@pytest.fixture
+def backend():
+    return FakeTagBackend({"model.model": {"name": "model"}, "scenario.scenario": {"name": "scenario"}})
+
+def test_a_tag_opened_many_times_is_loaded_and_saved_once(backend):
+    with TagSession(RecordingLog()) as session:
+        for idx in range(5):
+            with SessionTag(backend, "model.model") as tag:
+                tag.set(f"field_{idx}", idx)
+        with SessionTag(backend, "scenario.scenario"):
+            pass
+        assert session.handles["model.model"].references == 0
+
+    assert backend.loads == ["model.model", "scenario.scenario"]
+    assert backend.saves == ["model.model"]
+    assert backend.files["model.model"]["field_4"] == 4
+    # The tag files created for the repeat opens are disposed straight away, and the session's own ones when it closes
+    assert backend.open_files() == 0
+    assert (session.loads, session.saves) == (2, 1)
+
+def test_nested_sessions_join_the_outer_session(backend):
+    with TagSession(RecordingLog()) as outer:
+        with TagSession(RecordingLog()) as inner:
+            assert inner is outer
+            with SessionTag(backend, "model.model") as tag:
+                tag.set("a", 1)
+        assert not backend.saves and current_session() is outer
+    assert current_session() is None
+    assert backend.saves == ["model.model"]
+
+def test_new_tags_are_always_saved(backend):
+    with TagSession(RecordingLog()):
+        with SessionTag(backend, "new.scenario_structure_bsp"):
+            pass
+    assert backend.news == ["new.scenario_structure_bsp"] and backend.saves == ["new.scenario_structure_bsp"]
+
+def test_failed_load_holds_no_reference(backend):
+    backend.load_failures.add("model.model")
+    with TagSession(RecordingLog()) as session:
+        with pytest.raises(RuntimeError):
+            SessionTag(backend, "model.model")
+        assert "model.model" not in session.handles
+        # The unused tag file is left for its Tag to close, as it is outside the session
+        assert backend.open_files() == 1
+
+def test_failure_after_acquiring_releases_the_reference(backend):
+    with TagSession(RecordingLog()) as session:
+        with SessionTag(backend, "model.model"):
+            with pytest.raises(ValueError):
+                SessionTag(backend, "model.model", fail_reading=True)
+            assert session.handles["model.model"].references == 1
+        assert session.handles["model.model"].references == 0
+    assert not backend.saves and backend.open_files() == 0
+
+def test_rollback_saves_nothing_and_forgets_changed_block_states(backend, tmp_path):
+    path = str(tmp_path / "model.model")
+    backend.files[path] = {}
+    block_states.record(path, "regions", [("default", None)])
+    with pytest.raises(KeyError):
+        with TagSession(RecordingLog()):
+            with SessionTag(backend, path) as tag:
+                tag.set("a", 1)
+            raise KeyError("export failed")
+    assert not backend.saves and backend.open_files() == 0
+    assert block_states.tags.get(block_states._key(path)) is None
+
+def test_failed_save_is_reported_and_the_others_still_saved(backend):
+    backend.save_failures.add("model.model")
+    log = RecordingLog()
+    with TagSession(log):
+        for path in ("model.model", "scenario.scenario"):
+            with SessionTag(backend, path) as tag:
+                tag.set("a", 1)
+    assert backend.saves == ["scenario.scenario"]
+    assert len(log.warnings) == 1 and "model.model" in log.warnings[0]
+    assert backend.open_files() == 0
+
+def test_tag_which_failed_part_way_is_discarded_not_saved(backend, tmp_path):
+    path = str(tmp_path / "model.model")
+    backend.files[path] = {"name": "model"}
+    block_states.record(path, "regions", [("default", None)])
+    log = RecordingLog()
+    with TagSession(log) as session:
+        with SessionTag(backend, path) as outer:
+            with pytest.raises(ValueError):
+                with SessionTag(backend, path) as tag:
+                    tag.set("half", "written")
+                    raise ValueError("sync failed")
+            # Still in use by the outer Tag, so a flush now must not save the partial change
+            session.flush()
+            assert not backend.saves
+            outer.set("a", 1)
+        assert path not in session.handles and backend.open_files() == 0
+        assert block_states.tags.get(block_states._key(path)) is None
+        # Opening it again loads it fresh from disk
+        with SessionTag(backend, path) as tag:
+            assert "half" not in tag.tag.fields
+            tag.set("b", 2)
+
+    assert backend.saves == [path] and backend.files[path] == {"name": "model", "b": 2}
+    assert backend.loads == [path, path]
+    assert len(log.warnings) == 1 and path in log.warnings[0]
+
+def test_outside_a_session_tags_are_saved_as_they_close(backend, tmp_path):
+    path = str(tmp_path / "model.model")
+    backend.files[path] = {}
+    with SessionTag(backend, path) as tag:
+        tag.set("a", 1)
+    assert backend.saves == [path] and backend.files[path] == {"a": 1}
+    with SessionTag(backend, "scenario.scenario"):
+        pass
+    assert backend.saves == [path] and backend.open_files() == 0
+
+def test_outside_a_session_a_failed_tag_is_not_saved(backend, tmp_path):
+    path = str(tmp_path / "model.model")
+    backend.files[path] = {}
+    block_states.record(path, "regions", [("default", None)])
+    with pytest.raises(ValueError):
+        with SessionTag(backend, path) as tag:
+            tag.set("half", "written")
+            raise ValueError("sync failed")
+    assert not backend.saves and backend.open_files() == 0
+    assert block_states.tags.get(block_states._key(path)) is None
+
+def test_outside_a_session_a_failed_save_forgets_the_block_state(backend, tmp_path):
+    path = str(tmp_path / "model.model")
+    backend.files[path] = {}
+    backend.save_failures.add(path)
+    block_states.record(path, "regions", [("default", None)])
+    with SessionTag(backend, path) as tag:
+        tag.set("a", 1)
+    assert not backend.saves and backend.open_files() == 0
+    assert block_states.tags.get(block_states._key(path)) is None
+
+def test_export_phases_save_before_tool_import_and_load_its_output_after(backend):
+    '''Export runs the tags pre process and post process in separate sessions, so tool import reads the pre processed tags from disk
+    and the post process loads what tool import wrote'''
+    with TagSession(RecordingLog()) as preprocess:
+        for field in ("parent", "compression"):
+            with SessionTag(backend, "model.model") as tag:
+                tag.set(field, 1)
+        assert not backend.saves
+    assert backend.saves == ["model.model"] and preprocess.saves == 1
+
+    # Tool import reads the saved tag and writes its own fields
+    assert backend.files["model.model"]["parent"] == 1
+    backend.files["model.model"]["imported"] = True
+
+    with TagSession(RecordingLog()) as postprocess:
+        with SessionTag(backend, "model.model") as tag:
+            assert tag.tag.fields["imported"]
+            tag.set("overrides", 1)
+        # A light exporter called during the post process joins its session
+        with TagSession(RecordingLog()) as lights:
+            with SessionTag(backend, "model.model") as tag:
+                tag.set("lighting_info", 1)
+        assert lights is postprocess and backend.saves == ["model.model"]
+    assert backend.saves == ["model.model", "model.model"]
+    assert backend.files["model.model"] == {"name": "model", "parent": 1, "compression": 1, "imported": True, "overrides": 1, "lighting_info": 1}
+    assert backend.open_files() == 0
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.tool_output import ERROR, INFO, NOISE, PATTERN, PREFIX, WARNING, ToolOutputClassifier, compile_rules, read_tool_output
+
+EDGE_LINES = [
+    "",
+    "IMPORT FAILED",
+    "   IMPORT FAILED",
+    "IMPORT FAILED: Do you really want this?",
+    "animation:import: Failed to extract node",
+    "animation:import: first animation:import: Failed to extract node",
+    "animation:import: Failed to extract animation:import: Imported",
+    "animation:import: first animation:import: Failed",
+    "animation:import: Failed to find any animated nodes",
+    "animation:import:",
+    "animation:import:Failed",
+    "animation:import:x animation:import: Failed",
+    "animation:import: animation:import: ",
+    "prefix animation:import: Failed",
+    "Failed animation:import: Failed",
+    "### WARNING (skipping tangent-space calculations)",
+]
+
+def test_matches_the_previous_substring_chain():
+    classifier = ToolOutputClassifier()
+    for line in synthetic.make_tool_lines(20000, seed=3) + EDGE_LINES:
+        assert classifier.classify(line) == reference.classify_tool_line(line), line
+
+def test_first_matching_rule_wins():
+    classify = compile_rules((
+        (ERROR, PREFIX, "a"),
+        (INFO, PREFIX, "ab"),
+        (NOISE, PATTERN, ("b", r"b+c")),
+        (WARNING, PATTERN, ("b", r"b")),
+    ), default=INFO)
+    assert [classify(line) for line in ("abc", "bbc", "bx", "c", "'quote\"")] == [ERROR, NOISE, WARNING, INFO, INFO]
+    with pytest.raises(ValueError):
+        compile_rules(((ERROR, "suffix", "x"),))
+
+def test_reader_counts_and_buffers_lines():
+    lines = ["IMPORT FAILED x", "animation:import: Imported idle", "plain warning", "blah if it is a decorator"] * 300
+    classifier = ToolOutputClassifier(buffer_size=10)
+    seen = []
+    stream = io.BytesIO("".join(line + "\r\n" for line in lines).encode() + b"\xff bad bytes\n")
+    read_tool_output(stream, classifier, lambda line, category: seen.append(category)).join()
+
+    assert classifier.counts == {ERROR: 300, INFO: 300, WARNING: 301, NOISE: 300}
+    assert len(seen) == 1201
+    summary = classifier.summary()
+    assert summary["lines"] == 1201 and NOISE not in summary["recent"]
+    assert len(summary["recent"][WARNING]) == 10 and summary["recent"][WARNING][-1] == "� bad bytes"
@@ -0,0 +1,113 @@
+from ctypes import Array, addressof, c_ubyte
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from fakes import FakeGranny
+import reference
+import synthetic
+from io_scene_foundry.export.profiler import ExportProfiler
+from io_scene_foundry.export.vertex_buffer import bake_vertex_buffer, granny_vertex_buffer, weld_loops
+
+def mesh_components(num_vertices: int, seed=0, weighted=True, uv_layers=2, color_layers=1, vertex_ids=False) -> tuple[list, list]:
+    '''Vertex component arrays and dtypes in the order VirtualMesh._granny_vertex_data lays them out'''
+    rng = np.random.default_rng(seed)
+    data = [rng.random((num_vertices, 3), dtype=np.float32), rng.random((num_vertices, 3), dtype=np.float32)]
+    dtypes = [('Position', np.single, (3,)), ('Normal', np.single, (3,))]
+    if weighted:
+        data += [rng.integers(0, 128, (num_vertices, 4)).astype(np.byte), rng.integers(0, 40, (num_vertices, 4)).astype(np.byte)]
+        dtypes += [('BoneWeights', np.byte, (4,)), ('BoneIndices', np.byte, (4,))]
+    for idx in range(uv_layers):
+        data.append(rng.random((num_vertices, 3), dtype=np.float32))
+        dtypes.append((f"TextureCoordinates{idx}", np.single, (3,)))
+    for idx in range(color_layers):
+        # Colours are read as float64 from Blender and narrowed when packed
+        data.append(rng.random((num_vertices, 3)))
+        dtypes.append((f"DiffuseColor{idx}", np.single, (3,)))
+    if vertex_ids:
+        data.append(np.stack((np.arange(num_vertices), np.zeros(num_vertices)), axis=-1).astype(np.single))
+        dtypes.append(('vertex_id', np.single, (2,)))
+    return data, dtypes
+
+LAYOUTS = {
+    "render": {},
+    "unweighted": {"weighted": False},
+    "position and normal only": {"weighted": False, "uv_layers": 0, "color_layers": 0},
+    "many layers": {"uv_layers": 4, "color_layers": 3, "vertex_ids": True},
+}
+
+@pytest.mark.parametrize("layout", LAYOUTS.values(), ids=LAYOUTS.keys())
+@pytest.mark.parametrize("num_vertices", [1, 7, 1000])
+def test_matches_structured_array_copy(layout, num_vertices):
+    data, dtypes = mesh_components(num_vertices, **layout)
+    buffer = granny_vertex_buffer(data, dtypes, num_vertices)
+    expected = reference.vertex_buffer(data, dtypes)
+    assert len(buffer) == len(expected)
+    assert bytes(buffer) == bytes(expected)
+
+def test_duplicate_component_names_are_packed_separately():
+    # A lighting only uv layer reused the name of the last uv layer before component names were generated
+    data, dtypes = mesh_components(10, uv_layers=1, color_layers=0, weighted=False)
+    data.append(np.ones((10, 3), dtype=np.float32))
+    dtypes.append(dtypes[-1])
+    buffer = np.frombuffer(granny_vertex_buffer(data, dtypes, 10), dtype=np.single).reshape(10, -1)
+    np.testing.assert_array_equal(buffer[:, -6:-3], data[-2])
+    np.testing.assert_array_equal(buffer[:, -3:], 1)
+
+def test_bytes_are_counted_in_the_profiler():
+    data, dtypes = mesh_components(100)
+    profiler = ExportProfiler(True)
+    with profiler.stage("meshes"):
+        buffer = granny_vertex_buffer(data, dtypes, 100, profiler)
+    counts = profiler.events[0].counts
+    # One allocation the size of the packed buffer, with every component written once
+    assert counts["vertex buffer bytes allocated"] == len(buffer) == 100 * (12 + 12 + 4 + 4 + 12 + 12 + 12)
+    assert counts["vertex buffer bytes copied"] == len(buffer)
+
+@pytest.mark.parametrize("num_vertices", [1, 50, 2000])
+def test_welded_vertices_rebuild_every_loop(num_vertices):
+    loops = synthetic.make_mesh_loops(num_vertices, seed=num_vertices)
+    vertex_loops, loop_vertices = weld_loops(loops)
+    assert loop_vertices.shape == (len(loops[0]),)
+    loop_data = np.hstack(loops)
+    vertices = loop_data[vertex_loops]
+    np.testing.assert_array_equal(vertices[loop_vertices], loop_data)
+    # Every vertex is distinct, so loops are only merged when all their attributes match
+    assert len(np.unique(vertices, axis=0)) == len(vertices) == len({row.tobytes() for row in loop_data})
+
+def test_loops_which_differ_in_any_attribute_stay_apart():
+    positions = np.zeros((4, 3), dtype=np.single)
+    normals = np.array(((0, 0, 1), (0, 0, 1), (0, 1, 0), (0, 0, 1)), dtype=np.single)
+    uvs = np.array(((0, 0, 0), (0, 0, 0), (0, 0, 0), (0.5, 0, 0)), dtype=np.single)
+    vertex_loops, loop_vertices = weld_loops([positions, normals, uvs])
+    assert len(vertex_loops) == 3
+    assert loop_vertices[0] == loop_vertices[1] and len(set(loop_vertices[1:].tolist())) == 3
+
+def write_file(granny: FakeGranny, filename: str, mesh: Array, num_vertices: int, transform: tuple | None) -> np.ndarray:
+    '''Writes one node of mesh the way ExportScene._build_granny_file does, returning the vertices granny saved'''
+    node = SimpleNamespace(baked_vertex_array=None)
+    granny.new(filename)
+    node.baked_vertex_array = bake_vertex_buffer(mesh, num_vertices, None, transform, granny)
+    granny.from_tree(None, {"node": node})
+    granny.transform()
+    return np.frombuffer(node.baked_vertex_array, dtype=np.single).copy()
+
+def test_nodes_sharing_a_mesh_are_transformed_once_in_every_file():
+    positions = np.arange(12, dtype=np.single).reshape(4, 3)
+    mesh = granny_vertex_buffer([positions], [("Position", np.single, (3,))], 4)
+    granny = FakeGranny()
+    # An identity node written first must not leave granny's in place transform on the mesh's buffer
+    identity = write_file(granny, "identity.gr2", mesh, 4, None)
+    moved = write_file(granny, "moved.gr2", mesh, 4, ((5.0, 0.0, 0.0), None, None))
+    again = write_file(granny, "identity_again.gr2", mesh, 4, None)
+    np.testing.assert_array_equal(np.frombuffer(mesh, dtype=np.single), positions.ravel())
+    np.testing.assert_array_equal(identity, positions.ravel() * 2)
+    np.testing.assert_array_equal(moved, ((positions + (5, 0, 0)) * 2).ravel())
+    np.testing.assert_array_equal(again, identity)
+    assert granny.transformed == ["moved.gr2"]
+
+def test_baked_vertices_are_a_copy():
+    mesh = (c_ubyte * 8)(*range(8))
+    baked = bake_vertex_buffer(mesh, 2, None, None, FakeGranny())
+    assert bytes(baked) == bytes(mesh) and addressof(baked) != addressof(mesh)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import reference
+import synthetic
+from io_scene_foundry.managed_blam.vertex_buffers import decompress_texcoords, net_array_to_numpy, normalize_vectors, vertex_group_weights
+
+def apply_group_weights(groups) -> dict[int, dict[int, float]]:
+    '''Applies vertex_group_weights output the way Mesh._create_mesh does, one add call per distinct weight'''
+    applied = {}
+    for node_index, weighted_vertices in groups:
+        group = applied.setdefault(node_index, {})
+        for weight, vertices in weighted_vertices:
+            group.update(dict.fromkeys(vertices, weight))
+    return applied
+
+def test_net_array_to_numpy_gives_a_row_per_vertex():
+    # .NET arrays arrive as flat iterables
+    array = net_array_to_numpy(iter([0.5, 1, 2, 3, 4, 5]), np.single, 3)
+    assert array.dtype == np.single and array.shape == (2, 3)
+    np.testing.assert_array_equal(array, [[0.5, 1, 2], [3, 4, 5]])
+
+@pytest.mark.parametrize("bounds", [None, ((-2.0, 3.0), (0.25, 0.5)), ((1.0, -1.0), (4.0, 8.0))])
+def test_decompress_texcoords_matches_per_vertex_interp(bounds):
+    texcoords = np.random.default_rng(0).uniform(-0.5, 1.5, (500, 2))
+    # Values outside 0-1 are clamped by np.interp, as they were per vertex
+    uvs = decompress_texcoords(texcoords, *bounds) if bounds else decompress_texcoords(texcoords)
+    expected = reference.true_uvs(texcoords, *bounds) if bounds else reference.true_uvs(texcoords)
+    assert uvs.dtype == np.single
+    np.testing.assert_allclose(uvs, np.array(expected, dtype=np.single), rtol=1e-6)
+
+def test_normalize_vectors_matches_vector_normalized():
+    vectors = np.random.default_rng(1).normal(size=(300, 3)).astype(np.single)
+    vectors[::7] = 0
+    normals = normalize_vectors(vectors)
+    np.testing.assert_allclose(normals, reference.normalized(vectors), atol=1e-6)
+    assert not normals[::7].any()
+
+@pytest.mark.parametrize("node_map", [[], list(range(60, 0, -1))])
+@pytest.mark.parametrize("seed", range(4))
+def test_vertex_group_weights_match_per_influence_adds(seed, node_map):
+    node_indices, node_weights = synthetic.make_influences(500, 40, seed)
+    groups = vertex_group_weights(node_indices, node_weights, node_map)
+    expected = reference.vertex_group_adds(node_indices, node_weights, node_map)
+    applied = apply_group_weights(groups)
+    # Groups are created in the same order and end with the same weights
+    assert list(applied) == list(expected)
+    assert applied == expected
+
+def test_vertex_group_weights_without_influences():
+    assert vertex_group_weights(np.full((4, 4), 255, dtype=np.int32), np.ones((4, 4), dtype=np.single), []) == []
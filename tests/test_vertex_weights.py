@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from io_scene_foundry.export.vertex_weights import top_bone_weights, unpack_group_elements
+
+def reference_weights(vertex_groups: list[list[tuple[int, float]]], max_influences=4):
+    '''Per vertex version of top_bone_weights: sort each vertex's groups by weight, keep the top few and normalise them'''
+    weights = np.zeros((len(vertex_groups), max_influences), dtype=np.single)
+    indices = np.zeros((len(vertex_groups), max_influences), dtype=np.int32)
+    for vertex, groups in enumerate(vertex_groups):
+        kept = sorted(groups, key=lambda group: -group[1])[:max_influences]
+        total = sum(np.single(weight) for _, weight in kept)
+        for column, (index, weight) in enumerate(kept):
+            if total > 0 and weight > 0:
+                weights[vertex, column] = np.single(weight) / total
+                indices[vertex, column] = index
+    return weights, indices
+
+def flatten(vertex_groups):
+    counts = np.array([len(groups) for groups in vertex_groups], dtype=np.int32)
+    elements = np.array([value for groups in vertex_groups for pair in groups for value in pair], dtype=np.float64)
+    return counts, elements
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_per_vertex_reference(seed):
+    rng = np.random.default_rng(seed)
+    vertex_groups = []
+    for _ in range(500):
+        num_groups = int(rng.integers(0, 7))
+        groups = rng.choice(20, num_groups, replace=False)
+        # Rounded weights give ties and zero weights
+        vertex_groups.append([(int(group), float(np.round(rng.random(), 1))) for group in groups])
+
+    counts, elements = flatten(vertex_groups)
+    group_indices, group_weights = unpack_group_elements(elements)
+    assert group_indices.dtype == np.int32 and group_weights.dtype == np.single
+    weights, indices = top_bone_weights(counts, group_indices, group_weights)
+    expected_weights, expected_indices = reference_weights(vertex_groups)
+    np.testing.assert_allclose(weights, expected_weights, rtol=1e-6)
+    np.testing.assert_array_equal(indices, expected_indices)
+
+def test_no_groups():
+    counts, elements = flatten([[], []])
+    weights, indices = top_bone_weights(counts, *unpack_group_elements(elements))
+    assert weights.shape == (2, 4) and not weights.any() and not indices.any()